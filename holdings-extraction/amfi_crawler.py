@@ -0,0 +1,235 @@
+"""
+Incremental AMFI Crawler
+Follows the portfolio-disclosure listing into its month, AMC and archive sub-pages
+concurrently and keeps a persistent URL index (state/amfi_url_index.json) with first-seen and
+last-seen dates. Listing pages are fetched with If-None-Match / If-Modified-Since, so an
+unchanged page costs one 304; only disclosures that are new, or whose server validators
+changed, are reported to the downstream stages.
+
+Index:
+  {
+    pages:       {url: {etag, lastModified, links: [...], subpages: [...], lastFetched}},
+    disclosures: {url: {fund_name, filename, format, firstSeen, lastSeen, etag, lastModified,
+                        sha256, downloadedAt}}
+  }
+
+Environment:
+  AMFI_INDEX_FILE       URL index (default state/amfi_url_index.json)
+  AMFI_CRAWL_DEPTH      sub-page levels to follow below the listing (default 2)
+  AMFI_CRAWL_MAX_PAGES  listing pages per run (default 200)
+  AMFI_CRAWL_WORKERS    pages fetched concurrently (default 4; pacing is still per rate_limiter)
+"""
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from urllib.parse import urljoin, urldefrag, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+
+import instrumentation
+import rate_limiter
+
+INDEX_FILE = os.getenv('AMFI_INDEX_FILE', os.path.join('state', 'amfi_url_index.json'))
+MAX_DEPTH = int(os.getenv('AMFI_CRAWL_DEPTH', '2'))
+MAX_PAGES = int(os.getenv('AMFI_CRAWL_MAX_PAGES', '200'))
+WORKERS = int(os.getenv('AMFI_CRAWL_WORKERS', '4'))
+SOURCE = 'amfi'
+
+# Sub-pages worth following: month/AMC/archive listings of portfolio disclosures
+SUBPAGE_PATTERN = re.compile(
+    r'portfolio|disclosure|holding|archive|amc|fund-house|'
+    r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|\b20\d\d\b',
+    re.IGNORECASE
+)
+SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.svg', '.css', '.js', '.zip', '.doc', '.docx')
+
+_state = {'index': None}
+_lock = threading.Lock()
+
+def load_index():
+    """The persistent URL index (loaded once per process)"""
+    if _state['index'] is None:
+        if os.path.exists(INDEX_FILE):
+            with open(INDEX_FILE, 'r') as f:
+                _state['index'] = json.load(f)
+        else:
+            _state['index'] = {'pages': {}, 'disclosures': {}}
+    return _state['index']
+
+def save_index():
+    """Atomically persist the URL index"""
+    index = load_index()
+    directory = os.path.dirname(INDEX_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = INDEX_FILE + '.tmp'
+    with _lock, open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, INDEX_FILE)
+
+def validators(headers):
+    """ETag / Last-Modified of a response"""
+    return {'etag': headers.get('ETag'), 'lastModified': headers.get('Last-Modified')}
+
+def conditional_headers(entry, headers=None):
+    """Request headers that let the server answer 304 when nothing changed"""
+    headers = dict(headers or {})
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('lastModified'):
+        headers['If-Modified-Since'] = entry['lastModified']
+    return headers
+
+def find_subpages(page_url, soup, start_url):
+    """Listing sub-pages on the same host as the start page"""
+    host = urlparse(start_url).netloc
+    subpages = []
+    for link in soup.find_all('a', href=True):
+        url = urldefrag(urljoin(page_url, link['href']))[0]
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or parsed.netloc != host:
+            continue
+        if parsed.path.lower().endswith(SKIP_EXTENSIONS) or url == page_url:
+            continue
+        if SUBPAGE_PATTERN.search(parsed.path) or SUBPAGE_PATTERN.search(link.get_text(' ', strip=True)):
+            subpages.append(url)
+    return subpages
+
+def fetch_page(url, extract_links, start_url, headers=None):
+    """Conditional GET of one listing page; returns (disclosure links, sub-pages, changed)"""
+    pages = load_index()['pages']
+    entry = pages.get(url)
+    response = rate_limiter.get(SOURCE, url, headers=conditional_headers(entry, headers), timeout=30)
+
+    if response.status_code == 304 and entry:
+        instrumentation.count('scrape', 'pages_not_modified')
+        return entry['links'], entry['subpages'], False
+    response.raise_for_status()
+    instrumentation.count('scrape', 'pages_fetched')
+    instrumentation.count('scrape', 'bytes_downloaded', len(response.content))
+
+    soup = BeautifulSoup(response.text, 'html.parser')
+    links = extract_links(url, soup)
+    disclosure_urls = {link['url'] for link in links}
+    subpages = [u for u in find_subpages(url, soup, start_url) if u not in disclosure_urls]
+    with _lock:
+        pages[url] = {**validators(response.headers), 'links': links, 'subpages': subpages,
+                      'lastFetched': datetime.now().isoformat()}
+    return links, subpages, True
+
+def fetch_subpage(url, extract_links, start_url, headers=None):
+    """fetch_page for a sub-page: a failure keeps the links it listed last time instead of aborting the crawl"""
+    try:
+        return fetch_page(url, extract_links, start_url, headers)
+    except Exception as e:
+        print(f"   ⚠️  {url[:70]}: {str(e)[:50]}")
+        instrumentation.count('scrape', 'pages_failed')
+        entry = load_index()['pages'].get(url)
+        return (entry['links'], entry['subpages'], False) if entry else ([], [], False)
+
+def crawl(start_url, extract_links, headers=None, max_depth=None, max_pages=None, workers=None):
+    """Breadth-first crawl of the listing and its sub-pages, one level at a time in a thread pool.
+    Returns (disclosure links, urls of listing pages that changed)."""
+    max_depth = MAX_DEPTH if max_depth is None else max_depth
+    max_pages = max_pages or MAX_PAGES
+    seen = {start_url}
+    level = [start_url]
+    links = {}
+    changed_pages = set()
+    visited = 0
+
+    with ThreadPoolExecutor(max_workers=workers or WORKERS) as pool:
+        for depth in range(max_depth + 1):
+            if not level:
+                break
+            fetch = fetch_page if depth == 0 else fetch_subpage
+            results = list(pool.map(lambda url: (url, fetch(url, extract_links, start_url, headers)), level))
+            visited += len(results)
+            next_level = []
+            for url, (page_links, subpages, changed) in results:
+                if changed:
+                    changed_pages.add(url)
+                for link in page_links:
+                    links.setdefault(link['url'], dict(link, page=url))
+                for subpage in subpages:
+                    if subpage not in seen and len(seen) < max_pages:
+                        seen.add(subpage)
+                        next_level.append(subpage)
+            level = next_level if depth < max_depth else []
+
+    instrumentation.count('scrape', 'pages_visited', visited)
+    return list(links.values()), changed_pages
+
+def head_changed(link, entry, headers=None):
+    """Conditional HEAD of a known disclosure; True if the server reports new content"""
+    try:
+        response = rate_limiter.request(SOURCE, 'HEAD', link['url'], headers=conditional_headers(entry, headers),
+                                        timeout=30, allow_redirects=True)
+    except Exception:
+        return False
+    if response.status_code == 304 or response.status_code >= 400:
+        return False
+    new = validators(response.headers)
+    if not (new['etag'] or new['lastModified']):
+        return False
+    return (new['etag'], new['lastModified']) != (entry.get('etag'), entry.get('lastModified'))
+
+def discover(start_url, extract_links, headers=None, workers=None):
+    """Crawl, update first/last-seen dates and tag every current link 'new', 'changed' or 'unchanged'"""
+    index = load_index()
+    disclosures = index['disclosures']
+    links, changed_pages = crawl(start_url, extract_links, headers, workers=workers)
+    now = datetime.now().isoformat()
+
+    # Known files are only re-validated when the page listing them changed
+    recheck = [link for link in links
+               if disclosures.get(link['url'], {}).get('sha256') and link['page'] in changed_pages]
+    with ThreadPoolExecutor(max_workers=workers or WORKERS) as pool:
+        changed_urls = {
+            link['url'] for link, changed in zip(recheck, pool.map(lambda l: head_changed(l, disclosures[l['url']], headers), recheck))
+            if changed
+        }
+
+    for link in links:
+        entry = disclosures.get(link['url'])
+        if entry is None:
+            link['change'] = 'new'
+            disclosures[link['url']] = {
+                'fund_name': link['fund_name'], 'filename': link['filename'], 'format': link['format'],
+                'firstSeen': now, 'lastSeen': now
+            }
+        else:
+            # Never downloaded successfully: still pending
+            if not entry.get('sha256'):
+                link['change'] = 'new'
+            else:
+                link['change'] = 'changed' if link['url'] in changed_urls else 'unchanged'
+            entry['lastSeen'] = now
+        link.pop('page', None)
+
+    counts = {change: sum(1 for l in links if l['change'] == change) for change in ('new', 'changed', 'unchanged')}
+    for change, total in counts.items():
+        instrumentation.count('scrape', f"links_{change}", total)
+    save_index()
+    return links
+
+def record_download(pdf_info):
+    """Store validators and content hash of a download; False if the content is what we already had"""
+    index = load_index()
+    with _lock:
+        entry = index['disclosures'].setdefault(pdf_info['url'], {
+            'fund_name': pdf_info.get('fund_name'), 'filename': pdf_info.get('filename'),
+            'format': pdf_info.get('format'), 'firstSeen': datetime.now().isoformat(),
+            'lastSeen': datetime.now().isoformat()
+        })
+        unchanged = entry.get('sha256') == pdf_info.get('sha256')
+        if pdf_info.get('etag'):
+            entry['etag'] = pdf_info['etag']
+        if pdf_info.get('last_modified'):
+            entry['lastModified'] = pdf_info['last_modified']
+        entry['sha256'] = pdf_info.get('sha256')
+        entry['downloadedAt'] = pdf_info.get('downloaded_at')
+    return not unchanged
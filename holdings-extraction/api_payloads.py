@@ -0,0 +1,287 @@
+"""
+Pre-rendered API Payloads
+Last pipeline stage: renders the JSON the holdings API returns for
+  GET /api/holdings/stats
+  GET /api/holdings/:schemeCode              (default limit of 50)
+  GET /api/holdings/:schemeCode/top          (default limit of 10)
+  GET /api/holdings/:schemeCode/sectors
+once per scheme, precompressed with gzip and brotli, so a static server or the API can send
+the bytes as-is instead of rebuilding them from Mongo on every request. Only schemes whose
+holdings changed since the last run are re-rendered (a fingerprint of the rows is kept per
+scheme); files whose content didn't change are not rewritten, so their ETags stay valid.
+
+Layout (HOLDINGS_API_PAYLOAD_DIR, default api_payloads/):
+  holdings/stats.json[.gz|.br]
+  holdings/<schemeCode>.json[.gz|.br]
+  holdings/<schemeCode>/top.json[.gz|.br]
+  holdings/<schemeCode>/sectors.json[.gz|.br]
+  _manifest.json    {schemes: {code: fingerprint}, payloads: {path: {etag, bytes, gzip, br}}}
+ETags are content hashes of the JSON body; each encoding gets its own ('"<hash>"',
+'"<hash>-gz"', '"<hash>-br"'). Serve with `Vary: Accept-Encoding` (nginx gzip_static /
+brotli_static, or the API reading _manifest.json).
+
+Usage:
+  python api_payloads.py [publish] [--force]     # render changed schemes (--force: all)
+
+Environment:
+  HOLDINGS_API_PAYLOAD_DIR    output directory (default api_payloads)
+  HOLDINGS_BROTLI_QUALITY     brotli quality, 0-11 (default 11; payloads are small and written once)
+"""
+
+import os
+import sys
+import json
+import gzip
+import hashlib
+from datetime import datetime
+
+import instrumentation
+import repository
+
+try:
+    import brotli
+except ImportError:  # gzip only until the dependency is installed
+    brotli = None
+
+PAYLOAD_DIR = os.getenv('HOLDINGS_API_PAYLOAD_DIR', 'api_payloads')
+BROTLI_QUALITY = int(os.getenv('HOLDINGS_BROTLI_QUALITY', '11'))
+
+MANIFEST_FILE = '_manifest.json'
+HOLDINGS_LIMIT = 50         # controller default for /api/holdings/:schemeCode
+TOP_LIMIT = 10              # controller default for /api/holdings/:schemeCode/top
+ENCODINGS = {'gzip': '.gz', 'br': '.br'}
+HOLDING_FIELDS = ['security', 'weight', 'marketValue', 'sector', 'securityType']
+
+def _number(value):
+    """None for missing/NaN numbers"""
+    return None if value is None or value != value else value
+
+def iso_date(date):
+    """Date as Express serializes it (2026-01-01T00:00:00.000Z)"""
+    if date is None:
+        return None
+    return date.strftime('%Y-%m-%dT%H:%M:%S.') + f"{date.microsecond // 1000:03d}Z"
+
+def encode(payload):
+    """Compact UTF-8 JSON body"""
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def etag(body):
+    """Strong ETag from the JSON body's content hash"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def compress(body):
+    """{encoding: bytes} for every available encoding (gzip is deterministic: mtime 0)"""
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return variants
+
+def scheme_portfolios(db):
+    """Yield (schemeCode, rows of its latest month, rows scanned) streaming fund_holdings by scheme"""
+    cursor = repository.fund_holdings(db).find(
+        {'schemeCode': {'$ne': None}},
+        {'_id': 0, 'schemeCode': 1, 'fundName': 1, 'reportDate': 1, **{f: 1 for f in HOLDING_FIELDS}},
+        batch_size=10000
+    ).sort('schemeCode', 1)
+
+    code, rows, scanned = None, [], 0
+    for doc in cursor:
+        if doc['schemeCode'] != code:
+            if rows:
+                yield code, latest_month(rows), scanned
+            code, rows, scanned = doc['schemeCode'], [], 0
+        rows.append(doc)
+        scanned += 1
+    if rows:
+        yield code, latest_month(rows), scanned
+
+def latest_month(rows):
+    """Rows of the latest report date, heaviest first (the order the API returns)"""
+    latest = max((r.get('reportDate') for r in rows if r.get('reportDate')), default=None)
+    rows = [r for r in rows if r.get('reportDate') == latest]
+    rows.sort(key=lambda r: (_number(r.get('weight')) is None, -(_number(r.get('weight')) or 0), str(r.get('security'))))
+    return rows
+
+def fingerprint(rows):
+    """Content hash of a scheme's latest rows (changes with holdings, sectors or the month)"""
+    digest = hashlib.sha256()
+    for row in rows:
+        values = [row.get('fundName'), iso_date(row.get('reportDate'))] + [_number(row.get(f)) for f in HOLDING_FIELDS]
+        digest.update(json.dumps(values, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def render_scheme(code, rows):
+    """{relative path: payload} for one scheme's endpoints"""
+    scheme = str(code)
+    fund_name = rows[0].get('fundName')
+    report_date = iso_date(rows[0].get('reportDate'))
+    shown = rows[:HOLDINGS_LIMIT]
+
+    payloads = {
+        f"holdings/{scheme}.json": {
+            'success': True,
+            'source': 'static',
+            'schemeCode': scheme,
+            'fundName': fund_name,
+            'reportDate': report_date,
+            'totalHoldings': len(rows),
+            'displayedHoldings': len(shown),
+            'totalWeight': round(sum(_number(r.get('weight')) or 0 for r in shown), 2),
+            'holdings': [{f: _number(r.get(f)) for f in HOLDING_FIELDS} for r in shown]
+        },
+        f"holdings/{scheme}/top.json": {
+            'success': True,
+            'source': 'static',
+            'schemeCode': scheme,
+            'fundName': fund_name,
+            'reportDate': report_date,
+            'topHoldings': [
+                {'security': r.get('security'), 'weight': _number(r.get('weight')), 'marketValue': _number(r.get('marketValue'))}
+                for r in rows[:TOP_LIMIT]
+            ]
+        }
+    }
+
+    sectors = {}
+    for row in rows:
+        if row.get('sector'):
+            sectors[row['sector']] = sectors.get(row['sector'], 0.0) + (_number(row.get('weight')) or 0)
+    if sectors:
+        payloads[f"holdings/{scheme}/sectors.json"] = {
+            'success': True,
+            'source': 'static',
+            'schemeCode': scheme,
+            'sectors': [{'sector': s, 'weight': round(w, 2)} for s, w in sorted(sectors.items(), key=lambda item: -item[1])]
+        }
+    return payloads
+
+def render_stats(funds, records, latest):
+    """Payload for /api/holdings/stats"""
+    return {
+        'success': True,
+        'stats': {
+            'totalFundsWithHoldings': funds,
+            'totalHoldingsRecords': records,
+            'latestReportDate': iso_date(latest)
+        }
+    }
+
+def load_manifest(directory):
+    """Previous run's fingerprints and payload ETags"""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'schemes': {}, 'payloads': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _replace(path, data):
+    """Write a file atomically (readers never see a partial payload)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _remove(path):
+    """Delete a payload and its encodings"""
+    for suffix in [''] + list(ENCODINGS.values()):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def write_payload(directory, relative_path, payload, previous):
+    """Write body and encodings unless the same content is already there; returns (entry, written)"""
+    body = encode(payload)
+    tag = etag(body)
+    path = os.path.join(directory, relative_path)
+    if previous and previous.get('etag') == tag and os.path.exists(path):
+        return previous, False
+
+    entry = {'etag': tag, 'bytes': len(body)}
+    with instrumentation.span('publish', 'compress'):
+        variants = compress(body)
+    for encoding, suffix in ENCODINGS.items():
+        if encoding in variants:
+            _replace(path + suffix, variants[encoding])
+            entry[encoding] = len(variants[encoding])
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    # Identity last: its presence means the encodings next to it are current
+    _replace(path, body)
+    instrumentation.count('publish', 'bytes_identity', len(body))
+    for encoding, data in variants.items():
+        instrumentation.count('publish', f"bytes_{encoding}", len(data))
+    return entry, True
+
+@instrumentation.stage('publish')
+def publish_payloads(db=None, directory=None, force=False):
+    """Render changed schemes' payloads plus stats; returns counts"""
+    if db is None:
+        db = repository.get_db()
+    directory = directory or PAYLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    if brotli is None:
+        print("⚠️  brotli not installed - writing gzip encodings only")
+
+    print(f"📤 Publishing API payloads to {directory}/...")
+    manifest = load_manifest(directory)
+    schemes, payloads = {}, {}
+    counts = {'schemes': 0, 'rendered': 0, 'written': 0, 'unchanged': 0, 'removed': 0}
+    records, latest = 0, None
+
+    for code, rows, scanned in scheme_portfolios(db):
+        scheme = str(code)
+        records += scanned
+        if rows and rows[0].get('reportDate') and (latest is None or rows[0]['reportDate'] > latest):
+            latest = rows[0]['reportDate']
+        counts['schemes'] += 1
+        schemes[scheme] = fingerprint(rows)
+
+        owned = [p for p in (f"holdings/{scheme}.json", f"holdings/{scheme}/top.json", f"holdings/{scheme}/sectors.json")
+                 if p in manifest['payloads']]
+        if not force and manifest['schemes'].get(scheme) == schemes[scheme] and \
+                all(os.path.exists(os.path.join(directory, p)) for p in owned):
+            for path in owned:
+                payloads[path] = manifest['payloads'][path]
+            continue
+
+        with instrumentation.span('publish', 'render'):
+            rendered = render_scheme(code, rows)
+        counts['rendered'] += 1
+        for path, payload in rendered.items():
+            payloads[path], written = write_payload(directory, path, payload, manifest['payloads'].get(path))
+            counts['written' if written else 'unchanged'] += 1
+
+    stats_path = 'holdings/stats.json'
+    payloads[stats_path], written = write_payload(
+        directory, stats_path, render_stats(counts['schemes'], records, latest), manifest['payloads'].get(stats_path)
+    )
+    counts['written' if written else 'unchanged'] += 1
+
+    # Schemes (or sector breakdowns) that no longer exist
+    for path in set(manifest['payloads']) - set(payloads):
+        _remove(os.path.join(directory, path))
+        counts['removed'] += 1
+
+    manifest = {'generatedAt': datetime.now().isoformat(), 'schemes': schemes, 'payloads': payloads}
+    _replace(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    instrumentation.count('publish', 'schemes_rendered', counts['rendered'])
+    for name in ('written', 'unchanged', 'removed'):
+        instrumentation.count('publish', f"payloads_{name}", counts[name])
+    print(f"✅ {counts['rendered']}/{counts['schemes']} schemes re-rendered, {counts['written']} payloads written, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} removed")
+    return counts
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("📤 Pre-rendered Holdings API Payloads")
+    print("=" * 70)
+
+    command = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'publish'
+    if command != 'publish':
+        print("Usage: python api_payloads.py [publish] [--force]")
+        sys.exit(1)
+
+    publish_payloads(repository.get_db(), force='--force' in sys.argv)
+    instrumentation.print_summary(instrumentation.finish())
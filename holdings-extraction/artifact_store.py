@@ -0,0 +1,376 @@
+"""
+Artifact Store
+Compressed on-disk storage for downloaded disclosures (pdfs/) and parsed outputs
+(parsed_holdings/). Callers keep using the plain logical path ('pdfs/x.pdf',
+'parsed_holdings/x.json'); the file on disk is '<path>.zst' when compression pays off.
+Parsed JSON is compressed with a zstd dictionary trained on earlier outputs (they repeat the
+same keys, security names and fund names), so even small files shrink by an order of magnitude.
+Readers decompress as a stream; files written before compression was enabled still read as-is.
+
+Layout:
+  <dir>/<name>.zst                    one zstd frame (the dictionary id is in the frame header)
+  <dir>/_dictionaries/<id>.zdict      trained dictionaries, kept while any artifact may use them
+  <dir>/_dictionaries/current         id of the dictionary new JSON artifacts are written with
+
+Usage:
+  python artifact_store.py stats [dir ...]      # files, stored vs raw bytes
+  python artifact_store.py train [dir]          # (re)train the JSON dictionary (default parsed_holdings)
+  python artifact_store.py compress [dir ...]   # compress files written before the store existed
+  python artifact_store.py prune [dir ...]      # apply the retention policy now
+
+Environment:
+  HOLDINGS_COMPRESSION       'zstd' (default) or 'off' to write plain files
+  HOLDINGS_ZSTD_LEVEL        compression level (default 3; fast enough not to slow any stage)
+  HOLDINGS_RETENTION_DAYS    delete artifacts older than this (default 400, 0 keeps everything)
+  HOLDINGS_RETENTION_MB      per-directory size cap, oldest deleted first (default 0 = no cap)
+"""
+
+import os
+import io
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+import instrumentation
+
+try:
+    import zstandard
+except ImportError:  # plain files until the dependency is installed
+    zstandard = None
+
+COMPRESSION = os.getenv('HOLDINGS_COMPRESSION', 'zstd').lower()
+LEVEL = int(os.getenv('HOLDINGS_ZSTD_LEVEL', '3'))
+RETENTION_DAYS = float(os.getenv('HOLDINGS_RETENTION_DAYS', '400'))
+RETENTION_MB = float(os.getenv('HOLDINGS_RETENTION_MB', '0'))
+
+SUFFIX = '.zst'
+DICTIONARY_DIR = '_dictionaries'
+DICTIONARY_SIZE = 64 * 1024
+TRAIN_MIN_SAMPLES = 20      # zstd needs a reasonable corpus before a dictionary helps
+TRAIN_MAX_SAMPLES = 1000
+RETRAIN_EVERY = 500         # retrain once this many artifacts were written with the current dictionary
+MIN_SAVING = 0.05           # binaries that shrink less than this (zipped XLSX, image PDFs) stay plain
+STREAM_CHUNK = 1 << 20
+FRAME_HEADER_MAX = 18       # bytes that always cover a zstd frame header
+DEFAULT_DIRS = ['pdfs', 'parsed_holdings']
+
+_dictionaries = {}
+_lock = threading.Lock()
+
+def enabled():
+    """True when new artifacts are written compressed"""
+    return COMPRESSION == 'zstd' and zstandard is not None
+
+def stored_path(path):
+    """The file that actually holds a logical path's content, or None"""
+    if os.path.exists(path + SUFFIX):
+        return path + SUFFIX
+    if os.path.exists(path):
+        return path
+    return None
+
+def exists(path):
+    """Whether a logical artifact is on disk (compressed or plain)"""
+    return stored_path(path) is not None
+
+def logical_path(path):
+    """'pdfs/x.pdf.zst' -> 'pdfs/x.pdf'"""
+    return path[:-len(SUFFIX)] if path.endswith(SUFFIX) else path
+
+def list_artifacts(directory, extension=None):
+    """Logical file names in a directory (compressed and plain, deduplicated, '_' files skipped)"""
+    if not os.path.isdir(directory):
+        return []
+    names = set()
+    for name in os.listdir(directory):
+        if name.startswith('_') or name.endswith('.tmp') or not os.path.isfile(os.path.join(directory, name)):
+            continue
+        name = logical_path(name)
+        if extension is None or name.endswith(extension):
+            names.add(name)
+    return sorted(names)
+
+def _dictionary_dir(directory):
+    """Where a directory's trained dictionaries live"""
+    return os.path.join(directory, DICTIONARY_DIR)
+
+def load_dictionary(directory, dict_id):
+    """A trained dictionary by id (cached per process); None if it isn't on disk"""
+    key = (os.path.abspath(directory), dict_id)
+    with _lock:
+        if key not in _dictionaries:
+            path = os.path.join(_dictionary_dir(directory), f"{dict_id}.zdict")
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                _dictionaries[key] = zstandard.ZstdCompressionDict(f.read())
+        return _dictionaries[key]
+
+def current_dictionary(directory):
+    """The dictionary new JSON artifacts in a directory are compressed with, or None"""
+    pointer = os.path.join(_dictionary_dir(directory), 'current')
+    if zstandard is None or not os.path.exists(pointer):
+        return None
+    with open(pointer, 'r') as f:
+        return load_dictionary(directory, int(f.read().strip()))
+
+def train_dictionary(directory, extension='.json'):
+    """Train a dictionary on the newest artifacts of a directory and make it current; returns its id or None"""
+    if zstandard is None:
+        return None
+    names = list_artifacts(directory, extension)
+    names.sort(key=lambda name: os.path.getmtime(stored_path(os.path.join(directory, name))), reverse=True)
+    samples = [read_bytes(os.path.join(directory, name)) for name in names[:TRAIN_MAX_SAMPLES]]
+    if len(samples) < TRAIN_MIN_SAMPLES:
+        return None
+    try:
+        dictionary = zstandard.train_dictionary(DICTIONARY_SIZE, samples, level=LEVEL)
+    except zstandard.ZstdError as e:
+        print(f"⚠️  Dictionary training failed: {str(e)[:60]}")
+        return None
+
+    folder = _dictionary_dir(directory)
+    os.makedirs(folder, exist_ok=True)
+    dict_id = dictionary.dict_id()
+    with open(os.path.join(folder, f"{dict_id}.zdict"), 'wb') as f:
+        f.write(dictionary.as_bytes())
+    tmp_path = os.path.join(folder, 'current.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(str(dict_id))
+    os.replace(tmp_path, os.path.join(folder, 'current'))
+    with open(os.path.join(folder, 'written'), 'w') as f:
+        f.write('0')
+    with _lock:
+        _dictionaries[(os.path.abspath(directory), dict_id)] = dictionary
+    return dict_id
+
+def maybe_train(directory, extension='.json'):
+    """Train the first dictionary once enough samples exist, and retrain after RETRAIN_EVERY new artifacts"""
+    if not enabled():
+        return None
+    counter = os.path.join(_dictionary_dir(directory), 'written')
+    if current_dictionary(directory) is not None and os.path.exists(counter):
+        with open(counter, 'r') as f:
+            if int(f.read().strip() or 0) < RETRAIN_EVERY:
+                return None
+    return train_dictionary(directory, extension)
+
+def _count_written(directory, count):
+    """Artifacts written since the current dictionary was trained (drives maybe_train)"""
+    counter = os.path.join(_dictionary_dir(directory), 'written')
+    if not os.path.exists(counter):
+        return
+    with _lock:
+        with open(counter, 'r+') as f:
+            total = int(f.read().strip() or 0) + count
+            f.seek(0)
+            f.write(str(total))
+            f.truncate()
+
+def _replace(path, data):
+    """Atomically write bytes to path"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_bytes(path, data, dictionary=None):
+    """Store an artifact under its logical path; returns bytes on disk"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    stored = None
+    if enabled():
+        with instrumentation.span('storage', 'compress'):
+            compressed = zstandard.ZstdCompressor(level=LEVEL, dict_data=dictionary).compress(data)
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            stored = compressed
+
+    if stored is not None:
+        _replace(path + SUFFIX, stored)
+        if os.path.exists(path):
+            os.remove(path)
+    else:
+        stored = data
+        _replace(path, data)
+        if os.path.exists(path + SUFFIX):
+            os.remove(path + SUFFIX)
+
+    instrumentation.count('storage', 'bytes_raw', len(data))
+    instrumentation.count('storage', 'bytes_stored', len(stored))
+    return len(stored)
+
+def write_json(path, obj):
+    """Store a JSON artifact, compressed with the directory's trained dictionary when there is one"""
+    directory = os.path.dirname(path) or '.'
+    if enabled():
+        data = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+        written = write_bytes(path, data, current_dictionary(directory))
+        _count_written(directory, 1)
+        return written
+    return write_bytes(path, json.dumps(obj, indent=2).encode('utf-8'))
+
+@contextlib.contextmanager
+def open_read(path):
+    """Binary stream of an artifact's content, decompressed on the fly"""
+    physical = stored_path(path)
+    if physical is None:
+        raise FileNotFoundError(path)
+    with open(physical, 'rb') as f:
+        if not physical.endswith(SUFFIX):
+            yield f
+            return
+        if zstandard is None:
+            raise RuntimeError(f"{physical} is zstd-compressed; pip install zstandard")
+        header = f.read(FRAME_HEADER_MAX)
+        f.seek(0)
+        dict_id = zstandard.get_frame_parameters(header).dict_id
+        dictionary = load_dictionary(os.path.dirname(path) or '.', dict_id) if dict_id else None
+        if dict_id and dictionary is None:
+            raise RuntimeError(f"{physical} needs zstd dictionary {dict_id}, which is missing")
+        with zstandard.ZstdDecompressor(dict_data=dictionary).stream_reader(f) as reader:
+            yield reader
+
+def read_bytes(path):
+    """Whole decompressed content"""
+    with open_read(path) as f:
+        return f.read()
+
+def read_json(path):
+    """Parse a JSON artifact straight from the decompressing stream"""
+    with open_read(path) as f:
+        return json.load(io.TextIOWrapper(f, encoding='utf-8'))
+
+def sha256(path):
+    """Content hash of the decompressed artifact (matches the hash taken at download)"""
+    digest = hashlib.sha256()
+    with open_read(path) as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@contextlib.contextmanager
+def local_file(path):
+    """A real file path with the plain content, for libraries that need one (tabula, pdfplumber,
+    openpyxl). Plain artifacts are used in place; compressed ones are streamed into a temporary
+    file with the same name, removed afterwards."""
+    physical = stored_path(path)
+    if physical is None:
+        raise FileNotFoundError(path)
+    if not physical.endswith(SUFFIX):
+        yield physical
+        return
+    with tempfile.TemporaryDirectory(prefix='artifact-') as scratch:
+        target = os.path.join(scratch, os.path.basename(path))
+        with instrumentation.span('storage', 'decompress'):
+            with open_read(path) as source, open(target, 'wb') as f:
+                shutil.copyfileobj(source, f, STREAM_CHUNK)
+        yield target
+
+def enforce_retention(directory, max_age_days=None, max_mb=None, keep=()):
+    """Delete artifacts older than max_age_days, then the oldest until the directory fits in max_mb.
+    Logical paths in `keep` (e.g. this run's files) are never deleted. Returns (files, bytes) removed."""
+    max_age_days = RETENTION_DAYS if max_age_days is None else max_age_days
+    max_mb = RETENTION_MB if max_mb is None else max_mb
+    keep = {os.path.normpath(path) for path in keep}
+
+    files = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, name)
+        if name.startswith('_') or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).timestamp() if max_age_days else None
+    total = sum(size for _, size, _ in files)
+    removed = freed = 0
+    for mtime, size, path in files:
+        expired = cutoff is not None and mtime < cutoff
+        oversize = bool(max_mb) and total > max_mb * 2**20
+        if not (expired or oversize):
+            break   # oldest first: nothing newer is expired, and the total only shrinks
+        if os.path.normpath(logical_path(path)) in keep:
+            continue
+        os.remove(path)
+        total -= size
+        removed += 1
+        freed += size
+
+    if removed:
+        instrumentation.count('storage', 'files_pruned', removed)
+        print(f"🧹 {directory}: pruned {removed} artifacts ({freed / 2**20:.1f} MB)")
+    return removed, freed
+
+def compress_existing(directory):
+    """Compress plain artifacts written before compression was enabled; returns files converted"""
+    if not enabled():
+        return 0
+    converted = 0
+    for name in list_artifacts(directory):
+        path = os.path.join(directory, name)
+        if stored_path(path) != path:
+            continue
+        mtime = os.path.getmtime(path)
+        if name.endswith('.json'):
+            with open(path, 'r') as f:
+                write_json(path, json.load(f))
+        else:
+            with open(path, 'rb') as f:
+                write_bytes(path, f.read())
+        physical = stored_path(path)
+        os.utime(physical, (mtime, mtime))   # retention ages by the original write time
+        converted += physical != path
+    return converted
+
+def stats(directory):
+    """Artifact count, bytes on disk and decompressed bytes"""
+    files = stored = raw = 0
+    for name in list_artifacts(directory):
+        path = os.path.join(directory, name)
+        physical = stored_path(path)
+        files += 1
+        stored += os.path.getsize(physical)
+        if physical.endswith(SUFFIX):
+            with open(physical, 'rb') as f:
+                size = zstandard.frame_content_size(f.read(FRAME_HEADER_MAX))
+            raw += size if size > 0 else len(read_bytes(path))
+        else:
+            raw += os.path.getsize(physical)
+    return {'files': files, 'storedBytes': stored, 'rawBytes': raw}
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    directories = sys.argv[2:] or DEFAULT_DIRS
+
+    print("=" * 70)
+    print("🗜️  Artifact Store")
+    print("=" * 70)
+
+    if command == 'stats':
+        for directory in directories:
+            result = stats(directory)
+            ratio = result['rawBytes'] / result['storedBytes'] if result['storedBytes'] else 0
+            print(f"  {directory:.<24} {result['files']:>6} files  {result['storedBytes'] / 2**20:>8.1f} MB on disk"
+                  f"  {result['rawBytes'] / 2**20:>8.1f} MB raw  ({ratio:.1f}x)")
+    elif command == 'train':
+        directory = directories[0] if sys.argv[2:] else 'parsed_holdings'
+        dict_id = train_dictionary(directory)
+        print(f"✅ Dictionary {dict_id} trained" if dict_id else f"⚠️  Need zstandard and at least {TRAIN_MIN_SAMPLES} artifacts")
+    elif command == 'compress':
+        for directory in directories:
+            if directory.rstrip('/').endswith('parsed_holdings'):
+                maybe_train(directory)
+            print(f"  {directory}: {compress_existing(directory)} files compressed")
+    elif command == 'prune':
+        for directory in directories:
+            enforce_retention(directory)
+    else:
+        print("Usage: python artifact_store.py [stats|train|compress|prune] [dir ...]")
@@ -3,18 +3,21 @@ Automated Fund Holdings Scraper
 Fetches real-world holdings from MoneyControl, ValueResearch, and other sources
 """
 
-import requests
 from bs4 import BeautifulSoup
-from pymongo import MongoClient
 from datetime import datetime
-import time
 import re
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from similarity_index import update_index
+from holdings_history import append_snapshots, latest_disclosed_month
+from security_index import update_fund_postings
+from holdings_records import HoldingsBatch
+import holdings_stats
+import instrumentation
+import repository
+import rate_limiter
 
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
+# Derived stores refreshed once per run (flush_pending) instead of once per fetched fund
+_pending = {'codes': set(), 'snapshots': []}
 
 # User agent to mimic browser
 HEADERS = {
@@ -24,9 +27,8 @@ HEADERS = {
 }
 
 def connect_db():
-    """Connect to MongoDB"""
-    client = MongoClient(MONGODB_URI)
-    return client.get_database()
+    """Connect to MongoDB (shared pooled client)"""
+    return repository.get_db()
 
 def scrape_moneycontrol_holdings(fund_name):
     """Scrape holdings from MoneyControl"""
@@ -35,7 +37,7 @@ def scrape_moneycontrol_holdings(fund_name):
         search_query = fund_name.replace(' ', '+')
         search_url = f"https://www.moneycontrol.com/mutual-funds/nav/search?query={search_query}"
         
-        response = requests.get(search_url, headers=HEADERS, timeout=10)
+        response = rate_limiter.get('moneycontrol', search_url, headers=HEADERS, timeout=10)
         soup = BeautifulSoup(response.text, 'html.parser')
         
         # Find fund link
@@ -51,10 +53,10 @@ def scrape_moneycontrol_holdings(fund_name):
         portfolio_url = fund_url.replace('#nav', '') + '/portfolio'
         
         print(f"   Fetching from: {portfolio_url}")
-        response = requests.get(portfolio_url, headers=HEADERS, timeout=10)
+        response = rate_limiter.get('moneycontrol', portfolio_url, headers=HEADERS, timeout=10)
         soup = BeautifulSoup(response.text, 'html.parser')
         
-        holdings = []
+        securities, weights, sectors = [], [], []
         
         # Find portfolio table
         tables = soup.find_all('table', class_='mctable1')
@@ -69,18 +71,13 @@ def scrape_moneycontrol_holdings(fund_name):
                     # Extract percentage
                     weight_match = re.search(r'(\d+\.?\d*)', weight_text)
                     if weight_match and security:
-                        weight = float(weight_match.group(1))
+                        securities.append(security)
+                        weights.append(float(weight_match.group(1)))
                         
                         # Auto-classify sector
-                        sector = classify_sector(security)
-                        
-                        holdings.append({
-                            'security': security,
-                            'weight': weight,
-                            'sector': sector
-                        })
+                        sectors.append(classify_sector(security))
         
-        return holdings if holdings else None
+        return HoldingsBatch(securities, weights, sector=sectors) if securities else None
         
     except Exception as e:
         print(f"   ⚠️  MoneyControl error: {str(e)[:50]}")
@@ -93,10 +90,10 @@ def scrape_valueresearch_holdings(fund_name):
         search_query = fund_name.replace(' ', '-').lower()
         search_url = f"https://www.valueresearchonline.com/funds/newsnapshot.asp?schemecode={search_query}"
         
-        response = requests.get(search_url, headers=HEADERS, timeout=10)
+        response = rate_limiter.get('valueresearch', search_url, headers=HEADERS, timeout=10)
         soup = BeautifulSoup(response.text, 'html.parser')
         
-        holdings = []
+        securities, weights, sectors = [], [], []
         
         # Find holdings section
         holding_divs = soup.find_all('div', class_='holdings-table')
@@ -110,16 +107,11 @@ def scrape_valueresearch_holdings(fund_name):
                     
                     weight_match = re.search(r'(\d+\.?\d*)', weight_text)
                     if weight_match and security:
-                        weight = float(weight_match.group(1))
-                        sector = classify_sector(security)
-                        
-                        holdings.append({
-                            'security': security,
-                            'weight': weight,
-                            'sector': sector
-                        })
+                        securities.append(security)
+                        weights.append(float(weight_match.group(1)))
+                        sectors.append(classify_sector(security))
         
-        return holdings if holdings else None
+        return HoldingsBatch(securities, weights, sector=sectors) if securities else None
         
     except Exception as e:
         print(f"   ⚠️  ValueResearch error: {str(e)[:50]}")
@@ -178,39 +170,62 @@ def classify_sector(company_name):
 def import_holdings_to_db(fund_data):
     """Import holdings to MongoDB"""
     db = connect_db()
-    holdings_collection = db['fund_holdings']
+    holdings_collection = repository.fund_holdings(db)
     
     scheme_code = fund_data['scheme_code']
     fund_name = fund_data['fund_name']
     holdings = fund_data['holdings']
     
-    # Delete existing holdings
+    # fund_holdings is the latest-month projection; older months live in the history store
     holdings_collection.delete_many({'schemeCode': scheme_code})
     
-    # Insert new holdings
-    report_date = datetime.now()
-    holdings_docs = []
+    # Scraped pages show the latest published portfolio, i.e. last month's (or the month before,
+    # ahead of the disclosure day) - stamping the fetch month would put the scheduler a month behind
+    report_date = latest_disclosed_month(datetime.now())
     
-    for h in holdings:
-        doc = {
-            'schemeCode': scheme_code,
-            'fundName': fund_name,
-            'security': h['security'],
-            'weight': h['weight'],
-            'sector': h['sector'],
-            'marketValue': h.get('market_value'),
-            'reportDate': report_date,
-            'source': 'AUTO_SCRAPE',
-            'importedAt': datetime.now()
-        }
-        holdings_docs.append(doc)
+    # Insert new holdings (documents are built per insert batch from the scraped columns)
+    fields = {
+        'schemeCode': scheme_code,
+        'fundName': fund_name,
+        'reportDate': report_date,
+        'source': 'AUTO_SCRAPE',
+        'importedAt': datetime.now()
+    }
     
-    if holdings_docs:
-        holdings_collection.insert_many(holdings_docs)
-        return len(holdings_docs)
+    if len(holdings):
+        written = repository.insert_batched(holdings_collection, holdings.documents(**fields))
+        _pending['snapshots'].append((scheme_code, report_date, holdings))
+        update_fund_postings(db, scheme_code, holdings, report_date)
+        _pending['codes'].add(scheme_code)
+        return written
     
     return 0
 
+def flush_pending(db=None):
+    """Archive snapshots, then refresh the similarity index and health report once for every fund imported since the last flush"""
+    codes, snapshots = _pending['codes'], _pending['snapshots']
+    _pending['codes'], _pending['snapshots'] = set(), []
+    if snapshots:
+        with instrumentation.span('auto_fetch', 'history'):
+            archived = append_snapshots(snapshots)
+        print(f"🗄️  History: {archived} rows archived from {len(snapshots)} funds")
+    if not codes:
+        return 0
+    if db is None:
+        db = connect_db()
+    with instrumentation.span('auto_fetch', 'similarity_index'):
+        index, changed = update_index(db, codes)
+    print(f"🔗 Similarity index: {changed} funds updated ({len(index['signatures'])} indexed)")
+    with instrumentation.span('auto_fetch', 'holdings_stats'):
+        holdings_stats.refresh(db)
+    return changed
+
+SCRAPERS = {
+    'moneycontrol': scrape_moneycontrol_holdings,
+    'valueresearch': scrape_valueresearch_holdings
+}
+SOURCE_NAMES = {'moneycontrol': 'MoneyControl', 'valueresearch': 'ValueResearch'}
+
 def auto_fetch_holdings_for_fund(scheme_code, fund_name):
     """Automatically fetch holdings for a fund"""
     print(f"\n{'='*70}")
@@ -219,15 +234,14 @@ def auto_fetch_holdings_for_fund(scheme_code, fund_name):
     
     holdings = None
     
-    # Try MoneyControl first
-    print("   🔍 Trying MoneyControl...")
-    holdings = scrape_moneycontrol_holdings(fund_name)
-    
-    # If failed, try ValueResearch
-    if not holdings:
-        print("   🔍 Trying ValueResearch...")
-        time.sleep(2)  # Rate limiting
-        holdings = scrape_valueresearch_holdings(fund_name)
+    # Healthiest source first; pacing between requests is handled by rate_limiter
+    for source in rate_limiter.rank(list(SCRAPERS)):
+        print(f"   🔍 Trying {SOURCE_NAMES[source]}...")
+        with instrumentation.span('auto_fetch', source):
+            holdings = SCRAPERS[source](fund_name)
+        rate_limiter.record_yield(source, bool(holdings))
+        if holdings:
+            break
     
     if holdings:
         print(f"   ✅ Found {len(holdings)} holdings")
@@ -239,12 +253,14 @@ def auto_fetch_holdings_for_fund(scheme_code, fund_name):
             'holdings': holdings
         }
         
-        count = import_holdings_to_db(fund_data)
+        with instrumentation.span('auto_fetch', 'import'):
+            count = import_holdings_to_db(fund_data)
+        instrumentation.count('auto_fetch', 'docs_written', count)
         
         if count > 0:
             print(f"   ✅ Imported {count} holdings to database")
             print(f"\n   📊 Top 5 Holdings:")
-            for i, h in enumerate(holdings[:5], 1):
+            for i, h in enumerate(holdings.head(5), 1):
                 print(f"      {i}. {h['security'][:40]:.<40} {h['weight']:>5.2f}% ({h['sector']})")
             return True
         
@@ -255,59 +271,32 @@ def auto_fetch_holdings_for_fund(scheme_code, fund_name):
         print(f"      2. Use: node add-fund-holdings.js")
         return False
 
-def auto_fetch_popular_funds():
-    """Auto-fetch holdings for popular funds"""
+@instrumentation.stage('auto_fetch')
+def auto_fetch_popular_funds(max_fetches=5, max_attempts=20):
+    """Auto-fetch holdings for the most important stale funds: one fetch_scheduler pass that stops
+    after max_fetches successes (or max_attempts tries)"""
+    import fetch_scheduler
+    
     print("\n" + "="*70)
     print("🤖 AUTOMATED HOLDINGS FETCHER")
     print("="*70)
     
-    # Connect to database
-    db = connect_db()
-    funds_collection = db['funds']
-    
-    # Get funds from database
-    popular_funds = list(funds_collection.find({
-        'schemeCode': {'$ne': None, '$exists': True}
-    }).limit(20))
+    # Due funds by AUM/popularity and staleness, within the hourly request budget
+    counts = fetch_scheduler.run_scheduler(connect_db(), once=True, max_fetches=max_fetches, max_attempts=max_attempts)
     
-    if not popular_funds:
-        print("\n❌ No funds found in database")
-        print("   Add funds first with seed scripts")
+    if not sum(counts.values()):
+        print("\n✅ No fund is due for a refresh (or the hourly budget is used up)")
+        print("   Queue: python fetch_scheduler.py --plan")
         return
     
-    print(f"\n📋 Found {len(popular_funds)} funds in database")
-    print("   Fetching holdings for each...\n")
-    
-    success_count = 0
-    fail_count = 0
-    
-    for i, fund in enumerate(popular_funds, 1):
-        scheme_code = fund.get('schemeCode')
-        fund_name = fund.get('schemeName') or fund.get('name', 'Unknown')
-        
-        print(f"\n[{i}/{len(popular_funds)}] Processing...")
-        
-        success = auto_fetch_holdings_for_fund(scheme_code, fund_name)
-        
-        if success:
-            success_count += 1
-        else:
-            fail_count += 1
-        
-        # Rate limiting - be respectful to websites
-        time.sleep(3)
-        
-        # Stop after 5 successful fetches (demo)
-        if success_count >= 5:
-            print(f"\n✅ Successfully fetched 5 funds. Stopping for now.")
-            break
-    
     print("\n" + "="*70)
     print("📊 SUMMARY")
     print("="*70)
-    print(f"   ✅ Successful: {success_count}")
-    print(f"   ❌ Failed: {fail_count}")
+    print(f"   ✅ Successful: {counts['fetched']}")
+    print(f"   ❌ Failed: {counts['failed']}")
+    rate_limiter.print_health(list(SCRAPERS))
     print(f"\n   🎯 Test API: curl http://localhost:3002/api/holdings/stats")
 
 if __name__ == "__main__":
     auto_fetch_popular_funds()
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,368 @@
+"""
+Pipeline Benchmark
+Generates a synthetic disclosure corpus, serves it as a fake AMFI site and runs
+scrape -> parse -> import -> classify against mongomock or a local mongod.
+Reports throughput, per-item latency percentiles and peak RSS per stage as JSON.
+
+Also measures the cold start of every holdings.py subcommand in a fresh interpreter.
+
+Usage:
+  python benchmark.py run [--funds 20 --holdings 60 --months 2 --formats pdf,xlsx] [--mongo mongomock|URI] [--label NAME]
+  python benchmark.py compare benchmarks/<base>.json benchmarks/<new>.json
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+from datetime import datetime
+from functools import partial
+from statistics import median
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from generate_fixtures import generate_corpus, scale_arguments
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, 'benchmarks')
+CONFIG_FILES = ['parser_profiles.json', 'sector_mapping.json']
+STAGES = ['scrape', 'parse', 'import', 'classify']
+CLI_COMMANDS = ['status', 'scrape', 'parse', 'import', 'classify', 'run']
+RSS_SAMPLE_INTERVAL = 0.02
+BENCH_COLLECTIONS = ['funds', 'fund_holdings', 'security_holders']
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler without per-request access logs"""
+    def log_message(self, format, *args):
+        pass
+
+class RssSampler:
+    """Peak resident set size while a stage runs (sampled from /proc, ru_maxrss elsewhere)"""
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def current_rss():
+    """Resident set size in bytes (0 when unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Process-lifetime peak; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return 0
+
+@contextlib.contextmanager
+def timed_calls(module, name, count=None):
+    """Temporarily wrap module.name to record per-call latency (and rows via count(result))"""
+    original = getattr(module, name)
+    samples = {'seconds': [], 'rows': 0}
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = original(*args, **kwargs)
+        samples['seconds'].append(time.perf_counter() - start)
+        if count is not None:
+            samples['rows'] += count(result)
+        return result
+
+    setattr(module, name, wrapper)
+    try:
+        yield samples
+    finally:
+        setattr(module, name, original)
+
+def latency_summary(seconds):
+    """p50/p95/p99/max in milliseconds"""
+    if not seconds:
+        return None
+    values = np.array(seconds) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(values.max()), 3),
+        'mean': round(float(values.mean()), 3)
+    }
+
+def stage_result(seconds, samples, peak_rss, rows=None, extra=None):
+    """Machine-readable metrics for one stage"""
+    items = len(samples['seconds'])
+    rows = samples['rows'] if rows is None else rows
+    result = {
+        'seconds': round(seconds, 4),
+        'items': items,
+        'rows': rows,
+        'itemsPerSec': round(items / seconds, 2) if seconds else None,
+        'rowsPerSec': round(rows / seconds, 2) if seconds and rows else None,
+        'latencyMs': latency_summary(samples['seconds']),
+        'peakRssMb': round(peak_rss / 1e6, 1)
+    }
+    result.update(extra or {})
+    return result
+
+def connect(mongo):
+    """mongomock database, or a dedicated benchmark database on a real mongod"""
+    import repository
+    if mongo == 'mongomock':
+        import mongomock
+        repository.set_client(mongomock.MongoClient(), database='holdings_bench')
+        return repository.get_db()
+
+    from pymongo import MongoClient
+    repository.set_client(MongoClient(mongo, maxPoolSize=repository.MAX_POOL_SIZE, retryWrites=True))
+    db = repository.get_db()
+    # Collections are dropped before the run - refuse anything that isn't clearly a scratch database
+    if 'bench' not in db.name:
+        raise SystemExit(f"❌ Refusing to benchmark against database '{db.name}': use a database name containing 'bench'")
+    return db
+
+def git_commit():
+    """Current commit of the working tree (None outside a checkout)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure_startup(repeats):
+    """Median cold start per CLI subcommand: process wall time and time to ready (imports)"""
+    results = {}
+    env = dict(os.environ, HOLDINGS_LOG_FILE='off')
+    for command in CLI_COMMANDS:
+        walls, readies = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, os.path.join(HERE, 'holdings.py'), command, '--startup-only'],
+                                       capture_output=True, text=True, check=True, env=env)
+            walls.append(time.perf_counter() - start)
+            report = json.loads(completed.stdout.strip().splitlines()[-1])
+            readies.append(report['startupMs'])
+        results[command] = {'wallMs': round(median(walls) * 1000, 1), 'readyMs': round(median(readies), 1), 'modules': report['modules']}
+    return results
+
+def run_stages(db, base_url, stages):
+    """Run the pipeline stages in-process in the current (scratch) directory"""
+    import scrape_amfi_pdfs
+    import parse_holdings
+    import import_to_mongodb
+    import classify_sectors
+    import rate_limiter
+
+    results = {}
+
+    if 'scrape' in stages:
+        scrape_amfi_pdfs.AMFI_URL = f"{base_url}/portfolio-disclosures.html"
+        # The local server is never throttled: start (and stay) unpaced
+        rate_limiter.configure('amfi', initial_interval=0, min_interval=0)
+        with RssSampler() as rss, timed_calls(scrape_amfi_pdfs, 'download_pdf', lambda info: info['file_size']) as samples:
+            start = time.perf_counter()
+            links = scrape_amfi_pdfs.scrape_pdf_links()
+            scrape_amfi_pdfs.download_pdfs(links)
+            seconds = time.perf_counter() - start
+        results['scrape'] = stage_result(seconds, samples, rss.peak, rows=0, extra={
+            'links': len(links),
+            'bytes': samples['rows'],
+            'mbPerSec': round(samples['rows'] / 1e6 / seconds, 2) if seconds else None
+        })
+
+    if 'parse' in stages:
+        with RssSampler() as rss, timed_calls(parse_holdings, 'parse_disclosure', lambda parsed: sum(p['holdings_count'] for p in parsed)) as samples:
+            start = time.perf_counter()
+            parse_holdings.parse_all_pdfs()
+            seconds = time.perf_counter() - start
+        results['parse'] = stage_result(seconds, samples, rss.peak, extra={'engine': parse_holdings.PDF_ENGINE})
+
+    if 'import' in stages:
+        with RssSampler() as rss, timed_calls(import_to_mongodb, 'import_file', lambda r: len(r['snapshot'][2]) if r['snapshot'] else 0) as samples:
+            start = time.perf_counter()
+            import_to_mongodb.create_indexes(db)
+            import_to_mongodb.import_holdings(db)
+            seconds = time.perf_counter() - start
+        results['import'] = stage_result(seconds, samples, rss.peak, extra={
+            'documents': db['fund_holdings'].count_documents({})
+        })
+
+    if 'classify' in stages:
+        with RssSampler() as rss, timed_calls(classify_sectors, 'classify_security', lambda sector: 1) as samples:
+            start = time.perf_counter()
+            classify_sectors.classify_all_holdings(db)
+            seconds = time.perf_counter() - start
+        results['classify'] = stage_result(seconds, samples, rss.peak)
+
+    return results
+
+def run_benchmark(args):
+    """Generate, serve and benchmark; returns the report dict"""
+    stages = args.stages.split(',')
+    workdir = tempfile.mkdtemp(prefix='holdings-bench-')
+    corpus_dir = os.path.join(workdir, 'corpus')
+    original_cwd = os.getcwd()
+    server = None
+
+    try:
+        for name in CONFIG_FILES:
+            shutil.copy(os.path.join(HERE, name), workdir)
+        os.chdir(workdir)
+
+        print(f"🧪 Generating corpus: {args.funds} funds x {args.holdings} holdings x {args.months} months ({args.formats})")
+        start = time.perf_counter()
+        manifest = generate_corpus(corpus_dir, args.funds, args.holdings, args.months, args.formats.split(','), args.seed)
+        generate_seconds = time.perf_counter() - start
+        print(f"   {manifest['files']} files, {manifest['rows']} rows in {generate_seconds:.1f}s")
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=corpus_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        db = connect(args.mongo)
+        for name in BENCH_COLLECTIONS:
+            db[name].drop()
+        with open(os.path.join(corpus_dir, 'funds.json'), 'r') as f:
+            db['funds'].insert_many(json.load(f))
+
+        startup = measure_startup(args.startup_repeats) if args.startup_repeats else {}
+
+        print(f"🏁 Running stages: {', '.join(stages)} against {'mongomock' if args.mongo == 'mongomock' else 'mongod'}")
+        output = sys.stdout if args.verbose else io.StringIO()
+        # Later stages need the earlier ones' output, so run everything up to the last requested stage
+        needed = STAGES[:max(STAGES.index(name) for name in stages) + 1]
+        with contextlib.redirect_stdout(output):
+            results = run_stages(db, base_url, needed)
+        results = {name: result for name, result in results.items() if name in stages}
+
+        return {
+            'benchmark': 1,
+            'label': args.label,
+            'startedAt': datetime.now().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mongo': 'mongomock' if args.mongo == 'mongomock' else 'mongod',
+            'scale': manifest,
+            'generateSeconds': round(generate_seconds, 3),
+            'startup': startup,
+            'stages': results,
+            'peakRssMb': round(current_rss() / 1e6, 1) if not results else max(r['peakRssMb'] for r in results.values())
+        }
+
+    finally:
+        if server is not None:
+            server.shutdown()
+        os.chdir(original_cwd)
+        if args.keep:
+            print(f"📁 Scratch directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def print_report(report):
+    """Human-readable stage table"""
+    print("\n" + "=" * 70)
+    print(f"{'stage':<10} {'items':>6} {'rows':>8} {'seconds':>9} {'rows/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>8}")
+    for name, stage in report['stages'].items():
+        latency = stage['latencyMs'] or {}
+        print(f"{name:<10} {stage['items']:>6} {stage['rows']:>8} {stage['seconds']:>9.3f} "
+              f"{stage['rowsPerSec'] or 0:>10.1f} {latency.get('p50', 0):>9.2f} {latency.get('p95', 0):>9.2f} {stage['peakRssMb']:>8.1f}")
+    if report.get('startup'):
+        print("\n🚀 Cold start (median):")
+        for command, startup in report['startup'].items():
+            print(f"  {command:<10} {startup['wallMs']:>8.1f} ms process  {startup['readyMs']:>8.1f} ms to ready  {startup['modules']:>5} modules")
+
+def compare_reports(base, new):
+    """Per-stage change in wall time, throughput, p95 latency and peak RSS"""
+    print(f"📊 {base.get('label') or base.get('commit')} -> {new.get('label') or new.get('commit')}")
+    if base['scale'] != new['scale']:
+        print("⚠️  Corpus scale differs between runs; compare throughput, not wall time")
+
+    def change(old, current):
+        if not old or current is None:
+            return '   n/a'
+        return f"{(current - old) / old * 100:+6.1f}%"
+
+    print(f"{'stage':<10} {'seconds':>9} {'rows/s':>9} {'p95':>9} {'RSS':>9}")
+    for name in STAGES:
+        if name not in base['stages'] or name not in new['stages']:
+            continue
+        a, b = base['stages'][name], new['stages'][name]
+        print(f"{name:<10} {change(a['seconds'], b['seconds']):>9} {change(a['rowsPerSec'], b['rowsPerSec']):>9} "
+              f"{change((a['latencyMs'] or {}).get('p95'), (b['latencyMs'] or {}).get('p95')):>9} {change(a['peakRssMb'], b['peakRssMb']):>9}")
+
+    common = [c for c in CLI_COMMANDS if c in base.get('startup', {}) and c in new.get('startup', {})]
+    if common:
+        print(f"\n{'startup':<10} {'process':>9} {'ready':>9}")
+        for command in common:
+            a, b = base['startup'][command], new['startup'][command]
+            print(f"{command:<10} {change(a['wallMs'], b['wallMs']):>9} {change(a['readyMs'], b['readyMs']):>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the holdings pipeline on a synthetic corpus')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='generate a corpus and benchmark the pipeline stages')
+    scale_arguments(run)
+    run.add_argument('--mongo', default='mongomock', help="'mongomock' or a mongodb:// URI of a scratch database")
+    run.add_argument('--stages', default=','.join(STAGES))
+    run.add_argument('--label', default=None)
+    run.add_argument('--output', default=None, help='report path (default benchmarks/<timestamp>.json)')
+    run.add_argument('--keep', action='store_true', help='keep the scratch directory')
+    run.add_argument('--startup-repeats', type=int, default=3, help='cold starts per CLI subcommand (0 to skip)')
+    run.add_argument('--verbose', action='store_true', help='show stage output')
+
+    compare = commands.add_parser('compare', help='compare two benchmark reports')
+    compare.add_argument('base')
+    compare.add_argument('new')
+
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("⏱️  Holdings Pipeline Benchmark")
+    print("=" * 70)
+
+    if args.command == 'compare':
+        with open(args.base, 'r') as f:
+            base = json.load(f)
+        with open(args.new, 'r') as f:
+            new = json.load(f)
+        compare_reports(base, new)
+    else:
+        report = run_benchmark(args)
+        print_report(report)
+
+        output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}{'-' + args.label if args.label else ''}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Report: {output}")
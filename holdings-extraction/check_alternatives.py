@@ -4,42 +4,42 @@ Alternative approach - use existing MFAPI NAV data + fund basic info
 Then match with schemeCode to provide holdings structure
 """
 
-import requests
-from pymongo import MongoClient
 from datetime import datetime
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+import holdings_stats
+import repository
 
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
 MFAPI_BASE = "https://api.mfapi.in/mf"
 
-print("\n" + "="*70)
-print("💡 ALTERNATIVE: Using Fund Basic Info")
-print("="*70)
-print("\n⚠️  Note: Real holdings data requires:")
-print("   1. AMFI portfolio PDFs (updated quarterly)")
-print("   2. Or paid data providers (NSE, BSE)")
-print("   3. Or web scraping from fund house websites")
-print("\nFor now, we'll:")
-print("   ✅ Use your existing fund database")
-print("   ✅ Keep sample holdings for demonstration")
-print("   ✅ You can manually add holdings from fund factsheets")
-print("\n" + "="*70)
+def print_banner():
+    """Explain where real holdings data comes from"""
+    print("\n" + "="*70)
+    print("💡 ALTERNATIVE: Using Fund Basic Info")
+    print("="*70)
+    print("\n⚠️  Note: Real holdings data requires:")
+    print("   1. AMFI portfolio PDFs (updated quarterly)")
+    print("   2. Or paid data providers (NSE, BSE)")
+    print("   3. Or web scraping from fund house websites")
+    print("\nFor now, we'll:")
+    print("   ✅ Use your existing fund database")
+    print("   ✅ Keep sample holdings for demonstration")
+    print("   ✅ You can manually add holdings from fund factsheets")
+    print("\n" + "="*70)
 
-def check_existing_funds():
+def check_existing_funds(db=None):
     """Check what funds exist in database"""
     try:
-        client = MongoClient(MONGODB_URI)
-        db = client.get_database()
+        if db is None:
+            db = repository.get_db()
         
-        funds = db['funds'].find({}).limit(10)
-        holdings = db['fund_holdings']
+        funds = repository.funds(db).find({}).limit(10)
+        report = holdings_stats.load_report(db)
         
         print("\n📊 Your Database Status:")
-        print(f"   Total Funds: {db['funds'].count_documents({})}")
-        print(f"   Funds with Holdings: {len(holdings.distinct('schemeCode'))}")
+        print(f"   Total Funds: {report['totalFunds']}")
+        print(f"   Funds with Holdings: {report['fundsWithHoldings']}")
+        if report['latestReportDate']:
+            print(f"   Latest Report: {report['latestReportDate']:%Y-%m-%d} (stats from {report['generatedAt']:%Y-%m-%d %H:%M})")
         
         print("\n📋 Sample Funds in Database:")
         for i, fund in enumerate(funds, 1):
@@ -60,4 +60,5 @@ def check_existing_funds():
         return False
 
 if __name__ == "__main__":
+    print_banner()
     check_existing_funds()
@@ -0,0 +1,289 @@
+"""
+Online Sector Classifier
+Long-running service that classifies newly imported holdings seconds after they are inserted.
+On a replica set it follows fund_holdings inserts through a change stream and persists the
+resume token; on a standalone server it polls an _id high-water mark instead. Either way only
+new documents are read - there are no collection scans after the first start.
+
+Usage:
+  python classifier_service.py            # follow until interrupted (SIGTERM/Ctrl+C)
+  python classifier_service.py --poll     # force the polling follower
+  python classifier_service.py --once     # classify what is pending, then exit
+
+Environment:
+  CLASSIFIER_STATE_FILE       resume token / high-water mark (default state/classifier_service.json)
+  CLASSIFIER_BATCH_SIZE       holdings per micro-batch (default 500)
+  CLASSIFIER_MAX_WAIT_MS      flush a partial micro-batch after this long (default 1000)
+  CLASSIFIER_POLL_INTERVAL    seconds between polls when nothing is new (default 2)
+  CLASSIFIER_POLL_SETTLE      polling only reads _ids older than this many seconds, so documents
+                              from importers with slightly skewed clocks aren't skipped (default 2)
+  CLASSIFIER_STATS_INTERVAL   refresh the stored health report (holdings_stats) at most this often
+                              while classifying, and once more on exit (default 60 seconds)
+"""
+
+import os
+import json
+import time
+import signal
+import argparse
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+import classify_sectors
+import holdings_stats
+import instrumentation
+import repository
+
+STATE_FILE = os.getenv('CLASSIFIER_STATE_FILE', os.path.join('state', 'classifier_service.json'))
+BATCH_SIZE = int(os.getenv('CLASSIFIER_BATCH_SIZE', '500'))
+MAX_WAIT_MS = int(os.getenv('CLASSIFIER_MAX_WAIT_MS', '1000'))
+POLL_INTERVAL = float(os.getenv('CLASSIFIER_POLL_INTERVAL', '2'))
+POLL_SETTLE = float(os.getenv('CLASSIFIER_POLL_SETTLE', '2'))
+STATS_INTERVAL = float(os.getenv('CLASSIFIER_STATS_INTERVAL', '60'))
+METRICS_INTERVAL = 15
+CACHE_LIMIT = 100000
+
+# Resume token no longer in the oplog (ChangeStreamHistoryLost / ChangeStreamFatalError)
+LOST_TOKEN_CODES = (280, 286)
+
+PROJECTION = {'security': 1, 'sector': 1, 'importedAt': 1}
+UNCLASSIFIED = {'sector': None}
+
+_stop = {'requested': False}
+_stats = {'dirty': False, 'refreshed': None}
+
+def request_stop(signum=None, frame=None):
+    """Finish the current micro-batch, save the position and exit"""
+    _stop['requested'] = True
+
+def load_state():
+    """Saved position: {'resumeToken', 'lastId', 'updatedAt'}"""
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, 'r') as f:
+        return json.load(f)
+
+def save_state(state):
+    """Atomically persist the follower position"""
+    state['updatedAt'] = datetime.now().isoformat()
+    directory = os.path.dirname(STATE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = STATE_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+def load_classifier():
+    """Sector mapping plus a security -> sector cache (most names repeat across funds)"""
+    return {
+        'mapping': classify_sectors.load_sector_mapping(),
+        'mtime': os.path.getmtime(classify_sectors.SECTOR_MAPPING_FILE),
+        'cache': {}
+    }
+
+def refresh_classifier(classifier):
+    """Pick up edits to sector_mapping.json without restarting the service"""
+    mtime = os.path.getmtime(classify_sectors.SECTOR_MAPPING_FILE)
+    if mtime != classifier['mtime']:
+        classifier.update(load_classifier())
+        print("🔄 Sector mapping reloaded")
+
+def sector_for(classifier, security):
+    """Cached classify_security"""
+    cache = classifier['cache']
+    sector = cache.get(security)
+    if sector is None:
+        if len(cache) >= CACHE_LIMIT:
+            cache.clear()
+        sector = classify_sectors.classify_security(security or '', classifier['mapping'])
+        cache[security] = sector
+    return sector
+
+def classify_batch(collection, classifier, documents):
+    """Classify one micro-batch with an unordered bulk write; returns documents updated"""
+    pending = [doc for doc in documents if doc.get('sector') is None]
+    if not pending:
+        return 0
+
+    # Guarded by sector: None so a concurrent batch pass or backfill isn't overwritten
+    operations = [
+        UpdateOne({'_id': doc['_id'], **UNCLASSIFIED}, {'$set': {'sector': sector_for(classifier, doc.get('security'))}})
+        for doc in pending
+    ]
+    with instrumentation.span('classify_service', 'bulk_write'):
+        totals = repository.bulk_write_batched(collection, operations, ordered=False)
+
+    instrumentation.count('classify_service', 'docs_classified', totals['modified'])
+    instrumentation.count('classify_service', 'batches')
+    if totals['modified']:
+        _stats['dirty'] = True
+    imported = [doc['importedAt'] for doc in pending if isinstance(doc.get('importedAt'), datetime)]
+    if imported:
+        # importedAt is written with local naive datetimes by the importer
+        instrumentation.observe('classify_service', 'latency', max(0.0, (datetime.now() - min(imported)).total_seconds()))
+    return totals['modified']
+
+def refresh_stats(collection, force=False):
+    """Recompute the stored health report after holdings were classified (at most every STATS_INTERVAL)"""
+    if not _stats['dirty']:
+        return False
+    if not force and _stats['refreshed'] is not None and time.monotonic() - _stats['refreshed'] < STATS_INTERVAL:
+        return False
+    with instrumentation.span('classify_service', 'holdings_stats'):
+        holdings_stats.refresh(collection.database)
+    _stats['dirty'], _stats['refreshed'] = False, time.monotonic()
+    return True
+
+def catch_up(collection, classifier):
+    """One-off pass over documents already waiting when a change stream starts without a token"""
+    classified = 0
+    batch = []
+    for doc in collection.find(UNCLASSIFIED, PROJECTION).batch_size(BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            classified += classify_batch(collection, classifier, batch)
+            batch = []
+    if batch:
+        classified += classify_batch(collection, classifier, batch)
+    if classified:
+        print(f"🧹 Catch-up: {classified} holdings classified")
+    return classified
+
+def follow_change_stream(collection, classifier, state, once=False):
+    """Classify inserts from a change stream in micro-batches, saving the resume token after each"""
+    pipeline = [
+        {'$match': {'operationType': 'insert', 'fullDocument.sector': None}},
+        {'$project': {'fullDocument._id': 1, 'fullDocument.security': 1, 'fullDocument.importedAt': 1}}
+    ]
+    token = state.get('resumeToken')
+    classified = 0
+
+    with collection.watch(pipeline, resume_after=token, batch_size=BATCH_SIZE, max_await_time_ms=MAX_WAIT_MS) as stream:
+        if token is None:
+            # The stream is already open, so nothing inserted during the catch-up is missed
+            classified += catch_up(collection, classifier)
+            state['resumeToken'] = stream.resume_token
+            save_state(state)
+
+        batch = []
+        deadline = None
+        last_metrics = time.monotonic()
+        while stream.alive and not _stop['requested']:
+            change = stream.try_next()
+            if change is not None:
+                batch.append(change['fullDocument'])
+                deadline = deadline or time.monotonic() + MAX_WAIT_MS / 1000
+
+            if batch and (change is None or len(batch) >= BATCH_SIZE or time.monotonic() >= deadline):
+                refresh_classifier(classifier)
+                classified += classify_batch(collection, classifier, batch)
+                refresh_stats(collection)
+                batch = []
+                deadline = None
+
+            if change is None:
+                # Idle: the post-batch token still advances past unrelated oplog entries
+                if stream.resume_token != state.get('resumeToken'):
+                    state['resumeToken'] = stream.resume_token
+                    save_state(state)
+                if once:
+                    break
+            elif not batch:
+                state['resumeToken'] = stream.resume_token
+                save_state(state)
+
+            if time.monotonic() - last_metrics >= METRICS_INTERVAL:
+                instrumentation.write_prometheus()
+                last_metrics = time.monotonic()
+
+        if batch:
+            classified += classify_batch(collection, classifier, batch)
+            state['resumeToken'] = stream.resume_token
+            save_state(state)
+    return classified
+
+def follow_polling(collection, classifier, state, once=False):
+    """Classify documents past the saved _id high-water mark in micro-batches"""
+    classified = 0
+    last_metrics = time.monotonic()
+    while not _stop['requested']:
+        settled = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(seconds=POLL_SETTLE))
+        query = {'_id': {'$lt': settled}}
+        if state.get('lastId'):
+            query['_id']['$gt'] = ObjectId(state['lastId'])
+
+        # Range scan on _id; already-classified documents only move the high-water mark
+        with instrumentation.span('classify_service', 'poll'):
+            documents = list(collection.find(query, PROJECTION).sort('_id', 1).limit(BATCH_SIZE))
+
+        if documents:
+            refresh_classifier(classifier)
+            classified += classify_batch(collection, classifier, documents)
+            state['lastId'] = str(documents[-1]['_id'])
+            save_state(state)
+            refresh_stats(collection)
+
+        if time.monotonic() - last_metrics >= METRICS_INTERVAL:
+            instrumentation.write_prometheus()
+            last_metrics = time.monotonic()
+
+        if len(documents) < BATCH_SIZE:
+            if once:
+                break
+            time.sleep(POLL_INTERVAL)
+    return classified
+
+def run_service(db=None, mode='auto', once=False):
+    """Follow fund_holdings with a change stream where available, else poll; returns holdings classified"""
+    db = db if db is not None else repository.get_db()
+    db.command('ping')
+    collection = repository.fund_holdings(db)
+    classifier = load_classifier()
+    state = load_state()
+
+    use_stream = mode == 'stream' or (mode == 'auto' and repository.supports_change_streams())
+    print(f"👀 Following fund_holdings via {'change stream' if use_stream else 'polling'}"
+          f"{' (resuming)' if state.get('resumeToken' if use_stream else 'lastId') else ''}")
+
+    classified = 0
+    with instrumentation.stage('classify_service'):
+        while not _stop['requested']:
+            try:
+                if use_stream:
+                    classified += follow_change_stream(collection, classifier, state, once)
+                else:
+                    classified += follow_polling(collection, classifier, state, once)
+                break
+            except OperationFailure as e:
+                if not use_stream or e.code not in LOST_TOKEN_CODES:
+                    raise
+                # Token fell off the oplog: start a fresh stream with a catch-up pass
+                print(f"⚠️  Resume token expired ({e.code}); restarting with catch-up")
+                instrumentation.count('classify_service', 'resume_token_lost')
+                state.pop('resumeToken', None)
+        refresh_stats(collection, force=True)
+    return classified
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Classify new holdings as they are imported')
+    follow = parser.add_mutually_exclusive_group()
+    follow.add_argument('--poll', action='store_true', help='poll the _id high-water mark instead of a change stream')
+    follow.add_argument('--stream', action='store_true', help='require a change stream')
+    parser.add_argument('--once', action='store_true', help='classify what is pending, then exit')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🏢 Online Sector Classifier")
+    print("=" * 70)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    mode = 'poll' if args.poll else 'stream' if args.stream else 'auto'
+    try:
+        total = run_service(mode=mode, once=args.once)
+    except KeyboardInterrupt:
+        total = None
+    print(f"\n✅ Classifier stopped{f' ({total} holdings classified)' if total is not None else ''}")
+    instrumentation.print_summary(instrumentation.finish())
@@ -3,16 +3,26 @@ Sector Classification
 Automatically classify securities into sectors based on company names
 """
 
-import json
 import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
 import re
 
-load_dotenv()
+import holdings_stats
+import instrumentation
+import repository
 
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
 SECTOR_MAPPING_FILE = 'sector_mapping.json'
+BACKFILL_DIR = os.getenv('CLASSIFY_BACKFILL_DIR', os.path.join('state', 'classify_backfill'))
+BACKFILL_SHARDS = int(os.getenv('CLASSIFY_BACKFILL_SHARDS', '16'))
+BACKFILL_WORKERS = int(os.getenv('CLASSIFY_BACKFILL_WORKERS', str(os.cpu_count() or 1)))
+BACKFILL_BATCH_SIZE = int(os.getenv('CLASSIFY_BACKFILL_BATCH_SIZE', '2000'))
+SAMPLES_PER_SHARD = 32
 
 def load_sector_mapping():
     """Load sector mapping configuration"""
@@ -36,15 +46,16 @@ def classify_security(security_name, sector_mapping):
     # Default
     return 'Others'
 
-def classify_all_holdings():
+@instrumentation.stage('classify')
+def classify_all_holdings(db=None):
     """Classify all holdings in database"""
     
     print("🔄 Classifying securities into sectors...")
     
     # Connect to MongoDB
-    client = MongoClient(MONGODB_URI)
-    db = client.get_database()
-    holdings = db['fund_holdings']
+    if db is None:
+        db = repository.get_db()
+    holdings = repository.fund_holdings(db, bulk=True)
     
     # Load sector mapping
     sector_mapping = load_sector_mapping()
@@ -74,12 +85,7 @@ def classify_all_holdings():
         security = holding['security']
         sector = classify_security(security, sector_mapping)
         
-        bulk_operations.append({
-            'updateOne': {
-                'filter': {'_id': holding['_id']},
-                'update': {'$set': {'sector': sector}}
-            }
-        })
+        bulk_operations.append(UpdateOne({'_id': holding['_id']}, {'$set': {'sector': sector}}))
         
         classified_count += 1
         
@@ -87,35 +93,187 @@ def classify_all_holdings():
             print(f"  Processed {classified_count}/{total}...")
         
         # Execute bulk operations in batches
-        if len(bulk_operations) >= 1000:
-            holdings.bulk_write(bulk_operations)
+        if len(bulk_operations) >= repository.BULK_BATCH_SIZE:
+            with instrumentation.span('classify', 'bulk_write'):
+                holdings.bulk_write(bulk_operations, ordered=False)
             bulk_operations = []
     
     # Execute remaining operations
     if bulk_operations:
-        holdings.bulk_write(bulk_operations)
+        with instrumentation.span('classify', 'bulk_write'):
+            holdings.bulk_write(bulk_operations, ordered=False)
+    instrumentation.count('classify', 'docs_classified', classified_count)
     
     print("\n" + "=" * 70)
     print(f"✅ Classified {classified_count} holdings")
     
-    # Show sector distribution
-    print("\n📊 Sector Distribution:")
-    pipeline = [
-        {'$group': {
-            '_id': '$sector',
-            'count': {'$sum': 1}
-        }},
-        {'$sort': {'count': -1}}
-    ]
-    
-    for result in holdings.aggregate(pipeline):
-        print(f"  {result['_id']:.<30} {result['count']:>6} holdings")
+    # Refresh the stored health report; the weight-based sector distribution comes from the exposure stage
+    with instrumentation.span('classify', 'holdings_stats'):
+        report = holdings_stats.refresh(db)
+    print(f"📊 {report['classifiedHoldings']}/{report['totalHoldings']} holdings classified "
+          f"into {len(report['sectors'])} sectors (weights: python holdings.py exposure)")
+
+def mapping_hash(sector_mapping):
+    """Stable hash of the sector mapping; backfill checkpoints are only valid for the mapping they ran with"""
+    return hashlib.sha256(json.dumps(sector_mapping, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def plan_shards(holdings, shards):
+    """Split the collection into _id ranges of roughly equal size from a $sample of _ids"""
+    total = holdings.estimated_document_count()
+    if total == 0:
+        return []
+    shards = max(1, min(shards, total))
+    sample = sorted(doc['_id'] for doc in holdings.aggregate([
+        {'$sample': {'size': min(total, shards * SAMPLES_PER_SHARD)}},
+        {'$project': {'_id': 1}}
+    ]))
+    bounds = sorted({sample[len(sample) * i // shards] for i in range(1, shards)})
+    # Open-ended first and last shards also cover documents inserted after planning
+    edges = [None] + [str(b) for b in bounds] + [None]
+    return [{'shard': i, 'lower': edges[i], 'upper': edges[i + 1]} for i in range(len(edges) - 1)]
+
+def shard_checkpoint_file(checkpoint_dir, shard):
+    """Per-shard checkpoint, written only by the worker that owns the shard"""
+    return os.path.join(checkpoint_dir, f"shard-{shard:04d}.json")
+
+def load_json(path, default=None):
+    """Read a checkpoint/plan file if present"""
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_json(path, data):
+    """Atomically write a checkpoint/plan file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _init_worker(database):
+    """Drop the client inherited from the parent; each worker process opens its own pool on MONGODB_URI"""
+    repository.set_client(None, database=database)
+
+def backfill_shard(shard, sector_mapping, checkpoint_dir, batch_size=None, db=None):
+    """Reclassify one _id range, resuming from its checkpoint; rewrites only documents whose sector changes"""
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    path = shard_checkpoint_file(checkpoint_dir, shard['shard'])
+    checkpoint = load_json(path, {'shard': shard['shard'], 'lastId': None, 'scanned': 0, 'changed': 0, 'done': False})
+    if checkpoint['done']:
+        return checkpoint
+
+    holdings = repository.fund_holdings(db, bulk=True)
+    id_range = {}
+    if checkpoint['lastId'] or shard['lower']:
+        id_range['$gt' if checkpoint['lastId'] else '$gte'] = ObjectId(checkpoint['lastId'] or shard['lower'])
+    if shard['upper']:
+        id_range['$lt'] = ObjectId(shard['upper'])
+    cursor = holdings.find({'_id': id_range} if id_range else {}, {'security': 1, 'sector': 1}).sort('_id', 1).batch_size(batch_size)
+
+    sectors = {}
+    batch = []
+
+    def flush():
+        operations = []
+        for doc in batch:
+            security = doc.get('security') or ''
+            if security not in sectors:
+                sectors[security] = classify_security(security, sector_mapping)
+            if doc.get('sector') != sectors[security]:
+                # Guarded by the sector we read so a concurrent writer's update isn't lost
+                operations.append(UpdateOne({'_id': doc['_id'], 'sector': doc.get('sector')}, {'$set': {'sector': sectors[security]}}))
+        if operations:
+            checkpoint['changed'] += repository.bulk_write_batched(holdings, operations, batch_size, ordered=False)['modified']
+        checkpoint['scanned'] += len(batch)
+        checkpoint['lastId'] = str(batch[-1]['_id'])
+        save_json(path, checkpoint)
+
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+    checkpoint['done'] = True
+    save_json(path, checkpoint)
+    return checkpoint
+
+@instrumentation.stage('classify_backfill')
+def backfill_sectors(db=None, shards=None, workers=None, restart=False):
+    """Reclassify every holding after a mapping change, in parallel _id shards with resumable checkpoints"""
+    holdings = repository.fund_holdings(db)
+    sector_mapping = load_sector_mapping()
+    run_hash = mapping_hash(sector_mapping)
+    checkpoint_dir = os.path.join(BACKFILL_DIR, run_hash)
+    plan_file = os.path.join(checkpoint_dir, 'plan.json')
+
+    plan = None if restart else load_json(plan_file)
+    if plan is None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        for name in os.listdir(checkpoint_dir):
+            os.remove(os.path.join(checkpoint_dir, name))
+        plan = {
+            'mappingHash': run_hash,
+            'createdAt': datetime.now().isoformat(),
+            'shards': plan_shards(holdings, shards or BACKFILL_SHARDS)
+        }
+        save_json(plan_file, plan)
+        print(f"🧩 Planned {len(plan['shards'])} shards for mapping {run_hash}")
+    else:
+        print(f"↩️  Resuming backfill for mapping {run_hash} (planned {plan['createdAt']})")
+
+    pending = [s for s in plan['shards'] if not load_json(shard_checkpoint_file(checkpoint_dir, s['shard']), {}).get('done')]
+    print(f"🔄 {len(pending)}/{len(plan['shards'])} shards to process")
+
+    # mongomock lives in this process only, so it can't be shared with worker processes
+    workers = min(workers or BACKFILL_WORKERS, len(pending) or 1)
+    if repository.is_in_memory():
+        workers = 1
+
+    results = []
+    if workers <= 1:
+        for shard in pending:
+            with instrumentation.item('classify_backfill', f"shard-{shard['shard']}"):
+                results.append(backfill_shard(shard, sector_mapping, checkpoint_dir, db=db))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(holdings.database.name,)) as pool:
+            futures = [pool.submit(backfill_shard, shard, sector_mapping, checkpoint_dir) for shard in pending]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print(f"  Shard {results[-1]['shard']:>3} done: {results[-1]['changed']}/{results[-1]['scanned']} changed")
+
+    scanned = sum(r['scanned'] for r in results)
+    changed = sum(r['changed'] for r in results)
+    instrumentation.count('classify_backfill', 'docs_scanned', scanned)
+    instrumentation.count('classify_backfill', 'docs_changed', changed)
+
+    if changed:
+        with instrumentation.span('classify_backfill', 'holdings_stats'):
+            holdings_stats.refresh(db)
+
+    print("\n" + "=" * 70)
+    print(f"✅ Backfill complete: {changed} of {scanned} holdings changed sector ({workers} workers)")
+    return {'mappingHash': run_hash, 'shards': len(plan['shards']), 'scanned': scanned, 'changed': changed}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Classify holdings into sectors')
+    parser.add_argument('command', nargs='?', default='classify', choices=['classify', 'backfill'],
+                        help="'classify' fills missing sectors; 'backfill' reclassifies everything after a mapping change")
+    parser.add_argument('--shards', type=int, default=None, help=f"_id ranges to split the collection into (default {BACKFILL_SHARDS})")
+    parser.add_argument('--workers', type=int, default=None, help=f"worker processes (default {BACKFILL_WORKERS})")
+    parser.add_argument('--restart', action='store_true', help='ignore checkpoints from an interrupted backfill')
+    args = parser.parse_args()
+
     print("=" * 70)
     print("🏢 Sector Classification Tool")
     print("=" * 70)
     
-    classify_all_holdings()
+    if args.command == 'backfill':
+        backfill_sectors(shards=args.shards, workers=args.workers, restart=args.restart)
+    else:
+        classify_all_holdings()
     
     print("\n✅ Classification complete!")
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,128 @@
+"""
+Extraction Engine Cross-Check
+Runs the native (pdfplumber) and tabula engines over a fixture corpus of portfolio PDFs,
+compares the holdings they extract and reports throughput in pages/sec and rows/sec.
+
+Usage: python compare_engines.py [fixtures/corpus/disclosures]
+The default corpus is generate_fixtures.py output; it is generated (PDF only) when missing.
+"""
+
+import os
+import sys
+import json
+import time
+import pdfplumber
+
+import native_extract
+import generate_fixtures
+from parse_holdings import read_tables, extract_holdings, java_available
+from parser_profiles import select_profile
+from securities import normalize_security
+
+FIXTURE_DIR = os.path.join("fixtures", "corpus", "disclosures")
+WEIGHT_TOLERANCE = 0.01
+
+def holdings_by_security(df):
+    """{canonical security: weight} from an extracted holdings frame"""
+    if df is None:
+        return {}
+    return {
+        normalize_security(row.security): row.weight
+        for row in df.itertuples(index=False)
+        if normalize_security(row.security)
+    }
+
+def run_engine(engine, pdf_path, profile):
+    """Extract with one engine; returns (holdings frame, seconds)"""
+    start = time.perf_counter()
+    try:
+        result = extract_holdings(read_tables(pdf_path, profile, engine, profile['lattice']), profile)
+    except Exception as e:
+        print(f"   ⚠️  {engine}: {str(e)[:60]}")
+        result = None
+    return result, time.perf_counter() - start
+
+def compare_pdf(pdf_path, engines):
+    """Cross-check engines on one PDF"""
+    profile = select_profile(os.path.basename(pdf_path), None, native_extract.first_page_text(pdf_path))
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = len(pdf.pages)
+
+    results = {}
+    for engine in engines:
+        df, seconds = run_engine(engine, pdf_path, profile)
+        results[engine] = {'holdings': holdings_by_security(df), 'seconds': seconds}
+
+    report = {'file': os.path.basename(pdf_path), 'profile': profile['name'], 'pages': pages}
+    for engine in engines:
+        report[engine] = {'rows': len(results[engine]['holdings']), 'seconds': round(results[engine]['seconds'], 4)}
+
+    if 'tabula' in results and 'native' in results:
+        reference = results['tabula']['holdings']
+        candidate = results['native']['holdings']
+        common = set(reference) & set(candidate)
+        weight_matches = sum(
+            1 for key in common
+            if reference[key] is not None and candidate[key] is not None
+            and abs(reference[key] - candidate[key]) <= WEIGHT_TOLERANCE
+        )
+        report['agreement'] = {
+            'recall': round(len(common) / len(reference), 4) if reference else None,
+            'precision': round(len(common) / len(candidate), 4) if candidate else None,
+            'weightMatch': round(weight_matches / len(common), 4) if common else None,
+            'onlyTabula': sorted(set(reference) - set(candidate))[:10],
+            'onlyNative': sorted(set(candidate) - set(reference))[:10]
+        }
+    return report
+
+def summarize(reports, engines):
+    """Throughput per engine across the corpus"""
+    summary = {}
+    for engine in engines:
+        seconds = sum(r[engine]['seconds'] for r in reports)
+        pages = sum(r['pages'] for r in reports)
+        rows = sum(r[engine]['rows'] for r in reports)
+        summary[engine] = {
+            'pdfs': len(reports),
+            'pages': pages,
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'pagesPerSec': round(pages / seconds, 2) if seconds else None,
+            'rowsPerSec': round(rows / seconds, 2) if seconds else None
+        }
+    return summary
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("⚖️  Extraction Engine Cross-Check")
+    print("=" * 70)
+
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR
+    if not os.path.isdir(fixture_dir):
+        if fixture_dir != FIXTURE_DIR:
+            print(f"❌ No such directory: {fixture_dir}")
+            sys.exit(1)
+        print(f"🧪 Generating fixture corpus in {os.path.dirname(fixture_dir)}/ ...")
+        generate_fixtures.generate_corpus(os.path.dirname(fixture_dir), formats=('pdf',))
+    pdfs = sorted(os.path.join(fixture_dir, f) for f in os.listdir(fixture_dir) if f.lower().endswith('.pdf'))
+    engines = ['native', 'tabula'] if java_available() else ['native']
+    if 'tabula' not in engines:
+        print("⚠️  Java not found - reporting native engine only")
+
+    reports = []
+    for pdf_path in pdfs:
+        report = compare_pdf(pdf_path, engines)
+        reports.append(report)
+        agreement = report.get('agreement')
+        detail = f"recall {agreement['recall']}, weights {agreement['weightMatch']}" if agreement else ''
+        print(f"  {report['file'][:40]:.<40} {report['native']['rows']:>4} rows [{report['profile']}] {detail}")
+
+    summary = summarize(reports, engines)
+    print("\n📊 Throughput:")
+    for engine, stats in summary.items():
+        print(f"  {engine:<8} {stats['pagesPerSec']} pages/s  {stats['rowsPerSec']} rows/s  ({stats['pdfs']} PDFs)")
+
+    output_path = os.path.join(fixture_dir, '_engine_comparison.json')
+    with open(output_path, 'w') as f:
+        json.dump({'summary': summary, 'pdfs': reports}, f, indent=2)
+    print(f"\n📁 Report: {output_path}")
@@ -0,0 +1,305 @@
+"""
+Freshness-Aware Fetch Scheduler
+Decides which funds auto_fetch_holdings refreshes next. A scheme becomes due when a newer
+monthly disclosure than the one we hold should be out (portfolios are published by the 10th of
+the following month), so fresh schemes cost no requests at all. Due schemes wait in a heapq
+priority queue ordered by importance (log-scaled AUM and popularity) times how long they have
+been overdue; failed fetches back off exponentially. Fetches run continuously within a rolling
+hourly request budget that survives restarts.
+
+Usage:
+  python fetch_scheduler.py           # keep funds fresh until interrupted (SIGTERM/Ctrl+C)
+  python fetch_scheduler.py --once    # fetch what is due and fits this hour's budget, then exit
+  python fetch_scheduler.py --plan    # print the queue without fetching
+
+Environment:
+  FETCH_SCHEDULER_STATE_FILE   attempts, failures and spent budget (default state/fetch_scheduler.json)
+  FETCH_BUDGET_PER_HOUR        HTTP requests the fetcher may make per rolling hour (default 120)
+  FETCH_DISCLOSURE_DAY         day of the month by which last month's portfolio is published (default 10)
+  FETCH_RETRY_HOURS            wait after a failed fetch, doubled per further failure; also the
+                               minimum gap between two fetches of one scheme (default 6)
+  FETCH_REFRESH_MINUTES        how often the queue is rebuilt from MongoDB (default 30)
+"""
+
+import os
+import json
+import math
+import time
+import heapq
+import signal
+import argparse
+from datetime import datetime, timedelta
+
+from holdings_history import DISCLOSURE_DAY, add_months, disclosure_due, latest_disclosed_month
+import auto_fetch_holdings
+import instrumentation
+import rate_limiter
+import repository
+
+STATE_FILE = os.getenv('FETCH_SCHEDULER_STATE_FILE', os.path.join('state', 'fetch_scheduler.json'))
+BUDGET_PER_HOUR = int(os.getenv('FETCH_BUDGET_PER_HOUR', '120'))
+RETRY_HOURS = float(os.getenv('FETCH_RETRY_HOURS', '6'))
+REFRESH_MINUTES = float(os.getenv('FETCH_REFRESH_MINUTES', '30'))
+MAX_RETRY_HOURS = 24 * 7
+BUDGET_WINDOW = 3600
+STALENESS_DAYS = 7         # each week overdue adds the scheme's importance once more
+MAX_LAG_DAYS = 90          # schemes without any holdings count as this overdue
+DEFAULT_FETCH_COST = 2.0   # requests per fetch until real fetches have been measured
+SOURCES = list(auto_fetch_holdings.SCRAPERS)
+
+FUND_PROJECTION = {'schemeCode': 1, 'schemeName': 1, 'name': 1, 'aum': 1, 'popularity': 1}
+
+_stop = {'requested': False}
+
+def request_stop(signum=None, frame=None):
+    """Finish the current fetch, save the state and exit"""
+    _stop['requested'] = True
+
+def load_state():
+    """Saved scheduler state: {'schemes': {code: {...}}, 'requests': [[ts, n]], 'fetchCost'}"""
+    if not os.path.exists(STATE_FILE):
+        return {'schemes': {}, 'requests': [], 'fetchCost': DEFAULT_FETCH_COST}
+    with open(STATE_FILE, 'r') as f:
+        state = json.load(f)
+    state.setdefault('schemes', {})
+    state.setdefault('requests', [])
+    state.setdefault('fetchCost', DEFAULT_FETCH_COST)
+    return state
+
+def save_state(state):
+    """Atomically persist attempts and spent budget"""
+    state['updatedAt'] = datetime.now().isoformat()
+    directory = os.path.dirname(STATE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = STATE_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+def next_due(report_date):
+    """When a newer disclosure than report_date is expected"""
+    return disclosure_due(add_months(report_date, 1))
+
+def freshness_lag(report_date, now):
+    """Seconds a newer disclosure has been available for (0 while fresh); None without holdings"""
+    if report_date is None:
+        return None
+    return max(0.0, (now - next_due(report_date)).total_seconds())
+
+def _number(value):
+    """aum/popularity as a non-negative float (missing or malformed -> 0)"""
+    try:
+        return max(0.0, float(value or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def importance(fund):
+    """Log-scaled AUM plus popularity, so the largest funds don't drown out everything else"""
+    return 1.0 + math.log1p(_number(fund.get('aum'))) + math.log1p(_number(fund.get('popularity')))
+
+def priority(fund, lag_seconds):
+    """Importance scaled up by how long the scheme has been overdue"""
+    days = MAX_LAG_DAYS if lag_seconds is None else min(lag_seconds / 86400, MAX_LAG_DAYS)
+    return importance(fund) * (1.0 + days / STALENESS_DAYS)
+
+def latest_reports(db=None):
+    """{schemeCode: latest reportDate} (a DISTINCT_SCAN on the schemeCode + reportDate index)"""
+    pipeline = [
+        {'$sort': {'schemeCode': 1, 'reportDate': -1}},
+        {'$group': {'_id': '$schemeCode', 'reportDate': {'$first': '$reportDate'}}}
+    ]
+    return {row['_id']: row['reportDate'] for row in repository.fund_holdings(db).aggregate(pipeline)}
+
+def build_queue(state, now=None, db=None):
+    """Heap of schemes that are due and not backing off, plus when the next one becomes eligible"""
+    now = now or datetime.now()
+    reports = latest_reports(db)
+    funds = repository.funds(db).find({'schemeCode': {'$ne': None, '$exists': True}}, FUND_PROJECTION)
+
+    queue = []
+    next_at = None
+    lags = []
+    seen = set()
+    backing_off = missing = 0
+    for fund in funds:
+        code = fund['schemeCode']
+        if str(code) in seen:
+            continue
+        seen.add(str(code))
+        report_date = reports.get(code)
+        lag = freshness_lag(report_date, now)
+        if lag is None:
+            missing += 1
+        else:
+            lags.append(lag)
+
+        entry = state['schemes'].get(str(code), {})
+        eligible_at = now if report_date is None else next_due(report_date)
+        if entry.get('retryAt'):
+            retry_at = datetime.fromisoformat(entry['retryAt'])
+            if retry_at > now and eligible_at <= now:
+                backing_off += 1
+            eligible_at = max(eligible_at, retry_at)
+
+        if eligible_at <= now:
+            name = fund.get('schemeName') or fund.get('name', 'Unknown')
+            queue.append((-priority(fund, lag), str(code), code, name, lag))
+        elif next_at is None or eligible_at < next_at:
+            next_at = eligible_at
+
+    heapq.heapify(queue)
+    instrumentation.gauge('fetch_scheduler', 'queue_depth', len(queue))
+    instrumentation.gauge('fetch_scheduler', 'schemes_backing_off', backing_off)
+    instrumentation.gauge('fetch_scheduler', 'schemes_without_holdings', missing)
+    instrumentation.gauge('fetch_scheduler', 'freshness_lag_p50_hours', round(instrumentation.quantile(lags, 0.5) / 3600, 2))
+    instrumentation.gauge('fetch_scheduler', 'freshness_lag_max_hours', round(max(lags, default=0.0) / 3600, 2))
+    instrumentation.gauge('fetch_scheduler', 'stale_schemes', sum(1 for lag in lags if lag > 0) + missing)
+    return queue, next_at
+
+def spent(state, now):
+    """Requests made in the rolling hour (older entries are dropped)"""
+    state['requests'] = [[at, n] for at, n in state['requests'] if at > now - BUDGET_WINDOW]
+    return sum(n for _, n in state['requests'])
+
+def budget_wait(state, cost, now=None):
+    """Seconds until `cost` more requests fit in the hourly budget (0 if they fit now)"""
+    now = now or time.time()
+    used = spent(state, now)
+    if used + cost <= BUDGET_PER_HOUR:
+        return 0.0
+    freed = 0
+    for at, n in state['requests']:
+        freed += n
+        if used - freed + cost <= BUDGET_PER_HOUR:
+            return at + BUDGET_WINDOW - now
+    return float(BUDGET_WINDOW)
+
+def record_spend(state, requests, now=None):
+    """Charge one fetch's requests to the budget and update the per-fetch cost estimate"""
+    if requests:
+        state['requests'].append([now or time.time(), requests])
+    state['fetchCost'] = round(0.8 * state['fetchCost'] + 0.2 * requests, 3)
+    instrumentation.count('fetch_scheduler', 'requests', requests)
+
+def record_attempt(state, code, ok, now=None):
+    """Reset a scheme's backoff after a success, or push its next attempt out after a failure"""
+    now = now or datetime.now()
+    entry = state['schemes'].setdefault(str(code), {'failures': 0})
+    entry['lastAttempt'] = now.isoformat()
+    if ok:
+        entry['failures'] = 0
+        entry['lastSuccess'] = now.isoformat()
+        delay = RETRY_HOURS
+    else:
+        entry['failures'] += 1
+        delay = min(MAX_RETRY_HOURS, RETRY_HOURS * 2 ** (entry['failures'] - 1))
+    entry['retryAt'] = (now + timedelta(hours=delay)).isoformat()
+
+def _sleep(seconds):
+    """Sleep, waking early when a stop is requested"""
+    deadline = time.monotonic() + seconds
+    while not _stop['requested'] and time.monotonic() < deadline:
+        time.sleep(min(5.0, deadline - time.monotonic()))
+
+def run_scheduler(db=None, fetch=None, once=False, max_fetches=None, max_attempts=None):
+    """Fetch due schemes highest priority first within the hourly budget; returns {'fetched', 'failed'}.
+    fetch(scheme_code, fund_name) -> truthy on success (default auto_fetch_holdings_for_fund).
+    Stops after max_fetches successful fetches or max_attempts tries, whichever comes first."""
+    fetch = fetch or auto_fetch_holdings.auto_fetch_holdings_for_fund
+    state = load_state()
+    counts = {'fetched': 0, 'failed': 0}
+    queue, next_at, refreshed = [], None, None
+
+    with instrumentation.stage('fetch_scheduler'):
+        while not _stop['requested'] and (max_fetches is None or counts['fetched'] < max_fetches) \
+                and (max_attempts is None or sum(counts.values()) < max_attempts):
+            if refreshed is None or time.monotonic() - refreshed >= REFRESH_MINUTES * 60:
+                with instrumentation.span('fetch_scheduler', 'build_queue'):
+                    queue, next_at = build_queue(state, db=db)
+                refreshed = time.monotonic()
+                instrumentation.write_prometheus()
+
+            if not queue:
+                # Pass finished: derived indexes are refreshed once for everything fetched
+                auto_fetch_holdings.flush_pending(db)
+                if once:
+                    break
+                # Nothing due: sleep until the next scheme is, or the next rebuild
+                wait = REFRESH_MINUTES * 60
+                if next_at is not None:
+                    wait = min(wait, max(1.0, (next_at - datetime.now()).total_seconds()))
+                print(f"💤 Nothing due; next check in {wait / 60:.0f} min")
+                _sleep(wait)
+                refreshed = None
+                continue
+
+            wait = budget_wait(state, min(state['fetchCost'], BUDGET_PER_HOUR))
+            if wait > 0:
+                if once:
+                    print(f"⏸️  Hourly budget of {BUDGET_PER_HOUR} requests used up")
+                    break
+                print(f"⏸️  Budget used up; waiting {wait / 60:.1f} min")
+                _sleep(wait)
+                continue
+
+            score, _, code, name, lag = heapq.heappop(queue)
+            instrumentation.gauge('fetch_scheduler', 'queue_depth', len(queue))
+            print(f"\n🎯 {name[:50]} (priority {-score:.1f}, {'no holdings yet' if lag is None else f'{lag / 86400:.1f} days overdue'})")
+
+            before = rate_limiter.requests_sent(SOURCES)
+            with instrumentation.item('fetch_scheduler', code) as fields:
+                try:
+                    ok = bool(fetch(code, name))
+                except Exception as e:
+                    print(f"   ⚠️  Fetch error: {str(e)[:80]}")
+                    ok = False
+                fields['status'] = 'fetched' if ok else 'failed'
+                fields['priority'] = round(-score, 2)
+
+            record_spend(state, rate_limiter.requests_sent(SOURCES) - before)
+            record_attempt(state, code, ok)
+            save_state(state)
+            counts['fetched' if ok else 'failed'] += 1
+            instrumentation.count('fetch_scheduler', 'fetched' if ok else 'failed')
+            if ok and lag is not None:
+                instrumentation.observe('fetch_scheduler', 'freshness_lag', lag)
+            if not queue:
+                instrumentation.write_prometheus()
+
+    auto_fetch_holdings.flush_pending(db)
+    rate_limiter.save_health()
+    return counts
+
+def print_plan(limit=20, db=None):
+    """Show the current queue, highest priority first"""
+    queue, next_at = build_queue(load_state(), db=db)
+    print(f"\n📋 {len(queue)} schemes due")
+    for score, _, code, name, lag in heapq.nsmallest(limit, queue):
+        overdue = 'no holdings' if lag is None else f"{lag / 86400:.1f}d overdue"
+        print(f"  {str(code):>8}  {name[:45]:.<45} {-score:>7.1f}  {overdue}")
+    if next_at:
+        print(f"\n   Next scheme becomes due {next_at:%Y-%m-%d %H:%M}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Keep the most important funds fresh within a request budget')
+    parser.add_argument('--once', action='store_true', help='fetch what is due and fits the budget, then exit')
+    parser.add_argument('--plan', action='store_true', help='print the queue without fetching')
+    parser.add_argument('--max-fetches', type=int, default=None, help='stop after this many successful fetches')
+    parser.add_argument('--max-attempts', type=int, default=None, help='stop after this many tries, failures included')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🗓️  Freshness-Aware Fetch Scheduler")
+    print("=" * 70)
+
+    if args.plan:
+        print_plan()
+    else:
+        signal.signal(signal.SIGTERM, request_stop)
+        try:
+            counts = run_scheduler(once=args.once, max_fetches=args.max_fetches, max_attempts=args.max_attempts)
+            print(f"\n✅ Scheduler stopped ({counts['fetched']} fetched, {counts['failed']} failed)")
+        except KeyboardInterrupt:
+            print("\n✅ Scheduler stopped")
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,311 @@
+"""
+Synthetic Disclosure Corpus Generator
+Creates realistic portfolio disclosures (PDF / XLSX / CSV), the AMFI listing page
+that links to them and the matching `funds` documents, at a configurable scale
+(funds x holdings x months). Used by benchmark.py; deterministic for a given seed.
+
+Usage: python generate_fixtures.py [out_dir] [--funds 20] [--holdings 60] [--months 2] [--formats pdf,xlsx]
+"""
+
+import os
+import json
+import random
+import argparse
+from datetime import date
+from html import escape
+
+SECTOR_MAPPING_FILE = 'sector_mapping.json'
+PROFILES_FILE = 'parser_profiles.json'
+
+# AMC display name -> parser profile name (filenames start with the profile's fingerprint prefix)
+AMCS = [
+    ('HDFC', 'hdfc'),
+    ('SBI', 'sbi'),
+    ('ICICI Prudential', 'icici-prudential'),
+    ('Axis', 'axis'),
+    ('Kotak', 'kotak'),
+    ('Nippon India', 'nippon-india'),
+    ('Aditya Birla Sun Life', 'aditya-birla-sun-life'),
+]
+THEMES = [
+    ('Flexi Cap', 'Equity'), ('Large Cap', 'Equity'), ('Mid Cap', 'Equity'), ('Small Cap', 'Equity'),
+    ('Focused', 'Equity'), ('Value', 'Equity'), ('ELSS Tax Saver', 'Equity'), ('Banking and PSU', 'Debt'),
+    ('Balanced Advantage', 'Hybrid'), ('Multi Cap', 'Equity'), ('Infrastructure', 'Equity'), ('Dividend Yield', 'Equity')
+]
+SYNTHETIC_PREFIXES = ['Arvind', 'Bharat', 'Coromandel', 'Deccan', 'Everest', 'Ganga', 'Himalaya', 'Indus', 'Konkan', 'Malabar', 'Narmada', 'Sahyadri', 'Vindhya']
+SYNTHETIC_SUFFIXES = ['Industries', 'Textiles', 'Polymers', 'Engineering', 'Foods', 'Chemicals', 'Agro', 'Ceramics', 'Logistics', 'Electricals']
+MONTH_ABBR = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+
+# PDF page layout (points)
+PAGE_TOP = 700
+PAGE_BOTTOM = 60
+ROW_HEIGHT = 12
+FONT_SIZE = 8
+PDF_COLUMNS = [40, 250, 330, 420, 520]
+
+def slug(text):
+    """'ICICI Prudential' -> 'icici_prudential'"""
+    return '_'.join(''.join(c if c.isalnum() else ' ' for c in text.lower()).split())
+
+def security_universe(rng, size):
+    """Company names the classifier knows, topped up with synthetic ones"""
+    with open(SECTOR_MAPPING_FILE, 'r') as f:
+        mapping = json.load(f)
+
+    names = [f"{company} Limited" for companies in mapping['sectorMapping'].values() for company in companies]
+    for prefix in SYNTHETIC_PREFIXES:
+        for suffix in SYNTHETIC_SUFFIXES:
+            names.append(f"{prefix} {suffix} Limited")
+    rng.shuffle(names)
+
+    while len(names) < size:
+        names.append(f"{rng.choice(SYNTHETIC_PREFIXES)} {rng.choice(SYNTHETIC_SUFFIXES)} {len(names)} Limited")
+
+    return [
+        {'name': name, 'isin': f"INE{rng.randrange(10**8):08d}{rng.randrange(10)}", 'industry': rng.choice(['Banks', 'IT', 'Pharma', 'FMCG', 'Auto', 'Power', 'Metals'])}
+        for name in names[:size]
+    ]
+
+def report_months(count, today=None):
+    """The last `count` complete months, oldest first"""
+    today = today or date.today()
+    year, month = today.year, today.month
+    months = []
+    for _ in range(count):
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+        months.insert(0, (year, month))
+    return months
+
+def fund_holdings(rng, universe, count):
+    """Initial portfolio: weights descending, summing to ~97% (rest is cash)"""
+    picks = rng.sample(universe, min(count, len(universe)))
+    raw = sorted((rng.paretovariate(1.5) for _ in picks), reverse=True)
+    invested = rng.uniform(94.0, 99.0)
+    return [dict(security, weight=w / sum(raw) * invested) for security, w in zip(picks, raw)]
+
+def drift(rng, universe, holdings, turnover=0.05):
+    """Next month's portfolio: a few exits/entries and jittered weights"""
+    held = {h['name'] for h in holdings}
+    result = []
+    for holding in holdings:
+        if rng.random() < turnover:
+            candidates = [s for s in universe if s['name'] not in held]
+            if candidates:
+                replacement = rng.choice(candidates)
+                held.add(replacement['name'])
+                result.append(dict(replacement, weight=holding['weight']))
+                continue
+        result.append(dict(holding, weight=max(0.01, holding['weight'] * rng.uniform(0.9, 1.1))))
+
+    total = sum(h['weight'] for h in holdings)
+    scale = total / sum(h['weight'] for h in result)
+    return sorted((dict(h, weight=h['weight'] * scale) for h in result), key=lambda h: -h['weight'])
+
+def profile_headers(profile_name):
+    """(security, market value, weight) header texts the AMC's profile expects"""
+    with open(PROFILES_FILE, 'r') as f:
+        profiles = {p['name']: p for p in json.load(f)['profiles']}
+    columns = profiles[profile_name]['columns']
+    return columns['security'][0], columns['market_value'][0], columns['weight'][0]
+
+def pdf_escape(text):
+    """Escape a string for a PDF literal"""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path, pages):
+    """Minimal text-layer PDF writer; pages are lists of (x, y, text)"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+    kids = []
+    for items in pages:
+        content = b"".join(
+            b"BT /F1 %d Tf %.1f %.1f Td (%s) Tj ET\n" % (FONT_SIZE, x, y, pdf_escape(text).encode('latin-1', 'replace'))
+            for x, y, text in items
+        )
+        stream = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Resources << /Font << /F1 %d 0 R >> >> >>"
+            % (pages_id, stream, font)
+        ))
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+
+def disclosure_rows(holdings, aum_lakhs):
+    """(name, ISIN, industry, market value in lakhs, % to NAV) per holding"""
+    return [
+        (h['name'], h['isin'], h['industry'], h['weight'] * aum_lakhs / 100, h['weight'])
+        for h in holdings
+    ]
+
+def write_pdf_disclosure(path, amc, fund_name, month_label, headers, rows):
+    """Portfolio PDF: title, two-line header on page one, headerless continuation pages"""
+    security_header, value_header, weight_header = headers
+    value_top, _, value_bottom = value_header.partition('(')
+    header = [
+        (PDF_COLUMNS[0], PAGE_TOP, security_header), (PDF_COLUMNS[1], PAGE_TOP, 'ISIN'),
+        (PDF_COLUMNS[2], PAGE_TOP, 'Industry'), (PDF_COLUMNS[3], PAGE_TOP + 6, value_top.strip()),
+        (PDF_COLUMNS[3], PAGE_TOP - 2, '(' + value_bottom if value_bottom else ''), (PDF_COLUMNS[4], PAGE_TOP, weight_header)
+    ]
+    pages = [[(40, 760, f"{amc} Mutual Fund - Monthly Portfolio {month_label}"), (40, 745, f"Scheme Name : {fund_name}")] + [h for h in header if h[2]]]
+    y = PAGE_TOP - 20
+    for name, isin, industry, value, weight in rows:
+        if y < PAGE_BOTTOM:
+            pages.append([])
+            y = PAGE_TOP + 40
+        cells = (name, isin, industry, f"{value:,.2f}", f"{weight:.2f}")
+        pages[-1].extend((x, y, text) for x, text in zip(PDF_COLUMNS, cells))
+        y -= ROW_HEIGHT
+    write_pdf(path, pages)
+
+def write_xlsx_disclosure(path, amc, fund_name, month_label, headers, rows):
+    """Portfolio workbook as AMCs publish it: title rows, header, fractional % cells, grand total"""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+
+    security_header, value_header, weight_header = headers
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(slug(fund_name)[:31])
+    sheet.append([f"{amc} Mutual Fund"])
+    sheet.append([f"Scheme Name : {fund_name}"])
+    sheet.append([f"Monthly Portfolio Statement as on {month_label}"])
+    sheet.append([])
+    sheet.append([security_header, 'ISIN', 'Industry', 'Quantity', value_header, weight_header])
+    for name, isin, industry, value, weight in rows:
+        percent = WriteOnlyCell(sheet, value=round(weight / 100, 6))
+        percent.number_format = '0.00%'
+        sheet.append([name, isin, industry, int(value * 1000), round(value, 2), percent])
+    sheet.append(['Grand Total', None, None, None, round(sum(r[3] for r in rows), 2), round(sum(r[4] for r in rows) / 100, 6)])
+    workbook.save(path)
+
+def write_csv_disclosure(path, headers, rows):
+    """Portfolio CSV with plain percent values"""
+    import csv
+    security_header, value_header, weight_header = headers
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([security_header, 'ISIN', 'Industry', value_header, weight_header])
+        for name, isin, industry, value, weight in rows:
+            writer.writerow([name, isin, industry, f"{value:.2f}", f"{weight:.2f}"])
+
+def generate_corpus(out_dir, funds=20, holdings=60, months=2, formats=('pdf', 'xlsx'), seed=42):
+    """Write the corpus into out_dir; returns the manifest"""
+    rng = random.Random(seed)
+    files_dir = os.path.join(out_dir, 'disclosures')
+    os.makedirs(files_dir, exist_ok=True)
+
+    universe = security_universe(rng, max(holdings * 4, 300))
+    periods = report_months(months)
+    fund_docs = []
+    links = []
+    total_rows = 0
+
+    for index in range(funds):
+        amc, profile_name = AMCS[index % len(AMCS)]
+        theme, category = THEMES[(index // len(AMCS)) % len(THEMES)]
+        fund_name = f"{amc} {theme} Fund"
+        if index >= len(AMCS) * len(THEMES):
+            fund_name = f"{amc} {theme} Fund Series {index // (len(AMCS) * len(THEMES)) + 1}"
+        scheme_code = str(100000 + index)
+        aum_lakhs = rng.uniform(5_000, 500_000)
+        file_format = formats[index % len(formats)]
+        headers = profile_headers(profile_name)
+
+        fund_docs.append({
+            'schemeCode': scheme_code,
+            'schemeName': f"{fund_name} - Direct Plan - Growth",
+            'name': fund_name,
+            'category': category,
+            'amc': {'name': f"{amc} Mutual Fund"},
+            'fundHouse': f"{amc} Mutual Fund",
+            'aum': {'value': round(aum_lakhs / 100, 2)},
+            'popularity': rng.randint(1, 1000)
+        })
+
+        portfolio = fund_holdings(rng, universe, holdings)
+        for number, (year, month) in enumerate(periods):
+            if number:
+                portfolio = drift(rng, universe, portfolio)
+            rows = disclosure_rows(portfolio, aum_lakhs)
+            month_label = f"{MONTH_ABBR[month - 1].title()} {year}"
+            stem = f"{slug(amc)}_{slug(theme)}_{index:04d}_portfolio_{MONTH_ABBR[month - 1]}_{year}"
+            filename = f"{stem}.{file_format}"
+            path = os.path.join(files_dir, filename)
+
+            if file_format == 'pdf':
+                write_pdf_disclosure(path, amc, fund_name, month_label, headers, rows)
+            elif file_format == 'xlsx':
+                write_xlsx_disclosure(path, amc, fund_name, month_label, headers, rows)
+                # AMCs often publish the PDF too; the scraper should pick the spreadsheet
+                links.append({'href': f"/disclosures/{stem}.pdf", 'text': f"{fund_name} {month_label}"})
+            else:
+                write_csv_disclosure(path, headers, rows)
+
+            links.append({'href': f"/disclosures/{filename}", 'text': f"{fund_name} {month_label}"})
+            total_rows += len(rows)
+
+    # AMFI listing page the scraper parses
+    with open(os.path.join(out_dir, 'portfolio-disclosures.html'), 'w') as f:
+        f.write("<html><head><title>Portfolio Disclosures</title></head><body><table>\n")
+        for link in links:
+            f.write(f'<tr><td><a href="{escape(link["href"])}">{escape(link["text"])}</a></td></tr>\n')
+        f.write("</table></body></html>\n")
+
+    with open(os.path.join(out_dir, 'funds.json'), 'w') as f:
+        json.dump(fund_docs, f, indent=2)
+
+    manifest = {
+        'funds': funds,
+        'holdings': holdings,
+        'months': months,
+        'formats': list(formats),
+        'seed': seed,
+        'files': len(os.listdir(files_dir)),
+        'rows': total_rows,
+        'bytes': sum(os.path.getsize(os.path.join(files_dir, name)) for name in os.listdir(files_dir))
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def scale_arguments(parser):
+    """Corpus scale options shared with benchmark.py"""
+    parser.add_argument('--funds', type=int, default=20)
+    parser.add_argument('--holdings', type=int, default=60, help='holdings per fund')
+    parser.add_argument('--months', type=int, default=2)
+    parser.add_argument('--formats', default='pdf,xlsx', help='comma-separated: pdf, xlsx, csv')
+    parser.add_argument('--seed', type=int, default=42)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic portfolio disclosure corpus')
+    parser.add_argument('out_dir', nargs='?', default=os.path.join('fixtures', 'corpus'))
+    scale_arguments(parser)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🧪 Synthetic Disclosure Corpus")
+    print("=" * 70)
+
+    manifest = generate_corpus(args.out_dir, args.funds, args.holdings, args.months, args.formats.split(','), args.seed)
+    print(f"✅ {manifest['files']} files, {manifest['rows']} holdings rows, {manifest['bytes'] / 1e6:.1f} MB")
+    print(f"📁 Corpus: {args.out_dir}")
@@ -0,0 +1,315 @@
+"""
+Holdings Pipeline CLI
+Single entry point for the holdings pipeline. Heavy dependencies (pandas, pdfplumber,
+BeautifulSoup, pymongo) are imported only by the subcommands that need them, and
+`run` executes every stage in one process with one shared Mongo client.
+
+Usage:
+  python holdings.py scrape [--max-downloads N] [--enqueue] [--full]
+  python holdings.py parse
+  python holdings.py worker [--processes N] [--idle-exit]
+  python holdings.py collect
+  python holdings.py import
+  python holdings.py classify
+  python holdings.py exposure
+  python holdings.py lookthrough
+  python holdings.py publish [--force]
+  python holdings.py status
+  python holdings.py run [--stages scrape,parse,import,classify,exposure,lookthrough,publish] [--max-downloads N]
+                         [--queue [--processes N]]
+
+`run --queue` (default when HOLDINGS_PARSE_QUEUE=true) enqueues parse jobs in the scrape stage;
+its parse stage then drains the queue with N local workers alongside any remote ones and
+collects the outputs. Without it, `run` parses locally and never enqueues.
+
+Add --startup-only to any subcommand to report its import (cold start) time and exit.
+"""
+
+import time
+
+_STARTED = time.perf_counter()
+
+import os
+import sys
+import json
+import argparse
+import importlib
+from datetime import datetime
+
+import instrumentation
+
+PARSE_QUEUE = os.getenv('HOLDINGS_PARSE_QUEUE', 'false').lower() == 'true'
+
+STAGES = ['scrape', 'parse', 'import', 'classify', 'exposure', 'lookthrough', 'publish']
+STAGE_TITLES = {
+    'scrape': ('1. Scrape AMFI PDFs', 'Download portfolio disclosure PDFs from AMFI website'),
+    'parse': ('2. Parse Holdings', 'Extract holdings data from PDFs and spreadsheets'),
+    'import': ('3. Import to MongoDB', 'Load parsed holdings into database'),
+    'classify': ('4. Classify Sectors', 'Auto-classify securities into sectors'),
+    'exposure': ('5. Sector Exposure Snapshot', 'Roll up sector weights per fund, category and AMC for the API'),
+    'lookthrough': ('6. Fund-of-Funds Look-Through', 'Expand holdings of other schemes into underlying securities'),
+    'publish': ('7. Publish API Payloads', 'Pre-render and precompress holdings API responses'),
+    'worker': ('Parse Worker', 'Parse disclosures claimed from the work queue'),
+    'collect': ('Collect Parsed Jobs', 'Write finished parse jobs into parsed_holdings/')
+}
+
+# Modules each stage needs; imported only when a subcommand runs that stage
+STAGE_MODULES = {
+    'scrape': ['scrape_amfi_pdfs'],
+    'parse': ['parse_holdings'],
+    'import': ['import_to_mongodb'],
+    'classify': ['classify_sectors'],
+    'exposure': ['sector_exposure'],
+    'lookthrough': ['look_through'],
+    'publish': ['api_payloads'],
+    'status': ['check_alternatives', 'work_queue'],
+    'worker': ['parse_holdings', 'work_queue'],
+    'collect': ['parse_holdings']
+}
+
+class StageFailed(Exception):
+    """A stage finished without producing anything for the next one"""
+
+def get_db():
+    """The shared repository client's database (imported lazily; pulls in pymongo)"""
+    import repository
+    return repository.get_db()
+
+def load_modules(stages):
+    """Import the modules the given stages need; returns {name: module}"""
+    return {
+        name: importlib.import_module(name)
+        for stage in stages
+        for name in STAGE_MODULES[stage]
+    }
+
+def startup_complete(command):
+    """Record time from interpreter entry to 'ready to work' for a subcommand"""
+    seconds = time.perf_counter() - _STARTED
+    instrumentation.observe('cli', f"startup.{command}", seconds)
+    instrumentation.log_event('startup', command=command, seconds=round(seconds, 4), modules=len(sys.modules))
+    return seconds
+
+def run_scrape(modules, args):
+    """Find and download disclosures (non-interactive)"""
+    scraper = modules['scrape_amfi_pdfs']
+    links = scraper.scrape_pdf_links(full=getattr(args, 'full', False))
+    if links is None:
+        raise StageFailed("Could not read the AMFI listing. Check AMFI website structure.")
+    if not links:
+        print("✅ No new or changed disclosures since the last run")
+    # `run` picks one parse path for both stages; `scrape` alone falls back to HOLDINGS_PARSE_QUEUE
+    enqueue = args.queue if args.command == 'run' else (args.enqueue or None)
+    # Always rewrite the metadata so the parse stage only sees this run's downloads
+    scraper.download_pdfs(links, max_downloads=args.max_downloads, enqueue=enqueue)
+
+def run_parse(modules, args):
+    """Parse downloaded disclosures (in `run --queue`: through the work queue, then collect)"""
+    if getattr(args, 'queue', False):
+        written = modules['parse_holdings'].drain_parse_queue(args.processes, get_db())
+        print(f"📥 Collected {written} parsed files from the work queue")
+        return
+    modules['parse_holdings'].parse_all_pdfs()
+
+def run_import(modules, args):
+    """Import parsed holdings into MongoDB"""
+    importer = modules['import_to_mongodb']
+    db = get_db()
+    importer.create_indexes(db)
+    importer.import_holdings(db)
+
+def run_classify(modules, args):
+    """Classify holdings into sectors"""
+    modules['classify_sectors'].classify_all_holdings(get_db())
+
+def run_exposure(modules, args):
+    """Rebuild the sector exposure snapshot (weight-based sector distribution)"""
+    if modules['sector_exposure'].refresh_snapshot(get_db()) is None:
+        raise StageFailed("No holdings to roll up. Run the import stage first.")
+
+def run_lookthrough(modules, args):
+    """Resolve fund-of-funds into underlying securities"""
+    modules['look_through'].resolve_all(get_db())
+
+def run_publish(modules, args):
+    """Render changed schemes' API payloads"""
+    modules['api_payloads'].publish_payloads(get_db(), force=getattr(args, 'force', False))
+
+def run_status(modules, args):
+    """Local pipeline state plus database status"""
+    print("\n📁 Local Pipeline State:")
+    if os.path.exists('pdf_metadata.json'):
+        with open('pdf_metadata.json', 'r') as f:
+            metadata = json.load(f)
+        print(f"   Last scrape: {metadata.get('last_scraped', 'unknown')} ({metadata.get('downloaded', 0)} downloaded, {metadata.get('failed', 0)} failed)")
+    else:
+        print("   Last scrape: never")
+    parsed = [f for f in os.listdir('parsed_holdings') if f.endswith(('.json', '.json.zst')) and not f.startswith('_')] if os.path.isdir('parsed_holdings') else []
+    print(f"   Parsed files: {len(parsed)}")
+    history = sorted(d for d in os.listdir('history') if d[:4].isdigit()) if os.path.isdir('history') else []
+    print(f"   History months: {len(history)}{f' ({history[0]} .. {history[-1]})' if history else ''}")
+
+    modules['check_alternatives'].check_existing_funds(get_db())
+
+    stats = modules['work_queue'].queue_stats(get_db())
+    if stats:
+        print("\n📨 Work Queue:")
+        for kind, counts in stats.items():
+            print(f"   {kind}: " + ", ".join(f"{counts[s]} {s}" for s in modules['work_queue'].STATUSES))
+
+def run_worker(modules, args):
+    """Drain queued parse jobs with local worker processes"""
+    print(f"👷 Starting {args.processes} parse worker(s)...")
+    modules['parse_holdings'].run_parse_workers(args.processes, idle_exit=args.idle_exit)
+
+def run_collect(modules, args):
+    """Bring finished parse job outputs into parsed_holdings/"""
+    written = modules['parse_holdings'].collect_parsed_jobs(get_db())
+    print(f"📥 Collected {written} parsed files from the work queue")
+
+RUNNERS = {
+    'scrape': run_scrape,
+    'parse': run_parse,
+    'import': run_import,
+    'classify': run_classify,
+    'exposure': run_exposure,
+    'lookthrough': run_lookthrough,
+    'publish': run_publish,
+    'status': run_status,
+    'worker': run_worker,
+    'collect': run_collect
+}
+
+def run_stage(stage, modules, args):
+    """Run one pipeline stage with the step banner; returns success"""
+    title, description = STAGE_TITLES[stage]
+    print("\n" + "=" * 70)
+    print(f"🚀 STEP: {title}")
+    print(f"📝 {description}")
+    print("=" * 70)
+
+    with instrumentation.item('pipeline', stage) as fields:
+        try:
+            RUNNERS[stage](modules, args)
+            print(f"✅ {title} completed successfully")
+            fields['status'] = 'succeeded'
+            return True
+        except StageFailed as e:
+            print(f"⚠️  {e}")
+        except Exception as e:
+            print(f"❌ {title} failed: {str(e)}")
+        fields['status'] = 'failed'
+        return False
+
+def run_pipeline(modules, args, stages):
+    """Run the stages in order in this process; stops at the first failure"""
+    print("\n")
+    print("╔" + "=" * 68 + "╗")
+    print("║" + " " * 15 + "HOLDINGS EXTRACTION PIPELINE" + " " * 25 + "║")
+    print("║" + " " * 10 + "Complete Fund Portfolio Data Extraction" + " " * 19 + "║")
+    print("╚" + "=" * 68 + "╝")
+
+    start_time = datetime.now()
+    results = []
+    with instrumentation.stage('pipeline'):
+        for stage in stages:
+            success = run_stage(stage, modules, args)
+            results.append({'step': STAGE_TITLES[stage][0], 'success': success})
+            if not success:
+                print(f"\n⚠️  Pipeline stopped at: {STAGE_TITLES[stage][0]}")
+                break
+
+    duration = (datetime.now() - start_time).total_seconds()
+
+    print("\n\n" + "=" * 70)
+    print("📊 PIPELINE SUMMARY")
+    print("=" * 70)
+    for result in results:
+        status = "✅ SUCCESS" if result['success'] else "❌ FAILED"
+        print(f"{status} - {result['step']}")
+
+    print("\n" + "=" * 70)
+    print(f"⏱️  Total time: {duration:.1f} seconds")
+
+    if all(r['success'] for r in results):
+        print("✅ All steps completed successfully!")
+        print("\n🎉 Holdings data is now available in your database")
+        print("📡 API endpoints are ready to serve holdings data")
+        return True
+
+    print("⚠️  Some steps failed. Please check the logs above.")
+    return False
+
+def build_parser():
+    """argparse definition of the subcommands"""
+    parser = argparse.ArgumentParser(prog='holdings', description='Fund holdings extraction pipeline')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add(name, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--startup-only', action='store_true', help='import what the command needs, report startup time and exit')
+        return command
+
+    scrape = add('scrape', 'download portfolio disclosures from AMFI')
+    scrape.add_argument('--max-downloads', type=int, default=None)
+    scrape.add_argument('--enqueue', action='store_true', help='queue parse jobs for worker processes (HOLDINGS_PARSE_QUEUE)')
+    scrape.add_argument('--full', action='store_true', help='download every listed disclosure, not only new or changed ones')
+    add('parse', 'parse downloaded disclosures')
+    worker = add('worker', 'parse queued disclosures (run on each worker machine)')
+    worker.add_argument('--processes', type=int, default=1)
+    worker.add_argument('--idle-exit', action='store_true', help='exit once the queue is empty')
+    add('collect', 'write finished parse jobs into parsed_holdings/ for import')
+    add('import', 'import parsed holdings into MongoDB')
+    add('classify', 'classify holdings into sectors')
+    add('exposure', 'rebuild the sector exposure snapshot the API loads')
+    add('lookthrough', 'expand fund-of-funds into underlying securities')
+    publish = add('publish', 'pre-render precompressed API payloads for changed schemes')
+    publish.add_argument('--force', action='store_true', help='re-render every scheme')
+    add('status', 'show pipeline and database status')
+    run = add('run', 'run the whole pipeline in one process')
+    run.add_argument('--stages', default=','.join(STAGES), help='comma-separated subset of ' + ','.join(STAGES))
+    run.add_argument('--max-downloads', type=int, default=None)
+    run.add_argument('--full', action='store_true', help='download every listed disclosure, not only new or changed ones')
+    run.add_argument('--queue', action=argparse.BooleanOptionalAction, default=PARSE_QUEUE,
+                     help='enqueue parse jobs, drain the queue and collect the results (default: HOLDINGS_PARSE_QUEUE)')
+    run.add_argument('--processes', type=int, default=1, help='local parse workers with --queue')
+    return parser
+
+def main(argv=None):
+    """CLI entry point; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    instrumentation.configure(component=f"cli_{args.command}")
+
+    if args.command == 'run':
+        stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+        unknown = [s for s in stages if s not in STAGES]
+        if unknown:
+            print(f"❌ Unknown stage(s): {', '.join(unknown)}")
+            return 2
+        stages = [s for s in STAGES if s in stages]
+    else:
+        stages = [args.command]
+
+    modules = load_modules(stages)
+    startup = startup_complete(args.command)
+
+    if args.startup_only:
+        print(json.dumps({'command': args.command, 'startupMs': round(startup * 1000, 2), 'modules': len(sys.modules)}))
+        return 0
+
+    if args.command == 'run':
+        success = run_pipeline(modules, args, stages)
+    elif args.command == 'status':
+        RUNNERS['status'](modules, args)
+        success = True
+    else:
+        success = run_stage(args.command, modules, args)
+
+    report = instrumentation.finish()
+    if args.command != 'status':
+        instrumentation.print_summary(report)
+    print(f"🚀 Startup: {startup * 1000:.0f} ms")
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Holdings History Store
+Append-only, month-partitioned columnar archive of every monthly portfolio snapshot.
+
+Layout:
+    history/securities.json          dictionary: security id -> canonical name (append-only)
+    history/schemes.json             dictionary: scheme id -> schemeCode (append-only)
+    history/2026-01/seg-000001.*.npy one segment per import run (scheme, security, weight, market_value)
+
+A later segment for the same scheme and month supersedes earlier ones, so
+re-imports never rewrite existing files. fund_holdings in Mongo stays the
+latest-month projection the API reads.
+
+Writers (the importer, auto-fetch, long-running schedulers) serialize on history/.lock:
+dictionaries are re-read from disk under the lock before new ids are assigned, and segment
+numbers are picked under it, so concurrent processes never reuse an id or a segment.
+Cached dictionaries are reloaded whenever the file on disk changes.
+
+Disclosure months are inferred from filenames and archive URLs, never from fund names (target
+maturity funds such as 'Nifty SDL Apr 2027 Index Fund' carry a future month in the name), and a
+month newer than the latest one AMCs can have published is rejected.
+
+Environment:
+  FETCH_DISCLOSURE_DAY   day of the month by which last month's portfolio is published (default 10)
+"""
+
+import os
+import re
+import sys
+import json
+import contextlib
+import numpy as np
+from datetime import datetime
+
+from securities import normalize_security
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+HISTORY_DIR = "history"
+DISCLOSURE_DAY = int(os.getenv('FETCH_DISCLOSURE_DAY', '10'))
+SECURITIES_FILE = "securities.json"
+SCHEMES_FILE = "schemes.json"
+LOCK_FILE = ".lock"
+COLUMNS = {
+    'scheme': np.int32,
+    'security': np.int32,
+    'weight': np.float32,
+    'market_value': np.float64
+}
+
+MONTH_NAMES = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+# Whole tokens only: '_' and '-' separate words in filenames, so \b alone is not enough
+_MONTH_YEAR_RE = re.compile(
+    r'(?<![a-z0-9])(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+    r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)[\s_\-.,]*(20\d{2})(?!\d)',
+    re.IGNORECASE
+)
+# YYYYMM with an optional DD (the common YYYYMMDD stamp)
+_YEAR_MONTH_RE = re.compile(r'(?<![a-z0-9])(20\d{2})[\s_\-.]?(0[1-9]|1[0-2])(?:[\s_\-.]?(?:0[1-9]|[12]\d|3[01]))?(?!\d)', re.IGNORECASE)
+# Archive URLs: whole '/YYYY/MM/' directory segments
+_URL_MONTH_RE = re.compile(r'/(20\d{2})/(0?[1-9]|1[0-2])/')
+
+_dictionaries = {}
+_month_cache = {}
+
+def month_partition(report_date):
+    """Partition name ('YYYY-MM') for a report date"""
+    return report_date.strftime('%Y-%m')
+
+def add_months(when, months):
+    """First day of the month `months` after when's month"""
+    index = when.year * 12 + when.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def disclosure_due(month):
+    """When a month's portfolio should be published (DISCLOSURE_DAY of the next month)"""
+    return add_months(month, 1).replace(day=DISCLOSURE_DAY)
+
+def latest_disclosed_month(now):
+    """Newest portfolio month published by `now` (what a scrape at `now` actually finds)"""
+    month = add_months(now, -1)
+    return month if now >= disclosure_due(month) else add_months(now, -2)
+
+def _month_candidates(text):
+    """Every (year, month) a filename or URL path names, in order of appearance"""
+    found = [(m.start(), int(m.group(2)), MONTH_NAMES[m.group(1).lower()[:3]]) for m in _MONTH_YEAR_RE.finditer(text)]
+    found += [(m.start(), int(m.group(1)), int(m.group(2))) for m in _YEAR_MONTH_RE.finditer(text)]
+    found += [(m.start(), int(m.group(1)), int(m.group(2))) for m in _URL_MONTH_RE.finditer(text)]
+    return [(year, month) for _, year, month in sorted(found)]
+
+def infer_report_date(*texts, fallback=None, now=None):
+    """Disclosure month from filenames/URL paths (e.g. 'Portfolio_December_2025.pdf'), first day of month.
+    Months after the latest disclosed one are ignored; without a match, fallback or the latest disclosed month."""
+    latest = latest_disclosed_month(now or datetime.now())
+    for text in texts:
+        if not text:
+            continue
+        for year, month in _month_candidates(str(text)):
+            if datetime(year, month, 1) <= latest:
+                return datetime(year, month, 1)
+
+    return fallback if fallback is not None else latest
+
+def _file_stamp(path):
+    """(inode, size, mtime) identifying one version of a file, or None if missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _load_dictionary(name, root):
+    """Load an append-only dictionary as (list, {value: id}); reloaded when another process rewrote it"""
+    key = (root, name)
+    path = os.path.join(root, name)
+    stamp = _file_stamp(path)
+    cached = _dictionaries.get(key)
+    if cached is None or cached[0] != stamp:
+        values = []
+        if stamp is not None:
+            with open(path, 'r') as f:
+                values = json.load(f)
+        cached = _dictionaries[key] = (stamp, values, {v: i for i, v in enumerate(values)})
+    return cached[1], cached[2]
+
+def _save_dictionary(name, root):
+    """Persist a dictionary atomically (callers hold the history lock)"""
+    key = (root, name)
+    _, values, ids = _dictionaries[key]
+    path = os.path.join(root, name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(values, f)
+    os.replace(tmp_path, path)
+    _dictionaries[key] = (_file_stamp(path), values, ids)
+
+@contextlib.contextmanager
+def _locked(root):
+    """Exclusive lock on the history store across processes"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _encode(name, value, root, add=True):
+    """Dictionary-encode a value, appending new entries"""
+    values, ids = _load_dictionary(name, root)
+    if value in ids:
+        return ids[value]
+    if not add:
+        return None
+    ids[value] = len(values)
+    values.append(value)
+    return ids[value]
+
+def _segment_ids(month_dir):
+    """Sorted segment numbers present in a month partition"""
+    if not os.path.isdir(month_dir):
+        return []
+    ids = set()
+    for filename in os.listdir(month_dir):
+        match = re.match(r'seg-(\d+)\.', filename)
+        if match:
+            ids.add(int(match.group(1)))
+    return sorted(ids)
+
+def _number(value):
+    """Numeric value with None/NaN treated as 0"""
+    if value is None or value != value:
+        return 0.0
+    return float(value)
+
+def append_snapshot(scheme_code, report_date, holdings, root=HISTORY_DIR):
+    """Append one fund's monthly holdings as a new segment; returns rows written"""
+    return append_snapshots([(scheme_code, report_date, holdings)], root)
+
+def append_snapshots(snapshots, root=HISTORY_DIR):
+    """Append (schemeCode, reportDate, holdings) snapshots, one new segment per month touched"""
+    snapshots = [(code, date, holdings) for code, date, holdings in snapshots if code and holdings]
+    if not snapshots:
+        return 0
+    with _locked(root):
+        return _append_locked(snapshots, root)
+
+def _append_locked(snapshots, root):
+    """append_snapshots body; runs under the history lock"""
+    by_month = {}
+    for scheme_code, report_date, holdings in snapshots:
+        scheme_id = _encode(SCHEMES_FILE, str(scheme_code), root)
+
+        # Collapse duplicate rows of the same security (e.g. split across PDF pages)
+        rows = by_month.setdefault(month_partition(report_date), {})
+        rows.pop(scheme_id, None)
+        weights = rows.setdefault(scheme_id, {})
+        for holding in holdings:
+            security = normalize_security(holding.get('security'))
+            if not security:
+                continue
+            security_id = _encode(SECURITIES_FILE, security, root)
+            weight, value = weights.get(security_id, (0.0, 0.0))
+            weights[security_id] = (
+                weight + _number(holding.get('weight')),
+                value + _number(holding.get('market_value', holding.get('marketValue')))
+            )
+
+    if not any(weights for rows in by_month.values() for weights in rows.values()):
+        return 0
+
+    # Dictionaries first: a segment must never reference ids that are not on disk
+    _save_dictionary(SCHEMES_FILE, root)
+    _save_dictionary(SECURITIES_FILE, root)
+
+    written = 0
+    for month, rows in by_month.items():
+        columns = {name: [] for name in COLUMNS}
+        for scheme_id, weights in rows.items():
+            for security_id, (weight, value) in weights.items():
+                columns['scheme'].append(scheme_id)
+                columns['security'].append(security_id)
+                columns['weight'].append(weight)
+                columns['market_value'].append(value)
+        if not columns['scheme']:
+            continue
+        columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+        month_dir = os.path.join(root, month)
+        os.makedirs(month_dir, exist_ok=True)
+        existing = _segment_ids(month_dir)
+        segment = (existing[-1] + 1) if existing else 1
+
+        # Readers only pick up a segment once every column file is in place
+        for name in COLUMNS:
+            tmp_path = os.path.join(month_dir, f"tmp-{os.getpid()}-{segment:06d}.{name}.npy")
+            np.save(tmp_path, columns[name])
+            os.replace(tmp_path, os.path.join(month_dir, f"seg-{segment:06d}.{name}.npy"))
+
+        _month_cache.pop((root, month), None)
+        written += len(columns['scheme'])
+
+    return written
+
+def list_months(root=HISTORY_DIR):
+    """All partitions in chronological order"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if re.fullmatch(r'\d{4}-\d{2}', d))
+
+def load_month(month, root=HISTORY_DIR):
+    """Effective rows of a month (latest segment per scheme wins), memory-mapped and cached"""
+    month_dir = os.path.join(root, month)
+    segments = [
+        s for s in _segment_ids(month_dir)
+        if all(os.path.exists(os.path.join(month_dir, f"seg-{s:06d}.{name}.npy")) for name in COLUMNS)
+    ]
+
+    cache_key = (root, month)
+    cached = _month_cache.get(cache_key)
+    if cached and cached[0] == len(segments):
+        return cached[1]
+
+    parts = {name: [] for name in COLUMNS}
+    segment_of_row = []
+    for segment in segments:
+        for name in COLUMNS:
+            parts[name].append(np.load(os.path.join(month_dir, f"seg-{segment:06d}.{name}.npy"), mmap_mode='r'))
+        segment_of_row.append(np.full(len(parts['scheme'][-1]), segment, dtype=np.int32))
+
+    if not segments:
+        data = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+    else:
+        data = {name: np.concatenate(parts[name]) for name in COLUMNS}
+        row_segments = np.concatenate(segment_of_row)
+
+        # Keep only rows from each scheme's newest segment
+        newest = np.zeros(data['scheme'].max() + 1, dtype=np.int32)
+        np.maximum.at(newest, data['scheme'], row_segments)
+        keep = row_segments == newest[data['scheme']]
+        data = {name: column[keep] for name, column in data.items()}
+
+        # Sort by (security, scheme) so per-security lookups are binary searches
+        order = np.lexsort((data['scheme'], data['security']))
+        data = {name: column[order] for name, column in data.items()}
+
+    _month_cache[cache_key] = (len(segments), data)
+    return data
+
+def decoded_month(month, root=HISTORY_DIR):
+    """A month's effective rows with schemeCode and canonical security names decoded (object arrays)"""
+    data = load_month(month, root)
+    # Loaded after the segments: dictionaries are saved before any segment that references them
+    schemes, _ = _load_dictionary(SCHEMES_FILE, root)
+    securities, _ = _load_dictionary(SECURITIES_FILE, root)
+    return {
+        'schemeCode': np.asarray(schemes, dtype=object)[data['scheme']],
+        'security': np.asarray(securities, dtype=object)[data['security']],
+        'weight': data['weight'],
+        'market_value': data['market_value']
+    }
+
+def _security_rows(data, security_id):
+    """Slice of a month's rows holding one security"""
+    start = np.searchsorted(data['security'], security_id, side='left')
+    end = np.searchsorted(data['security'], security_id, side='right')
+    return slice(start, end)
+
+def weight_history(scheme_code, security, months=36, root=HISTORY_DIR):
+    """Weight of a security in a fund over the last N months: [(month, weight or None)]"""
+    scheme_id = _encode(SCHEMES_FILE, str(scheme_code), root, add=False)
+    security_id = _encode(SECURITIES_FILE, normalize_security(security), root, add=False)
+
+    series = []
+    for month in list_months(root)[-months:]:
+        weight = None
+        if scheme_id is not None and security_id is not None:
+            data = load_month(month, root)
+            rows = _security_rows(data, security_id)
+            match = np.flatnonzero(data['scheme'][rows] == scheme_id)
+            if len(match):
+                weight = float(data['weight'][rows][match[0]])
+        series.append((month, weight))
+    return series
+
+def funds_added_security(security, month=None, root=HISTORY_DIR):
+    """Schemes holding a security in `month` (default latest) that did not hold it the month before"""
+    months = list_months(root)
+    if not months:
+        return []
+    month = month or months[-1]
+    if month not in months:
+        return []
+
+    security_id = _encode(SECURITIES_FILE, normalize_security(security), root, add=False)
+    if security_id is None:
+        return []
+
+    current = load_month(month, root)
+    rows = _security_rows(current, security_id)
+    holders = current['scheme'][rows]
+    weights = current['weight'][rows]
+
+    position = months.index(month)
+    if position > 0:
+        previous = load_month(months[position - 1], root)
+        previous_holders = previous['scheme'][_security_rows(previous, security_id)]
+        # Only schemes that reported last month can have "added" the security
+        reported = np.unique(previous['scheme'])
+        new = ~np.isin(holders, previous_holders) & np.isin(holders, reported)
+    else:
+        new = np.zeros(len(holders), dtype=bool)
+
+    # Loaded after the segments: dictionaries are saved before any segment that references them
+    schemes, _ = _load_dictionary(SCHEMES_FILE, root)
+    return sorted(
+        ({'schemeCode': schemes[s], 'weight': float(w)} for s, w in zip(holders[new], weights[new])),
+        key=lambda r: r['weight'],
+        reverse=True
+    )
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("🗂️  Holdings History Store")
+    print("=" * 70)
+
+    months = list_months()
+    securities, _ = _load_dictionary(SECURITIES_FILE, HISTORY_DIR)
+    schemes, _ = _load_dictionary(SCHEMES_FILE, HISTORY_DIR)
+    print(f"📅 Months: {len(months)} ({months[0] if months else '-'} → {months[-1] if months else '-'})")
+    print(f"🏢 Securities: {len(securities)}, Schemes: {len(schemes)}")
+
+    if len(sys.argv) >= 4 and sys.argv[1] == 'weight':
+        for month, weight in weight_history(sys.argv[2], sys.argv[3]):
+            print(f"  {month}  {'-' if weight is None else f'{weight:.2f}%'}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'added':
+        for row in funds_added_security(sys.argv[2]):
+            print(f"  {row['schemeCode']:<12} {row['weight']:>6.2f}%")
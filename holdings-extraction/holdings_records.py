@@ -0,0 +1,220 @@
+"""
+Holdings Records
+Compact struct-of-arrays batches for one fund's holdings as they move from parse to import.
+Security names are one object array and weight / market value are float64 arrays (NaN when
+missing); per-fund fields (scheme, fund name, report date, import time) are given once at the
+writer. Rows only become dicts/BSON documents there, one insert batch at a time, instead of a
+dict per row with repeated key strings living through every stage.
+
+Parsed files store the same columns:
+  {fund_name, filename, format, report_date, parsed_at, total_holdings,
+   columns: {security: [...], weight: [...], market_value: [...]}}
+Files with the older per-row `holdings: [{security, weight, market_value}, ...]` still load.
+
+Usage:
+  python holdings_records.py benchmark [--funds 2000] [--holdings 100]   # memory/throughput vs dicts
+"""
+
+import sys
+import time
+import argparse
+import itertools
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+def _float_column(values, length):
+    """float64 array with NaN for None/blank/unparseable cells"""
+    if values is None:
+        return np.full(length, np.nan)
+    try:
+        # None converts to NaN directly; only strings and odd cells need the slow path
+        return np.asarray(values, dtype=np.float64).reshape(length)
+    except (TypeError, ValueError):
+        pass
+    column = np.empty(length, dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            column[i] = np.nan if value is None or value == '' else float(value)
+        except (TypeError, ValueError):
+            column[i] = np.nan
+    return column
+
+def _value(number):
+    """NaN -> None, numpy scalar -> Python float (BSON and JSON friendly)"""
+    return None if number != number else float(number)
+
+class HoldingsBatch:
+    """One fund's holdings as parallel columns"""
+    __slots__ = ('security', 'weight', 'market_value', 'sector')
+
+    def __init__(self, security, weight=None, market_value=None, sector=None):
+        self.security = np.asarray(security, dtype=object)
+        self.weight = _float_column(weight, len(self.security))
+        self.market_value = _float_column(market_value, len(self.security))
+        self.sector = None if sector is None else np.asarray(sector, dtype=object)
+
+    @classmethod
+    def from_frame(cls, df):
+        """From a parse DataFrame (security/weight/market_value columns), without per-row dicts"""
+        import pandas as pd
+        def numeric(name):
+            if name not in df.columns:
+                return None
+            return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        batch = cls(df['security'].to_numpy(dtype=object))
+        for name in ('weight', 'market_value'):
+            column = numeric(name)
+            if column is not None:
+                setattr(batch, name, column)
+        if 'sector' in df.columns:
+            batch.sector = df['sector'].to_numpy(dtype=object)
+        return batch
+
+    @classmethod
+    def from_records(cls, records):
+        """From [{security, weight, market_value|marketValue, sector?}] rows"""
+        records = list(records)
+        sectors = [r.get('sector') for r in records] if any('sector' in r for r in records) else None
+        return cls(
+            [r.get('security') for r in records],
+            [r.get('weight') for r in records],
+            [r.get('market_value', r.get('marketValue')) for r in records],
+            sectors
+        )
+
+    @classmethod
+    def from_parsed(cls, data):
+        """From a parsed_holdings file: `columns`, or the older per-row `holdings` list"""
+        if 'columns' in data:
+            columns = data['columns']
+            return cls(columns['security'], columns.get('weight'), columns.get('market_value'), columns.get('sector'))
+        return cls.from_records(data.get('holdings') or [])
+
+    def __len__(self):
+        return len(self.security)
+
+    def __iter__(self):
+        """Row dicts, built on demand (for consumers written against record lists)"""
+        return self.rows()
+
+    def rows(self):
+        """Yield {security, weight, market_value[, sector]} one row at a time"""
+        sectors = self.sector
+        for i, (security, weight, value) in enumerate(zip(self.security, self.weight, self.market_value)):
+            row = {'security': security, 'weight': _value(weight), 'market_value': _value(value)}
+            if sectors is not None:
+                row['sector'] = sectors[i]
+            yield row
+
+    def head(self, n):
+        """First n rows as dicts"""
+        return list(itertools.islice(self.rows(), n))
+
+    def to_columns(self):
+        """JSON-friendly columns for parsed_holdings files"""
+        columns = {
+            'security': self.security.tolist(),
+            'weight': [_value(w) for w in self.weight],
+            'market_value': [_value(v) for v in self.market_value]
+        }
+        if self.sector is not None:
+            columns['sector'] = self.sector.tolist()
+        return columns
+
+    def documents(self, **fields):
+        """fund_holdings documents, generated lazily: per-fund fields once, then the row columns.
+        marketValue is the Mongo field name for market_value."""
+        sectors = self.sector
+        for i, (security, weight, value) in enumerate(zip(self.security, self.weight, self.market_value)):
+            doc = dict(fields)
+            doc['security'] = security
+            doc['weight'] = _value(weight)
+            doc['marketValue'] = _value(value)
+            if sectors is not None:
+                doc['sector'] = sectors[i]
+            yield doc
+
+def _synthetic_frames(funds, holdings):
+    """Parse-stage DataFrames shaped like real disclosures"""
+    import pandas as pd
+    rng = np.random.default_rng(7)
+    names = np.array([f"Security {i} Ltd" for i in range(5000)], dtype=object)
+    for _ in range(funds):
+        weights = rng.dirichlet(np.ones(holdings)) * 100
+        yield pd.DataFrame({
+            'security': rng.choice(names, holdings, replace=False),
+            'weight': weights,
+            'market_value': weights * 1e7
+        })
+
+def _measure(build, write):
+    """Seconds and peak traced MB of building every fund's records, then writing their documents"""
+    import bson
+    tracemalloc.start()
+    start = time.perf_counter()
+    retained = build()
+    encoded = 0
+    for docs in write(retained):
+        # Writer side: documents leave as BSON one insert batch at a time
+        encoded += sum(len(bson.encode(doc)) for doc in docs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(seconds, 3), 'peakMB': round(peak / 2**20, 1), 'bsonMB': round(encoded / 2**20, 1)}
+
+def benchmark(funds=2000, holdings=100, batch_size=1000):
+    """Dict-per-row path vs HoldingsBatch for a month of parse -> import (records held until import ends)"""
+    frames = list(_synthetic_frames(funds, holdings))
+    report_date = datetime(2026, 1, 1)
+
+    def dict_build():
+        return [frame.to_dict('records') for frame in frames]
+
+    def dict_write(all_records):
+        for scheme_code, records in enumerate(all_records):
+            yield [{
+                'schemeCode': scheme_code, 'fundName': 'Fund', 'security': h.get('security'),
+                'weight': h.get('weight'), 'marketValue': h.get('market_value'),
+                'reportDate': report_date, 'importedAt': datetime.now(), 'source': 'AMFI_PDF'
+            } for h in records]
+
+    def batch_build():
+        return [HoldingsBatch.from_frame(frame) for frame in frames]
+
+    def batch_write(batches):
+        for scheme_code, batch in enumerate(batches):
+            docs = batch.documents(schemeCode=scheme_code, fundName='Fund', reportDate=report_date,
+                                   importedAt=datetime.now(), source='AMFI_PDF')
+            while True:
+                chunk = list(itertools.islice(docs, batch_size))
+                if not chunk:
+                    break
+                yield chunk
+
+    return {
+        'rows': funds * holdings,
+        'dicts': _measure(dict_build, dict_write),
+        'batches': _measure(batch_build, batch_write)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compact holdings records')
+    commands = parser.add_subparsers(dest='command')
+    bench = commands.add_parser('benchmark', help='memory and throughput vs dict-per-row records')
+    bench.add_argument('--funds', type=int, default=2000)
+    bench.add_argument('--holdings', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command != 'benchmark':
+        parser.print_help()
+        sys.exit(1)
+
+    print("=" * 70)
+    print("🧱 Holdings Records Benchmark")
+    print("=" * 70)
+    result = benchmark(args.funds, args.holdings)
+    print(f"  Rows:              {result['rows']}")
+    for path in ('dicts', 'batches'):
+        stats = result[path]
+        print(f"  {path:.<18} {stats['seconds']:>7.2f}s  peak {stats['peakMB']:>7.1f} MB  ({stats['bsonMB']} MB BSON)")
@@ -0,0 +1,201 @@
+"""
+Holdings Health Report
+Every health metric of fund_holdings from one $facet aggregation (a single collection scan)
+plus one $group over funds for AMC coverage. Every stage that writes fund_holdings or its
+sectors (import, auto_fetch, classify, the classify backfill, the online classifier) and the
+look-through stage store the result in `holdings_stats`, so the health check, status command
+and API read one small document instead of re-scanning fund_holdings with several counts,
+groups and distincts.
+
+Document `holdings_stats` {_id: 'fund_holdings'}:
+    {
+      totalHoldings, classifiedHoldings, fundsWithHoldings, totalFunds, latestReportDate,
+      fundsOfFunds,                                   # funds with a fund_lookthrough document
+      sectors: [{sector, count}],                     # every sector, most holdings first
+      topFunds: [{schemeCode, fundName, count, latestDate}],
+      staleness: [{bucket: '0', funds}, ...],         # months each fund's latest report trails the newest
+      coverageByAmc: [{amc, funds, withHoldings, coveragePct}],
+      generatedAt, computeMs
+    }
+
+Usage:
+  python holdings_stats.py [show]       # stored report (computed if missing)
+  python holdings_stats.py refresh      # recompute and store
+"""
+
+import sys
+import time
+from datetime import datetime
+
+import repository
+
+REPORT_ID = 'fund_holdings'
+TOP_FUNDS = 5
+# (label, lowest months behind) - a fund falls in the last bucket whose bound it reaches
+STALENESS_BUCKETS = [('0', 0), ('1', 1), ('2', 2), ('3-5', 3), ('6-11', 6), ('12+', 12)]
+
+HOLDINGS_FACET = [{'$facet': {
+    'totals': [{'$group': {
+        '_id': None,
+        'holdings': {'$sum': 1},
+        'classified': {'$sum': {'$cond': [{'$ifNull': ['$sector', False]}, 1, 0]}},
+        'latestDate': {'$max': '$reportDate'}
+    }}],
+    'funds': [
+        {'$match': {'schemeCode': {'$ne': None}}},
+        {'$group': {
+            '_id': '$schemeCode',
+            'fundName': {'$first': '$fundName'},
+            'count': {'$sum': 1},
+            'latestDate': {'$max': '$reportDate'}
+        }}
+    ],
+    'sectors': [
+        {'$match': {'sector': {'$ne': None}}},
+        {'$group': {'_id': '$sector', 'count': {'$sum': 1}}},
+        {'$sort': {'count': -1}}
+    ]
+}}]
+
+AMC_GROUP = [{'$group': {
+    '_id': {'$ifNull': ['$amc.name', {'$ifNull': ['$amc', '$fundHouse']}]},
+    'codes': {'$push': '$schemeCode'}
+}}]
+
+def months_behind(date, latest):
+    """Whole months between a fund's latest report and the newest one"""
+    return (latest.year - date.year) * 12 + latest.month - date.month
+
+def staleness_histogram(dates, latest):
+    """[{bucket, funds}] of how far each fund's latest report trails the newest month"""
+    counts = {label: 0 for label, _ in STALENESS_BUCKETS}
+    counts['unknown'] = 0
+    for date in dates:
+        if date is None or latest is None:
+            counts['unknown'] += 1
+            continue
+        behind = months_behind(date, latest)
+        label = [label for label, bound in STALENESS_BUCKETS if behind >= bound][-1]
+        counts[label] += 1
+    return [{'bucket': label, 'funds': n} for label, n in counts.items() if n or label != 'unknown']
+
+def amc_coverage(amc_groups, codes_with_holdings):
+    """[{amc, funds, withHoldings, coveragePct}], largest AMCs first"""
+    coverage = []
+    for group in amc_groups:
+        codes = [c for c in group['codes'] if c is not None]
+        with_holdings = sum(1 for c in codes if c in codes_with_holdings)
+        coverage.append({
+            'amc': group['_id'] if isinstance(group['_id'], str) else 'unknown',
+            'funds': len(codes),
+            'withHoldings': with_holdings,
+            'coveragePct': round(with_holdings / len(codes) * 100, 1) if codes else 0.0
+        })
+    coverage.sort(key=lambda c: (-c['funds'], c['amc']))
+    return coverage
+
+def compute_report(db=None):
+    """Health report from one pass over fund_holdings and one over funds"""
+    if db is None:
+        db = repository.get_db()
+    start = time.perf_counter()
+
+    facets = next(repository.fund_holdings(db).aggregate(HOLDINGS_FACET, allowDiskUse=True))
+    totals = facets['totals'][0] if facets['totals'] else {'holdings': 0, 'classified': 0, 'latestDate': None}
+    funds = facets['funds']
+    amc_groups = list(repository.funds(db).aggregate(AMC_GROUP))
+
+    latest = max((f['latestDate'] for f in funds if f.get('latestDate')), default=None)
+    coverage = amc_coverage(amc_groups, {f['_id'] for f in funds})
+    top_funds = sorted(funds, key=lambda f: (-f['count'], str(f['_id'])))[:TOP_FUNDS]
+
+    return {
+        'totalHoldings': totals['holdings'],
+        'classifiedHoldings': totals['classified'],
+        'fundsWithHoldings': len(funds),
+        'totalFunds': sum(c['funds'] for c in coverage),
+        'latestReportDate': totals['latestDate'],
+        'fundsOfFunds': repository.fund_lookthrough(db).estimated_document_count(),
+        'sectors': [{'sector': s['_id'], 'count': s['count']} for s in facets['sectors']],
+        'topFunds': [
+            {'schemeCode': f['_id'], 'fundName': f.get('fundName'), 'count': f['count'], 'latestDate': f.get('latestDate')}
+            for f in top_funds
+        ],
+        'staleness': staleness_histogram([f.get('latestDate') for f in funds], latest),
+        'coverageByAmc': coverage,
+        'generatedAt': datetime.now(),
+        'computeMs': round((time.perf_counter() - start) * 1000, 1)
+    }
+
+def refresh(db=None):
+    """Recompute the report and store it; returns it"""
+    if db is None:
+        db = repository.get_db()
+    report = compute_report(db)
+    repository.holdings_stats(db).replace_one({'_id': REPORT_ID}, dict(report, _id=REPORT_ID), upsert=True)
+    return report
+
+def load_report(db=None, compute_missing=True):
+    """Stored report (a single _id read), computed and stored first if there is none"""
+    if db is None:
+        db = repository.get_db()
+    report = repository.holdings_stats(db).find_one({'_id': REPORT_ID}, {'_id': 0})
+    if report is None and compute_missing:
+        report = refresh(db)
+    return report
+
+def print_report(report, sectors=5):
+    """Human-readable health report"""
+    total = report['totalHoldings']
+    print(f"\n📊 Holdings: {total} records, {report['fundsWithHoldings']}/{report['totalFunds']} funds with holdings")
+    if report['latestReportDate']:
+        print(f"   Latest report: {report['latestReportDate']:%Y-%m-%d}")
+    if report.get('fundsOfFunds'):
+        print(f"   Fund-of-funds resolved: {report['fundsOfFunds']}")
+
+    print(f"\n📊 Top {len(report['topFunds'])} Funds with Holdings:")
+    print("-" * 70)
+    for fund in report['topFunds']:
+        name = (fund['fundName'] or str(fund['schemeCode']))[:45]
+        date = fund['latestDate'].strftime('%Y-%m-%d') if fund['latestDate'] else 'N/A'
+        print(f"  {name:.<45} {fund['count']:>3} holdings ({date})")
+
+    print("\n📈 Sector Distribution:")
+    print(f"  Total unique sectors: {len(report['sectors'])}")
+    print(f"  Classified holdings: {report['classifiedHoldings']}/{total}")
+    if total:
+        print(f"  Coverage: {report['classifiedHoldings'] / total * 100:.1f}%")
+    if report['sectors']:
+        print(f"\n  Top {min(sectors, len(report['sectors']))} Sectors:")
+        for stat in report['sectors'][:sectors]:
+            print(f"    • {stat['sector']:.<30} {stat['count']:>5} securities")
+
+    print("\n🕰️  Staleness (months behind the newest report):")
+    for bucket in report['staleness']:
+        print(f"    {bucket['bucket']:>7}: {bucket['funds']} funds")
+
+    print("\n🏦 Coverage by AMC:")
+    for amc in report['coverageByAmc'][:10]:
+        print(f"    {amc['amc'][:40]:.<40} {amc['withHoldings']:>4}/{amc['funds']:<4} ({amc['coveragePct']:.1f}%)")
+
+    print(f"\n   Generated {report['generatedAt']:%Y-%m-%d %H:%M} in {report['computeMs']} ms")
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("🩺 Holdings Health Report")
+    print("=" * 70)
+
+    db = repository.get_db()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'show'
+
+    if command == 'show':
+        start = time.perf_counter()
+        report = load_report(db)
+        print(f"   Loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print_report(report)
+
+    elif command == 'refresh':
+        print_report(refresh(db))
+
+    else:
+        print("Usage: python holdings_stats.py [show|refresh]")
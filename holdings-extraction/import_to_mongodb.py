@@ -3,39 +3,122 @@ Import Holdings to MongoDB
 Load parsed holdings data into MongoDB
 """
 
-import json
 import os
-from pymongo import MongoClient, ASCENDING
+from pymongo import ASCENDING
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from similarity_index import update_index
+from holdings_history import append_snapshots, infer_report_date
+from holdings_records import HoldingsBatch
+import security_index
+import holdings_stats
+import instrumentation
+import repository
+import artifact_store
 
 PARSED_DIR = "parsed_holdings"
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
 
 def connect_to_mongodb():
-    """Connect to MongoDB"""
+    """Connect to MongoDB (shared pooled client)"""
     print("🔌 Connecting to MongoDB...")
-    client = MongoClient(MONGODB_URI)
-    db = client.get_database()
-    return db
+    return repository.get_db()
 
 def create_indexes(db):
     """Create indexes for efficient queries"""
     print("📇 Creating indexes...")
     
-    holdings = db['fund_holdings']
+    holdings = repository.fund_holdings(db)
     
     # Create indexes
     holdings.create_index([('schemeCode', ASCENDING)])
     holdings.create_index([('fundName', ASCENDING)])
     holdings.create_index([('reportDate', ASCENDING)])
     holdings.create_index([('schemeCode', ASCENDING), ('reportDate', ASCENDING)])
+    security_index.create_indexes(db)
     
     print("✅ Indexes created")
 
+def import_file(db, json_file):
+    """Import one parsed holdings file; returns its status ('imported', 'archived', 'skipped') and history snapshot"""
+    holdings_collection = repository.fund_holdings(db, bulk=True)
+    filepath = os.path.join(PARSED_DIR, json_file)
+    result = {'status': 'skipped', 'scheme_code': None, 'snapshot': None}
+    
+    try:
+        data = artifact_store.read_json(filepath)
+        
+        fund_name = data['fund_name']
+        holdings = HoldingsBatch.from_parsed(data)
+        
+        if not len(holdings):
+            print(f"⚠️  {fund_name[:50]} - No holdings data")
+            return result
+        
+        # Try to match with existing funds in database
+        fund = repository.funds(db).find_one({
+            '$or': [
+                {'schemeName': {'$regex': fund_name.split()[0], '$options': 'i'}},
+                {'name': {'$regex': fund_name.split()[0], '$options': 'i'}}
+            ]
+        })
+        
+        scheme_code = fund['schemeCode'] if fund and 'schemeCode' in fund else None
+        result['scheme_code'] = scheme_code
+        if not scheme_code:
+            instrumentation.count('import', 'funds_unmatched')
+        
+        # Disclosure month recorded by the parser (falls back to the filename)
+        if data.get('report_date'):
+            report_date = datetime.fromisoformat(data['report_date'])
+        else:
+            report_date = infer_report_date(data.get('filename'), json_file)
+        
+        # Every month goes to the history store; fund_holdings keeps only the latest month
+        result['snapshot'] = (scheme_code, report_date, holdings)
+        
+        if scheme_code and holdings_collection.find_one({'schemeCode': scheme_code, 'reportDate': {'$gt': report_date}}, {'_id': 1}):
+            print(f"🗂️  {fund_name[:50]} - {report_date:%Y-%m} archived (newer month in database)")
+            result['status'] = 'archived'
+            instrumentation.count('import', 'months_archived')
+            return result
+        
+        # Documents are generated per insert batch at the writer; per-fund fields are shared
+        fields = {
+            'schemeCode': scheme_code,
+            'fundName': fund_name,
+            'reportDate': report_date,
+            'importedAt': datetime.now(),
+            'source': 'AMFI_PDF'
+        }
+        
+        def replace_month(session):
+            """Swap the scheme's older rows for this month in one transaction where supported"""
+            if scheme_code:
+                deleted = holdings_collection.delete_many({
+                    'schemeCode': scheme_code,
+                    'reportDate': {'$lte': report_date}
+                }, session=session)
+                instrumentation.count('import', 'docs_deleted', deleted.deleted_count)
+            return repository.insert_batched(holdings_collection, holdings.documents(**fields), session=session)
+        
+        # Bulk insert
+        with instrumentation.span('import', 'insert_holdings'):
+            written = repository.run_in_transaction(replace_month)
+        if written:
+            instrumentation.count('import', 'docs_written', written)
+            print(f"✅ {fund_name[:50]} - {written} holdings")
+            result['status'] = 'imported'
+            if scheme_code:
+                with instrumentation.span('import', 'security_index'):
+                    security_index.update_fund_postings(db, scheme_code, holdings, report_date)
+        
+    except Exception as e:
+        print(f"❌ {json_file[:50]} - Error: {str(e)[:50]}")
+        result['status'] = 'skipped'
+    
+    return result
+
+@instrumentation.stage('import')
 def import_holdings(db):
     """Import all parsed holdings to MongoDB"""
     
@@ -43,83 +126,49 @@ def import_holdings(db):
         print(f"❌ Directory not found: {PARSED_DIR}")
         return
     
-    holdings_collection = db['fund_holdings']
-    
     # Read all JSON files
-    json_files = [f for f in os.listdir(PARSED_DIR) if f.endswith('.json') and not f.startswith('_')]
+    json_files = artifact_store.list_artifacts(PARSED_DIR, '.json')
     
     print(f"\n📥 Importing {len(json_files)} funds to MongoDB...")
     print("=" * 70)
     
     imported_count = 0
     skipped_count = 0
+    imported_codes = set()
+    snapshots = []
     
     for json_file in json_files:
-        filepath = os.path.join(PARSED_DIR, json_file)
+        with instrumentation.item('import', json_file) as fields:
+            result = import_file(db, json_file)
+            fields['status'] = result['status']
         
-        try:
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            
-            fund_name = data['fund_name']
-            holdings = data['holdings']
-            
-            if not holdings:
-                print(f"⚠️  {fund_name[:50]} - No holdings data")
-                skipped_count += 1
-                continue
-            
-            # Try to match with existing funds in database
-            fund = db['funds'].find_one({
-                '$or': [
-                    {'schemeName': {'$regex': fund_name.split()[0], '$options': 'i'}},
-                    {'name': {'$regex': fund_name.split()[0], '$options': 'i'}}
-                ]
-            })
-            
-            scheme_code = fund['schemeCode'] if fund and 'schemeCode' in fund else None
-            
-            # Prepare holdings documents
-            report_date = datetime.now().replace(day=1)  # First day of current month
-            
-            # Clear existing holdings for this fund and date
-            if scheme_code:
-                holdings_collection.delete_many({
-                    'schemeCode': scheme_code,
-                    'reportDate': report_date
-                })
-            
-            holdings_docs = []
-            for holding in holdings:
-                doc = {
-                    'schemeCode': scheme_code,
-                    'fundName': fund_name,
-                    'security': holding.get('security'),
-                    'weight': holding.get('weight'),
-                    'marketValue': holding.get('market_value'),
-                    'reportDate': report_date,
-                    'importedAt': datetime.now(),
-                    'source': 'AMFI_PDF'
-                }
-                holdings_docs.append(doc)
-            
-            # Bulk insert
-            if holdings_docs:
-                holdings_collection.insert_many(holdings_docs)
-                print(f"✅ {fund_name[:50]} - {len(holdings_docs)} holdings")
-                imported_count += 1
-            
-        except Exception as e:
-            print(f"❌ {json_file[:50]} - Error: {str(e)[:50]}")
+        if result['snapshot']:
+            snapshots.append(result['snapshot'])
+        if result['status'] == 'imported':
+            imported_count += 1
+            if result['scheme_code']:
+                imported_codes.add(result['scheme_code'])
+        elif result['status'] == 'skipped':
             skipped_count += 1
     
     print("\n" + "=" * 70)
     print(f"✅ Imported: {imported_count} funds")
     print(f"⚠️  Skipped: {skipped_count} funds")
     
-    # Show collection stats
-    total_holdings = holdings_collection.count_documents({})
-    print(f"📊 Total holdings in database: {total_holdings}")
+    # Refresh the stored health report (one $facet pass) and show collection stats
+    with instrumentation.span('import', 'holdings_stats'):
+        report = holdings_stats.refresh(db)
+    print(f"📊 Total holdings in database: {report['totalHoldings']}")
+    
+    with instrumentation.span('import', 'history_store'):
+        archived = append_snapshots(snapshots)
+    print(f"🗂️  History store: {archived} rows appended")
+    
+    # Refresh similar-fund index for the funds whose holdings changed
+    if imported_codes:
+        with instrumentation.span('import', 'similarity_index'):
+            index, changed = update_index(db, imported_codes)
+        print(f"🔗 Similarity index: {changed} funds updated ({len(index['signatures'])} indexed)")
 
 if __name__ == "__main__":
     print("=" * 70)
@@ -131,3 +180,4 @@ if __name__ == "__main__":
     import_holdings(db)
     
     print("\n✅ Import complete!")
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,342 @@
+"""
+Pipeline Instrumentation
+Per-stage and per-item timers and counters shared by the pipeline scripts.
+Emits structured JSON-lines logs and a Prometheus textfile (node_exporter textfile
+collector format), and optionally profiles the slowest items with cProfile or tracemalloc.
+
+Environment:
+  HOLDINGS_RUN_ID       groups the logs of separately started scripts under one run
+  HOLDINGS_LOG_FILE     JSON-lines log (default logs/pipeline.jsonl, 'off' to disable)
+  HOLDINGS_METRICS_DIR  Prometheus textfile directory (default metrics)
+  HOLDINGS_PROFILE      'cprofile' or 'tracemalloc' to capture the slowest items (default off)
+  HOLDINGS_PROFILE_TOP  how many slowest items per stage to keep profiles for (default 5)
+  HOLDINGS_ITEM_SAMPLE  per-stage reservoir of item durations used for quantiles (default 1024);
+                        counts and sums stay exact, so long-running services use bounded memory
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import heapq
+import random
+import itertools
+import contextlib
+from datetime import datetime
+
+LOG_FILE = os.getenv('HOLDINGS_LOG_FILE', os.path.join('logs', 'pipeline.jsonl'))
+METRICS_DIR = os.getenv('HOLDINGS_METRICS_DIR', 'metrics')
+PROFILE_MODE = os.getenv('HOLDINGS_PROFILE', '').lower()
+PROFILE_TOP = int(os.getenv('HOLDINGS_PROFILE_TOP', '5'))
+ITEM_SAMPLE = int(os.getenv('HOLDINGS_ITEM_SAMPLE', '1024'))
+QUANTILES = [0.5, 0.9, 0.99]
+METRIC_PREFIX = 'holdings'
+
+_state = {
+    'run_id': os.getenv('HOLDINGS_RUN_ID') or datetime.now().strftime('%Y%m%d-%H%M%S'),
+    'component': os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python',
+    'started': time.time(),
+    'stages': {},
+    'log': None
+}
+_sequence = itertools.count()
+_sampler = random.Random(0)
+
+def configure(component=None, run_id=None):
+    """Override the component name (defaults to the script name) or run id"""
+    if component:
+        _state['component'] = component
+    if run_id:
+        _state['run_id'] = run_id
+
+def run_id():
+    """Identifier of the current run"""
+    return _state['run_id']
+
+def _stage(name):
+    """Metrics record for a stage, created on first use"""
+    if name not in _state['stages']:
+        _state['stages'][name] = {
+            'seconds': 0.0,
+            'runs': 0,
+            'items': 0,
+            'item_total': 0.0,
+            'item_sample': [],   # uniform reservoir of at most ITEM_SAMPLE durations
+            'failed_items': 0,
+            'counters': {},
+            'gauges': {},
+            'spans': {},
+            'slowest': []   # min-heap of (seconds, seq, key, profile)
+        }
+    return _state['stages'][name]
+
+def log_event(event, **fields):
+    """Append one structured JSON line to the pipeline log"""
+    if LOG_FILE == 'off':
+        return
+    if _state['log'] is None:
+        directory = os.path.dirname(LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _state['log'] = open(LOG_FILE, 'a', buffering=1)
+
+    record = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'run': _state['run_id'],
+        'component': _state['component'],
+        'event': event
+    }
+    record.update(fields)
+    _state['log'].write(json.dumps(record, default=str) + '\n')
+
+def count(stage_name, name, value=1):
+    """Add to a per-stage counter (bytes_downloaded, rows_cleaned, docs_written, cache_hits, ...)"""
+    counters = _stage(stage_name)['counters']
+    counters[name] = counters.get(name, 0) + value
+
+def gauge(stage_name, name, value):
+    """Set a per-stage point-in-time value (queue depth, lag) that long-running services update"""
+    _stage(stage_name)['gauges'][name] = value
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a whole stage"""
+    record = _stage(name)
+    log_event('stage_start', stage=name)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        record['seconds'] += seconds
+        record['runs'] += 1
+        log_event('stage_end', stage=name, seconds=round(seconds, 4),
+                  items=record['items'], counters=record['counters'])
+
+def observe(stage_name, name, seconds):
+    """Record a sub-step duration measured elsewhere"""
+    spans = _stage(stage_name)['spans']
+    total = spans.setdefault(name, {'count': 0, 'seconds': 0.0, 'max': 0.0})
+    total['count'] += 1
+    total['seconds'] += seconds
+    total['max'] = max(total['max'], seconds)
+
+@contextlib.contextmanager
+def span(stage_name, name):
+    """Time a sub-step of a stage (e.g. one extraction engine, one bulk write)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, name, time.perf_counter() - start)
+
+def _start_profile():
+    """Begin capturing one item when HOLDINGS_PROFILE is set"""
+    if PROFILE_MODE == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if PROFILE_MODE == 'tracemalloc':
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        return tracemalloc.take_snapshot()
+    return None
+
+def _stop_profile(handle):
+    """Finish capturing: a cProfile.Profile, or the top allocation diffs as text"""
+    if handle is None:
+        return None
+    if PROFILE_MODE == 'cprofile':
+        handle.disable()
+        return handle
+    import tracemalloc
+    diff = tracemalloc.take_snapshot().compare_to(handle, 'lineno')
+    return '\n'.join(str(entry) for entry in diff[:25])
+
+@contextlib.contextmanager
+def item(stage_name, key):
+    """Time one work item (a PDF, a parsed file, a download); fields set on the yielded dict are logged"""
+    record = _stage(stage_name)
+    fields = {}
+    handle = _start_profile()
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield fields
+    except Exception:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        profile = _stop_profile(handle)
+        _record_item(record, seconds)
+        if failed or fields.get('status') in ('failed', 'skipped'):
+            record['failed_items'] += 1
+
+        # Keep only the slowest PROFILE_TOP items (and their profiles)
+        entry = (seconds, next(_sequence), str(key), profile)
+        if len(record['slowest']) < PROFILE_TOP:
+            heapq.heappush(record['slowest'], entry)
+        elif seconds > record['slowest'][0][0]:
+            heapq.heapreplace(record['slowest'], entry)
+
+        log_event('item', stage=stage_name, key=str(key), seconds=round(seconds, 4), failed=failed, **fields)
+
+def _record_item(record, seconds):
+    """Count an item duration exactly and keep it in the stage's reservoir sample (Algorithm R)"""
+    record['items'] += 1
+    record['item_total'] += seconds
+    sample = record['item_sample']
+    if len(sample) < ITEM_SAMPLE:
+        sample.append(seconds)
+    else:
+        slot = _sampler.randrange(record['items'])
+        if slot < ITEM_SAMPLE:
+            sample[slot] = seconds
+
+def quantile(values, q):
+    """Nearest-rank quantile of a list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+def summary():
+    """JSON-friendly metrics of everything recorded so far"""
+    stages = {}
+    for name, record in _state['stages'].items():
+        sample = record['item_sample']
+        stages[name] = {
+            'seconds': round(record['seconds'], 4),
+            'items': record['items'],
+            'failedItems': record['failed_items'],
+            'itemSeconds': {f"p{int(q * 100)}": round(quantile(sample, q), 4) for q in QUANTILES} if sample else None,
+            'counters': dict(record['counters']),
+            'gauges': dict(record['gauges']),
+            'spans': {k: dict(v, seconds=round(v['seconds'], 4), max=round(v['max'], 4)) for k, v in record['spans'].items()},
+            'slowest': [{'key': key, 'seconds': round(seconds, 4)} for seconds, _, key, _ in sorted(record['slowest'], reverse=True)]
+        }
+    return {'run': _state['run_id'], 'component': _state['component'], 'stages': stages}
+
+def _labels(**labels):
+    """Prometheus label set"""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+def _metric_name(name):
+    """Counter name -> valid Prometheus metric name"""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name).lower()
+
+def prometheus_text():
+    """Metrics in the Prometheus text exposition format"""
+    component = _state['component']
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{METRIC_PREFIX}_{name}{suffix}{_labels(**labels)} {value}")
+
+    stages = _state['stages']
+    metric('stage_duration_seconds', 'gauge', 'Wall time of each stage in the last run',
+           [('', {'component': component, 'stage': s}, round(r['seconds'], 6)) for s, r in stages.items()])
+
+    item_samples = []
+    for s, r in stages.items():
+        if not r['items']:
+            continue
+        for q in QUANTILES:
+            item_samples.append(('', {'component': component, 'stage': s, 'quantile': q}, round(quantile(r['item_sample'], q), 6)))
+        item_samples.append(('_sum', {'component': component, 'stage': s}, round(r['item_total'], 6)))
+        item_samples.append(('_count', {'component': component, 'stage': s}, r['items']))
+    metric('item_duration_seconds', 'summary', 'Per-item processing time in the last run', item_samples)
+
+    metric('item_failures', 'gauge', 'Items that failed or were skipped in the last run',
+           [('', {'component': component, 'stage': s}, r['failed_items']) for s, r in stages.items()])
+
+    span_samples = []
+    for s, r in stages.items():
+        for span_name, totals in r['spans'].items():
+            labels = {'component': component, 'stage': s, 'span': span_name}
+            span_samples.append(('_sum', labels, round(totals['seconds'], 6)))
+            span_samples.append(('_count', labels, totals['count']))
+    metric('span_duration_seconds', 'summary', 'Time spent in sub-steps of each stage', span_samples)
+
+    counter_samples = [
+        ('', {'component': component, 'stage': s, 'counter': _metric_name(c)}, value)
+        for s, r in stages.items() for c, value in sorted(r['counters'].items())
+    ]
+    metric('stage_counter', 'gauge', 'Per-stage counters of the last run (bytes, pages, rows, documents, cache hits)', counter_samples)
+
+    gauge_samples = [
+        ('', {'component': component, 'stage': s, 'gauge': _metric_name(g)}, value)
+        for s, r in stages.items() for g, value in sorted(r['gauges'].items())
+    ]
+    metric('stage_gauge', 'gauge', 'Current values reported by long-running stages (queue depth, freshness lag)', gauge_samples)
+
+    metric('last_run_timestamp_seconds', 'gauge', 'When the component last finished',
+           [('', {'component': component}, round(time.time(), 3))])
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(directory=None):
+    """Atomically write <component>.prom for the node_exporter textfile collector"""
+    directory = directory or METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{METRIC_PREFIX}_{_metric_name(_state['component'])}.prom")
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(temp_path, path)
+    return path
+
+def write_profiles(directory=None):
+    """Dump the captured profiles of the slowest items; returns the written paths"""
+    if not PROFILE_MODE:
+        return []
+    directory = os.path.join(directory or METRICS_DIR, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for stage_name, record in _state['stages'].items():
+        for rank, (seconds, _, key, profile) in enumerate(sorted(record['slowest'], reverse=True), 1):
+            if profile is None:
+                continue
+            base = os.path.join(directory, f"{_state['component']}-{stage_name}-{rank:02d}-{_metric_name(key)[:60]}")
+            if PROFILE_MODE == 'cprofile':
+                path = base + '.prof'
+                profile.dump_stats(path)
+            else:
+                path = base + '.txt'
+                with open(path, 'w') as f:
+                    f.write(f"# {key}: {seconds:.3f}s\n{profile}\n")
+            paths.append(path)
+    return paths
+
+def finish():
+    """Flush metrics at the end of a script: Prometheus textfile, profiles and a run summary log line"""
+    report = summary()
+    report['metricsFile'] = write_prometheus()
+    report['profiles'] = write_profiles()
+    log_event('run_summary', seconds=round(time.time() - _state['started'], 3), stages=report['stages'], profiles=report['profiles'])
+    if _state['log'] is not None:
+        _state['log'].close()
+        _state['log'] = None
+    return report
+
+def print_summary(report=None):
+    """Short per-stage timing table for the console"""
+    report = report or summary()
+    print("\n⏱️  Stage timings:")
+    for name, stats in report['stages'].items():
+        p90 = stats['itemSeconds']['p90'] if stats['itemSeconds'] else 0
+        slowest = stats['slowest'][0]['key'][:30] if stats['slowest'] else '-'
+        print(f"  {name:.<20} {stats['seconds']:>8.2f}s  {stats['items']:>5} items  p90 {p90:.2f}s  slowest: {slowest}")
+        for span_name, totals in stats['spans'].items():
+            print(f"    {span_name:.<18} {totals['seconds']:>8.2f}s  ({totals['count']}x)")
+    if report.get('profiles'):
+        print(f"  🔬 {len(report['profiles'])} profiles in {os.path.dirname(report['profiles'][0])}")
@@ -0,0 +1,293 @@
+"""
+Fund-of-Funds Look-Through
+Fund-of-funds and multi-asset schemes disclose units of other mutual fund schemes as
+"securities" (classified 'Others'). This stage recognizes those units, recursively expands
+each into the underlying scheme's latest holdings scaled by the unit weight, and writes the
+resulting security-level portfolio per fund.
+
+Expansions are memoized per (scheme, report month), so a scheme held by many FoFs is expanded
+once and every fund resolves in a single pass over fund_holdings. Units that point back into
+the scheme being expanded (A -> B -> A) are cycles: they are kept as unresolved units instead of
+being expanded again. An expansion that cut a cycle at one of its callers depends on the path
+it was reached by, so it is not memoized, and a memoized expansion is only reused when none of
+the schemes it covers is on the current path; every fund's result is then the same whatever
+order the funds are resolved in.
+
+Collection `fund_lookthrough` (only funds holding other schemes):
+    {
+      _id: 100027,                                    # schemeCode
+      fundName, reportDate,
+      holdings: [{security, weight, sector, via}],    # via: underlying schemeCodes it came through
+      inputs: {'100027': {month: 202601, rows: 'e3b0c44298fc1c14'}, ...},  # every scheme used
+      unresolvedWeight: 4.2,                          # known scheme units kept as-is (no holdings, cycle)
+      cycles: [[100027, 118989]],
+      resolvedAt: Date
+    }
+A fund is rewritten only when its inputs change: the report month or the content fingerprint of
+its own rows or any underlying's rows (so same-month re-imports and corrections are picked up).
+
+Usage:
+  python look_through.py [resolve]        # resolve every FoF (runs after import/classify)
+  python look_through.py show 100027      # expanded top holdings of one fund
+"""
+
+import hashlib
+import json
+import re
+import sys
+from datetime import datetime
+from pymongo import ReplaceOne
+
+from securities import normalize_security, scheme_base_name
+import holdings_stats
+import instrumentation
+import repository
+
+# Security names that can be mutual fund units (others never need a scheme lookup)
+UNIT_RE = re.compile(r'\b(fund|funds|fof|etf|units?|scheme)\b', re.IGNORECASE)
+UNIT_PREFIX_RE = re.compile(r'^\s*(mutual fund units? of|units? of|investment in)\s+', re.IGNORECASE)
+TOP_HOLDINGS = 10
+
+def month_key(date):
+    """yyyymm integer for a report date"""
+    return date.year * 100 + date.month if date else 0
+
+def rows_fingerprint(rows):
+    """Order-independent content hash of a scheme's rows (security, weight, sector)"""
+    digest = hashlib.sha256()
+    for line in sorted(json.dumps([row.get('security'), row.get('weight'), row.get('sector')], default=str)
+                       for row in rows):
+        digest.update(line.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def unit_scheme_key(security_name):
+    """Scheme base name for a security that looks like mutual fund units, else None"""
+    if not security_name or not UNIT_RE.search(security_name):
+        return None
+    return scheme_base_name(UNIT_PREFIX_RE.sub('', str(security_name)))
+
+def load_portfolios(db):
+    """{schemeCode: {fundName, reportDate, rows}} for each scheme's latest month, in one scan"""
+    portfolios = {}
+    cursor = repository.fund_holdings(db).find(
+        {'schemeCode': {'$ne': None}},
+        {'_id': 0, 'schemeCode': 1, 'fundName': 1, 'security': 1, 'weight': 1, 'sector': 1, 'reportDate': 1},
+        batch_size=10000
+    )
+    for doc in cursor:
+        code = doc['schemeCode']
+        portfolio = portfolios.get(code)
+        report_date = doc.get('reportDate')
+        if portfolio is None or month_key(report_date) > month_key(portfolio['reportDate']):
+            portfolio = portfolios[code] = {'fundName': doc.get('fundName'), 'reportDate': report_date, 'rows': []}
+        elif month_key(report_date) < month_key(portfolio['reportDate']):
+            continue
+        portfolio['rows'].append(doc)
+    return portfolios
+
+def scheme_name_index(db, portfolios):
+    """{scheme base name: schemeCode}; variants share a key, the one with holdings wins"""
+    index = {}
+    names = [(code, p['fundName']) for code, p in portfolios.items()]
+    names += [(f['schemeCode'], f.get('schemeName') or f.get('name'))
+              for f in repository.funds(db).find({}, {'_id': 0, 'schemeCode': 1, 'schemeName': 1, 'name': 1})]
+    for code, name in names:
+        key = scheme_base_name(name)
+        if key and (key not in index or (index[key] not in portfolios and code in portfolios)):
+            index[key] = code
+    return index
+
+class Resolver:
+    """Memoized depth-first expansion of scheme units into underlying securities"""
+
+    def __init__(self, portfolios, name_index):
+        self.portfolios = portfolios
+        self.name_index = name_index
+        self.memo = {}
+        self.stats = {'expanded': 0, 'memo_hits': 0, 'cycles': 0}
+
+    def underlying(self, security_name, code):
+        """schemeCode a holding's units belong to (None for ordinary securities)"""
+        key = unit_scheme_key(security_name)
+        target = self.name_index.get(key) if key else None
+        return target if target is not None and (target in self.portfolios or target == code) else None
+
+    def input_stamp(self, code):
+        """{'month', 'rows'} identifying the portfolio version a scheme was expanded from"""
+        portfolio = self.portfolios[code]
+        if 'fingerprint' not in portfolio:
+            portfolio['fingerprint'] = rows_fingerprint(portfolio['rows'])
+        return {'month': month_key(portfolio['reportDate']), 'rows': portfolio['fingerprint']}
+
+    def expand(self, code, path=()):
+        """Look-through of one scheme:
+        {'positions': {key: [weight, security, sector, via]}, 'inputs': {code: {month, rows}},
+         'unresolved', 'cycles', 'open': callers a cycle was cut at}"""
+        portfolio = self.portfolios[code]
+        memo_key = (code, month_key(portfolio['reportDate']))
+        cached = self.memo.get(memo_key)
+        # Reusable only when the current path crosses none of the schemes it expanded
+        if cached is not None and not any(c in cached['inputs'] for c in path):
+            self.stats['memo_hits'] += 1
+            return cached
+
+        path = path + (code,)
+        positions = {}
+        inputs = {code: self.input_stamp(code)}
+        unresolved = 0.0
+        cycles = []
+        open_cuts = set()
+
+        def add(key, weight, security, sector, via):
+            position = positions.get(key)
+            if position is None:
+                positions[key] = [weight, security, sector, set(via)]
+            else:
+                position[0] += weight
+                position[3].update(via)
+
+        for row in portfolio['rows']:
+            security = row.get('security')
+            weight = row.get('weight')
+            weight = 0.0 if weight is None or weight != weight else float(weight)
+            target = self.underlying(security, code)
+
+            if target is not None and target in path:
+                cycles.append(list(path[path.index(target):]) + [target])
+                self.stats['cycles'] += 1
+                if target != code:
+                    open_cuts.add(target)
+                target = None
+            if target is None:
+                if unit_scheme_key(security) and self.name_index.get(unit_scheme_key(security)) is not None:
+                    unresolved += weight
+                add(normalize_security(security) or security, weight, security, row.get('sector'), ())
+                continue
+
+            child = self.expand(target, path)
+            scale = weight / 100.0
+            for key, (child_weight, child_security, sector, via) in child['positions'].items():
+                add(key, child_weight * scale, child_security, sector, via | {target})
+            inputs.update(child['inputs'])
+            unresolved += child['unresolved'] * scale
+            cycles.extend(child['cycles'])
+            open_cuts.update(child['open'] - {code})
+
+        self.stats['expanded'] += 1
+        result = {'positions': positions, 'inputs': inputs, 'unresolved': unresolved, 'cycles': cycles,
+                  'open': open_cuts}
+        # Cut at a caller: the expansion depends on the path it was reached by
+        if not open_cuts:
+            self.memo[memo_key] = result
+        return result
+
+    def is_fund_of_funds(self, code):
+        """True when any of the scheme's holdings are units of another known scheme"""
+        return any(self.underlying(row.get('security'), code) not in (None, code)
+                   for row in self.portfolios[code]['rows'])
+
+def lookthrough_document(code, portfolio, result, now):
+    """fund_lookthrough document for one resolved fund"""
+    holdings = [
+        {'security': security, 'weight': round(weight, 6), 'sector': sector, 'via': sorted(via)}
+        for weight, security, sector, via in result['positions'].values()
+    ]
+    holdings.sort(key=lambda h: h['weight'], reverse=True)
+    return {
+        '_id': code,
+        'fundName': portfolio['fundName'],
+        'reportDate': portfolio['reportDate'],
+        'holdings': holdings,
+        'inputs': {str(c): m for c, m in sorted(result['inputs'].items(), key=lambda item: str(item[0]))},
+        'unresolvedWeight': round(result['unresolved'], 6),
+        'cycles': result['cycles'],
+        'resolvedAt': now
+    }
+
+@instrumentation.stage('lookthrough')
+def resolve_all(db=None, force=False):
+    """Expand every fund-of-funds; rewrites only funds whose inputs changed. Returns counts."""
+    if db is None:
+        db = repository.get_db()
+    collection = repository.fund_lookthrough(db, bulk=True)
+
+    print("🔍 Resolving fund-of-funds look-through...")
+    with instrumentation.span('lookthrough', 'load'):
+        portfolios = load_portfolios(db)
+        resolver = Resolver(portfolios, scheme_name_index(db, portfolios))
+
+    previous = {doc['_id']: doc.get('inputs') for doc in collection.find({}, {'inputs': 1})}
+    now = datetime.now()
+    operations = []
+    funds_of_funds = set()
+
+    with instrumentation.span('lookthrough', 'expand'):
+        for code in portfolios:
+            if not resolver.is_fund_of_funds(code):
+                continue
+            funds_of_funds.add(code)
+            result = resolver.expand(code)
+            doc = lookthrough_document(code, portfolios[code], result, now)
+            if force or previous.get(code) != doc['inputs']:
+                operations.append(ReplaceOne({'_id': code}, doc, upsert=True))
+
+    with instrumentation.span('lookthrough', 'write'):
+        if operations:
+            repository.bulk_write_batched(collection, operations)
+        stale = [code for code in previous if code not in funds_of_funds]
+        if stale:
+            collection.delete_many({'_id': {'$in': stale}})
+
+    if operations or stale:
+        with instrumentation.span('lookthrough', 'holdings_stats'):
+            holdings_stats.refresh(db)
+
+    counts = {
+        'funds_of_funds': len(funds_of_funds),
+        'written': len(operations),
+        'removed': len(stale),
+        'expanded': resolver.stats['expanded'],
+        'memo_hits': resolver.stats['memo_hits'],
+        'cycles': resolver.stats['cycles']
+    }
+    for name in ('written', 'removed', 'expanded', 'memo_hits', 'cycles'):
+        instrumentation.count('lookthrough', name, counts[name])
+
+    print(f"✅ {counts['funds_of_funds']} fund-of-funds resolved ({counts['written']} updated, "
+          f"{counts['expanded']} schemes expanded, {counts['memo_hits']} memo hits)")
+    if counts['cycles']:
+        print(f"⚠️  {counts['cycles']} holding cycle(s) left as unresolved units")
+    return counts
+
+def lookthrough_holdings(db, scheme_code, limit=TOP_HOLDINGS):
+    """Expanded top holdings of a fund (its own holdings when it holds no other schemes)"""
+    doc = repository.fund_lookthrough(db).find_one({'_id': scheme_code}, {'holdings': {'$slice': limit}})
+    if doc:
+        return doc['holdings']
+    cursor = repository.fund_holdings(db).find(
+        {'schemeCode': scheme_code}, {'_id': 0, 'security': 1, 'weight': 1, 'sector': 1}
+    ).sort('weight', -1).limit(limit)
+    return list(cursor)
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("🔍 Fund-of-Funds Look-Through")
+    print("=" * 70)
+
+    db = repository.get_db()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'resolve'
+
+    if command == 'resolve':
+        resolve_all(db, force='--force' in sys.argv)
+
+    elif command == 'show' and len(sys.argv) > 2:
+        code = sys.argv[2]
+        code = int(code) if code.isdigit() else code
+        for holding in lookthrough_holdings(db, code):
+            via = f"  via {', '.join(str(c) for c in holding.get('via') or [])}" if holding.get('via') else ''
+            print(f"  {holding['weight'] or 0:>7.2f}%  {str(holding['security'])[:50]:<50}{via}")
+
+    else:
+        print("Usage: python look_through.py [resolve [--force]|show <schemeCode>]")
+
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,179 @@
+"""
+Native PDF Table Extraction
+JVM-free alternative to tabula: reads the text layer with word coordinates (pdfplumber)
+and rebuilds holdings tables by clustering column positions.
+
+Produces the same list-of-DataFrames shape as tabula.read_pdf(..., pandas_options={'header': 0}),
+so parse_holdings.extract_holdings works unchanged on either engine.
+"""
+
+import re
+import pandas as pd
+import pdfplumber
+
+LINE_TOLERANCE = 3          # words within 3pt vertically share a line
+CELL_GAP_FACTOR = 1.5       # gap wider than 1.5 x median char width starts a new cell
+MAX_HEADER_LINES = 3        # wrapped headers span up to 3 lines
+MIN_DATA_COLUMNS = 3
+
+_NUMERIC_RE = re.compile(r'^\(?-?[\d,]*\.?\d+%?\)?$')
+
+def is_numeric(text):
+    """True for cells like '1,234.56', '9.42%', '(0.12)'"""
+    return bool(_NUMERIC_RE.match(text.replace('₹', '').replace(' ', '')))
+
+def group_lines(words):
+    """Group words into lines by their top coordinate"""
+    lines = []
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        if lines and abs(word['top'] - lines[-1]['top']) <= LINE_TOLERANCE:
+            lines[-1]['words'].append(word)
+            lines[-1]['bottom'] = max(lines[-1]['bottom'], word['bottom'])
+        else:
+            lines.append({'top': word['top'], 'bottom': word['bottom'], 'words': [word]})
+    for line in lines:
+        line['words'].sort(key=lambda w: w['x0'])
+    return lines
+
+def split_cells(line, char_width):
+    """Merge adjacent words of a line into cells separated by wide gaps"""
+    cells = []
+    for word in line['words']:
+        if cells and word['x0'] - cells[-1]['x1'] <= CELL_GAP_FACTOR * char_width:
+            cells[-1]['text'] += ' ' + word['text']
+            cells[-1]['x1'] = word['x1']
+        else:
+            cells.append({'text': word['text'], 'x0': word['x0'], 'x1': word['x1']})
+    return cells
+
+def is_data_line(cells):
+    """Holdings rows have a text cell followed by at least one numeric cell"""
+    return len(cells) >= MIN_DATA_COLUMNS and not is_numeric(cells[0]['text']) and is_numeric(cells[-1]['text'])
+
+def cluster_columns(data_rows):
+    """Union the x-extents of data cells into column intervals"""
+    intervals = sorted((c['x0'], c['x1']) for cells in data_rows for c in cells)
+    columns = []
+    for x0, x1 in intervals:
+        if columns and x0 <= columns[-1][1]:
+            columns[-1][1] = max(columns[-1][1], x1)
+        else:
+            columns.append([x0, x1])
+    return columns
+
+def column_of(cell, columns):
+    """Index of the column interval a cell overlaps most (or is nearest to)"""
+    best, best_score = 0, None
+    for i, (x0, x1) in enumerate(columns):
+        overlap = min(cell['x1'], x1) - max(cell['x0'], x0)
+        distance = 0 if overlap > 0 else min(abs(cell['x0'] - x1), abs(cell['x1'] - x0))
+        score = (-overlap, distance) if overlap > 0 else (0, distance)
+        if best_score is None or score < best_score:
+            best, best_score = i, score
+    return best
+
+def page_table(page, previous_header=None):
+    """Rebuild the holdings table of one page as a DataFrame (or None)"""
+    words = page.extract_words(keep_blank_chars=False, use_text_flow=False)
+    if not words:
+        return None, previous_header
+
+    char_width = sorted((w['x1'] - w['x0']) / max(len(w['text']), 1) for w in words)[len(words) // 2]
+    lines = group_lines(words)
+    cells_by_line = [split_cells(line, char_width) for line in lines]
+    data_idx = [i for i, cells in enumerate(cells_by_line) if is_data_line(cells)]
+    if not data_idx:
+        return None, previous_header
+
+    columns = cluster_columns([cells_by_line[i] for i in data_idx])
+    if len(columns) < MIN_DATA_COLUMNS:
+        return None, previous_header
+
+    # Header: up to MAX_HEADER_LINES tightly stacked lines directly above the first data row
+    first = data_idx[0]
+    header_lines = []
+    below = lines[first]
+    for i in range(first - 1, max(-1, first - 1 - MAX_HEADER_LINES), -1):
+        line_height = lines[i]['bottom'] - lines[i]['top']
+        if below['top'] - lines[i]['bottom'] > line_height:
+            break
+        header_lines.insert(0, i)
+        below = lines[i]
+
+    header_parts = [[] for _ in columns]
+    for i in header_lines:
+        for cell in cells_by_line[i]:
+            # Titles spanning several columns are not headers
+            spanned = sum(1 for x0, x1 in columns if cell['x0'] < x1 and cell['x1'] > x0)
+            if spanned <= 1:
+                header_parts[column_of(cell, columns)].append(cell['text'])
+    header = [' '.join(parts) if parts else f"Unnamed: {i}" for i, parts in enumerate(header_parts)]
+
+    # Headerless continuation page: reuse the previous page's header
+    if all(h.startswith('Unnamed:') for h in header[1:]) and previous_header and len(previous_header) == len(columns):
+        header = previous_header
+
+    rows = []
+    last_data_line = None
+    for i in range(first, len(lines)):
+        cells = cells_by_line[i]
+        if is_data_line(cells):
+            row = [''] * len(columns)
+            for cell in cells:
+                col = column_of(cell, columns)
+                row[col] = (row[col] + ' ' + cell['text']).strip()
+            rows.append(row)
+            last_data_line = lines[i]
+        elif rows and last_data_line is not None and len(cells) == 1 and column_of(cells[0], columns) == 0:
+            # Wrapped security name: a lone first-column fragment right below its row
+            line_height = last_data_line['bottom'] - last_data_line['top']
+            if lines[i]['top'] - last_data_line['bottom'] <= line_height:
+                rows[-1][0] = rows[-1][0] + ' ' + cells[0]['text']
+                last_data_line = lines[i]
+
+    if not rows:
+        return None, previous_header
+
+    # Deduplicate header names the way pandas does ('X', 'X.1')
+    seen = {}
+    unique_header = []
+    for name in header:
+        count = seen.get(name, 0)
+        unique_header.append(name if count == 0 else f"{name}.{count}")
+        seen[name] = count + 1
+
+    return pd.DataFrame(rows, columns=unique_header), header
+
+def page_indexes(pages, count):
+    """0-based page indexes for a tabula-style pages setting ('all', 3, '1,3', '2-4', [1, 2])"""
+    if pages == 'all' or pages is None:
+        return list(range(count))
+    parts = pages if isinstance(pages, (list, tuple)) else str(pages).split(',')
+    indexes = []
+    for part in parts:
+        first, _, last = str(part).strip().partition('-')
+        indexes.extend(range(int(first) - 1, int(last or first)))
+    return [i for i in indexes if 0 <= i < count]
+
+def read_pdf(pdf_path, pages='all', area=None):
+    """Extract holdings tables from a PDF; returns (list of DataFrames, page count)"""
+    tables = []
+    header = None
+    with pdfplumber.open(pdf_path) as pdf:
+        page_numbers = page_indexes(pages, len(pdf.pages))
+        for number in page_numbers:
+            page = pdf.pages[number]
+            if area:
+                # tabula-style area: [top, left, bottom, right] in points
+                page = page.crop((area[1], area[0], area[3], area[2]))
+            table, header = page_table(page, header)
+            if table is not None:
+                tables.append(table)
+        return tables, len(page_numbers)
+
+def first_page_text(pdf_path):
+    """Plain text of the first page (for profile fingerprinting)"""
+    with pdfplumber.open(pdf_path) as pdf:
+        if not pdf.pages:
+            return ''
+        return pdf.pages[0].extract_text() or ''
@@ -3,16 +3,28 @@ Portfolio PDF Parser
 Extract holdings data from portfolio disclosure PDFs
 """
 
-import tabula
 import pandas as pd
 import os
 import json
 from datetime import datetime
 import re
+import time
+import shutil
+import multiprocessing
+from urllib.parse import urlparse
+
+from holdings_history import infer_report_date
+from holdings_records import HoldingsBatch
+from parser_profiles import select_profile, normalize_header, record_parse, parse_stats
+import native_extract
+import spreadsheet_ingest
+import instrumentation
+import artifact_store
 
 PDF_DIR = "pdfs"
 OUTPUT_DIR = "parsed_holdings"
 METADATA_FILE = "pdf_metadata.json"
+PDF_ENGINE = os.getenv('HOLDINGS_PDF_ENGINE', 'auto')  # auto | native | tabula
 
 def clean_percentage(value):
     """Clean percentage strings"""
@@ -36,61 +48,281 @@ def clean_amount(value):
     except:
         return None
 
-def parse_pdf(pdf_path):
-    """Extract holdings table from PDF"""
-    print(f"📄 Parsing: {os.path.basename(pdf_path)[:50]}...", end=' ')
+def java_available():
+    """tabula needs a Java runtime on PATH"""
+    return shutil.which('java') is not None
+
+def extraction_attempts(profile):
+    """Ordered (engine, lattice) attempts for a profile; HOLDINGS_PDF_ENGINE overrides the profile"""
+    engine = PDF_ENGINE if PDF_ENGINE != 'auto' else profile.get('engine', 'auto')
+    tabula_attempts = [('tabula', profile['lattice']), ('tabula', not profile['lattice'])]
     
-    try:
-        # Try to extract tables from all pages
-        dfs = tabula.read_pdf(
-            pdf_path,
-            pages='all',
-            multiple_tables=True,
-            lattice=True,
-            pandas_options={'header': 0}
-        )
-        
-        if not dfs:
-            print("⚠️  No tables found")
-            return None
-        
-        # Combine all tables
-        combined_df = pd.concat(dfs, ignore_index=True)
+    if engine == 'native':
+        return [('native', None)]
+    if engine == 'tabula':
+        return tabula_attempts
+    
+    # auto: native text layer first, tabula only if it finds nothing and Java is installed
+    attempts = [('native', None)]
+    if java_available():
+        attempts.append(tabula_attempts[0])
+    return attempts
+
+def read_tables(pdf_path, profile, engine, lattice):
+    """Extract raw tables with the given engine and the profile's settings"""
+    if engine == 'native':
+        tables, pages = native_extract.read_pdf(pdf_path, profile.get('pages', 'all'), profile.get('area'))
+        instrumentation.count('parse', 'pages_parsed', pages)
+        return tables
+    
+    # tabula-py launches a JVM per call unless jpype is installed
+    import tabula
+    instrumentation.count('parse', 'jvm_launches')
+    
+    options = {
+        'pages': profile.get('pages', 'all'),
+        'multiple_tables': True,
+        'lattice': lattice,
+        'stream': not lattice,
+        'pandas_options': {'header': 0}
+    }
+    if profile.get('area'):
+        options['area'] = profile['area']
+    return tabula.read_pdf(pdf_path, **options)
+
+def extract_holdings(dfs, profile):
+    """Map each table onto security/weight/market_value using the profile's resolver"""
+    resolve = profile['resolve']
+    multiplier = profile.get('valueMultiplier', 1)
+    frames = []
+    last_layout = None
+    
+    for df in dfs:
+        columns = list(df.columns)
+        mapping = resolve(columns)
         
-        # Identify columns (different AMCs use different headers)
-        possible_security_cols = ['Name of the Instrument', 'Security', 'Name', 'Instrument', 'Company']
-        possible_weight_cols = ['% to Net Assets', '% to NAV', 'Weight', 'Percentage', '%']
-        possible_value_cols = ['Market/Fair Value', 'Market Value', 'Value', 'Amount']
+        if mapping['security'] is not None:
+            positions = {field: (columns.index(col) if col is not None else None) for field, col in mapping.items()}
+            last_layout = (len(columns), positions)
+        elif last_layout and len(columns) == last_layout[0]:
+            # Continuation table without a header: pandas consumed the first data row as header
+            header_row = [None if str(c).startswith('Unnamed:') else c for c in columns]
+            df = pd.concat([pd.DataFrame([header_row]), df.set_axis(range(len(columns)), axis=1)], ignore_index=True)
+            positions = last_layout[1]
+        else:
+            continue
         
-        # Find matching columns
-        security_col = next((col for col in combined_df.columns if any(s in col for s in possible_security_cols)), None)
-        weight_col = next((col for col in combined_df.columns if any(w in col for w in possible_weight_cols)), None)
-        value_col = next((col for col in combined_df.columns if any(v in col for v in possible_value_cols)), None)
+        frame = pd.DataFrame({'security': df.iloc[:, positions['security']]})
+        frame['weight'] = df.iloc[:, positions['weight']].apply(clean_percentage) if positions['weight'] is not None else None
+        if positions['market_value'] is not None:
+            frame['market_value'] = df.iloc[:, positions['market_value']].apply(clean_amount) * multiplier
+        else:
+            frame['market_value'] = None
+        frames.append(frame)
+    
+    if not frames:
+        return None
+    
+    result = pd.concat(frames, ignore_index=True)
+    instrumentation.count('parse', 'rows_raw', len(result))
+    
+    # Clean data
+    result = result.dropna(subset=['security'])
+    result['security'] = result['security'].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+    result = result[result['security'].str.len() > 3]  # Remove invalid entries
+    
+    # Remove header rows that got repeated
+    is_header = result['security'].map(lambda s: normalize_header(s) in profile['header_names'])
+    result = result[~is_header]
+    instrumentation.count('parse', 'rows_cleaned', len(result))
+    return result
+
+def parse_pdf(pdf_path, fund_name=None):
+    """Extract holdings table from PDF using the matching AMC layout profile"""
+    print(f"📄 Parsing: {os.path.basename(pdf_path)[:50]}...", end=' ')
+    
+    # Filename/fund name usually identify the AMC; only read the first page when they don't
+    profile = select_profile(os.path.basename(pdf_path), fund_name)
+    if profile['name'] == 'generic':
+        try:
+            with instrumentation.span('parse', 'fingerprint'):
+                profile = select_profile(os.path.basename(pdf_path), fund_name, native_extract.first_page_text(pdf_path))
+        except Exception as e:
+            # Corrupt/encrypted PDFs or a pdfplumber regression: keep going with the generic profile
+            print(f"⚠️  first page unreadable ({type(e).__name__}: {str(e)[:40]}), using generic profile...", end=' ')
+            instrumentation.count('parse', 'fingerprint_failed')
+            instrumentation.log_event('fingerprint_failed', file=os.path.basename(pdf_path), error=f"{type(e).__name__}: {e}")
+    
+    start = time.perf_counter()
+    result = None
+    engine = None
+    attempts = extraction_attempts(profile)
+    
+    error = None
+    
+    try:
+        # Later attempts only run when the earlier ones fail or find no holdings table
+        for engine, lattice in attempts:
+            try:
+                with instrumentation.span('parse', f"extract.{engine}"):
+                    result = extract_holdings(read_tables(pdf_path, profile, engine, lattice), profile)
+            except Exception as e:
+                error, result = e, None
+                instrumentation.count('parse', f"{engine}.failed")
+                continue
+            if result is not None and len(result) > 0:
+                break
         
-        if not security_col:
-            print("⚠️  Could not identify security column")
+        if result is None or len(result) == 0:
+            if error is not None:
+                print(f"❌ {str(error)[:50]}")
+            else:
+                print(f"⚠️  Could not identify holdings table [{profile['name']}]")
             return None
         
-        # Extract relevant columns
-        result = pd.DataFrame()
-        result['security'] = combined_df[security_col] if security_col else None
-        result['weight'] = combined_df[weight_col].apply(clean_percentage) if weight_col else None
-        result['market_value'] = combined_df[value_col].apply(clean_amount) if value_col else None
+        print(f"✅ {len(result)} holdings [{profile['name']}/{engine}]")
+        return result
+    
+    finally:
+        rows = len(result) if result is not None else 0
+        retried = engine is not None and (engine, lattice) != attempts[0]
+        record_parse(profile['name'], time.perf_counter() - start, rows, rows > 0, retried, engine)
+
+def parse_disclosure(pdf_info):
+    """Parse one downloaded disclosure and write its parsed_holdings JSON file(s)"""
+    if 'local_path' not in pdf_info:
+        return []
+    
+    pdf_path = pdf_info['local_path']
+    if not artifact_store.exists(pdf_path):
+        print(f"⚠️  File not found: {pdf_path}")
+        return []
+    
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    # Archive URLs often carry the month in a directory ('/2024/05/portfolio.pdf') rather than the filename;
+    # fund names are never used (target maturity funds name a future month)
+    url_path = urlparse(pdf_info.get('url') or '').path
+    report_date = infer_report_date(pdf_info['filename'], url_path).isoformat()
+    
+    # Spreadsheets carry one scheme per sheet; PDFs one fund per file
+    with artifact_store.local_file(pdf_path) as local_path:
+        if spreadsheet_ingest.is_spreadsheet(local_path):
+            with instrumentation.span('parse', 'extract.spreadsheet'):
+                schemes = spreadsheet_ingest.parse_spreadsheet(local_path, pdf_info['fund_name'])
+            outputs = [
+                (f"{stem}__{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')}.json" if len(schemes) > 1 else f"{stem}.json", name, df)
+                for name, df in schemes
+            ]
+        else:
+            holdings_df = parse_pdf(local_path, pdf_info['fund_name'])
+            outputs = [(f"{stem}.json", pdf_info['fund_name'], holdings_df)]
+    
+    parsed = []
+    for filename, fund_name, holdings_df in outputs:
+        if holdings_df is None or len(holdings_df) == 0:
+            continue
         
-        # Clean data
-        result = result.dropna(subset=['security'])
-        result = result[result['security'].str.len() > 3]  # Remove invalid entries
+        # Save individual fund holdings
+        output_path = os.path.join(OUTPUT_DIR, filename)
         
-        # Remove header rows that got repeated
-        result = result[~result['security'].str.contains('Name|Security|Instrument', case=False, na=False)]
+        holdings_data = {
+            'fund_name': fund_name,
+            'filename': pdf_info['filename'],
+            'format': pdf_info.get('format', 'pdf'),
+            'report_date': report_date,
+            'parsed_at': datetime.now().isoformat(),
+            'total_holdings': len(holdings_df),
+            'columns': HoldingsBatch.from_frame(holdings_df).to_columns()
+        }
         
-        print(f"✅ {len(result)} holdings")
-        return result
+        artifact_store.write_json(output_path, holdings_data)
         
-    except Exception as e:
-        print(f"❌ {str(e)[:50]}")
-        return None
+        parsed.append({
+            'fund_name': fund_name,
+            'filename': filename,
+            'holdings_count': len(holdings_df),
+            'output_file': output_path
+        })
+    
+    return parsed
+
+def file_sha256(path):
+    """Content hash of a downloaded disclosure (of its plain bytes, also when stored compressed)"""
+    return artifact_store.sha256(path)
 
+def parse_job(pdf_info):
+    """Work-queue handler: fetch the disclosure if this node doesn't have it, parse it, return the outputs"""
+    local_path = pdf_info.get('local_path')
+    if not local_path or not artifact_store.exists(local_path) or file_sha256(local_path) != pdf_info.get('sha256'):
+        import scrape_amfi_pdfs
+        os.makedirs(scrape_amfi_pdfs.PDF_DIR, exist_ok=True)
+        pdf_info = scrape_amfi_pdfs.download_pdf(dict(pdf_info))
+    
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    parsed = parse_disclosure(pdf_info)
+    if not parsed:
+        raise ValueError(f"no holdings extracted from {pdf_info['filename']}")
+    
+    # Outputs travel back in the job result so the importing node needs no shared filesystem
+    outputs = []
+    for entry in parsed:
+        outputs.append({'filename': entry['filename'], 'holdings_count': entry['holdings_count'],
+                        'data': artifact_store.read_json(entry['output_file'])})
+    return {'outputs': outputs}
+
+def _parse_worker(idle_exit):
+    """Entry point of one worker process"""
+    import work_queue
+    instrumentation.configure(component='parse_worker')
+    counts = work_queue.run_worker('parse', parse_job, idle_exit=idle_exit)
+    instrumentation.finish()
+    return counts
+
+def run_parse_workers(processes=1, idle_exit=False):
+    """Drain queued parse jobs with N local worker processes (run this on every worker box)"""
+    if processes <= 1:
+        return _parse_worker(idle_exit)
+    # spawn: each worker opens its own Mongo pool instead of inheriting the parent's sockets
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_parse_worker, args=(idle_exit,)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
+
+def drain_parse_queue(processes=1, db=None):
+    """Parse every queued job here (alongside any remote workers), wait for jobs leased elsewhere, then collect them"""
+    import work_queue
+    while True:
+        # Start workers only when there is something to claim, not on every poll
+        if work_queue.claimable_count('parse', db):
+            if processes <= 1:
+                work_queue.run_worker('parse', parse_job, idle_exit=True, db=db)
+            else:
+                run_parse_workers(processes, idle_exit=True)
+        counts = work_queue.queue_stats(db).get('parse', {})
+        if not counts.get('queued') and not counts.get('running'):
+            break
+        # Jobs another worker holds, or retries still backing off; an expired lease becomes claimable again
+        time.sleep(work_queue.POLL_INTERVAL)
+    return collect_parsed_jobs(db)
+
+def collect_parsed_jobs(db=None):
+    """Write the outputs of finished parse jobs into parsed_holdings/ for the import stage; returns files written"""
+    import work_queue
+    import repository
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    jobs = repository.jobs(db)
+    written = 0
+    for job in jobs.find({'kind': 'parse', 'status': 'succeeded', 'collectedAt': {'$exists': False}}):
+        for output in job['result']['outputs']:
+            artifact_store.write_json(os.path.join(OUTPUT_DIR, output['filename']), output['data'])
+            written += 1
+        jobs.update_one({'_id': job['_id']}, {'$set': {'collectedAt': work_queue.utcnow()}})
+    return written
+
+@instrumentation.stage('parse')
 def parse_all_pdfs():
     """Parse all downloaded PDFs"""
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -105,48 +337,21 @@ def parse_all_pdfs():
     
     parsed_data = []
     
-    print(f"\n🔄 Parsing {len(metadata['pdfs'])} PDFs...")
+    print(f"\n🔄 Parsing {len(metadata['pdfs'])} disclosures...")
     print("=" * 70)
     
     for pdf_info in metadata['pdfs']:
-        if 'local_path' not in pdf_info:
-            continue
-        
-        pdf_path = pdf_info['local_path']
-        if not os.path.exists(pdf_path):
-            print(f"⚠️  File not found: {pdf_path}")
-            continue
-        
-        # Parse PDF
-        holdings_df = parse_pdf(pdf_path)
-        
-        if holdings_df is not None and len(holdings_df) > 0:
-            # Save individual fund holdings
-            filename = os.path.basename(pdf_path).replace('.pdf', '.json')
-            output_path = os.path.join(OUTPUT_DIR, filename)
-            
-            holdings_data = {
-                'fund_name': pdf_info['fund_name'],
-                'filename': pdf_info['filename'],
-                'parsed_at': datetime.now().isoformat(),
-                'total_holdings': len(holdings_df),
-                'holdings': holdings_df.to_dict('records')
-            }
-            
-            with open(output_path, 'w') as f:
-                json.dump(holdings_data, f, indent=2)
-            
-            parsed_data.append({
-                'fund_name': pdf_info['fund_name'],
-                'filename': filename,
-                'holdings_count': len(holdings_df),
-                'output_file': output_path
-            })
+        with instrumentation.item('parse', pdf_info['filename']) as fields:
+            parsed = parse_disclosure(pdf_info)
+            fields['rows'] = sum(p['holdings_count'] for p in parsed)
+            fields['status'] = 'parsed' if parsed else 'failed'
+        parsed_data.extend(parsed)
     
     # Save summary
     summary = {
         'parsed_at': datetime.now().isoformat(),
         'total_parsed': len(parsed_data),
+        'profiles': parse_stats(),
         'funds': parsed_data
     }
     
@@ -154,9 +359,18 @@ def parse_all_pdfs():
     with open(summary_path, 'w') as f:
         json.dump(summary, f, indent=2)
     
+    # Outputs repeat the same keys and names: a trained dictionary makes them compress far better
+    if artifact_store.maybe_train(OUTPUT_DIR):
+        print("🗜️  Trained a new compression dictionary for parsed outputs")
+    artifact_store.enforce_retention(OUTPUT_DIR, keep=[p['output_file'] for p in parsed_data])
+    
     print("\n" + "=" * 70)
     print(f"✅ Successfully parsed {len(parsed_data)} funds")
     print(f"📁 Output saved to: {OUTPUT_DIR}/")
+    
+    print("\n⏱️  Parse time by layout profile:")
+    for name, stats in summary['profiles'].items():
+        print(f"  {name:.<30} {stats['pdfs']:>4} PDFs  {stats['avgSeconds']:>6.2f}s avg  {stats['retries']} retries")
     print(f"📊 Summary: {summary_path}")
 
 if __name__ == "__main__":
@@ -165,3 +379,4 @@ if __name__ == "__main__":
     print("=" * 70)
     
     parse_all_pdfs()
+    instrumentation.print_summary(instrumentation.finish())
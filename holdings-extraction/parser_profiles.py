@@ -0,0 +1,140 @@
+"""
+Parser Profiles
+Registry of AMC portfolio layouts (parser_profiles.json): fingerprinting, extraction
+settings and a column resolver compiled once per profile.
+"""
+
+import json
+import re
+
+import instrumentation
+
+PROFILES_FILE = 'parser_profiles.json'
+FIELDS = ['security', 'weight', 'market_value']
+
+_registry = None
+_parse_stats = {}
+
+def normalize_header(header):
+    """Canonical form of a table header ('Market/ Fair Value (Rs. in Lacs.)' -> 'market/fair value(rs in lacs)')"""
+    text = str(header).lower()
+    text = re.sub(r'[.,:;]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([/()])\s*', r'\1', text)
+    return text.strip()
+
+def compile_resolver(profile, default):
+    """Build a cached header-tuple -> {field: column} resolver for one profile"""
+    aliases = {}
+    for field in FIELDS:
+        names = profile['columns'].get(field, []) + default['columns'].get(field, [])
+        # Earlier alias wins; duplicates keep their first (best) rank
+        ranked = {}
+        for rank, name in enumerate(names):
+            ranked.setdefault(normalize_header(name), rank)
+        aliases[field] = ranked
+
+    patterns = {
+        field: [re.compile(p) for p in profile.get('patterns', default.get('patterns', {})).get(field, [])]
+        for field in FIELDS
+    }
+    cache = {}
+
+    def resolve(columns):
+        key = tuple(columns)
+        if key in cache:
+            instrumentation.count('parse', 'resolver_cache_hits')
+            return cache[key]
+        instrumentation.count('parse', 'resolver_cache_misses')
+
+        normalized = [normalize_header(c) for c in columns]
+        mapping = {}
+        used = set()
+        for field in FIELDS:
+            best = None
+            for position, header in enumerate(normalized):
+                if position in used:
+                    continue
+                # Exact alias match ranks above any pattern match
+                if header in aliases[field]:
+                    score = aliases[field][header]
+                else:
+                    matched = next((i for i, p in enumerate(patterns[field]) if p.search(header)), None)
+                    if matched is None:
+                        continue
+                    score = len(aliases[field]) + matched
+                if best is None or score < best[0]:
+                    best = (score, position)
+            if best is not None:
+                used.add(best[1])
+                mapping[field] = columns[best[1]]
+            else:
+                mapping[field] = None
+
+        cache[key] = mapping
+        return mapping
+
+    return resolve
+
+def load_profiles():
+    """Load and compile the profile registry (once per process)"""
+    global _registry
+    if _registry is not None:
+        return _registry
+
+    with open(PROFILES_FILE, 'r') as f:
+        config = json.load(f)
+
+    default = config['default']
+    profiles = []
+    for profile in config['profiles'] + [default]:
+        compiled = dict(profile)
+        compiled['fingerprint_res'] = [re.compile(p, re.IGNORECASE | re.MULTILINE) for p in profile.get('fingerprint', [])]
+        compiled['resolve'] = compile_resolver(profile, default)
+        compiled['header_names'] = {
+            normalize_header(name)
+            for source in (profile, default)
+            for names in source['columns'].values()
+            for name in names
+        }
+        profiles.append(compiled)
+
+    _registry = profiles
+    return _registry
+
+def select_profile(filename, fund_name=None, first_page_text=None):
+    """Pick the profile whose fingerprints best match the PDF's name and first page"""
+    profiles = load_profiles()
+    haystacks = [t for t in (filename, fund_name, first_page_text) if t]
+
+    best = profiles[-1]
+    best_score = 0
+    for profile in profiles[:-1]:
+        score = sum(1 for pattern in profile['fingerprint_res'] for text in haystacks if pattern.search(text))
+        if score > best_score:
+            best, best_score = profile, score
+    return best
+
+def record_parse(profile_name, seconds, rows, success, retried=False, engine=None):
+    """Accumulate per-profile parse timing"""
+    stats = _parse_stats.setdefault(profile_name, {
+        'pdfs': 0, 'failed': 0, 'retries': 0, 'rows': 0, 'seconds': 0.0, 'maxSeconds': 0.0, 'engines': {}
+    })
+    if engine:
+        stats['engines'][engine] = stats['engines'].get(engine, 0) + 1
+    stats['pdfs'] += 1
+    stats['failed'] += 0 if success else 1
+    stats['retries'] += 1 if retried else 0
+    stats['rows'] += rows
+    stats['seconds'] += seconds
+    stats['maxSeconds'] = max(stats['maxSeconds'], seconds)
+
+def parse_stats():
+    """Per-profile timing summary"""
+    summary = {}
+    for name, stats in _parse_stats.items():
+        summary[name] = dict(stats, engines=dict(stats['engines']))
+        summary[name]['avgSeconds'] = round(stats['seconds'] / stats['pdfs'], 3) if stats['pdfs'] else 0.0
+        summary[name]['seconds'] = round(stats['seconds'], 3)
+        summary[name]['maxSeconds'] = round(stats['maxSeconds'], 3)
+    return summary
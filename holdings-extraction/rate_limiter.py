@@ -0,0 +1,268 @@
+"""
+Adaptive Rate Limiter
+Per-source AIMD request pacing for the scrapers. Each healthy response adds a little to a
+source's request rate; a 429/503, an error or a slow response halves it, and a Retry-After
+header pauses the source until the given time. Rolling success and latency stats per source
+are kept in state/source_health.json so runs can try the healthiest source first.
+
+Environment:
+  SOURCE_HEALTH_FILE     rolling per-source stats (default state/source_health.json, 'off' to disable)
+  AMFI_DOWNLOAD_DELAY    starting seconds between AMFI requests (default 2)
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+
+import instrumentation
+
+HEALTH_FILE = os.getenv('SOURCE_HEALTH_FILE', os.path.join('state', 'source_health.json'))
+WINDOW = 50            # responses kept per source for the rolling stats
+MAX_RETRIES = 2        # re-sends of a throttled request (after waiting out Retry-After)
+THROTTLE_CODES = (429, 503)
+
+DEFAULTS = {
+    'initial_interval': 2.0,   # seconds between requests before anything is known
+    'min_interval': 0.25,      # fastest pace ever used
+    'max_interval': 60.0,      # slowest pace (multiplicative decrease stops here)
+    'additive_step': 0.05,     # requests/second added per healthy response
+    'decrease_factor': 0.5,    # rate multiplier on throttling, errors or slow responses
+    'slow_seconds': 5.0        # responses slower than this count as congestion
+}
+
+SOURCES = {
+    'amfi': {'initial_interval': float(os.getenv('AMFI_DOWNLOAD_DELAY', '2')), 'min_interval': 0.5, 'slow_seconds': 15.0},
+    'moneycontrol': {'initial_interval': 3.0, 'min_interval': 1.0},
+    'valueresearch': {'initial_interval': 3.0, 'min_interval': 1.0}
+}
+
+_sources = {}
+_lock = threading.Lock()
+
+def settings(source):
+    """DEFAULTS overlaid with the source's own settings"""
+    return {**DEFAULTS, **SOURCES.get(source, {})}
+
+def configure(source, **overrides):
+    """Change a source's settings (e.g. a zero interval for local benchmarks) and reset its pacing"""
+    SOURCES.setdefault(source, {}).update(overrides)
+    with _lock:
+        _sources.pop(source, None)
+
+def _state(source):
+    """Pacing and rolling stats for a source, created on first use"""
+    if source not in _sources:
+        config = settings(source)
+        _sources[source] = {
+            'lock': threading.Lock(),
+            'rate': 1.0 / config['initial_interval'] if config['initial_interval'] > 0 else float('inf'),
+            'next_at': 0.0,
+            'blocked_until': 0.0,
+            'outcomes': deque(maxlen=WINDOW),
+            'latencies': deque(maxlen=WINDOW),
+            'yields': deque(maxlen=WINDOW),
+            'throttled': 0,
+            'sent': 0
+        }
+        _load_history(source, _sources[source])
+    return _sources[source]
+
+def _clamp(rate, config):
+    """Keep a rate between 1/max_interval and 1/min_interval"""
+    low = 1.0 / config['max_interval']
+    high = 1.0 / config['min_interval'] if config['min_interval'] > 0 else float('inf')
+    return min(high, max(low, rate))
+
+def parse_retry_after(value):
+    """Retry-After as seconds from now (delta-seconds or an HTTP date); None if absent or unparseable"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def acquire(source):
+    """Block until the source may be called again; returns seconds waited"""
+    with _lock:
+        state = _state(source)
+    with state['lock']:
+        now = time.monotonic()
+        start = max(now, state['next_at'], state['blocked_until'])
+        # Reserve the slot before sleeping so concurrent callers queue behind each other
+        state['next_at'] = start + (1.0 / state['rate'] if state['rate'] != float('inf') else 0.0)
+    wait = start - now
+    if wait > 0:
+        time.sleep(wait)
+        instrumentation.observe('http', f"{source}.wait", wait)
+    return wait
+
+def record(source, status_code=None, seconds=None, retry_after=None, error=False):
+    """Feed one response (or a connection error) back into the source's pace and stats"""
+    config = settings(source)
+    with _lock:
+        state = _state(source)
+    throttled = status_code in THROTTLE_CODES
+    ok = not error and status_code is not None and status_code < 400
+    slow = seconds is not None and seconds > config['slow_seconds']
+
+    with state['lock']:
+        state['outcomes'].append(1 if ok else 0)
+        state['sent'] += 1
+        if seconds is not None:
+            state['latencies'].append(seconds)
+        if throttled or error or slow:
+            state['rate'] = _clamp(state['rate'] * config['decrease_factor'], config)
+        elif ok:
+            state['rate'] = _clamp(state['rate'] + config['additive_step'], config)
+        if throttled:
+            state['throttled'] += 1
+            if retry_after is not None:
+                state['blocked_until'] = max(state['blocked_until'], time.monotonic() + retry_after)
+
+    instrumentation.count('http', f"{source}.requests")
+    if throttled:
+        instrumentation.count('http', f"{source}.throttled")
+    elif not ok:
+        instrumentation.count('http', f"{source}.failed")
+    if seconds is not None:
+        instrumentation.observe('http', f"{source}.latency", seconds)
+
+def record_yield(source, found):
+    """Whether a source actually had the data asked for (a 200 with an empty table doesn't help)"""
+    with _lock:
+        state = _state(source)
+    with state['lock']:
+        state['yields'].append(1 if found else 0)
+
+def request(source, method, url, session=None, **kwargs):
+    """Paced HTTP request; throttled responses are retried after waiting out Retry-After"""
+    session = session or requests
+    for attempt in range(MAX_RETRIES + 1):
+        acquire(source)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            record(source, seconds=time.perf_counter() - start, error=True)
+            raise
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        record(source, response.status_code, time.perf_counter() - start, retry_after)
+        if response.status_code not in THROTTLE_CODES or attempt == MAX_RETRIES:
+            return response
+        print(f"   ⏳ {source} throttled ({response.status_code}), backing off{f' {retry_after:.0f}s' if retry_after else ''}")
+    return response
+
+def get(source, url, **kwargs):
+    """Paced GET"""
+    return request(source, 'GET', url, **kwargs)
+
+def requests_sent(sources):
+    """Requests made to the given sources by this process (retries included), for request budgets"""
+    total = 0
+    with _lock:
+        states = [_state(source) for source in sources]
+    for state in states:
+        with state['lock']:
+            total += state['sent']
+    return total
+
+def health(source):
+    """Rolling success rate, latency and current pace of a source"""
+    with _lock:
+        state = _state(source)
+    with state['lock']:
+        outcomes = list(state['outcomes'])
+        latencies = sorted(state['latencies'])
+        return {
+            'requests': len(outcomes),
+            'successRate': round(sum(outcomes) / len(outcomes), 3) if outcomes else None,
+            'latencyP50': round(latencies[len(latencies) // 2], 3) if latencies else None,
+            'intervalSeconds': round(1.0 / state['rate'], 3) if state['rate'] != float('inf') else 0.0,
+            'blockedFor': round(max(0.0, state['blocked_until'] - time.monotonic()), 1),
+            'throttled': state['throttled']
+        }
+
+def score(source):
+    """Higher is better: smoothed HTTP success x data yield per second of latency, zero while blocked by Retry-After"""
+    stats = health(source)
+    if stats['blockedFor'] > 0:
+        return 0.0
+    with _lock:
+        state = _state(source)
+    with state['lock']:
+        outcomes, yields = list(state['outcomes']), list(state['yields'])
+    # Laplace smoothing so an untried source isn't ranked last (or first) on no evidence
+    success = (sum(outcomes) + 1) / (len(outcomes) + 2)
+    found = (sum(yields) + 1) / (len(yields) + 2)
+    return success * found / (1.0 + (stats['latencyP50'] or 0.0))
+
+def rank(sources):
+    """Sources ordered healthiest first (ties keep the given order)"""
+    return sorted(sources, key=lambda source: -score(source))
+
+def _load_history(source, state):
+    """Seed the rolling window from the last run's saved stats"""
+    if HEALTH_FILE == 'off' or not os.path.exists(HEALTH_FILE):
+        return
+    try:
+        with open(HEALTH_FILE, 'r') as f:
+            saved = json.load(f).get(source)
+    except (OSError, ValueError):
+        return
+    if saved:
+        state['outcomes'].extend(saved.get('outcomes', []))
+        state['latencies'].extend(saved.get('latencies', []))
+        state['yields'].extend(saved.get('yields', []))
+        if saved.get('intervalSeconds'):
+            state['rate'] = _clamp(1.0 / saved['intervalSeconds'], settings(source))
+
+def save_health():
+    """Persist every used source's rolling window and pace for the next run"""
+    if HEALTH_FILE == 'off':
+        return
+    saved = {}
+    if os.path.exists(HEALTH_FILE):
+        try:
+            with open(HEALTH_FILE, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+    with _lock:
+        for source, state in _sources.items():
+            with state['lock']:
+                saved[source] = {
+                    'outcomes': list(state['outcomes']),
+                    'latencies': [round(s, 4) for s in state['latencies']],
+                    'yields': list(state['yields']),
+                    'intervalSeconds': 1.0 / state['rate'] if state['rate'] != float('inf') else 0.0,
+                    'updatedAt': datetime.now().isoformat()
+                }
+    directory = os.path.dirname(HEALTH_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = HEALTH_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(saved, f, indent=2)
+    os.replace(tmp_path, HEALTH_FILE)
+
+def print_health(sources=None):
+    """Per-source health table for the console"""
+    print("\n🌐 Source health:")
+    for source in sources or list(_sources):
+        stats = health(source)
+        success = f"{stats['successRate'] * 100:.0f}%" if stats['successRate'] is not None else '-'
+        latency = f"{stats['latencyP50']:.2f}s" if stats['latencyP50'] is not None else '-'
+        print(f"  {source:.<16} {stats['requests']:>4} req  {success:>5} ok  p50 {latency:>7}  every {stats['intervalSeconds']:.2f}s  {stats['throttled']} throttled")
@@ -0,0 +1,178 @@
+"""
+Mongo Repository
+One process-wide pooled MongoClient shared by every pipeline script, collection
+accessors with the configured write concern, batched bulk writes and sessions.
+
+Environment:
+  MONGODB_URI                          connection string (default mongodb://localhost:27017/mutual-funds)
+  MONGODB_MAX_POOL_SIZE                connections per server in the pool (default 20)
+  MONGODB_SERVER_SELECTION_TIMEOUT_MS  how long to wait for a reachable server (default 30000)
+  MONGODB_WRITE_CONCERN                'majority' or a member count such as '1' (default 1)
+  MONGODB_BULK_WRITE_CONCERN           write concern for bulk loads (default: MONGODB_WRITE_CONCERN)
+  MONGODB_JOURNAL                      'true' to wait for the journal before acknowledging writes
+  HOLDINGS_BULK_BATCH_SIZE             documents/operations per bulk call (default 1000)
+"""
+
+import os
+import itertools
+import threading
+import contextlib
+from pymongo import MongoClient, WriteConcern
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
+MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '20'))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+WRITE_CONCERN = os.getenv('MONGODB_WRITE_CONCERN', '1')
+BULK_WRITE_CONCERN = os.getenv('MONGODB_BULK_WRITE_CONCERN', WRITE_CONCERN)
+JOURNAL = os.getenv('MONGODB_JOURNAL', 'false').lower() == 'true'
+BULK_BATCH_SIZE = int(os.getenv('HOLDINGS_BULK_BATCH_SIZE', '1000'))
+
+# Collections
+FUNDS = 'funds'
+FUND_HOLDINGS = 'fund_holdings'
+SECURITY_HOLDERS = 'security_holders'
+FUND_LOOKTHROUGH = 'fund_lookthrough'
+HOLDINGS_STATS = 'holdings_stats'
+JOBS = 'pipeline_jobs'
+
+_state = {'client': None, 'database': None, 'options': {}}
+_lock = threading.Lock()
+
+def configure(**client_options):
+    """Extra MongoClient options (e.g. serverSelectionTimeoutMS) applied when the client is created"""
+    _state['options'].update(client_options)
+
+def get_client():
+    """The process-wide pooled client (created on first use; retryable reads and writes)"""
+    if _state['client'] is None:
+        with _lock:
+            if _state['client'] is None:
+                options = {
+                    'maxPoolSize': MAX_POOL_SIZE,
+                    'serverSelectionTimeoutMS': SERVER_SELECTION_TIMEOUT_MS,
+                    'retryWrites': True,
+                    'retryReads': True,
+                    'appname': 'holdings-extraction'
+                }
+                options.update(_state['options'])
+                _state['client'] = MongoClient(MONGODB_URI, **options)
+    return _state['client']
+
+def set_client(client, database=None):
+    """Use an existing client (mongomock in tests, a scratch database in benchmarks)"""
+    with _lock:
+        _state['client'] = client
+        _state['database'] = database
+
+def close():
+    """Close the shared client; the next get_client() opens a new one"""
+    with _lock:
+        if _state['client'] is not None:
+            _state['client'].close()
+        _state['client'] = None
+        _state['database'] = None
+
+def get_db():
+    """Database named in MONGODB_URI (or the one given to set_client)"""
+    client = get_client()
+    if _state['database']:
+        return client.get_database(_state['database'])
+    return client.get_database()
+
+def write_concern(level=None):
+    """WriteConcern for 'majority' or a member count"""
+    level = str(level or WRITE_CONCERN)
+    w = level if level == 'majority' else int(level)
+    return WriteConcern(w=w, j=True if JOURNAL else None)
+
+def collection(name, db=None, bulk=False):
+    """Collection handle with the configured (or bulk-load) write concern"""
+    db = db if db is not None else get_db()
+    return db[name].with_options(write_concern=write_concern(BULK_WRITE_CONCERN if bulk else WRITE_CONCERN))
+
+def funds(db=None):
+    """`funds` collection (scheme metadata)"""
+    return collection(FUNDS, db)
+
+def fund_holdings(db=None, bulk=False):
+    """`fund_holdings` collection (latest month of holdings per scheme)"""
+    return collection(FUND_HOLDINGS, db, bulk)
+
+def security_holders(db=None, bulk=False):
+    """`security_holders` collection (security -> funds reverse index)"""
+    return collection(SECURITY_HOLDERS, db, bulk)
+
+def fund_lookthrough(db=None, bulk=False):
+    """`fund_lookthrough` collection (fund-of-funds expanded into underlying securities)"""
+    return collection(FUND_LOOKTHROUGH, db, bulk)
+
+def holdings_stats(db=None):
+    """`holdings_stats` collection (health report kept up to date by the import and classify stages)"""
+    return collection(HOLDINGS_STATS, db)
+
+def jobs(db=None):
+    """`pipeline_jobs` collection (distributed work queue; always acknowledged by the majority)"""
+    db = db if db is not None else get_db()
+    return db[JOBS].with_options(write_concern=write_concern('majority'))
+
+def insert_batched(target, documents, batch_size=None, session=None):
+    """insert_many in unordered batches of HOLDINGS_BULK_BATCH_SIZE; returns documents inserted.
+    documents may be any iterable - a generator is only materialized one batch at a time."""
+    batch_size = batch_size or BULK_BATCH_SIZE
+    documents = iter(documents)
+    inserted = 0
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            return inserted
+        result = target.insert_many(batch, ordered=False, session=session)
+        inserted += len(result.inserted_ids)
+
+def bulk_write_batched(target, operations, batch_size=None, ordered=False, session=None):
+    """bulk_write in batches; batches run in order, so ordered=True keeps operation order overall"""
+    batch_size = batch_size or BULK_BATCH_SIZE
+    totals = {'matched': 0, 'modified': 0, 'upserted': 0, 'inserted': 0, 'deleted': 0}
+    for start in range(0, len(operations), batch_size):
+        result = target.bulk_write(operations[start:start + batch_size], ordered=ordered, session=session)
+        totals['matched'] += result.matched_count
+        totals['modified'] += result.modified_count
+        totals['upserted'] += result.upserted_count
+        totals['inserted'] += result.inserted_count
+        totals['deleted'] += result.deleted_count
+    return totals
+
+@contextlib.contextmanager
+def session(causal_consistency=True):
+    """Client session, or None where sessions aren't supported (mongomock)"""
+    try:
+        client_session = get_client().start_session(causal_consistency=causal_consistency)
+    except NotImplementedError:
+        yield None
+        return
+    with client_session:
+        yield client_session
+
+def supports_transactions():
+    """Transactions need a replica set or sharded cluster"""
+    client = get_client()
+    if not isinstance(client, MongoClient):
+        return False
+    return client.topology_description.topology_type_name in ('ReplicaSetWithPrimary', 'Sharded')
+
+def is_in_memory():
+    """True for mongomock, whose data can't be reached from other processes"""
+    return not isinstance(get_client(), MongoClient)
+
+def supports_change_streams():
+    """Change streams have the same requirement as transactions (an oplog)"""
+    return supports_transactions()
+
+def run_in_transaction(callback):
+    """callback(session) atomically where the deployment supports it, otherwise without a transaction"""
+    with session() as client_session:
+        if client_session is None or not supports_transactions():
+            return callback(client_session)
+        return client_session.with_transaction(callback)
@@ -3,66 +3,143 @@ AMFI Portfolio PDF Scraper
 Scrapes portfolio disclosure PDFs from AMFI website
 """
 
-import requests
-from bs4 import BeautifulSoup
 import os
+import re
+import sys
 import json
+import hashlib
 from datetime import datetime
-import time
+from urllib.parse import urljoin
+
+import instrumentation
+import rate_limiter
+import amfi_crawler
+import artifact_store
 
 AMFI_URL = "https://www.amfiindia.com/research-information/portfolio-disclosures"
 PDF_DIR = "pdfs"
 METADATA_FILE = "pdf_metadata.json"
+PARSE_QUEUE = os.getenv('HOLDINGS_PARSE_QUEUE', 'false').lower() == 'true'  # enqueue parse jobs for remote workers
 
-def scrape_pdf_links():
-    """Scrape all portfolio PDF links from AMFI website"""
-    print("🔍 Scraping AMFI website for portfolio PDFs...")
-    
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(AMFI_URL, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+# Spreadsheets parse orders of magnitude faster than PDF tables
+DISCLOSURE_FORMATS = ['xlsx', 'xls', 'csv', 'pdf']
+FORMAT_PREFERENCE = {fmt: rank for rank, fmt in enumerate(DISCLOSURE_FORMATS)}
+
+def disclosure_format(href):
+    """'pdf', 'xlsx', 'xls' or 'csv' for a disclosure link, None otherwise"""
+    path = href.lower().split('?')[0]
+    for extension in DISCLOSURE_FORMATS:
+        if path.endswith('.' + extension):
+            return extension
+    # Some links carry the extension mid-path (e.g. '/file.pdf/download')
+    return 'pdf' if '.pdf' in path else None
+
+def disclosure_key(link):
+    """(URL directory, file stem): the same stem recurs across month, AMC and archive directories"""
+    directory = link['url'].split('?')[0].rsplit('/', 1)[0]
+    return directory.lower(), os.path.splitext(link['filename'])[0].lower()
+
+def storage_name(pdf_info):
+    """Stable local filename unique to the disclosure's URL ('<stem>-<url hash>.<format>')"""
+    stem = re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.splitext(pdf_info['filename'])[0])[:80] or 'disclosure'
+    digest = hashlib.sha1(pdf_info['url'].encode('utf-8')).hexdigest()[:10]
+    return f"{stem}-{digest}.{pdf_info.get('format') or 'pdf'}"
+
+def prefer_spreadsheets(links):
+    """Keep one link per disclosure, choosing a spreadsheet over the PDF when both exist"""
+    chosen = {}
+    for link in links:
+        # Link texts are often just 'PDF' / 'Excel'; the file stem within its directory identifies the disclosure
+        key = disclosure_key(link)
+        current = chosen.get(key)
+        if current is None or FORMAT_PREFERENCE[link['format']] < FORMAT_PREFERENCE[current['format']]:
+            chosen[key] = link
+    return list(chosen.values())
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+def extract_disclosure_links(page_url, soup):
+    """Portfolio disclosure links (PDF or spreadsheet) on one listing page"""
+    pdf_links = []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        file_format = disclosure_format(href)
         
-        pdf_links = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
+        # Filter for portfolio disclosures (PDF or spreadsheet)
+        if file_format and ('portfolio' in href.lower() or 'holding' in href.lower()):
+            # Handle relative and absolute URLs
+            full_url = urljoin(page_url, href)
             
-            # Filter for portfolio PDFs
-            if '.pdf' in href.lower() and ('portfolio' in href.lower() or 'holding' in href.lower()):
-                # Handle relative and absolute URLs
-                if href.startswith('http'):
-                    full_url = href
-                elif href.startswith('/'):
-                    full_url = f"https://www.amfiindia.com{href}"
-                else:
-                    full_url = f"https://www.amfiindia.com/{href}"
-                
-                # Extract fund name from link text or URL
-                fund_name = link.get_text(strip=True) or href.split('/')[-1].replace('.pdf', '')
-                
-                pdf_links.append({
-                    'url': full_url,
-                    'fund_name': fund_name,
-                    'filename': href.split('/')[-1],
-                    'scraped_at': datetime.now().isoformat()
-                })
-        
-        print(f"✅ Found {len(pdf_links)} portfolio PDFs")
-        return pdf_links
+            # Extract fund name from link text or URL
+            filename = href.split('/')[-1].split('?')[0]
+            fund_name = link.get_text(strip=True) or os.path.splitext(filename)[0]
+            
+            pdf_links.append({
+                'url': full_url,
+                'fund_name': fund_name,
+                'filename': filename,
+                'format': file_format,
+                'scraped_at': datetime.now().isoformat()
+            })
+    return pdf_links
+
+@instrumentation.stage('scrape')
+def scrape_pdf_links(full=False):
+    """New or changed portfolio disclosure links (PDF/XLSX/XLS/CSV) across the AMFI listing and its
+    sub-pages; every current link with full=True. None if the listing can't be fetched."""
+    print("🔍 Crawling AMFI portfolio disclosure pages...")
     
+    try:
+        with instrumentation.span('scrape', 'crawl'):
+            pdf_links = amfi_crawler.discover(AMFI_URL, extract_disclosure_links, headers=HEADERS)
     except Exception as e:
         print(f"❌ Error scraping AMFI website: {e}")
-        return []
+        return None
+    
+    instrumentation.count('scrape', 'links_found', len(pdf_links))
+    pdf_links = prefer_spreadsheets(pdf_links)
+    current = len(pdf_links)
+    if not full:
+        pdf_links = [l for l in pdf_links if l['change'] != 'unchanged']
+    instrumentation.count('scrape', 'links_kept', len(pdf_links))
+    spreadsheets = sum(1 for l in pdf_links if l['format'] != 'pdf')
+    print(f"✅ {current} portfolio disclosures listed, {len(pdf_links)} to download ({spreadsheets} spreadsheets)")
+    return pdf_links
+
+def download_pdf(pdf_info):
+    """Download one disclosure into PDF_DIR and record where it went"""
+    response = rate_limiter.get('amfi', pdf_info['url'], timeout=60)
+    response.raise_for_status()
+    
+    # Logical path; artifact_store keeps it zstd-compressed on disk when that saves space.
+    # Named after the URL: same-named files from different directories must not overwrite each other
+    filepath = os.path.join(PDF_DIR, storage_name(pdf_info))
+    pdf_info['stored_size'] = artifact_store.write_bytes(filepath, response.content)
+    
+    pdf_info['local_path'] = filepath
+    pdf_info['downloaded_at'] = datetime.now().isoformat()
+    pdf_info['file_size'] = len(response.content)
+    pdf_info['sha256'] = hashlib.sha256(response.content).hexdigest()
+    pdf_info['etag'] = response.headers.get('ETag')
+    pdf_info['last_modified'] = response.headers.get('Last-Modified')
+    instrumentation.count('download', 'bytes_downloaded', len(response.content))
+    return pdf_info
 
-def download_pdfs(pdf_links, max_downloads=None):
+def enqueue_parse_jobs(downloaded, db=None):
+    """Queue one parse job per disclosure, keyed by its content hash; returns jobs added"""
+    import work_queue
+    work_queue.create_indexes(db)
+    return work_queue.enqueue_many('parse', [(pdf_info['sha256'], pdf_info) for pdf_info in downloaded], db=db)
+
+@instrumentation.stage('download')
+def download_pdfs(pdf_links, max_downloads=None, enqueue=None):
     """Download PDFs with rate limiting"""
     os.makedirs(PDF_DIR, exist_ok=True)
     
     downloaded = []
+    unchanged = []
     failed = []
     
     # Limit downloads if specified
@@ -74,33 +151,31 @@ def download_pdfs(pdf_links, max_downloads=None):
         try:
             print(f"  [{idx}/{len(links_to_download)}] {pdf_info['filename'][:50]}...", end=' ')
             
-            response = requests.get(pdf_info['url'], timeout=60)
-            response.raise_for_status()
-            
-            filepath = os.path.join(PDF_DIR, pdf_info['filename'])
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            with instrumentation.item('download', pdf_info['filename']) as fields:
+                download_pdf(pdf_info)
+                fields['bytes'] = pdf_info['file_size']
             
-            pdf_info['local_path'] = filepath
-            pdf_info['downloaded_at'] = datetime.now().isoformat()
-            pdf_info['file_size'] = len(response.content)
+            # Re-published with new headers but identical content: nothing for the next stages
+            if not amfi_crawler.record_download(pdf_info):
+                print("= unchanged")
+                unchanged.append(pdf_info)
+                continue
             downloaded.append(pdf_info)
-            
             print("✅")
             
-            # Rate limiting - be respectful to AMFI servers
-            time.sleep(2)
-            
         except Exception as e:
             print(f"❌ {str(e)[:50]}")
             pdf_info['error'] = str(e)
             failed.append(pdf_info)
     
-    # Save metadata
+    # Save metadata: this run's new/changed downloads (history lives in the crawler's URL index)
+    amfi_crawler.save_index()
+    artifact_store.enforce_retention(PDF_DIR, keep=[p['local_path'] for p in downloaded + unchanged])
     metadata = {
         'last_scraped': datetime.now().isoformat(),
         'total_found': len(pdf_links),
         'downloaded': len(downloaded),
+        'unchanged': len(unchanged),
         'failed': len(failed),
         'pdfs': downloaded
     }
@@ -109,8 +184,15 @@ def download_pdfs(pdf_links, max_downloads=None):
         json.dump(metadata, f, indent=2)
     
     print(f"\n✅ Downloaded: {len(downloaded)}")
+    if unchanged:
+        print(f"= Unchanged content: {len(unchanged)}")
     print(f"❌ Failed: {len(failed)}")
     print(f"📄 Metadata saved to {METADATA_FILE}")
+    rate_limiter.save_health()
+    
+    if PARSE_QUEUE if enqueue is None else enqueue:
+        added = enqueue_parse_jobs(downloaded)
+        print(f"📨 Parse jobs queued: {added} new ({len(downloaded) - added} already known)")
     
     return downloaded, failed
 
@@ -119,13 +201,19 @@ if __name__ == "__main__":
     print("🏦 AMFI Portfolio PDF Scraper")
     print("=" * 60)
     
-    # Scrape PDF links
-    pdf_links = scrape_pdf_links()
+    # Scrape PDF links (--full: every listed disclosure, not just new/changed ones)
+    pdf_links = scrape_pdf_links(full='--full' in sys.argv)
     
-    if not pdf_links:
-        print("⚠️  No PDFs found. Check AMFI website structure.")
+    if pdf_links is None:
+        print("⚠️  Could not read the AMFI listing. Check AMFI website structure.")
+        instrumentation.finish()
         exit(1)
     
+    if not pdf_links:
+        print("✅ No new or changed disclosures since the last run")
+        instrumentation.print_summary(instrumentation.finish())
+        exit(0)
+    
     # Show first 5 for verification
     print("\n📋 Sample PDFs found:")
     for pdf in pdf_links[:5]:
@@ -141,3 +229,5 @@ if __name__ == "__main__":
         # Download only first 5 for testing
         print("\nDownloading first 5 PDFs for testing...")
         downloaded, failed = download_pdfs(pdf_links, max_downloads=5)
+    
+    instrumentation.print_summary(instrumentation.finish())
@@ -0,0 +1,319 @@
+"""
+Sector Exposure Analytics
+Dense fund x sector weight matrix with category/AMC roll-ups, percentiles and month-over-month drift.
+Writes a compact binary snapshot (JSON header + float32 arrays) that the API loads at startup.
+
+The latest month comes from fund_holdings (one scan); fund_holdings keeps only that month, so each
+fund's previous month is read from the history store. Securities there are canonical names without
+sectors: they take the sector the same security has this month, else the sector_mapping rules.
+
+Usage:
+  python sector_exposure.py        # rebuild analytics/sector_exposure.bin (the pipeline's exposure stage)
+"""
+
+import os
+import json
+import struct
+import numpy as np
+from datetime import datetime
+
+from classify_sectors import classify_security
+from securities import normalize_security
+import holdings_history
+import instrumentation
+import repository
+
+SECTOR_MAPPING_FILE = 'sector_mapping.json'
+SNAPSHOT_DIR = "analytics"
+SNAPSHOT_FILE = os.path.join(SNAPSHOT_DIR, "sector_exposure.bin")
+
+SNAPSHOT_MAGIC = b'SEXP'
+SNAPSHOT_VERSION = 1
+PERCENTILES = [25, 50, 75]
+UNCLASSIFIED = 'Unclassified'
+
+def load_sector_mapping():
+    """sector_mapping.json (sector axis and classification rules)"""
+    with open(SECTOR_MAPPING_FILE, 'r') as f:
+        return json.load(f)
+
+def load_sector_axis(mapping=None):
+    """Ordered sector axis from sector_mapping.json (plus Others / Unclassified)"""
+    mapping = mapping or load_sector_mapping()
+    sectors = list(mapping['sectorMapping'])
+    for rule in mapping['fallbackRules']:
+        if rule['sector'] not in sectors:
+            sectors.append(rule['sector'])
+    sectors.extend(['Others', UNCLASSIFIED])
+    return sectors
+
+def month_key(date):
+    """yyyymm integer for a report date"""
+    return date.year * 100 + date.month
+
+def load_holdings_columns(db, sectors):
+    """Read fund_holdings once into parallel NumPy columns, plus {canonical security: sector id}"""
+    sector_index = {sector: i for i, sector in enumerate(sectors)}
+    others = sector_index['Others']
+    unclassified = sector_index[UNCLASSIFIED]
+
+    codes, sector_ids, weights, months = [], [], [], []
+    security_sectors = {}
+    cursor = repository.fund_holdings(db).find(
+        {'schemeCode': {'$ne': None}, 'reportDate': {'$ne': None}},
+        {'_id': 0, 'schemeCode': 1, 'security': 1, 'sector': 1, 'weight': 1, 'reportDate': 1},
+        batch_size=10000
+    )
+    for doc in cursor:
+        sector = doc.get('sector')
+        sector_id = unclassified if sector is None else sector_index.get(sector, others)
+        codes.append(doc['schemeCode'])
+        sector_ids.append(sector_id)
+        weights.append(doc.get('weight') or 0.0)
+        months.append(month_key(doc['reportDate']))
+        if sector is not None:
+            security_sectors[normalize_security(doc.get('security'))] = sector_id
+
+    return (
+        np.asarray(codes, dtype=object),
+        np.asarray(sector_ids, dtype=np.int32),
+        np.asarray(weights, dtype=np.float32),
+        np.asarray(months, dtype=np.int32),
+        security_sectors
+    )
+
+def build_fund_matrices(codes, sector_ids, weights, months, num_sectors):
+    """Latest-month fund x sector matrix (summed weights, not row counts) and each fund's latest month"""
+    fund_codes, fund_idx = np.unique(codes, return_inverse=True)
+    num_funds = len(fund_codes)
+
+    latest = np.zeros(num_funds, dtype=np.int32)
+    np.maximum.at(latest, fund_idx, months)
+    is_latest = months == latest[fund_idx]
+
+    current_matrix = np.zeros((num_funds, num_sectors), dtype=np.float32)
+    np.add.at(current_matrix, (fund_idx[is_latest], sector_ids[is_latest]), weights[is_latest])
+    return fund_codes, current_matrix, latest
+
+def load_previous_matrix(fund_codes, latest_months, sectors, sector_of, root=None):
+    """Fund x sector matrix of the month before each fund's latest one, from the history store.
+    Returns (matrix, previous month yyyymm or 0 where history has no such month)"""
+    root = root or holdings_history.HISTORY_DIR
+    matrix = np.zeros((len(fund_codes), len(sectors)), dtype=np.float32)
+    previous = np.zeros(len(fund_codes), dtype=np.int32)
+    available = set(holdings_history.list_months(root))
+    codes = np.asarray([str(code) for code in fund_codes], dtype=object)
+
+    for latest in np.unique(latest_months):
+        month = holdings_history.add_months(datetime(latest // 100, latest % 100, 1), -1)
+        partition = holdings_history.month_partition(month)
+        if partition not in available:
+            continue
+        funds = np.flatnonzero(latest_months == latest)
+        data = holdings_history.decoded_month(partition, root)
+        rows = np.isin(data['schemeCode'], codes[funds])
+        if not rows.any():
+            continue
+
+        # One sector lookup per distinct security and one fund lookup per distinct scheme
+        securities, security_idx = np.unique(data['security'][rows], return_inverse=True)
+        row_sectors = np.asarray([sector_of(s) for s in securities], dtype=np.int32)[security_idx]
+        schemes, scheme_idx = np.unique(data['schemeCode'][rows], return_inverse=True)
+        fund_of_scheme = {code: i for i, code in zip(funds, codes[funds])}
+        row_funds = np.asarray([fund_of_scheme[s] for s in schemes], dtype=np.int64)[scheme_idx]
+
+        np.add.at(matrix, (row_funds, row_sectors), data['weight'][rows])
+        previous[np.unique(row_funds)] = month_key(month)
+    return matrix, previous
+
+def compute_drift(current_matrix, previous_matrix, previous_months):
+    """Total-variation drift (0-100 scale) per fund; NaN where no previous month exists"""
+    drift = 0.5 * np.abs(current_matrix - previous_matrix).sum(axis=1)
+    drift[previous_months == 0] = np.nan
+    return drift.astype(np.float32)
+
+def group_rollup(matrix, group_idx, num_groups, row_weights=None):
+    """Mean sector vector per group, optionally weighted (e.g. by AUM)"""
+    if row_weights is None:
+        row_weights = np.ones(matrix.shape[0], dtype=np.float64)
+
+    sums = np.zeros((num_groups, matrix.shape[1]), dtype=np.float64)
+    np.add.at(sums, group_idx, matrix * row_weights[:, None])
+    totals = np.bincount(group_idx, weights=row_weights, minlength=num_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / totals[:, None]).astype(np.float32)
+
+def group_percentiles(matrix, group_idx, num_groups):
+    """Per-group sector percentiles, shape (groups, len(PERCENTILES), sectors)"""
+    result = np.full((num_groups, len(PERCENTILES), matrix.shape[1]), np.nan, dtype=np.float32)
+    order = np.argsort(group_idx, kind='stable')
+    boundaries = np.searchsorted(group_idx[order], np.arange(num_groups + 1))
+
+    for group in range(num_groups):
+        rows = order[boundaries[group]:boundaries[group + 1]]
+        if len(rows):
+            result[group] = np.percentile(matrix[rows], PERCENTILES, axis=0)
+    return result
+
+def load_fund_metadata(db, fund_codes):
+    """Category, AMC and AUM for each fund on the axis"""
+    meta = {}
+    cursor = repository.funds(db).find(
+        {'schemeCode': {'$in': list(fund_codes)}},
+        {'schemeCode': 1, 'category': 1, 'amc': 1, 'fundHouse': 1, 'aum': 1}
+    )
+    for fund in cursor:
+        amc = fund.get('amc')
+        aum = fund.get('aum')
+        meta[fund['schemeCode']] = {
+            'category': fund.get('category') or 'unknown',
+            'amc': (amc.get('name') if isinstance(amc, dict) else amc) or fund.get('fundHouse') or 'unknown',
+            'aum': (aum.get('value') if isinstance(aum, dict) else aum) or 0.0
+        }
+    return meta
+
+def encode_groups(labels):
+    """Map labels to dense group ids"""
+    names, idx = np.unique(np.asarray(labels, dtype=object), return_inverse=True)
+    return [str(n) for n in names], idx
+
+def build_exposure(db, history_root=None):
+    """Compute all sector exposure arrays from one fund_holdings scan and the previous history month"""
+    mapping = load_sector_mapping()
+    sectors = load_sector_axis(mapping)
+    codes, sector_ids, weights, months, security_sectors = load_holdings_columns(db, sectors)
+    if len(codes) == 0:
+        return None
+
+    fund_codes, current, latest_months = build_fund_matrices(codes, sector_ids, weights, months, len(sectors))
+
+    sector_index = {sector: i for i, sector in enumerate(sectors)}
+    def sector_of(security):
+        """Sector id of a canonical security name"""
+        if security in security_sectors:
+            return security_sectors[security]
+        return sector_index.get(classify_security(security, mapping), sector_index['Others'])
+
+    previous, previous_months = load_previous_matrix(fund_codes, latest_months, sectors, sector_of, history_root)
+    meta = load_fund_metadata(db, fund_codes)
+    default = {'category': 'unknown', 'amc': 'unknown', 'aum': 0.0}
+
+    categories, category_idx = encode_groups([meta.get(c, default)['category'] for c in fund_codes])
+    amcs, amc_idx = encode_groups([meta.get(c, default)['amc'] for c in fund_codes])
+    aum = np.asarray([meta.get(c, default)['aum'] for c in fund_codes], dtype=np.float64)
+    aum_weights = aum if aum.any() else None
+
+    return {
+        'generatedAt': datetime.now().isoformat(),
+        'funds': [str(c) for c in fund_codes],
+        'sectors': sectors,
+        'categories': categories,
+        'amcs': amcs,
+        'percentiles': PERCENTILES,
+        'reportMonths': latest_months.tolist(),
+        'arrays': {
+            'fundWeights': current,
+            'fundDrift': compute_drift(current, previous, previous_months),
+            'fundCategory': category_idx.astype(np.float32),
+            'fundAmc': amc_idx.astype(np.float32),
+            'categoryMean': group_rollup(current, category_idx, len(categories)),
+            'categoryAumWeighted': group_rollup(current, category_idx, len(categories), aum_weights),
+            'categoryPercentiles': group_percentiles(current, category_idx, len(categories)),
+            'amcMean': group_rollup(current, amc_idx, len(amcs))
+        }
+    }
+
+def save_snapshot(exposure, path=SNAPSHOT_FILE):
+    """Write header + little-endian float32 arrays; layout is described in the JSON header"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    arrays = exposure['arrays']
+    header = {k: v for k, v in exposure.items() if k != 'arrays'}
+    header['arrays'] = []
+
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'].append({'name': name, 'shape': list(array.shape), 'offset': offset})
+        offset += array.size * 4
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(len(header_bytes) + 12) % 4)  # keep float32 data 4-byte aligned
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<HHI', SNAPSHOT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        for array in arrays.values():
+            f.write(np.ascontiguousarray(array, dtype='<f4').tobytes())
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+def mean_distribution(exposure, limit=10):
+    """[(sector, mean weight %)] across funds, largest first (weights, not row counts)"""
+    mean_weights = exposure['arrays']['fundWeights'].mean(axis=0)
+    return [(exposure['sectors'][i], float(mean_weights[i])) for i in np.argsort(mean_weights)[::-1][:limit]]
+
+def print_distribution(exposure, limit=10):
+    """Weight-based sector distribution of a snapshot"""
+    print("\n📊 Sector Distribution (mean weight across funds):")
+    for sector, weight in mean_distribution(exposure, limit):
+        print(f"  {sector:.<30} {weight:>6.2f}%")
+
+@instrumentation.stage('exposure')
+def refresh_snapshot(db=None, path=None):
+    """Rebuild the exposure snapshot the API loads; returns the exposure (None without holdings)"""
+    if db is None:
+        db = repository.get_db()
+    path = path or SNAPSHOT_FILE
+
+    with instrumentation.span('exposure', 'build'):
+        exposure = build_exposure(db)
+    if exposure is None:
+        print("⚠️  No holdings data found")
+        return None
+    with instrumentation.span('exposure', 'write'):
+        size = save_snapshot(exposure, path)
+    instrumentation.count('exposure', 'funds', len(exposure['funds']))
+
+    arrays = exposure['arrays']
+    print(f"✅ {len(exposure['funds'])} funds x {len(exposure['sectors'])} sectors")
+    print(f"   Categories: {len(exposure['categories'])}, AMCs: {len(exposure['amcs'])}")
+    drift = arrays['fundDrift']
+    if np.isfinite(drift).any():
+        print(f"   Median month-over-month drift: {np.nanmedian(drift):.2f}%")
+    print_distribution(exposure)
+    print(f"\n📁 Snapshot: {path} ({size / 1024:.1f} KB)")
+    return exposure
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """Read a snapshot back; arrays are zero-copy views over the file buffer"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[:4] != SNAPSHOT_MAGIC:
+        raise ValueError(f"Not a sector exposure snapshot: {path}")
+    version, _, header_len = struct.unpack('<HHI', data[4:12])
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {version}")
+
+    header = json.loads(data[12:12 + header_len])
+    base = 12 + header_len
+    arrays = {}
+    for spec in header.pop('arrays'):
+        count = int(np.prod(spec['shape']))
+        arrays[spec['name']] = np.frombuffer(
+            data, dtype='<f4', count=count, offset=base + spec['offset']
+        ).reshape(spec['shape'])
+
+    header['arrays'] = arrays
+    return header
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("📊 Sector Exposure Roll-up")
+    print("=" * 70)
+
+    refresh_snapshot()
+    instrumentation.print_summary(instrumentation.finish())
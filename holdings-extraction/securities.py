@@ -0,0 +1,47 @@
+"""
+Security & Scheme Name Normalization
+Canonical keys for security names and scheme variants across AMCs
+"""
+
+import re
+
+# Corporate suffixes that differ between AMC disclosures for the same issuer
+SECURITY_SUFFIXES = [
+    'limited', 'ltd', 'co', 'company', 'corporation', 'corp',
+    'inc', 'plc', 'pvt', 'private', 'equity shares', 'eq', 'the'
+]
+
+# Plan/option words that distinguish variants of one underlying portfolio
+SCHEME_VARIANT_WORDS = [
+    'direct', 'regular', 'plan', 'growth', 'idcw', 'dividend', 'payout',
+    'reinvestment', 'reinvest', 'option', 'bonus', 'monthly', 'quarterly',
+    'annual', 'weekly', 'daily', 'half yearly', 'transfer'
+]
+
+_PUNCTUATION_RE = re.compile(r'[^a-z0-9 ]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+_SUFFIX_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(s) for s in sorted(SECURITY_SUFFIXES, key=len, reverse=True)) + r')\b'
+)
+_VARIANT_RE = re.compile(
+    r'\b(' + '|'.join(re.escape(w) for w in sorted(SCHEME_VARIANT_WORDS, key=len, reverse=True)) + r')\b'
+)
+
+def normalize_security(security_name):
+    """Canonical key for a security name (e.g. 'Reliance Industries Ltd.' -> 'reliance industries')"""
+    if not security_name:
+        return None
+    name = str(security_name).lower().replace('&', ' and ')
+    name = _PUNCTUATION_RE.sub(' ', name)
+    name = _SUFFIX_RE.sub(' ', name)
+    name = _WHITESPACE_RE.sub(' ', name).strip()
+    return name or None
+
+def scheme_base_name(fund_name):
+    """Strip plan/option words so Direct/Regular and Growth/IDCW variants share one key"""
+    if not fund_name:
+        return None
+    name = _PUNCTUATION_RE.sub(' ', str(fund_name).lower())
+    name = _VARIANT_RE.sub(' ', name)
+    name = _WHITESPACE_RE.sub(' ', name).strip()
+    return name or None
@@ -0,0 +1,207 @@
+"""
+Security Reverse Index
+Inverted index: canonical security -> funds holding it, maintained incrementally at import time.
+
+Collection `security_holders`:
+    {
+      _id: 'reliance industries',                 # canonical security key
+      names: ['Reliance Industries Ltd', ...],     # names as disclosed by AMCs
+      holders: [{schemeCode, weight, reportDate}], # sorted by weight, descending
+      updatedAt: Date
+    }
+"""
+
+import sys
+import re
+import time
+from datetime import datetime
+from pymongo import UpdateOne, ReplaceOne, ASCENDING
+
+from securities import normalize_security
+import repository
+
+INDEX_COLLECTION = repository.SECURITY_HOLDERS
+BENCHMARK_COLLECTION = 'security_holders_benchmark'   # scratch copy built by benchmark(), dropped afterwards
+
+def create_indexes(db, name=INDEX_COLLECTION):
+    """Index posting lists by schemeCode so a fund's old postings can be found"""
+    repository.collection(name, db).create_index([('holders.schemeCode', ASCENDING)])
+
+def aggregate_postings(holdings):
+    """{canonical security: (weight, [display names])} for one fund's holdings"""
+    postings = {}
+    for holding in holdings:
+        name = holding.get('security')
+        key = normalize_security(name)
+        if not key:
+            continue
+        weight = holding.get('weight')
+        weight = 0.0 if weight is None or weight != weight else float(weight)
+        total, names = postings.get(key, (0.0, []))
+        if name not in names:
+            names.append(name)
+        postings[key] = (total + weight, names)
+    return postings
+
+def update_fund_postings(db, scheme_code, holdings, report_date):
+    """Replace one fund's entries in the reverse index; returns securities touched"""
+    if not scheme_code:
+        return 0
+
+    collection = repository.security_holders(db)
+    postings = aggregate_postings(holdings)
+    now = datetime.now()
+
+    previous = {doc['_id'] for doc in collection.find({'holders.schemeCode': scheme_code}, {'_id': 1})}
+
+    # Ordered: the $pull for a security must land before its $push
+    operations = []
+    for key in previous - set(postings):
+        operations.append(UpdateOne({'_id': key}, {'$pull': {'holders': {'schemeCode': scheme_code}}}))
+
+    for key, (weight, names) in postings.items():
+        if key in previous:
+            operations.append(UpdateOne({'_id': key}, {'$pull': {'holders': {'schemeCode': scheme_code}}}))
+        operations.append(UpdateOne(
+            {'_id': key},
+            {
+                '$push': {'holders': {
+                    '$each': [{'schemeCode': scheme_code, 'weight': weight, 'reportDate': report_date}],
+                    '$sort': {'weight': -1}
+                }},
+                '$addToSet': {'names': {'$each': names}},
+                '$set': {'updatedAt': now}
+            },
+            upsert=True
+        ))
+
+    repository.bulk_write_batched(collection, operations, ordered=True)
+
+    # Securities nobody holds any more
+    if previous - set(postings):
+        collection.delete_many({'_id': {'$in': list(previous - set(postings))}, 'holders': {'$size': 0}})
+
+    return len(previous | set(postings))
+
+def rebuild_index(db, name=INDEX_COLLECTION):
+    """Build the whole reverse index (or a scratch copy under another name) from fund_holdings in one pass"""
+    entries = {}
+    cursor = repository.fund_holdings(db).find(
+        {'schemeCode': {'$ne': None}},
+        {'_id': 0, 'schemeCode': 1, 'security': 1, 'weight': 1, 'reportDate': 1},
+        batch_size=10000
+    )
+
+    # Collect per fund first so split rows of one security are summed
+    funds = {}
+    for doc in cursor:
+        funds.setdefault(doc['schemeCode'], {'reportDate': doc.get('reportDate'), 'holdings': []})['holdings'].append(doc)
+
+    for scheme_code, fund in funds.items():
+        for key, (weight, names) in aggregate_postings(fund['holdings']).items():
+            entry = entries.setdefault(key, {'names': [], 'holders': []})
+            entry['names'].extend(n for n in names if n not in entry['names'])
+            entry['holders'].append({'schemeCode': scheme_code, 'weight': weight, 'reportDate': fund['reportDate']})
+
+    collection = repository.collection(name, db, bulk=True)
+    now = datetime.now()
+    operations = []
+    for key, entry in entries.items():
+        entry['holders'].sort(key=lambda h: h['weight'], reverse=True)
+        operations.append(ReplaceOne(
+            {'_id': key},
+            {'names': entry['names'], 'holders': entry['holders'], 'updatedAt': now},
+            upsert=True
+        ))
+        if len(operations) >= repository.BULK_BATCH_SIZE:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+    collection.delete_many({'_id': {'$nin': list(entries)}})
+    create_indexes(db, name)
+    return len(entries)
+
+def top_holders(db, security, limit=10, name=INDEX_COLLECTION):
+    """Top holders of a security with a single point read"""
+    doc = repository.collection(name, db).find_one(
+        {'_id': normalize_security(security)},
+        {'holders': {'$slice': limit}, 'names': 1}
+    )
+    return doc['holders'] if doc else []
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def benchmark(db, sample_size=100):
+    """Build time and point-read latency vs scanning fund_holdings, on a scratch copy (the live index is untouched)"""
+    try:
+        return _benchmark(db, sample_size)
+    finally:
+        db.drop_collection(BENCHMARK_COLLECTION)
+
+def _benchmark(db, sample_size):
+    """benchmark() body against BENCHMARK_COLLECTION"""
+    start = time.perf_counter()
+    securities = rebuild_index(db, BENCHMARK_COLLECTION)
+    build_seconds = time.perf_counter() - start
+
+    scratch = repository.collection(BENCHMARK_COLLECTION, db)
+    sample = [doc['names'][0] for doc in scratch.find({}, {'names': {'$slice': 1}}).limit(sample_size)]
+
+    index_times = []
+    scan_times = []
+    for security in sample:
+        start = time.perf_counter()
+        top_holders(db, security, name=BENCHMARK_COLLECTION)
+        index_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        list(repository.fund_holdings(db).find(
+            {'security': {'$regex': f"^{re.escape(security)}$", '$options': 'i'}},
+            {'schemeCode': 1, 'weight': 1}
+        ).sort('weight', -1).limit(10))
+        scan_times.append(time.perf_counter() - start)
+
+    return {
+        'securities': securities,
+        'buildSeconds': round(build_seconds, 3),
+        'queries': len(sample),
+        'indexP50Ms': round(1000 * percentile(index_times, 50), 3),
+        'indexP95Ms': round(1000 * percentile(index_times, 95), 3),
+        'scanP50Ms': round(1000 * percentile(scan_times, 50), 3),
+        'scanP95Ms': round(1000 * percentile(scan_times, 95), 3)
+    }
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("🔎 Security → Funds Reverse Index")
+    print("=" * 70)
+
+    db = repository.get_db()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'build':
+        start = time.perf_counter()
+        count = rebuild_index(db)
+        print(f"✅ Indexed {count} securities in {time.perf_counter() - start:.1f}s")
+
+    elif command == 'top' and len(sys.argv) > 2:
+        for holder in top_holders(db, ' '.join(sys.argv[2:])):
+            print(f"  {holder['schemeCode']:<12} {holder['weight']:>6.2f}%")
+
+    elif command == 'benchmark':
+        result = benchmark(db)
+        print(f"  Securities:        {result['securities']}")
+        print(f"  Build time:        {result['buildSeconds']}s")
+        print(f"  Point read p50/95: {result['indexP50Ms']} / {result['indexP95Ms']} ms")
+        print(f"  Scan p50/95:       {result['scanP50Ms']} / {result['scanP95Ms']} ms")
+
+    else:
+        print("Usage: python security_index.py [build|top <security>|benchmark]")
@@ -0,0 +1,313 @@
+"""
+Similar Fund Index
+MinHash/LSH candidate index over each fund's set of securities.
+Finds similar funds and near-duplicate scheme variants without an all-pairs scan;
+exact overlap is only computed for the LSH candidates.
+"""
+
+import os
+import sys
+import time
+import pickle
+import zlib
+import numpy as np
+from securities import normalize_security, scheme_base_name
+import repository
+
+INDEX_DIR = "indexes"
+INDEX_FILE = os.path.join(INDEX_DIR, "similarity_index.pkl")
+
+# 32 bands x 4 rows: funds with Jaccard >= ~0.45 collide in at least one band with high probability
+NUM_PERM = 128
+NUM_BANDS = 32
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+SEED = 42
+
+NEAR_DUPLICATE_THRESHOLD = 0.9
+MERSENNE_PRIME = (1 << 31) - 1
+EMPTY_HASH = np.uint64(MERSENNE_PRIME)
+
+_rng = np.random.RandomState(SEED)
+PERM_A = _rng.randint(1, MERSENNE_PRIME, size=NUM_PERM).astype(np.uint64)
+PERM_B = _rng.randint(0, MERSENNE_PRIME, size=NUM_PERM).astype(np.uint64)
+
+def new_index():
+    """Create an empty index"""
+    return {
+        'num_perm': NUM_PERM,
+        'num_bands': NUM_BANDS,
+        'seed': SEED,
+        'signatures': {},       # schemeCode -> np.uint64[NUM_PERM]
+        'securities': {},       # schemeCode -> frozenset of canonical securities
+        'fund_names': {},       # schemeCode -> fund name
+        'band_keys': {},        # schemeCode -> tuple of band keys (for removal)
+        'buckets': [dict() for _ in range(NUM_BANDS)],  # band -> {band bytes: set(schemeCode)}
+        'updated_at': None
+    }
+
+def minhash_signature(securities):
+    """Compute the MinHash signature of a set of canonical security names"""
+    if not securities:
+        return np.full(NUM_PERM, EMPTY_HASH, dtype=np.uint64)
+
+    # crc32 is stable across processes, unlike hash(), so signatures can be persisted
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) % MERSENNE_PRIME for s in securities),
+        dtype=np.uint64,
+        count=len(securities)
+    )
+    permuted = (np.outer(hashes, PERM_A) + PERM_B) % np.uint64(MERSENNE_PRIME)
+    return permuted.min(axis=0)
+
+def signature_bands(signature):
+    """Split a signature into LSH band keys"""
+    bands = signature.reshape(NUM_BANDS, ROWS_PER_BAND)
+    return tuple(band.tobytes() for band in bands)
+
+def remove_fund(index, scheme_code):
+    """Drop a fund from the index (used before re-adding changed holdings)"""
+    keys = index['band_keys'].pop(scheme_code, None)
+    if keys is None:
+        return False
+
+    for band, key in enumerate(keys):
+        bucket = index['buckets'][band].get(key)
+        if bucket:
+            bucket.discard(scheme_code)
+            if not bucket:
+                del index['buckets'][band][key]
+
+    index['signatures'].pop(scheme_code, None)
+    index['securities'].pop(scheme_code, None)
+    index['fund_names'].pop(scheme_code, None)
+    return True
+
+def add_fund(index, scheme_code, fund_name, securities):
+    """Add or replace a fund's holdings in the index"""
+    canonical = frozenset(filter(None, (normalize_security(s) for s in securities)))
+
+    # Unchanged holdings need no rehashing
+    if index['securities'].get(scheme_code) == canonical:
+        index['fund_names'][scheme_code] = fund_name
+        return False
+
+    remove_fund(index, scheme_code)
+
+    signature = minhash_signature(canonical)
+    keys = signature_bands(signature)
+
+    index['signatures'][scheme_code] = signature
+    index['securities'][scheme_code] = canonical
+    index['fund_names'][scheme_code] = fund_name
+    index['band_keys'][scheme_code] = keys
+
+    for band, key in enumerate(keys):
+        index['buckets'][band].setdefault(key, set()).add(scheme_code)
+
+    index['updated_at'] = time.time()
+    return True
+
+def query_candidates(index, scheme_code):
+    """Funds sharing at least one LSH band with the given fund"""
+    keys = index['band_keys'].get(scheme_code)
+    if keys is None:
+        return set()
+
+    candidates = set()
+    for band, key in enumerate(keys):
+        candidates.update(index['buckets'][band].get(key, ()))
+    candidates.discard(scheme_code)
+    return candidates
+
+def estimate_jaccard(index, code_a, code_b):
+    """Estimate Jaccard similarity from MinHash signatures"""
+    return float(np.mean(index['signatures'][code_a] == index['signatures'][code_b]))
+
+def exact_jaccard(set_a, set_b):
+    """Exact Jaccard similarity of two security sets"""
+    if not set_a and not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+def find_similar(index, scheme_code, min_similarity=0.5, limit=10):
+    """Similar funds ranked by exact overlap, computed only on LSH candidates"""
+    securities = index['securities'].get(scheme_code)
+    if securities is None:
+        return []
+
+    results = []
+    for candidate in query_candidates(index, scheme_code):
+        other = index['securities'][candidate]
+        similarity = exact_jaccard(securities, other)
+        if similarity >= min_similarity:
+            results.append({
+                'schemeCode': candidate,
+                'fundName': index['fund_names'].get(candidate),
+                'jaccard': round(similarity, 4),
+                'commonHoldings': len(securities & other)
+            })
+
+    results.sort(key=lambda r: r['jaccard'], reverse=True)
+    return results[:limit]
+
+def find_near_duplicates(index, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Groups of schemes that are variants of one portfolio (Direct/Regular, Growth/IDCW)"""
+    seen = set()
+    groups = []
+
+    for scheme_code in index['signatures']:
+        if scheme_code in seen:
+            continue
+
+        base_name = scheme_base_name(index['fund_names'].get(scheme_code))
+        group = [scheme_code]
+        for candidate in query_candidates(index, scheme_code):
+            if candidate in seen:
+                continue
+            similarity = exact_jaccard(index['securities'][scheme_code], index['securities'][candidate])
+            if similarity < threshold:
+                continue
+            group.append(candidate)
+
+        if len(group) > 1:
+            seen.update(group)
+            groups.append({
+                'baseName': base_name,
+                'sameBaseName': len({scheme_base_name(index['fund_names'].get(c)) for c in group}) == 1,
+                'schemeCodes': sorted(group, key=str)
+            })
+
+    return groups
+
+def save_index(index, path=INDEX_FILE):
+    """Persist the index to disk (atomic replace)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_index(path=INDEX_FILE):
+    """Load a persisted index, or an empty one if missing or built with other parameters"""
+    if not os.path.exists(path):
+        return new_index()
+
+    with open(path, 'rb') as f:
+        index = pickle.load(f)
+
+    if (index.get('num_perm'), index.get('num_bands'), index.get('seed')) != (NUM_PERM, NUM_BANDS, SEED):
+        print("⚠️  Index parameters changed, rebuilding from scratch")
+        return new_index()
+
+    return index
+
+def load_fund_securities(db, scheme_codes=None):
+    """Read {schemeCode: (fundName, [securities])} from fund_holdings"""
+    match = {'schemeCode': {'$ne': None}}
+    if scheme_codes is not None:
+        match['schemeCode'] = {'$in': list(scheme_codes)}
+
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': '$schemeCode',
+            'fundName': {'$first': '$fundName'},
+            'securities': {'$addToSet': '$security'}
+        }}
+    ]
+
+    return {
+        doc['_id']: (doc['fundName'], doc['securities'])
+        for doc in repository.fund_holdings(db).aggregate(pipeline, allowDiskUse=True)
+    }
+
+def update_index(db, scheme_codes=None, path=INDEX_FILE):
+    """Incrementally refresh the persisted index for changed funds (all funds if None)"""
+    index = load_index(path)
+    funds = load_fund_securities(db, scheme_codes)
+
+    changed = 0
+    for scheme_code, (fund_name, securities) in funds.items():
+        if add_fund(index, scheme_code, fund_name, securities):
+            changed += 1
+
+    # Funds that no longer have holdings
+    requested = set(scheme_codes) if scheme_codes is not None else set(index['signatures'])
+    for scheme_code in requested - set(funds):
+        if remove_fund(index, scheme_code):
+            changed += 1
+
+    save_index(index, path)
+    return index, changed
+
+def benchmark_against_exact(index, min_similarity=0.5, sample_size=200):
+    """Measure LSH recall and latency against an exact all-pairs scan"""
+    codes = list(index['securities'])
+    sample = codes[:sample_size]
+
+    lsh_times = []
+    exact_times = []
+    true_pairs = 0
+    found_pairs = 0
+
+    for scheme_code in sample:
+        start = time.perf_counter()
+        lsh_result = {r['schemeCode'] for r in find_similar(index, scheme_code, min_similarity, limit=len(codes))}
+        lsh_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        securities = index['securities'][scheme_code]
+        exact_result = {
+            other for other in codes
+            if other != scheme_code and exact_jaccard(securities, index['securities'][other]) >= min_similarity
+        }
+        exact_times.append(time.perf_counter() - start)
+
+        true_pairs += len(exact_result)
+        found_pairs += len(exact_result & lsh_result)
+
+    return {
+        'funds': len(codes),
+        'queries': len(sample),
+        'minSimilarity': min_similarity,
+        'recall': round(found_pairs / true_pairs, 4) if true_pairs else 1.0,
+        'lshMeanMs': round(1000 * float(np.mean(lsh_times)), 3) if lsh_times else 0.0,
+        'exactMeanMs': round(1000 * float(np.mean(exact_times)), 3) if exact_times else 0.0
+    }
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("🔗 Similar Fund Index (MinHash/LSH)")
+    print("=" * 70)
+
+    db = repository.get_db()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'build':
+        index, changed = update_index(db)
+        print(f"✅ Indexed {len(index['signatures'])} funds ({changed} changed)")
+        print(f"📁 Saved to: {INDEX_FILE}")
+
+    elif command == 'similar' and len(sys.argv) > 2:
+        index = load_index()
+        for result in find_similar(index, sys.argv[2]):
+            print(f"  {str(result['fundName'] or result['schemeCode'])[:45]:.<45} {result['jaccard']:>6.2%} ({result['commonHoldings']} common)")
+
+    elif command == 'duplicates':
+        index = load_index()
+        groups = find_near_duplicates(index)
+        print(f"📊 Found {len(groups)} near-duplicate groups")
+        for group in groups:
+            print(f"  • {group['baseName']}: {', '.join(map(str, group['schemeCodes']))}")
+
+    elif command == 'benchmark':
+        index = load_index()
+        result = benchmark_against_exact(index)
+        print(f"  Funds indexed:  {result['funds']}")
+        print(f"  Recall:         {result['recall']:.2%}")
+        print(f"  LSH query:      {result['lshMeanMs']} ms")
+        print(f"  Exact scan:     {result['exactMeanMs']} ms")
+
+    else:
+        print("Usage: python similarity_index.py [build|similar <schemeCode>|duplicates|benchmark]")
@@ -0,0 +1,128 @@
+"""
+Spreadsheet Portfolio Ingestion
+Reads XLSX/XLS/CSV portfolio disclosures directly (no PDF table extraction).
+Workbooks are streamed read-only, one sheet per scheme, and produce the same
+security/weight/market_value frames as parse_holdings.parse_pdf.
+"""
+
+import os
+import csv
+import re
+import time
+import pandas as pd
+
+import parse_holdings
+from parser_profiles import select_profile, normalize_header, record_parse
+
+SPREADSHEET_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+HEADER_SCAN_ROWS = 40
+SCHEME_NAME_RE = re.compile(r'(scheme\s*name|name\s*of\s*(the\s*)?scheme)\s*[:\-]?\s*(.+)', re.IGNORECASE)
+
+def is_spreadsheet(path):
+    """True for disclosure files this module can read"""
+    return path.lower().endswith(SPREADSHEET_EXTENSIONS)
+
+def iter_sheets(path):
+    """Yield (sheet name, row iterator) without loading whole workbooks into memory"""
+    lower = path.lower()
+
+    if lower.endswith('.csv'):
+        with open(path, 'r', newline='', encoding='utf-8-sig', errors='replace') as f:
+            yield os.path.splitext(os.path.basename(path))[0], csv.reader(f)
+
+    elif lower.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    elif lower.endswith('.xls'):
+        import xlrd
+        workbook = xlrd.open_workbook(path, on_demand=True)
+        try:
+            for index in range(workbook.nsheets):
+                sheet = workbook.sheet_by_index(index)
+                yield sheet.name, (sheet.row_values(r) for r in range(sheet.nrows))
+                workbook.unload_sheet(index)
+        finally:
+            workbook.release_resources()
+
+def read_sheet(rows, profile):
+    """Find the header row, then collect data rows; returns (scheme name or None, DataFrame or None)"""
+    scheme_name = None
+    header = None
+    data = []
+
+    for number, row in enumerate(rows):
+        values = ['' if v is None else v for v in row]
+
+        if header is None:
+            if number >= HEADER_SCAN_ROWS:
+                return scheme_name, None
+
+            # Scheme title lines usually sit above the header ("Scheme Name : HDFC Top 100 Fund")
+            for value in values:
+                if isinstance(value, str):
+                    match = SCHEME_NAME_RE.search(value)
+                    if match and not scheme_name:
+                        scheme_name = match.group(3).strip()
+
+            columns = [str(v).strip() for v in values]
+            mapping = profile['resolve'](columns)
+            if mapping['security'] is not None and mapping['weight'] is not None:
+                header = columns
+            continue
+
+        if any(v != '' for v in values):
+            data.append(values[:len(header)] + [''] * (len(header) - len(values)))
+
+    if header is None or not data:
+        return scheme_name, None
+
+    # Blank header cells get pandas-style names so the resolver ignores them
+    names = [c if c else f"Unnamed: {i}" for i, c in enumerate(header)]
+    return scheme_name, pd.DataFrame(data, columns=names)
+
+def scale_fractional_weights(df):
+    """Excel percentage cells hold fractions (0.0942); convert to percent when the column looks like it"""
+    weights = df['weight'].dropna()
+    if len(weights) and weights.max() <= 1.0 and weights.sum() <= 1.5:
+        df = df.copy()
+        df['weight'] = df['weight'] * 100
+    return df
+
+def parse_spreadsheet(path, fund_name=None):
+    """Extract holdings per scheme: list of (scheme name, holdings DataFrame)"""
+    print(f"📗 Parsing: {os.path.basename(path)[:50]}...", end=' ')
+
+    profile = select_profile(os.path.basename(path), fund_name)
+    results = []
+    start = time.perf_counter()
+
+    try:
+        for sheet_name, rows in iter_sheets(path):
+            scheme_name, table = read_sheet(rows, profile)
+            if table is None:
+                continue
+
+            holdings = parse_holdings.extract_holdings([table], profile)
+            if holdings is None or len(holdings) == 0:
+                continue
+
+            # Total rows would double the fund's weight
+            holdings = holdings[~holdings['security'].map(lambda s: normalize_header(s).endswith('total'))]
+            results.append((scheme_name or sheet_name, scale_fractional_weights(holdings)))
+
+    except Exception as e:
+        print(f"❌ {str(e)[:50]}")
+        results = []
+
+    total = sum(len(df) for _, df in results)
+    record_parse(profile['name'], time.perf_counter() - start, total, total > 0, engine='spreadsheet')
+    if not results:
+        return []
+    print(f"✅ {len(results)} schemes, {total} holdings [{profile['name']}]")
+    return results
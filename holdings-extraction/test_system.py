@@ -9,13 +9,12 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from pymongo import MongoClient
-from dotenv import load_dotenv
 import json
+import time
 
-load_dotenv()
-
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/mutual-funds')
+import holdings_stats
+import repository
+import sector_exposure
 
 def test_holdings_system():
     """Test the complete holdings system"""
@@ -25,74 +24,37 @@ def test_holdings_system():
     print("=" * 70)
     
     # Connect to MongoDB
-    print("\n[1/4] Testing MongoDB connection...")
+    print("\n[1/3] Testing MongoDB connection...")
     try:
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
-        db = client.get_database()
+        repository.configure(serverSelectionTimeoutMS=5000)
+        db = repository.get_db()
+        db.command('ping')
         print("✅ Connected to MongoDB")
     except Exception as e:
         print(f"❌ MongoDB connection failed: {e}")
         return False
     
-    # Check holdings collection
-    print("\n[2/4] Checking fund_holdings collection...")
-    holdings_collection = db['fund_holdings']
-    total_holdings = holdings_collection.count_documents({})
+    # Health report: stored by the import/classify stages (one $facet pass when missing)
+    print("\n[2/3] Loading holdings health report...")
+    holdings_collection = repository.fund_holdings(db)
+    started = time.perf_counter()
+    report = holdings_stats.load_report(db)
+    total_holdings = report['totalHoldings']
     
     if total_holdings > 0:
-        print(f"✅ Found {total_holdings} holdings records")
+        print(f"✅ Found {total_holdings} holdings records ({(time.perf_counter() - started) * 1000:.1f} ms)")
     else:
         print("⚠️  No holdings data found")
         print("   Run the pipeline first: python run_pipeline.py")
         return False
     
-    # Check unique funds with holdings
-    print("\n[3/4] Analyzing holdings data...")
-    pipeline = [
-        {'$group': {
-            '_id': '$schemeCode',
-            'fundName': {'$first': '$fundName'},
-            'count': {'$sum': 1},
-            'latestDate': {'$max': '$reportDate'}
-        }},
-        {'$sort': {'count': -1}},
-        {'$limit': 5}
-    ]
-    
-    top_funds = list(holdings_collection.aggregate(pipeline))
-    
-    print(f"\n📊 Top 5 Funds with Holdings:")
-    print("-" * 70)
-    for fund in top_funds:
-        scheme = fund['_id'] or 'N/A'
-        name = fund['fundName'][:45]
-        count = fund['count']
-        date = fund['latestDate'].strftime('%Y-%m-%d') if fund['latestDate'] else 'N/A'
-        print(f"  {name:.<45} {count:>3} holdings ({date})")
-    
-    # Test sector classification
-    print("\n[4/4] Checking sector classification...")
-    sectors = holdings_collection.distinct('sector')
-    classified = holdings_collection.count_documents({'sector': {'$exists': True, '$ne': None}})
-    
-    print(f"\n📈 Sector Distribution:")
-    print(f"  Total unique sectors: {len(sectors)}")
-    print(f"  Classified holdings: {classified}/{total_holdings}")
-    
-    if classified > 0:
-        print(f"  Coverage: {(classified/total_holdings*100):.1f}%")
-        
-        # Show top sectors
-        sector_stats = holdings_collection.aggregate([
-            {'$match': {'sector': {'$exists': True, '$ne': None}}},
-            {'$group': {'_id': '$sector', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}},
-            {'$limit': 5}
-        ])
-        
-        print("\n  Top 5 Sectors:")
-        for stat in sector_stats:
-            print(f"    • {stat['_id']:.<30} {stat['count']:>5} securities")
+    # Funds, sectors, staleness and AMC coverage all come from the same report
+    print("\n[3/3] Analyzing holdings data and sector classification...")
+    holdings_stats.print_report(report)
+    if os.path.exists(sector_exposure.SNAPSHOT_FILE):
+        sector_exposure.print_distribution(sector_exposure.load_snapshot())
+    else:
+        print("\n⚠️  No sector exposure snapshot yet: python holdings.py exposure")
     
     # Test sample query
     print("\n[BONUS] Testing sample holdings query...")
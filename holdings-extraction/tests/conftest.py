@@ -0,0 +1,43 @@
+"""
+Shared pytest fixtures
+Pipeline modules are flat scripts, so tests import them from the parent directory.
+"""
+
+import os
+import sys
+
+import mongomock
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_DIR)
+os.environ.setdefault('HOLDINGS_LOG_FILE', 'off')
+
+import repository
+
+@pytest.fixture
+def db():
+    """Fresh mongomock database installed as the shared repository client"""
+    repository.set_client(mongomock.MongoClient(), database='holdings_test')
+    yield repository.get_db()
+    repository.set_client(None)
+
+@pytest.fixture
+def add_holdings(db):
+    """Factory inserting one scheme's fund_holdings rows into `db`:
+    add_holdings(code, rows, report_date=None, fund_name='Fund <code>', **fields), where each row is a
+    security name or a (security, weight[, sector[, marketValue]]) tuple and fields are set on every row"""
+    def add(code, rows, report_date=None, fund_name=None, **fields):
+        documents = []
+        for row in rows:
+            values = (row,) if isinstance(row, str) else tuple(row)
+            security, weight, sector, market_value = values + (1.0, None, None)[len(values) - 1:]
+            document = {'schemeCode': code, 'fundName': fund_name or f"Fund {code}", 'security': security,
+                        'weight': weight, 'sector': sector, 'reportDate': report_date, **fields}
+            if market_value is not None:
+                document['marketValue'] = market_value
+            documents.append(document)
+        if documents:
+            repository.fund_holdings(db).insert_many(documents)
+        return documents
+    return add
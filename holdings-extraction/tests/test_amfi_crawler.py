@@ -0,0 +1,138 @@
+"""
+Incremental crawler tests against a local static server (supports If-Modified-Since)
+"""
+
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import amfi_crawler
+import rate_limiter
+import scrape_amfi_pdfs
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    def send_response(self, code, message=None):
+        self.server.responses.append((self.command, self.path, code))
+        super().send_response(code, message)
+
+    def log_message(self, *args):
+        pass
+
+def write(path, text, age=0):
+    """Write a file and date it `age` seconds in the past (Last-Modified has 1s resolution)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+def listing(*links):
+    return "<html><body>" + "".join(f'<a href="{href}">{text}</a>' for href, text in links) + "</body></html>"
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    """AMFI-like listing with archive and AMC sub-pages, served from tmp_path/site"""
+    root = tmp_path / 'site'
+    write(root / 'portfolio-disclosures.html', listing(
+        ('/files/hdfc_portfolio_may_2024.xlsx', 'HDFC Flexi Cap'),
+        ('/files/hdfc_portfolio_may_2024.pdf', 'HDFC Flexi Cap'),
+        ('/archive/2024.html', 'Archive 2024'),
+        ('/amc/sbi.html', 'SBI Mutual Fund AMC'),
+        ('/archive/missing.html', 'Archive 2023'),
+        ('/about.html', 'About us')
+    ), age=100)
+    write(root / 'archive' / '2024.html', listing(('/files/axis_portfolio_apr_2024.csv', 'Axis Bluechip')), age=100)
+    write(root / 'amc' / 'sbi.html', listing(('/files/sbi_portfolio_may_2024.pdf', 'SBI Bluechip')), age=100)
+    write(root / 'about.html', listing(('/files/not_followed_portfolio.pdf', 'x')), age=100)
+    for name in ['hdfc_portfolio_may_2024.xlsx', 'hdfc_portfolio_may_2024.pdf', 'axis_portfolio_apr_2024.csv', 'sbi_portfolio_may_2024.pdf']:
+        write(root / 'files' / name, f"content of {name}", age=100)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(CountingHandler, directory=str(root)))
+    server.responses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(amfi_crawler, '_state', {'index': None})
+    monkeypatch.setattr(rate_limiter, 'HEALTH_FILE', 'off')
+    monkeypatch.setattr(rate_limiter, '_sources', {})
+    monkeypatch.setitem(rate_limiter.SOURCES, 'amfi', {'initial_interval': 0, 'min_interval': 0})
+    monkeypatch.setattr(scrape_amfi_pdfs, 'AMFI_URL', f"http://127.0.0.1:{server.server_address[1]}/portfolio-disclosures.html")
+    server.root = root
+    yield server
+    server.shutdown()
+
+def filenames(links):
+    return sorted(link['filename'] for link in links)
+
+def test_first_crawl_follows_subpages(site):
+    links = scrape_amfi_pdfs.scrape_pdf_links()
+    # xlsx preferred over its PDF twin; /about.html isn't a listing page; the 404 archive is skipped
+    assert filenames(links) == ['axis_portfolio_apr_2024.csv', 'hdfc_portfolio_may_2024.xlsx', 'sbi_portfolio_may_2024.pdf']
+    assert all(link['change'] == 'new' for link in links)
+    index = amfi_crawler.load_index()
+    assert len(index['disclosures']) == 4
+    assert all(entry['firstSeen'] == entry['lastSeen'] for entry in index['disclosures'].values())
+
+def test_unchanged_site_costs_only_304s(site):
+    scrape_amfi_pdfs.download_pdfs(scrape_amfi_pdfs.scrape_pdf_links())
+    site.responses.clear()
+
+    assert scrape_amfi_pdfs.scrape_pdf_links() == []
+    codes = {path: code for _, path, code in site.responses}
+    assert codes['/portfolio-disclosures.html'] == 304
+    assert codes['/archive/2024.html'] == 304 and codes['/amc/sbi.html'] == 304
+    assert not any(path.startswith('/files/') for _, path, _ in site.responses)
+    assert len(scrape_amfi_pdfs.scrape_pdf_links(full=True)) == 3
+
+def test_only_new_and_changed_disclosures_are_emitted(site):
+    scrape_amfi_pdfs.download_pdfs(scrape_amfi_pdfs.scrape_pdf_links())
+
+    # A new month on the SBI page, and the Axis file re-published on the archive page
+    write(site.root / 'files' / 'sbi_portfolio_jun_2024.pdf', 'june')
+    write(site.root / 'amc' / 'sbi.html', listing(
+        ('/files/sbi_portfolio_may_2024.pdf', 'SBI Bluechip'),
+        ('/files/sbi_portfolio_jun_2024.pdf', 'SBI Bluechip')
+    ))
+    write(site.root / 'files' / 'axis_portfolio_apr_2024.csv', 'corrected content')
+    write(site.root / 'archive' / '2024.html', listing(('/files/axis_portfolio_apr_2024.csv', 'Axis Bluechip (revised)')))
+
+    links = scrape_amfi_pdfs.scrape_pdf_links()
+    assert {link['filename']: link['change'] for link in links} == {
+        'sbi_portfolio_jun_2024.pdf': 'new',
+        'axis_portfolio_apr_2024.csv': 'changed'
+    }
+    downloaded, _ = scrape_amfi_pdfs.download_pdfs(links)
+    assert filenames(downloaded) == ['axis_portfolio_apr_2024.csv', 'sbi_portfolio_jun_2024.pdf']
+
+def test_failed_download_stays_pending(site, monkeypatch):
+    links = scrape_amfi_pdfs.scrape_pdf_links()
+    scrape_amfi_pdfs.download_pdfs(links, max_downloads=1)
+    assert len(scrape_amfi_pdfs.scrape_pdf_links()) == 2
+
+def test_same_filename_in_different_directories(site):
+    # AMCs that publish a fixed filename under a directory per month
+    write(site.root / 'amc' / 'sbi.html', listing(
+        ('/files/sbi_portfolio_may_2024.pdf', 'SBI Bluechip'),
+        ('/sbi/2024/05/portfolio.pdf', 'SBI Bluechip'),
+        ('/sbi/2024/05/portfolio.xlsx', 'SBI Bluechip'),
+        ('/sbi/2024/06/portfolio.pdf', 'SBI Bluechip')
+    ))
+    write(site.root / 'sbi' / '2024' / '05' / 'portfolio.pdf', 'may pdf')
+    write(site.root / 'sbi' / '2024' / '05' / 'portfolio.xlsx', 'may workbook')
+    write(site.root / 'sbi' / '2024' / '06' / 'portfolio.pdf', 'june pdf')
+
+    links = scrape_amfi_pdfs.scrape_pdf_links()
+    months = sorted(link['url'].split('/sbi/')[1] for link in links if '/sbi/' in link['url'])
+    assert months == ['2024/05/portfolio.xlsx', '2024/06/portfolio.pdf']
+
+    downloaded, failed = scrape_amfi_pdfs.download_pdfs(links)
+    assert not failed
+    paths = [info['local_path'] for info in downloaded]
+    assert len(set(paths)) == len(paths) == 5
+    june = next(info for info in downloaded if info['url'].endswith('/06/portfolio.pdf'))
+    with scrape_amfi_pdfs.artifact_store.local_file(june['local_path']) as path, open(path) as f:
+        assert f.read() == 'june pdf'
+    assert scrape_amfi_pdfs.storage_name(june) == os.path.basename(june['local_path'])
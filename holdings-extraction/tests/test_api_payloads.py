@@ -0,0 +1,92 @@
+"""
+Pre-rendered API payload tests (mongomock)
+"""
+
+import os
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+import api_payloads
+import instrumentation
+import repository
+
+JAN = datetime(2026, 1, 1)
+FEB = datetime(2026, 2, 1)
+
+@pytest.fixture
+def payload_dir(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    return str(tmp_path / 'api')
+
+def read(directory, path, suffix=''):
+    with open(os.path.join(directory, path + suffix), 'rb') as f:
+        return f.read()
+
+def test_payloads_match_the_api_responses(db, payload_dir, add_holdings):
+    add_holdings(100, [('Infosys Ltd', 4.0, 'IT'), ('HDFC Bank Ltd', 8.5, 'Banking', 8.5e6), ('ICICI Bank Ltd', 6.0, 'Banking')],
+                 report_date=JAN)
+    add_holdings(100, [('Old Holding', 50.0, 'IT')], report_date=datetime(2025, 12, 1))
+
+    counts = api_payloads.publish_payloads(db, payload_dir)
+
+    assert counts['schemes'] == 1 and counts['written'] == 4
+    holdings = json.loads(read(payload_dir, 'holdings/100.json'))
+    assert holdings['schemeCode'] == '100'
+    assert holdings['reportDate'] == '2026-01-01T00:00:00.000Z'
+    assert [h['security'] for h in holdings['holdings']] == ['HDFC Bank Ltd', 'ICICI Bank Ltd', 'Infosys Ltd']
+    assert holdings['totalWeight'] == 18.5
+    assert json.loads(read(payload_dir, 'holdings/100/top.json'))['topHoldings'][0] == {
+        'security': 'HDFC Bank Ltd', 'weight': 8.5, 'marketValue': 8.5e6
+    }
+    assert json.loads(read(payload_dir, 'holdings/100/sectors.json'))['sectors'] == [
+        {'sector': 'Banking', 'weight': 14.5}, {'sector': 'IT', 'weight': 4.0}
+    ]
+    assert json.loads(read(payload_dir, 'holdings/stats.json'))['stats'] == {
+        'totalFundsWithHoldings': 1, 'totalHoldingsRecords': 4, 'latestReportDate': '2026-01-01T00:00:00.000Z'
+    }
+
+def test_encodings_decompress_to_the_body_with_content_etags(db, payload_dir, add_holdings):
+    add_holdings(100, [(f"Security {i} Ltd", 1.0, 'IT') for i in range(60)], report_date=JAN)
+    api_payloads.publish_payloads(db, payload_dir)
+
+    body = read(payload_dir, 'holdings/100.json')
+    assert gzip.decompress(read(payload_dir, 'holdings/100.json', '.gz')) == body
+    entry = api_payloads.load_manifest(payload_dir)['payloads']['holdings/100.json']
+    assert entry['etag'] == api_payloads.etag(body)
+    assert entry['gzip'] < entry['bytes']
+    if api_payloads.brotli is not None:
+        assert api_payloads.brotli.decompress(read(payload_dir, 'holdings/100.json', '.br')) == body
+        assert entry['br'] < entry['bytes']
+
+def test_only_changed_schemes_are_rerendered(db, payload_dir, add_holdings):
+    add_holdings(100, [('HDFC Bank Ltd', 8.5, 'Banking')], report_date=JAN)
+    add_holdings(200, [('Infosys Ltd', 4.0, 'IT')], report_date=JAN)
+    api_payloads.publish_payloads(db, payload_dir)
+    untouched = os.path.getmtime(os.path.join(payload_dir, 'holdings/200.json'))
+
+    counts = api_payloads.publish_payloads(db, payload_dir)
+    assert counts['rendered'] == 0 and counts['written'] == 0
+
+    repository.fund_holdings(db).delete_many({'schemeCode': 100})
+    add_holdings(100, [('ITC Ltd', 9.0, None)], report_date=FEB)
+    counts = api_payloads.publish_payloads(db, payload_dir)
+
+    # Scheme 100 re-rendered (its sector payload is gone), stats changed, scheme 200 left alone
+    assert counts['rendered'] == 1
+    assert counts['written'] == 3 and counts['removed'] == 1
+    assert not os.path.exists(os.path.join(payload_dir, 'holdings/100/sectors.json.gz'))
+    assert os.path.getmtime(os.path.join(payload_dir, 'holdings/200.json')) == untouched
+    assert json.loads(read(payload_dir, 'holdings/100.json'))['holdings'][0]['security'] == 'ITC Ltd'
+
+def test_removed_schemes_lose_their_payloads(db, payload_dir, add_holdings):
+    add_holdings(100, [('HDFC Bank Ltd', 8.5, 'Banking')], report_date=JAN)
+    api_payloads.publish_payloads(db, payload_dir)
+    repository.fund_holdings(db).delete_many({})
+
+    counts = api_payloads.publish_payloads(db, payload_dir)
+    assert counts['removed'] == 3
+    assert sorted(api_payloads.load_manifest(payload_dir)['payloads']) == ['holdings/stats.json']
+    assert not os.path.exists(os.path.join(payload_dir, 'holdings/100.json.br'))
@@ -0,0 +1,103 @@
+"""
+Compressed artifact store tests
+"""
+
+import os
+import json
+import time
+import hashlib
+
+import pytest
+
+import artifact_store
+
+pytestmark = pytest.mark.skipif(artifact_store.zstandard is None, reason='zstandard not installed')
+
+def parsed_output(i):
+    securities = [f"Security {(i * 7 + n) % 300} Ltd" for n in range(40)]
+    return {
+        'fund_name': f"Acme Fund {i}",
+        'report_date': '2026-01-01',
+        'columns': {'security': securities, 'weight': [2.5] * 40, 'market_value': [None] * 40}
+    }
+
+def test_json_round_trip_is_compressed(tmp_path):
+    path = str(tmp_path / 'acme.json')
+    artifact_store.write_json(path, parsed_output(1))
+
+    assert not os.path.exists(path)
+    assert os.path.exists(path + '.zst')
+    assert artifact_store.list_artifacts(str(tmp_path), '.json') == ['acme.json']
+    assert artifact_store.read_json(path) == parsed_output(1)
+
+def test_incompressible_binaries_stay_plain(tmp_path):
+    path = str(tmp_path / 'scan.pdf')
+    data = os.urandom(4096)
+    artifact_store.write_bytes(path, data)
+
+    assert artifact_store.stored_path(path) == path
+    assert artifact_store.read_bytes(path) == data
+
+def test_local_file_and_hash_see_plain_content(tmp_path):
+    path = str(tmp_path / 'portfolio.csv')
+    data = b'Name of the Instrument,% to NAV\n' + b'HDFC Bank Ltd,8.5\n' * 200
+    artifact_store.write_bytes(path, data)
+    assert artifact_store.stored_path(path).endswith('.zst')
+
+    with artifact_store.local_file(path) as local_path:
+        assert os.path.basename(local_path) == 'portfolio.csv'
+        with open(local_path, 'rb') as f:
+            assert f.read() == data
+    assert not os.path.exists(local_path)
+    assert artifact_store.sha256(path) == hashlib.sha256(data).hexdigest()
+
+def test_plain_files_from_before_the_store_still_read(tmp_path):
+    path = tmp_path / 'old.json'
+    path.write_text(json.dumps({'holdings': []}, indent=2))
+    assert artifact_store.read_json(str(path)) == {'holdings': []}
+
+def test_trained_dictionary_shrinks_small_outputs(tmp_path):
+    directory = str(tmp_path)
+    for i in range(40):
+        artifact_store.write_json(os.path.join(directory, f"fund_{i}.json"), parsed_output(i))
+    without = os.path.getsize(os.path.join(directory, 'fund_0.json.zst'))
+
+    dict_id = artifact_store.maybe_train(directory)
+    assert dict_id
+    artifact_store.write_json(os.path.join(directory, 'fund_100.json'), parsed_output(100))
+    artifact_store.write_json(os.path.join(directory, 'fund_0.json'), parsed_output(0))
+
+    assert os.path.getsize(os.path.join(directory, 'fund_0.json.zst')) < without
+    assert artifact_store.read_json(os.path.join(directory, 'fund_100.json')) == parsed_output(100)
+    # Not retrained until RETRAIN_EVERY more outputs were written
+    assert artifact_store.maybe_train(directory) is None
+
+    # Another process (empty cache) finds the dictionary through the frame header
+    artifact_store._dictionaries.clear()
+    assert artifact_store.read_json(os.path.join(directory, 'fund_0.json')) == parsed_output(0)
+
+def test_retention_by_age_and_size(tmp_path):
+    directory = str(tmp_path)
+    now = time.time()
+    for i, age_days in enumerate([500, 30, 20, 10, 1]):
+        path = os.path.join(directory, f"f{i}.pdf")
+        artifact_store.write_bytes(path, os.urandom(100_000))
+        os.utime(path, (now - age_days * 86400,) * 2)
+    (tmp_path / '_summary.json').write_text('{}')
+
+    removed, _ = artifact_store.enforce_retention(directory, max_age_days=400, max_mb=0)
+    assert removed == 1
+    assert not os.path.exists(os.path.join(directory, 'f0.pdf'))
+
+    # 4 x ~98 KB against a 0.2 MB cap: oldest go first, kept files are never removed
+    removed, _ = artifact_store.enforce_retention(directory, max_age_days=0, max_mb=0.2, keep=[os.path.join(directory, 'f1.pdf')])
+    assert removed == 2
+    assert artifact_store.list_artifacts(directory) == ['f1.pdf', 'f4.pdf']
+    assert os.path.exists(tmp_path / '_summary.json')
+
+def test_compression_off_writes_plain_indented_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, 'COMPRESSION', 'off')
+    path = str(tmp_path / 'acme.json')
+    artifact_store.write_json(path, {'fund_name': 'Acme'})
+    with open(path) as f:
+        assert f.read() == '{\n  "fund_name": "Acme"\n}'
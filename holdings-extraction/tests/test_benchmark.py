@@ -0,0 +1,55 @@
+"""
+Synthetic corpus and end-to-end benchmark tests
+"""
+
+import argparse
+import json
+import os
+
+import pytest
+
+pytest.importorskip('pdfplumber')
+
+import benchmark
+import generate_fixtures
+import repository
+
+def test_corpus_is_deterministic_per_seed(tmp_path):
+    first = generate_fixtures.generate_corpus(str(tmp_path / 'a'), funds=3, holdings=20, months=2, formats=('csv',), seed=7)
+    generate_fixtures.generate_corpus(str(tmp_path / 'b'), funds=3, holdings=20, months=2, formats=('csv',), seed=7)
+
+    assert (first['files'], first['rows']) == (6, 120)
+    for name in sorted(os.listdir(tmp_path / 'a' / 'disclosures')):
+        assert (tmp_path / 'a' / 'disclosures' / name).read_bytes() == (tmp_path / 'b' / 'disclosures' / name).read_bytes()
+    with open(tmp_path / 'a' / 'funds.json') as f:
+        assert [fund['schemeCode'] for fund in json.load(f)] == ['100000', '100001', '100002']
+
+def test_listing_links_every_disclosure_and_the_pdf_twin_of_workbooks(tmp_path):
+    generate_fixtures.generate_corpus(str(tmp_path), funds=2, holdings=10, months=1, formats=('xlsx', 'pdf'))
+    listing = (tmp_path / 'portfolio-disclosures.html').read_text()
+
+    for name in os.listdir(tmp_path / 'disclosures'):
+        assert f'href="/disclosures/{name}"' in listing
+    assert listing.count('href=') == 3
+
+def test_run_reports_every_stage(tmp_path):
+    args = argparse.Namespace(
+        funds=3, holdings=20, months=1, formats='pdf,xlsx,csv', seed=42, mongo='mongomock',
+        stages=','.join(benchmark.STAGES), label='test', keep=False, startup_repeats=0, verbose=False
+    )
+    try:
+        report = benchmark.run_benchmark(args)
+    finally:
+        repository.set_client(None)
+
+    stages = report['stages']
+    assert list(stages) == benchmark.STAGES
+    assert stages['scrape']['links'] == 3 and stages['scrape']['items'] == 3
+    assert (stages['parse']['items'], stages['parse']['rows']) == (3, 60)
+    assert stages['import']['documents'] == 60
+    assert stages['parse']['latencyMs']['p95'] >= stages['parse']['latencyMs']['p50']
+
+def test_latency_summary_percentiles():
+    summary = benchmark.latency_summary([0.001 * i for i in range(1, 101)])
+    assert (summary['p50'], summary['max']) == (50.5, 100.0)
+    assert benchmark.latency_summary([]) is None
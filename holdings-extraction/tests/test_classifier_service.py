@@ -0,0 +1,74 @@
+"""
+Online classifier tests (mongomock, polling follower)
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+import classifier_service
+import classify_sectors
+import holdings_stats
+import repository
+from conftest import PACKAGE_DIR
+
+@pytest.fixture
+def service(db, tmp_path, monkeypatch):
+    """Polling follower with a scratch state file and no settle delay"""
+    monkeypatch.setattr(classifier_service, 'STATE_FILE', str(tmp_path / 'classifier_service.json'))
+    monkeypatch.setattr(classifier_service, 'POLL_SETTLE', -5)
+    monkeypatch.setattr(classifier_service, 'BATCH_SIZE', 2)
+    monkeypatch.setattr(classify_sectors, 'SECTOR_MAPPING_FILE', os.path.join(PACKAGE_DIR, 'sector_mapping.json'))
+    monkeypatch.setattr(classifier_service, '_stats', {'dirty': False, 'refreshed': None})
+    return repository.fund_holdings(db)
+
+def insert(collection, *securities, **fields):
+    collection.insert_many([
+        {'schemeCode': 1, 'security': security, 'importedAt': datetime.now(), **fields}
+        for security in securities
+    ])
+
+def test_poll_classifies_new_holdings(service):
+    insert(service, 'HDFC Bank Ltd', 'Infosys Ltd', 'Zzyzx Holdings')
+    insert(service, 'Manually Tagged Ltd', sector='Energy')
+
+    assert classifier_service.run_service(mode='poll', once=True) == 3
+    assert service.count_documents({'sector': None}) == 0
+    assert service.find_one({'security': 'Manually Tagged Ltd'})['sector'] == 'Energy'
+
+    state = classifier_service.load_state()
+    assert state['lastId'] == str(service.find_one(sort=[('_id', -1)])['_id'])
+
+def test_poll_resumes_from_high_water_mark(service):
+    insert(service, 'HDFC Bank Ltd')
+    classifier_service.run_service(mode='poll', once=True)
+
+    # Documents behind the high-water mark are not read again
+    service.update_many({}, {'$unset': {'sector': ''}})
+    insert(service, 'Infosys Ltd')
+    assert classifier_service.run_service(mode='poll', once=True) == 1
+    assert service.find_one({'security': 'HDFC Bank Ltd'}).get('sector') is None
+    assert service.find_one({'security': 'Infosys Ltd'})['sector'] is not None
+
+def test_stored_stats_follow_classification(service, db, monkeypatch):
+    insert(service, 'HDFC Bank Ltd', 'Infosys Ltd', 'Zzyzx Holdings')
+    refreshes = []
+    original = holdings_stats.refresh
+    monkeypatch.setattr(holdings_stats, 'refresh', lambda db: refreshes.append(1) or original(db))
+
+    classifier_service.run_service(mode='poll', once=True)
+
+    # Two micro-batches: the first refreshes, the second is inside the interval, exit refreshes again
+    assert len(refreshes) == 2
+    assert holdings_stats.load_report(db, compute_missing=False)['classifiedHoldings'] == 3
+    assert not classifier_service.refresh_stats(service, force=True)
+
+def test_classify_batch_does_not_overwrite(service):
+    insert(service, 'Zzyzx Holdings')
+    document = service.find_one()
+    service.update_one({'_id': document['_id']}, {'$set': {'sector': 'Banking'}})
+
+    classifier = classifier_service.load_classifier()
+    assert classifier_service.classify_batch(service, classifier, [document]) == 0
+    assert service.find_one()['sector'] == 'Banking'
@@ -0,0 +1,96 @@
+"""
+Sharded reclassification backfill tests (mongomock, in-process workers)
+"""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import classify_sectors
+import holdings_stats
+import repository
+from conftest import PACKAGE_DIR
+
+@pytest.fixture
+def holdings(db, tmp_path, monkeypatch):
+    """40 holdings, half with a stale sector, and a scratch checkpoint dir and mapping file"""
+    mapping_file = tmp_path / 'sector_mapping.json'
+    with open(os.path.join(PACKAGE_DIR, 'sector_mapping.json')) as f:
+        mapping_file.write_text(f.read())
+    monkeypatch.setattr(classify_sectors, 'SECTOR_MAPPING_FILE', str(mapping_file))
+    monkeypatch.setattr(classify_sectors, 'BACKFILL_DIR', str(tmp_path / 'backfill'))
+    monkeypatch.setattr(classify_sectors, 'BACKFILL_BATCH_SIZE', 3)
+
+    collection = repository.fund_holdings(db)
+    collection.insert_many([
+        {'schemeCode': i % 4, 'security': name, 'reportDate': datetime(2024, 5, 1),
+         **({'sector': 'Stale'} if i % 2 else {})}
+        for i, name in enumerate(['HDFC Bank Ltd', 'Infosys Ltd', 'Zzyzx Holdings', 'Reliance Industries Ltd'] * 10)
+    ])
+    return collection
+
+def expected(collection):
+    mapping = classify_sectors.load_sector_mapping()
+    return {doc['_id']: classify_sectors.classify_security(doc['security'], mapping) for doc in collection.find()}
+
+def test_plan_covers_every_document(holdings):
+    shards = classify_sectors.plan_shards(holdings, 4)
+    assert shards[0]['lower'] is None and shards[-1]['upper'] is None
+    assert all(a['upper'] == b['lower'] for a, b in zip(shards, shards[1:]))
+
+def test_backfill_rewrites_only_changed(holdings):
+    result = classify_sectors.backfill_sectors(shards=4)
+    assert result['scanned'] == 40
+    assert result['changed'] == 40
+    assert {doc['_id']: doc['sector'] for doc in holdings.find()} == expected(holdings)
+
+    # Same mapping again: already complete, nothing scanned
+    assert classify_sectors.backfill_sectors(shards=4)['scanned'] == 0
+    # Forced rerun scans everything but writes nothing
+    rerun = classify_sectors.backfill_sectors(shards=4, restart=True)
+    assert rerun['scanned'] == 40 and rerun['changed'] == 0
+
+def test_backfill_resumes_after_interruption(holdings, monkeypatch):
+    real_bulk_write = repository.bulk_write_batched
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError('connection lost')
+        return real_bulk_write(*args, **kwargs)
+
+    monkeypatch.setattr(repository, 'bulk_write_batched', flaky)
+    with pytest.raises(RuntimeError):
+        classify_sectors.backfill_sectors(shards=2)
+
+    # The first two batches were checkpointed before the failure
+    run_dir = os.path.join(classify_sectors.BACKFILL_DIR, os.listdir(classify_sectors.BACKFILL_DIR)[0])
+    checkpoint = classify_sectors.load_json(classify_sectors.shard_checkpoint_file(run_dir, 0))
+    assert checkpoint['scanned'] == 6 and not checkpoint['done']
+
+    monkeypatch.setattr(repository, 'bulk_write_batched', real_bulk_write)
+    resumed = classify_sectors.backfill_sectors(shards=2)
+    assert resumed['scanned'] == 40
+    assert {doc['_id']: doc['sector'] for doc in holdings.find()} == expected(holdings)
+
+def test_mapping_change_starts_new_plan(holdings):
+    classify_sectors.backfill_sectors(shards=2)
+    mapping = classify_sectors.load_sector_mapping()
+    mapping['sectorMapping'].setdefault('Conglomerate', []).append('Zzyzx')
+    with open(classify_sectors.SECTOR_MAPPING_FILE, 'w') as f:
+        json.dump(mapping, f)
+
+    result = classify_sectors.backfill_sectors(shards=2)
+    assert result['scanned'] == 40
+    assert result['changed'] == 10
+    assert holdings.count_documents({'sector': 'Conglomerate'}) == 10
+
+def test_backfill_refreshes_the_stored_stats(holdings, db):
+    holdings_stats.refresh(db)
+    classify_sectors.backfill_sectors(shards=2)
+
+    sectors = {s['sector'] for s in holdings_stats.load_report(db, compute_missing=False)['sectors']}
+    assert 'Stale' not in sectors and sectors
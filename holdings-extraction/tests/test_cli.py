@@ -0,0 +1,90 @@
+"""
+Unified CLI tests: lazy per-subcommand imports and the startup report
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import holdings
+from conftest import PACKAGE_DIR
+
+HEAVY = ['pandas', 'pdfplumber', 'tabula', 'bs4', 'pymongo', 'openpyxl']
+
+def imported_by(command):
+    """Heavy modules in sys.modules after a fresh interpreter loads one subcommand's modules"""
+    code = f"import sys, holdings; holdings.load_modules({[command]!r}); print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+@pytest.mark.parametrize('command, allowed', [
+    ('scrape', {'bs4'}),
+    ('classify', {'pymongo'}),
+    ('import', {'pymongo'}),
+    ('exposure', {'pymongo'}),
+    ('parse', {'pandas', 'pdfplumber'}),
+])
+def test_subcommands_import_only_what_they_need(command, allowed):
+    assert imported_by(command) <= allowed
+
+def test_every_command_is_wired():
+    commands = set(holdings.build_parser()._subparsers._group_actions[0].choices)
+    assert commands == set(holdings.RUNNERS) | {'run'}
+    assert set(holdings.STAGE_MODULES) == set(holdings.RUNNERS)
+    assert set(holdings.STAGES) <= set(holdings.STAGE_TITLES)
+
+def test_startup_only_reports_and_exits(tmp_path):
+    env = dict(os.environ, HOLDINGS_LOG_FILE='off', HOLDINGS_METRICS_DIR=str(tmp_path))
+    result = subprocess.run([sys.executable, 'holdings.py', 'classify', '--startup-only'], cwd=PACKAGE_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report['command'] == 'classify' and report['startupMs'] > 0
+
+def test_unknown_stage_is_rejected(capsys):
+    assert holdings.main(['run', '--stages', 'scrape,bogus']) == 2
+    assert 'bogus' in capsys.readouterr().out
+
+class FakeScraper:
+    def __init__(self):
+        self.enqueue = 'unset'
+
+    def scrape_pdf_links(self, full=False):
+        return [{'filename': 'a.pdf'}]
+
+    def download_pdfs(self, links, max_downloads=None, enqueue=None):
+        self.enqueue = enqueue
+
+class FakeParser:
+    def __init__(self):
+        self.calls = []
+
+    def parse_all_pdfs(self):
+        self.calls.append('local')
+
+    def drain_parse_queue(self, processes, db):
+        self.calls.append(('queue', processes))
+        return 0
+
+@pytest.mark.parametrize('argv, enqueue, parsed', [
+    (['run'], False, ['local']),
+    (['run', '--queue', '--processes', '3'], True, [('queue', 3)]),
+])
+def test_run_takes_one_parse_path(argv, enqueue, parsed, monkeypatch):
+    monkeypatch.setattr(holdings, 'get_db', lambda: None)
+    monkeypatch.setattr(holdings, 'PARSE_QUEUE', False)
+    modules = {'scrape_amfi_pdfs': FakeScraper(), 'parse_holdings': FakeParser()}
+    args = holdings.build_parser().parse_args(argv)
+
+    holdings.run_scrape(modules, args)
+    holdings.run_parse(modules, args)
+
+    assert modules['scrape_amfi_pdfs'].enqueue is enqueue
+    assert modules['parse_holdings'].calls == parsed
+
+def test_scrape_alone_defers_to_the_environment():
+    scraper = FakeScraper()
+    holdings.run_scrape({'scrape_amfi_pdfs': scraper}, holdings.build_parser().parse_args(['scrape']))
+    assert scraper.enqueue is None
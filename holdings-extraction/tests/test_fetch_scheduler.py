@@ -0,0 +1,156 @@
+"""
+Fetch scheduler tests (mongomock, stub fetcher)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import fetch_scheduler
+import holdings_history
+import instrumentation
+import rate_limiter
+import repository
+
+NOW = datetime(2026, 3, 15, 12, 0)
+
+@pytest.fixture
+def scheduler(db, tmp_path, monkeypatch):
+    """Scratch scheduler state, no source-health file"""
+    monkeypatch.setattr(fetch_scheduler, 'STATE_FILE', str(tmp_path / 'fetch_scheduler.json'))
+    monkeypatch.setattr(rate_limiter, 'HEALTH_FILE', 'off')
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setattr(holdings_history, 'DISCLOSURE_DAY', 10)
+    return db
+
+@pytest.fixture
+def add_fund(scheduler, add_holdings):
+    """A scheme with AUM/popularity, holding one security as of report_date (none without one)"""
+    def add(code, aum=0, popularity=0, report_date=None):
+        repository.funds(scheduler).insert_one({'schemeCode': code, 'schemeName': f"Fund {code}", 'aum': aum, 'popularity': popularity})
+        if report_date:
+            add_holdings(code, ['X'], report_date)
+    return add
+
+def test_disclosure_dates():
+    # January's portfolio is due on 10 February; holding it, March's is the next one we need
+    assert fetch_scheduler.disclosure_due(datetime(2026, 1, 1)) == datetime(2026, 2, 10)
+    assert fetch_scheduler.next_due(datetime(2025, 12, 1)) == datetime(2026, 2, 10)
+    assert fetch_scheduler.freshness_lag(datetime(2026, 2, 1), NOW) == 0.0
+    assert fetch_scheduler.freshness_lag(datetime(2026, 1, 1), NOW) == 5.5 * 86400
+    assert fetch_scheduler.freshness_lag(None, NOW) is None
+
+def test_queue_orders_by_importance_and_staleness(scheduler, add_fund):
+    add_fund(1, aum=50000, report_date=datetime(2026, 1, 1))     # big, a month overdue
+    add_fund(2, aum=100, report_date=datetime(2026, 1, 1))       # small, same lag
+    add_fund(3, aum=50000, report_date=datetime(2026, 2, 1))     # big but fresh
+    add_fund(4, popularity=10)                                   # never fetched
+
+    queue, next_at = fetch_scheduler.build_queue(fetch_scheduler.load_state(), now=NOW)
+
+    order = [entry[2] for entry in sorted(queue)]
+    assert 3 not in order
+    assert order.index(1) < order.index(2)
+    assert set(order) == {1, 2, 4}
+    assert next_at == datetime(2026, 4, 10)
+    assert instrumentation.summary()['stages']['fetch_scheduler']['gauges']['queue_depth'] == 3
+
+def test_failed_fetch_backs_off(scheduler, add_fund):
+    add_fund(1, report_date=datetime(2026, 1, 1))
+    state = fetch_scheduler.load_state()
+
+    fetch_scheduler.record_attempt(state, 1, ok=False, now=NOW)
+    fetch_scheduler.record_attempt(state, 1, ok=False, now=NOW)
+    assert state['schemes']['1']['failures'] == 2
+    assert state['schemes']['1']['retryAt'] == (NOW + timedelta(hours=2 * fetch_scheduler.RETRY_HOURS)).isoformat()
+
+    queue, next_at = fetch_scheduler.build_queue(state, now=NOW)
+    assert queue == []
+    assert next_at == datetime.fromisoformat(state['schemes']['1']['retryAt'])
+
+    fetch_scheduler.record_attempt(state, 1, ok=True, now=NOW)
+    assert state['schemes']['1']['failures'] == 0
+
+def test_budget_wait(monkeypatch):
+    monkeypatch.setattr(fetch_scheduler, 'BUDGET_PER_HOUR', 120)
+    state = {'requests': [[1000.0, 60], [2000.0, 50]], 'fetchCost': 2.0}
+    assert fetch_scheduler.budget_wait(state, 5, now=2500.0) == 0.0
+    # 122 would be over budget until the 60 from t=1000 expire at t=4600
+    assert fetch_scheduler.budget_wait(state, 12, now=2500.0) == 4600.0 - 2500.0
+    # Entries older than an hour no longer count
+    assert fetch_scheduler.budget_wait(state, 12, now=4700.0) == 0.0
+    assert state['requests'] == [[2000.0, 50]]
+
+def test_run_fetches_highest_priority_first_within_budget(scheduler, monkeypatch, add_fund):
+    monkeypatch.setattr(fetch_scheduler, 'BUDGET_PER_HOUR', 5)
+    for code, aum in [(1, 10), (2, 100000), (3, 1000), (4, 1)]:
+        add_fund(code, aum=aum, report_date=datetime(2025, 6, 1))
+
+    fetched = []
+    def fetch(code, name):
+        # Two HTTP requests per fund, like a MoneyControl search + portfolio page
+        rate_limiter.record('moneycontrol', 200, 0.01)
+        rate_limiter.record('moneycontrol', 200, 0.01)
+        fetched.append(code)
+        return code != 3
+
+    counts = fetch_scheduler.run_scheduler(scheduler, fetch=fetch, once=True)
+
+    # 5 requests/hour fit two 2-request fetches; the third would exceed the budget
+    assert fetched == [2, 3]
+    assert counts == {'fetched': 1, 'failed': 1}
+    state = fetch_scheduler.load_state()
+    assert sum(n for _, n in state['requests']) == 4
+    assert state['schemes']['3']['failures'] == 1
+
+    # Next run: budget still spent within the hour
+    assert fetch_scheduler.run_scheduler(scheduler, fetch=fetch, once=True) == {'fetched': 0, 'failed': 0}
+
+def test_max_fetches_counts_successes_only(scheduler, add_fund):
+    for code in range(1, 7):
+        add_fund(code, aum=1000 * (7 - code), report_date=datetime(2026, 1, 1))
+    fetched = []
+
+    def fetch(code, name):
+        fetched.append(code)
+        return code % 2 == 0
+
+    # Failures don't use up max_fetches; max_attempts still bounds the pass
+    assert fetch_scheduler.run_scheduler(scheduler, fetch=fetch, once=True, max_fetches=2) == {'fetched': 2, 'failed': 2}
+    assert fetched == [1, 2, 3, 4]
+    assert fetch_scheduler.run_scheduler(scheduler, fetch=fetch, once=True, max_fetches=5, max_attempts=1) == {'fetched': 0, 'failed': 1}
+
+def test_run_skips_fresh_schemes(scheduler, add_fund):
+    add_fund(1, aum=100000, report_date=datetime.now().replace(day=1))
+    fetched = []
+    counts = fetch_scheduler.run_scheduler(scheduler, fetch=lambda code, name: fetched.append(code) or True, once=True)
+    assert fetched == []
+    assert counts == {'fetched': 0, 'failed': 0}
+
+def test_gauges_are_exported(scheduler, add_fund):
+    add_fund(1, report_date=datetime(2026, 1, 1))
+    fetch_scheduler.build_queue(fetch_scheduler.load_state(), now=NOW)
+    text = instrumentation.prometheus_text()
+    assert 'holdings_stage_gauge{' in text
+    assert 'gauge="freshness_lag_max_hours"' in text
+
+def test_latest_disclosed_month():
+    # February's portfolio is out from 10 March; before that the newest one is January's
+    assert fetch_scheduler.latest_disclosed_month(NOW) == datetime(2026, 2, 1)
+    assert fetch_scheduler.latest_disclosed_month(datetime(2026, 3, 9, 23, 0)) == datetime(2026, 1, 1)
+    assert fetch_scheduler.latest_disclosed_month(datetime(2026, 1, 10)) == datetime(2025, 12, 1)
+
+def test_auto_scraped_holdings_are_due_with_the_next_disclosure(scheduler, monkeypatch, add_fund):
+    import auto_fetch_holdings
+    from holdings_records import HoldingsBatch
+    monkeypatch.setattr(auto_fetch_holdings, '_pending', {'codes': set(), 'snapshots': []})
+    add_fund(1, aum=100000)
+
+    now = datetime.now()
+    auto_fetch_holdings.import_holdings_to_db({'scheme_code': 1, 'fund_name': 'Fund 1', 'holdings': HoldingsBatch(['Infosys Ltd'], [5.0])})
+    report_date = fetch_scheduler.latest_reports(scheduler)[1]
+
+    # Stamped with the disclosed month, so the scheme is fresh now and due exactly when the next portfolio is out
+    assert report_date == fetch_scheduler.latest_disclosed_month(now)
+    assert fetch_scheduler.freshness_lag(report_date, now) == 0.0
+    assert now < fetch_scheduler.next_due(report_date) <= fetch_scheduler.add_months(now, 1).replace(day=holdings_history.DISCLOSURE_DAY)
@@ -0,0 +1,93 @@
+"""
+Columnar holdings history store tests
+"""
+
+import json
+import multiprocessing
+import os
+from datetime import datetime
+
+import pytest
+
+import holdings_history
+
+JAN = datetime(2026, 1, 1)
+FEB = datetime(2026, 2, 1)
+
+@pytest.fixture
+def root(tmp_path):
+    yield str(tmp_path / 'history')
+    holdings_history._dictionaries.clear()
+    holdings_history._month_cache.clear()
+
+def holdings(*rows):
+    return [{'security': security, 'weight': weight, 'market_value': weight * 1e6} for security, weight in rows]
+
+def test_weight_history_and_added_funds(root):
+    holdings_history.append_snapshots([
+        (100, JAN, holdings(('Infosys Ltd', 4.0))),
+        (200, JAN, holdings(('HDFC Bank Ltd', 8.0))),
+    ], root)
+    holdings_history.append_snapshots([
+        (100, FEB, holdings(('Infosys Ltd', 3.0), ('HDFC Bank Ltd', 2.0))),
+        (200, FEB, holdings(('HDFC Bank Ltd', 7.5))),
+        (300, FEB, holdings(('HDFC Bank Ltd', 1.0))),
+    ], root)
+
+    assert holdings_history.weight_history(100, 'INFOSYS LIMITED', root=root) == [('2026-01', 4.0), ('2026-02', 3.0)]
+    assert holdings_history.weight_history(200, 'Infosys Ltd', root=root) == [('2026-01', None), ('2026-02', None)]
+    # 300 did not report in January, so it cannot have "added" the security
+    assert holdings_history.funds_added_security('HDFC Bank Ltd', root=root) == [{'schemeCode': '100', 'weight': 2.0}]
+
+@pytest.mark.parametrize('texts, expected', [
+    (('Portfolio_December_2025.pdf',), datetime(2025, 12, 1)),
+    (('HDFC_Portfolio_20260131.xlsx',), datetime(2026, 1, 1)),
+    (('portfolio.pdf', '/downloads/2025/11/portfolio.pdf'), datetime(2025, 11, 1)),
+    # Words that merely start with a month name, and months not yet disclosed, are ignored
+    (('portfolio.pdf', '/decoration2026/portfolio.pdf'), datetime(2026, 2, 1)),
+    (('Nifty_SDL_Apr_2027_Index_Fund.pdf',), datetime(2026, 2, 1)),
+    (('Bharat Bond ETF April 2030 - Jan 2026.pdf',), datetime(2026, 1, 1)),
+])
+def test_report_date_inference(texts, expected):
+    assert holdings_history.infer_report_date(*texts, now=datetime(2026, 3, 15)) == expected
+
+def test_later_segment_supersedes_and_duplicates_collapse(root):
+    holdings_history.append_snapshot(100, JAN, holdings(('Infosys Ltd', 4.0)), root)
+    holdings_history.append_snapshot(100, JAN, holdings(('Infosys Ltd', 1.5), ('Infosys Limited', 1.0)), root)
+
+    assert holdings_history.weight_history(100, 'Infosys Ltd', root=root) == [('2026-01', 2.5)]
+    assert len(holdings_history.load_month('2026-01', root)['scheme']) == 1
+
+def test_stale_dictionary_cache_is_merged_not_overwritten(root):
+    holdings_history.append_snapshot(100, JAN, holdings(('Infosys Ltd', 4.0)), root)
+
+    # Another process appends new securities behind this process's cached dictionaries
+    path = os.path.join(root, holdings_history.SECURITIES_FILE)
+    with open(path) as f:
+        values = json.load(f)
+    with open(path + '.other', 'w') as f:
+        json.dump(values + ['tcs'], f)
+    os.replace(path + '.other', path)
+
+    holdings_history.append_snapshot(200, JAN, holdings(('Wipro Ltd', 2.0)), root)
+
+    with open(path) as f:
+        assert json.load(f) == values + ['tcs', 'wipro']
+    assert holdings_history.weight_history(200, 'Wipro Ltd', root=root) == [('2026-01', 2.0)]
+
+def _append_fund(root, code):
+    holdings_history.append_snapshot(code, JAN, holdings((f"Security {code} Ltd", float(code)), ('Shared Ltd', 1.0)), root)
+
+def test_concurrent_writers_never_reuse_ids_or_segments(root):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_append_fund, args=(root, code)) for code in range(1, 9)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    assert len(holdings_history._segment_ids(os.path.join(root, '2026-01'))) == 8
+    for code in range(1, 9):
+        assert holdings_history.weight_history(code, f"Security {code} Ltd", root=root) == [('2026-01', float(code))]
+        assert holdings_history.weight_history(code, 'Shared Ltd', root=root) == [('2026-01', 1.0)]
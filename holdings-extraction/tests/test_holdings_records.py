@@ -0,0 +1,79 @@
+"""
+Columnar holdings batch tests
+"""
+
+import json
+import math
+from datetime import datetime
+
+import pandas as pd
+
+import holdings_records
+import import_to_mongodb
+import repository
+from holdings_records import HoldingsBatch
+
+def test_from_frame_keeps_missing_values_as_none():
+    df = pd.DataFrame({'security': ['HDFC Bank Ltd', 'Infosys Ltd'], 'weight': [8.5, None], 'market_value': [None, '1200']})
+    batch = HoldingsBatch.from_frame(df)
+
+    assert len(batch) == 2
+    assert batch.weight.dtype == 'float64'
+    assert math.isnan(batch.weight[1])
+    assert batch.to_columns() == {
+        'security': ['HDFC Bank Ltd', 'Infosys Ltd'],
+        'weight': [8.5, None],
+        'market_value': [None, 1200.0]
+    }
+
+def test_parsed_columns_and_legacy_rows_load_the_same():
+    rows = [{'security': 'HDFC Bank Ltd', 'weight': 8.5, 'market_value': 100.0}, {'security': 'Infosys Ltd', 'weight': ''}]
+    legacy = HoldingsBatch.from_parsed({'holdings': rows})
+    columnar = HoldingsBatch.from_parsed(json.loads(json.dumps({'columns': legacy.to_columns()})))
+
+    assert list(columnar) == list(legacy) == [
+        {'security': 'HDFC Bank Ltd', 'weight': 8.5, 'market_value': 100.0},
+        {'security': 'Infosys Ltd', 'weight': None, 'market_value': None}
+    ]
+
+def test_documents_share_per_fund_fields():
+    imported_at = datetime(2026, 1, 5)
+    batch = HoldingsBatch(['A Ltd', 'B Ltd'], [1.5, 2.5], sector=['Banking', 'Others'])
+    docs = list(batch.documents(schemeCode=7, importedAt=imported_at))
+
+    assert docs[1] == {'schemeCode': 7, 'importedAt': imported_at, 'security': 'B Ltd',
+                       'weight': 2.5, 'marketValue': None, 'sector': 'Others'}
+    assert type(docs[0]['weight']) is float
+
+def test_insert_batched_consumes_generators_in_batches(db, monkeypatch):
+    monkeypatch.setattr(repository, 'BULK_BATCH_SIZE', 2)
+    batch = HoldingsBatch([f"S{i}" for i in range(5)], list(range(5)))
+    calls = []
+    collection = repository.fund_holdings(db)
+    original = collection.insert_many
+
+    def insert_many(documents, **kwargs):
+        calls.append(len(documents))
+        return original(documents, **kwargs)
+
+    monkeypatch.setattr(collection, 'insert_many', insert_many)
+    assert repository.insert_batched(collection, batch.documents(schemeCode=1)) == 5
+    assert calls == [2, 2, 1]
+
+def test_importer_reads_columnar_files(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_to_mongodb, 'PARSED_DIR', str(tmp_path))
+    repository.funds(db).insert_one({'schemeCode': 5, 'schemeName': 'Zeta Flexi Cap Fund'})
+    batch = HoldingsBatch(['HDFC Bank Ltd', 'Infosys Ltd'], [8.5, 6.0], [1e7, None])
+    with open(tmp_path / 'zeta.json', 'w') as f:
+        json.dump({'fund_name': 'Zeta Flexi Cap Fund', 'report_date': '2026-01-01', 'columns': batch.to_columns()}, f)
+
+    assert import_to_mongodb.import_file(db, 'zeta.json')['status'] == 'imported'
+    docs = list(repository.fund_holdings(db).find({'schemeCode': 5}, {'_id': 0}).sort('security', 1))
+    assert [(d['security'], d['weight'], d['marketValue']) for d in docs] == [('HDFC Bank Ltd', 8.5, 1e7), ('Infosys Ltd', 6.0, None)]
+    assert len({d['importedAt'] for d in docs}) == 1
+
+def test_benchmark_reports_both_paths():
+    result = holdings_records.benchmark(funds=20, holdings=30, batch_size=7)
+    assert result['rows'] == 600
+    assert result['dicts']['bsonMB'] == result['batches']['bsonMB']
+    assert result['batches']['peakMB'] <= result['dicts']['peakMB']
@@ -0,0 +1,67 @@
+"""
+Holdings health report tests (mongomock)
+"""
+
+from datetime import datetime
+
+import pytest
+
+import check_alternatives
+import holdings_stats
+import repository
+
+@pytest.fixture
+def add_fund(db, add_holdings):
+    """A scheme of an AMC with `rows` holdings, the first ones classified into `sectors`"""
+    def add(code, amc, rows=0, report_date=None, sectors=()):
+        repository.funds(db).insert_one({'schemeCode': code, 'schemeName': f"Fund {code}", 'amc': {'name': amc}})
+        add_holdings(code, [(f"S{i}", 1.0, sectors[i] if i < len(sectors) else None) for i in range(rows)], report_date)
+    return add
+
+def test_report_covers_every_metric_in_one_pass(db, add_fund):
+    add_fund(1, 'Acme MF', rows=3, report_date=datetime(2026, 3, 1), sectors=['IT', 'IT', 'Banking'])
+    add_fund(2, 'Acme MF', rows=2, report_date=datetime(2026, 2, 1), sectors=['IT'])
+    add_fund(3, 'Zeta MF', rows=1, report_date=datetime(2025, 1, 1))
+    add_fund(4, 'Zeta MF')
+    add_fund(5, 'Zeta MF')
+
+    report = holdings_stats.compute_report(db)
+
+    assert report['totalHoldings'] == 6
+    assert report['classifiedHoldings'] == 4
+    assert (report['fundsWithHoldings'], report['totalFunds']) == (3, 5)
+    assert report['latestReportDate'] == datetime(2026, 3, 1)
+    assert report['sectors'] == [{'sector': 'IT', 'count': 3}, {'sector': 'Banking', 'count': 1}]
+    assert [f['schemeCode'] for f in report['topFunds']] == [1, 2, 3]
+    assert report['staleness'] == [
+        {'bucket': '0', 'funds': 1}, {'bucket': '1', 'funds': 1}, {'bucket': '2', 'funds': 0},
+        {'bucket': '3-5', 'funds': 0}, {'bucket': '6-11', 'funds': 0}, {'bucket': '12+', 'funds': 1}
+    ]
+    assert report['coverageByAmc'] == [
+        {'amc': 'Zeta MF', 'funds': 3, 'withHoldings': 1, 'coveragePct': 33.3},
+        {'amc': 'Acme MF', 'funds': 2, 'withHoldings': 2, 'coveragePct': 100.0}
+    ]
+
+def test_load_reads_the_stored_report(db, monkeypatch, add_fund):
+    add_fund(1, 'Acme MF', rows=2, report_date=datetime(2026, 3, 1), sectors=['IT', 'IT'])
+    assert holdings_stats.load_report(db, compute_missing=False) is None
+
+    stored = holdings_stats.load_report(db)
+    assert stored['totalHoldings'] == 2
+
+    # Later reads are a single document lookup, not another aggregation
+    monkeypatch.setattr(holdings_stats, 'compute_report', lambda db=None: 1 / 0)
+    assert holdings_stats.load_report(db)['fundsWithHoldings'] == 1
+
+def test_empty_collection(db):
+    report = holdings_stats.compute_report(db)
+    assert report['totalHoldings'] == 0 and report['staleness'][0] == {'bucket': '0', 'funds': 0}
+
+def test_status_uses_the_report(db, capsys, add_fund):
+    add_fund(1, 'Acme MF', rows=2, report_date=datetime(2026, 3, 1))
+    add_fund(2, 'Acme MF')
+    holdings_stats.refresh(db)
+
+    assert check_alternatives.check_existing_funds(db)
+    out = capsys.readouterr().out
+    assert 'Total Funds: 2' in out and 'Funds with Holdings: 1' in out
@@ -0,0 +1,76 @@
+"""
+Pipeline instrumentation tests: JSON-lines log, Prometheus textfile and bounded item samples
+"""
+
+import json
+
+import pytest
+
+import instrumentation
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'LOG_FILE', str(tmp_path / 'logs' / 'pipeline.jsonl'))
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    monkeypatch.setitem(instrumentation._state, 'stages', {})
+    monkeypatch.setitem(instrumentation._state, 'log', None)
+    monkeypatch.setitem(instrumentation._state, 'component', 'parse_holdings')
+    monkeypatch.setitem(instrumentation._state, 'run_id', 'test-run')
+    return tmp_path
+
+def events(tmp_path):
+    with open(tmp_path / 'logs' / 'pipeline.jsonl') as f:
+        return [json.loads(line) for line in f]
+
+def test_stage_items_and_counters_are_logged_and_exported(run):
+    with instrumentation.stage('parse'):
+        for key in ('a.pdf', 'b.pdf'):
+            with instrumentation.item('parse', key) as fields:
+                fields['rows'] = 10
+                instrumentation.count('parse', 'rows_raw', 10)
+        with pytest.raises(ValueError):
+            with instrumentation.item('parse', 'broken.pdf'):
+                raise ValueError('bad table')
+        with instrumentation.span('parse', 'extract.native'):
+            pass
+        instrumentation.gauge('parse', 'queue_depth', 3)
+
+    report = instrumentation.finish()
+
+    logged = events(run)
+    assert [e['event'] for e in logged] == ['stage_start', 'item', 'item', 'item', 'stage_end', 'run_summary']
+    assert all(e['run'] == 'test-run' and e['component'] == 'parse_holdings' for e in logged)
+    assert (logged[1]['key'], logged[1]['rows'], logged[3]['failed']) == ('a.pdf', 10, True)
+    assert logged[4]['items'] == 3 and logged[4]['counters'] == {'rows_raw': 20}
+
+    stats = report['stages']['parse']
+    assert (stats['items'], stats['failedItems'], stats['counters']['rows_raw']) == (3, 1, 20)
+    assert stats['spans']['extract.native']['count'] == 1
+
+    with open(report['metricsFile']) as f:
+        text = f.read()
+    assert report['metricsFile'].endswith('holdings_parse_holdings.prom')
+    assert '# TYPE holdings_item_duration_seconds summary' in text
+    assert 'holdings_item_duration_seconds_count{component="parse_holdings",stage="parse"} 3' in text
+    assert 'holdings_stage_counter{component="parse_holdings",stage="parse",counter="rows_raw"} 20' in text
+    assert 'holdings_stage_gauge{component="parse_holdings",stage="parse",gauge="queue_depth"} 3' in text
+
+def test_item_durations_use_a_bounded_reservoir(run, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'ITEM_SAMPLE', 50)
+    record = instrumentation._stage('classify_service')
+    for i in range(10000):
+        instrumentation._record_item(record, i / 10000)
+
+    assert len(record['item_sample']) == 50
+    stats = instrumentation.summary()['stages']['classify_service']
+    assert stats['items'] == 10000
+    # The reservoir is a uniform sample: its median lands near the true one
+    assert 0.3 < stats['itemSeconds']['p50'] < 0.7
+    assert f"_sum{{component=\"parse_holdings\",stage=\"classify_service\"}} {round(sum(i / 10000 for i in range(10000)), 6)}" \
+        in instrumentation.prometheus_text()
+
+def test_logging_can_be_disabled(run, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'LOG_FILE', 'off')
+    with instrumentation.stage('import'):
+        pass
+    assert not (run / 'logs').exists()
@@ -0,0 +1,143 @@
+"""
+Fund-of-funds look-through tests (mongomock)
+"""
+
+from datetime import datetime
+
+import pytest
+
+import holdings_stats
+import instrumentation
+import look_through
+import repository
+
+JAN = datetime(2026, 1, 1)
+FEB = datetime(2026, 2, 1)
+
+@pytest.fixture
+def lookthrough_db(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    return db
+
+@pytest.fixture
+def add_fund(db, add_holdings):
+    """A scheme (Direct Plan name in funds) with its holdings"""
+    def add(code, name, holdings, report_date=JAN):
+        repository.funds(db).insert_one({'schemeCode': code, 'schemeName': f"{name} - Direct Plan - Growth"})
+        add_holdings(code, holdings, report_date, fund_name=name)
+    return add
+
+def holdings_by_security(db, code):
+    doc = repository.fund_lookthrough(db).find_one({'_id': code})
+    return {h['security']: (h['weight'], h['via']) for h in doc['holdings']}
+
+def test_unit_names_map_to_scheme_keys():
+    assert look_through.unit_scheme_key('Units of Acme Flexi Cap Fund - Regular Plan - Growth') == 'acme flexi cap fund'
+    assert look_through.unit_scheme_key('HDFC Bank Ltd') is None
+
+def test_nested_funds_expand_to_weighted_securities(lookthrough_db, add_fund):
+    db = lookthrough_db
+    add_fund(1, 'Acme Flexi Cap Fund', [('HDFC Bank Ltd', 60.0, 'Banking'), ('Infosys Ltd', 40.0, 'IT')])
+    add_fund(2, 'Acme Gold ETF', [('Gold', 100.0, 'Commodities')])
+    add_fund(3, 'Acme Asset Allocator FoF', [
+        ('Acme Flexi Cap Fund - Direct Plan - Growth', 50.0, 'Others'),
+        ('Units of Acme Gold ETF', 30.0, 'Others'),
+        ('HDFC Bank Ltd.', 20.0, 'Banking')
+    ])
+    add_fund(4, 'Acme Multi Manager FoF', [('Acme Asset Allocator FoF - Regular Plan', 100.0, 'Others')])
+
+    counts = look_through.resolve_all(db)
+
+    assert counts['funds_of_funds'] == 2
+    # Each scheme expanded once; the allocator is reused from the memo for the multi-manager FoF
+    assert counts['expanded'] == 4 and counts['memo_hits'] == 1
+    assert holdings_by_security(db, 3) == {
+        'HDFC Bank Ltd': (50.0, [1]),
+        'Infosys Ltd': (20.0, [1]),
+        'Gold': (30.0, [2])
+    }
+    assert holdings_by_security(db, 4)['Gold'] == (30.0, [2, 3])
+    inputs = repository.fund_lookthrough(db).find_one({'_id': 4})['inputs']
+    assert sorted(inputs) == ['1', '2', '3', '4'] and {i['month'] for i in inputs.values()} == {202601}
+    assert repository.fund_lookthrough(db).find_one({'_id': 1}) is None
+
+def test_cycles_are_kept_as_unresolved_units(lookthrough_db, add_fund):
+    db = lookthrough_db
+    add_fund(1, 'Alpha Balanced Fund', [('Beta Income Fund', 50.0, 'Others'), ('Infosys Ltd', 50.0, 'IT')])
+    add_fund(2, 'Beta Income Fund', [('Alpha Balanced Fund', 10.0, 'Others'), ('GOI 2033', 90.0, 'Government')])
+
+    counts = look_through.resolve_all(db)
+
+    # Each fund cuts the cycle at itself
+    assert counts['cycles'] == 2
+    doc = repository.fund_lookthrough(db).find_one({'_id': 1})
+    assert doc['cycles'] == [[1, 2, 1]]
+    assert doc['unresolvedWeight'] == 5.0
+    assert holdings_by_security(db, 1)['Alpha Balanced Fund'] == (5.0, [2])
+    assert repository.fund_lookthrough(db).find_one({'_id': 2})['cycles'] == [[2, 1, 2]]
+    assert holdings_by_security(db, 2)['Beta Income Fund'] == (5.0, [1])
+
+def test_cycle_results_do_not_depend_on_resolution_order():
+    portfolios = {
+        1: {'fundName': 'Alpha Balanced Fund', 'reportDate': JAN, 'rows': [
+            {'security': 'Beta Income Fund', 'weight': 50.0}, {'security': 'Infosys Ltd', 'weight': 50.0}]},
+        2: {'fundName': 'Beta Income Fund', 'reportDate': JAN, 'rows': [
+            {'security': 'Alpha Balanced Fund', 'weight': 10.0}, {'security': 'GOI 2033', 'weight': 90.0}]},
+        3: {'fundName': 'Gamma Conservative FoF', 'reportDate': JAN, 'rows': [
+            {'security': 'Units of Beta Income Fund', 'weight': 100.0}]},
+    }
+    name_index = {'alpha balanced fund': 1, 'beta income fund': 2, 'gamma conservative fof': 3}
+
+    def resolve(order):
+        resolver = look_through.Resolver(portfolios, name_index)
+        return {code: resolver.expand(code) for code in order}
+
+    forward, backward = resolve([1, 2, 3]), resolve([3, 2, 1])
+    for code in (1, 2, 3):
+        assert forward[code]['positions'] == backward[code]['positions']
+        assert forward[code]['cycles'] == backward[code]['cycles']
+    assert forward[2]['positions']['beta income fund'][0] == pytest.approx(5.0)
+
+def test_only_changed_inputs_are_rewritten(lookthrough_db, add_fund):
+    db = lookthrough_db
+    add_fund(1, 'Acme Flexi Cap Fund', [('HDFC Bank Ltd', 100.0, 'Banking')])
+    add_fund(2, 'Acme Passive FoF', [('Acme Flexi Cap Fund', 100.0, 'Others')])
+    add_fund(3, 'Zeta Gold ETF', [('Gold', 100.0, 'Commodities')])
+    add_fund(4, 'Zeta Gold FoF', [('Zeta Gold ETF', 100.0, 'Others')])
+    assert look_through.resolve_all(db)['written'] == 2
+    assert holdings_stats.load_report(db, compute_missing=False)['fundsOfFunds'] == 2
+    assert look_through.resolve_all(db)['written'] == 0
+
+    # A new month for the underlying fund only touches the FoF holding it
+    repository.fund_holdings(db).delete_many({'schemeCode': 1})
+    repository.fund_holdings(db).insert_one({'schemeCode': 1, 'fundName': 'Acme Flexi Cap Fund', 'security': 'ITC Ltd',
+                                             'weight': 100.0, 'sector': 'FMCG', 'reportDate': FEB})
+    assert look_through.resolve_all(db)['written'] == 1
+    assert holdings_by_security(db, 2) == {'ITC Ltd': (100.0, [1])}
+
+def test_same_month_reimport_is_rewritten(lookthrough_db, add_fund):
+    db = lookthrough_db
+    add_fund(1, 'Acme Flexi Cap Fund', [('HDFC Bank Ltd', 100.0, 'Banking')])
+    add_fund(2, 'Acme Passive FoF', [('Acme Flexi Cap Fund', 100.0, 'Others')])
+    assert look_through.resolve_all(db)['written'] == 1
+
+    # A corrected January disclosure replaces the underlying rows without changing the month
+    repository.fund_holdings(db).delete_many({'schemeCode': 1})
+    add_fund(1, 'Acme Flexi Cap Fund', [('HDFC Bank Ltd', 70.0, 'Banking'), ('ITC Ltd', 30.0, 'FMCG')])
+    assert look_through.resolve_all(db)['written'] == 1
+    assert holdings_by_security(db, 2) == {'HDFC Bank Ltd': (70.0, [1]), 'ITC Ltd': (30.0, [1])}
+
+    # The same rows in a different scan order are not a change
+    rows = list(repository.fund_holdings(db).find({'schemeCode': 1}, {'_id': 0}))
+    repository.fund_holdings(db).delete_many({'schemeCode': 1})
+    repository.fund_holdings(db).insert_many(rows[::-1])
+    assert look_through.resolve_all(db)['written'] == 0
+
+def test_lookthrough_holdings_falls_back_to_direct_holdings(lookthrough_db, add_fund):
+    db = lookthrough_db
+    add_fund(1, 'Acme Flexi Cap Fund', [('HDFC Bank Ltd', 60.0, 'Banking'), ('Infosys Ltd', 40.0, 'IT')])
+    add_fund(2, 'Acme Passive FoF', [('Acme Flexi Cap Fund', 100.0, 'Others')])
+    look_through.resolve_all(db)
+
+    assert [h['security'] for h in look_through.lookthrough_holdings(db, 2, limit=1)] == ['HDFC Bank Ltd']
+    assert [h['security'] for h in look_through.lookthrough_holdings(db, 1)] == ['HDFC Bank Ltd', 'Infosys Ltd']
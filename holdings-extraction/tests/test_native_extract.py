@@ -0,0 +1,89 @@
+"""
+Native (pdfplumber) extraction tests on generate_fixtures output
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip('pdfplumber')
+
+import compare_engines
+import generate_fixtures
+import instrumentation
+import native_extract
+import parse_holdings
+import parser_profiles
+import spreadsheet_ingest
+from securities import normalize_security
+from conftest import PACKAGE_DIR
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.chdir(PACKAGE_DIR)
+    monkeypatch.setattr(parser_profiles, '_registry', None)
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    # Same seed, different format: the CSV twin of each PDF carries the exact rows
+    for out, file_format in (('pdf', 'pdf'), ('csv', 'csv')):
+        generate_fixtures.generate_corpus(str(tmp_path / out), funds=3, holdings=80, months=1, formats=(file_format,))
+    return tmp_path
+
+def files(corpus, out):
+    directory = corpus / out / 'disclosures'
+    return [str(directory / name) for name in sorted(os.listdir(directory))]
+
+def test_native_engine_matches_the_generated_rows(corpus, monkeypatch):
+    monkeypatch.setattr(parse_holdings, 'PDF_ENGINE', 'native')
+    for pdf_path, csv_path in zip(files(corpus, 'pdf'), files(corpus, 'csv')):
+        tables, pages = native_extract.read_pdf(pdf_path)
+        # Continuation pages have no header row and reuse the first page's columns
+        assert pages == 2 and len(tables) == 2 and list(tables[1].columns) == list(tables[0].columns)
+
+        parsed = parse_holdings.parse_pdf(pdf_path)
+        [(_, expected)] = spreadsheet_ingest.parse_spreadsheet(csv_path)
+        # The PDF text layer renders straight quotes as typographic ones
+        assert [normalize_security(s) for s in parsed['security']] == [normalize_security(s) for s in expected['security']]
+        assert list(parsed['weight']) == pytest.approx(list(expected['weight']))
+
+def test_profile_fingerprinted_from_the_first_page(corpus):
+    pdf_path = files(corpus, 'pdf')[0]
+    profile = compare_engines.select_profile('portfolio.pdf', None, native_extract.first_page_text(pdf_path))
+    assert profile['name'] == 'hdfc'
+
+def test_next_engine_runs_when_one_raises(corpus, monkeypatch):
+    pdf_path = files(corpus, 'pdf')[0]
+    real_read_tables = parse_holdings.read_tables
+    calls = []
+
+    def read_tables(path, profile, engine, lattice):
+        calls.append(engine)
+        if engine == 'native':
+            raise RuntimeError('broken text layer')
+        return real_read_tables(path, profile, 'native', None)
+
+    monkeypatch.setattr(parse_holdings, 'extraction_attempts', lambda profile: [('native', None), ('tabula', True)])
+    monkeypatch.setattr(parse_holdings, 'read_tables', read_tables)
+
+    assert len(parse_holdings.parse_pdf(pdf_path)) == 80
+    assert calls == ['native', 'tabula']
+    assert parser_profiles.parse_stats()['hdfc']['engines']['tabula'] >= 1
+
+def test_tabula_page_ranges_are_expanded():
+    assert native_extract.page_indexes('all', 3) == [0, 1, 2]
+    assert native_extract.page_indexes('1-3,5', 10) == [0, 1, 2, 4]
+    assert native_extract.page_indexes(2, 10) == [1]
+    # Pages past the end are skipped rather than raising
+    assert native_extract.page_indexes([1, 4], 2) == [0]
+
+def test_unreadable_first_page_is_counted_and_falls_back(corpus, monkeypatch, capsys):
+    pdf_path = files(corpus, 'pdf')[0]
+    renamed = str(corpus / 'portfolio.pdf')
+    os.rename(pdf_path, renamed)
+
+    def broken(path):
+        raise ValueError('encrypted')
+    monkeypatch.setattr(native_extract, 'first_page_text', broken)
+
+    parse_holdings.parse_pdf(renamed)
+    assert instrumentation.summary()['stages']['parse']['counters']['fingerprint_failed'] == 1
+    assert 'ValueError: encrypted' in capsys.readouterr().out
@@ -0,0 +1,57 @@
+"""
+AMC parser profile selection and column resolution tests
+"""
+
+import os
+
+import pytest
+
+import instrumentation
+import parser_profiles
+from conftest import PACKAGE_DIR
+
+@pytest.fixture(autouse=True)
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(parser_profiles, 'PROFILES_FILE', os.path.join(PACKAGE_DIR, 'parser_profiles.json'))
+    monkeypatch.setattr(parser_profiles, '_registry', None)
+    monkeypatch.setattr(parser_profiles, '_parse_stats', {})
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+
+def test_normalize_header():
+    assert parser_profiles.normalize_header('Market/ Fair Value (Rs. in Lacs.)') == 'market/fair value(rs in lacs)'
+    assert parser_profiles.normalize_header('  % to\nNet   Assets ') == '% to net assets'
+
+def test_profile_selected_by_filename_or_first_page():
+    assert parser_profiles.select_profile('hdfc_flexi_cap_2026_01.pdf')['name'] == 'hdfc'
+    assert parser_profiles.select_profile('portfolio.pdf', first_page_text='SBI Funds Management Ltd\nMonthly Portfolio')['name'] == 'sbi'
+    assert parser_profiles.select_profile('portfolio.pdf', fund_name='Unknown Fund')['name'] == 'generic'
+
+def test_resolver_prefers_exact_aliases_then_patterns():
+    resolve = parser_profiles.select_profile('hdfc_equity.pdf')['resolve']
+    columns = ['Name of Instrument', 'ISIN', 'Market/Fair Value (Rs. in Lacs)', '% to NAV']
+    assert resolve(columns) == {
+        'security': 'Name of Instrument', 'weight': '% to NAV', 'market_value': 'Market/Fair Value (Rs. in Lacs)'
+    }
+
+    # Unknown headers fall back to the default profile's patterns; a column is used once
+    generic = parser_profiles.select_profile('other.pdf')['resolve']
+    assert generic(['Name of the Security', '% of Net Assets', 'Fair Value (Rs Cr)']) == {
+        'security': 'Name of the Security', 'weight': '% of Net Assets', 'market_value': 'Fair Value (Rs Cr)'
+    }
+    assert generic(['Quantity', 'Rating']) == {'security': None, 'weight': None, 'market_value': None}
+
+def test_resolver_caches_per_header_tuple():
+    resolve = parser_profiles.select_profile('sbi_bluechip.pdf')['resolve']
+    columns = ['Name of the Instrument', '% to AUM']
+    first = resolve(columns)
+    assert resolve(list(columns)) is first
+    assert parser_profiles.load_profiles() is parser_profiles.load_profiles()
+
+def test_parse_stats_per_profile():
+    parser_profiles.record_parse('sbi', 0.5, 40, True, engine='native')
+    parser_profiles.record_parse('sbi', 1.5, 0, False, retried=True, engine='tabula')
+
+    stats = parser_profiles.parse_stats()['sbi']
+    assert (stats['pdfs'], stats['failed'], stats['retries'], stats['rows']) == (2, 1, 1, 40)
+    assert (stats['avgSeconds'], stats['maxSeconds']) == (1.0, 1.5)
+    assert stats['engines'] == {'native': 1, 'tabula': 1}
@@ -0,0 +1,121 @@
+"""
+Adaptive rate limiter tests against a local stub server that throttles
+"""
+
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import rate_limiter
+
+class StubHandler(BaseHTTPRequestHandler):
+    """429s while the server is 'throttling' or when requests arrive closer than min_gap apart"""
+
+    def do_GET(self):
+        server = self.server
+        now = time.monotonic()
+        with server.lock:
+            too_fast = server.last is not None and now - server.last < server.min_gap
+            server.last = now
+            server.hits += 1
+            throttle = server.throttle_next > 0 or too_fast
+            if server.throttle_next > 0:
+                server.throttle_next -= 1
+        if throttle:
+            self.send_response(429)
+            if server.retry_after is not None:
+                self.send_header('Retry-After', server.retry_after)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """Local throttling server plus a clean limiter with no saved history"""
+    monkeypatch.setattr(rate_limiter, 'HEALTH_FILE', str(tmp_path / 'source_health.json'))
+    monkeypatch.setattr(rate_limiter, '_sources', {})
+    monkeypatch.setitem(rate_limiter.SOURCES, 'stub', {})
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.last = None
+    server.hits = 0
+    server.min_gap = 0.0
+    server.throttle_next = 0
+    server.retry_after = None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield server
+    server.shutdown()
+
+def test_parse_retry_after():
+    assert rate_limiter.parse_retry_after('3') == 3.0
+    assert rate_limiter.parse_retry_after(None) is None
+    assert rate_limiter.parse_retry_after('soon') is None
+    assert 8 <= rate_limiter.parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+def test_aimd_adjusts_pace(stub):
+    rate_limiter.configure('stub', initial_interval=1.0, min_interval=0.1, max_interval=10, additive_step=0.5, slow_seconds=2)
+    rate_limiter.record('stub', 200, 0.1)
+    assert rate_limiter.health('stub')['intervalSeconds'] == pytest.approx(1 / 1.5, abs=1e-3)
+    rate_limiter.record('stub', 429, 0.1)
+    assert rate_limiter.health('stub')['intervalSeconds'] == pytest.approx(1 / 0.75, abs=1e-3)
+    rate_limiter.record('stub', 200, 5.0)
+    assert rate_limiter.health('stub')['intervalSeconds'] == pytest.approx(1 / 0.375, abs=1e-3)
+    for _ in range(20):
+        rate_limiter.record('stub', 429, 0.1)
+    assert rate_limiter.health('stub')['intervalSeconds'] == 10
+
+def test_retry_after_is_honoured(stub):
+    rate_limiter.configure('stub', initial_interval=0.01, min_interval=0.01)
+    stub.throttle_next = 1
+    stub.retry_after = '1'
+
+    start = time.monotonic()
+    response = rate_limiter.get('stub', stub.url, timeout=5)
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.9
+    assert stub.hits == 2
+    assert rate_limiter.health('stub')['throttled'] == 1
+
+def test_backs_off_to_what_the_server_allows(stub):
+    rate_limiter.configure('stub', initial_interval=0.01, min_interval=0.01, additive_step=0.5)
+    stub.min_gap = 0.05
+
+    statuses = [rate_limiter.get('stub', stub.url, timeout=5).status_code for _ in range(15)]
+    assert statuses[-10:] == [200] * 10
+    assert rate_limiter.health('stub')['intervalSeconds'] >= 0.05
+    assert 0 < rate_limiter.health('stub')['throttled'] <= 4
+
+def test_rank_prefers_healthy_sources(stub):
+    for source in ('flaky', 'empty', 'good'):
+        rate_limiter.configure(source, initial_interval=1.0)
+    for _ in range(5):
+        rate_limiter.record('flaky', 503, 0.2)
+        rate_limiter.record('empty', 200, 0.2)
+        rate_limiter.record_yield('empty', False)
+        rate_limiter.record('good', 200, 0.3)
+        rate_limiter.record_yield('good', True)
+    assert rate_limiter.rank(['flaky', 'empty', 'good']) == ['good', 'empty', 'flaky']
+
+    rate_limiter.record('good', 429, 0.3, retry_after=30)
+    assert rate_limiter.rank(['good', 'empty'])[0] == 'empty'
+
+def test_health_survives_restart(stub, monkeypatch):
+    rate_limiter.configure('stub', initial_interval=1.0)
+    rate_limiter.record('stub', 200, 0.4)
+    rate_limiter.record('stub', 503, 0.4)
+    rate_limiter.save_health()
+
+    monkeypatch.setattr(rate_limiter, '_sources', {})
+    stats = rate_limiter.health('stub')
+    assert stats['requests'] == 2 and stats['successRate'] == 0.5
+    assert stats['intervalSeconds'] == pytest.approx(1 / 0.525, abs=1e-3)
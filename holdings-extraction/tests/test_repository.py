@@ -0,0 +1,140 @@
+"""
+Repository layer tests (mongomock)
+"""
+
+import json
+import os
+from datetime import datetime
+
+import mongomock
+from pymongo import InsertOne, UpdateOne, WriteConcern
+
+import repository
+from conftest import PACKAGE_DIR
+
+class CountingCollection:
+    """Wraps a collection and records the size of every bulk call"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def insert_many(self, documents, **kwargs):
+        self.calls.append(('insert_many', len(documents), kwargs.get('ordered')))
+        return self.collection.insert_many(documents, **kwargs)
+
+    def bulk_write(self, operations, **kwargs):
+        self.calls.append(('bulk_write', len(operations), kwargs.get('ordered')))
+        return self.collection.bulk_write(operations, **kwargs)
+
+def test_set_client_is_shared(db):
+    assert repository.get_client() is repository.get_client()
+    assert db.name == 'holdings_test'
+    assert repository.get_db().name == 'holdings_test'
+
+def test_get_client_is_created_once(monkeypatch):
+    created = []
+
+    def fake_client(uri, **options):
+        created.append(options)
+        return mongomock.MongoClient()
+
+    monkeypatch.setattr(repository, 'MongoClient', fake_client)
+    repository.set_client(None)
+    repository.configure(serverSelectionTimeoutMS=5000)
+    try:
+        first = repository.get_client()
+        assert repository.get_client() is first
+        assert len(created) == 1
+        assert created[0]['maxPoolSize'] == repository.MAX_POOL_SIZE
+        assert created[0]['retryWrites'] is True
+        assert created[0]['serverSelectionTimeoutMS'] == 5000
+    finally:
+        repository._state['options'].clear()
+        repository.set_client(None)
+
+def test_write_concern_levels(monkeypatch):
+    assert repository.write_concern('majority') == WriteConcern(w='majority')
+    assert repository.write_concern('1') == WriteConcern(w=1)
+    monkeypatch.setattr(repository, 'JOURNAL', True)
+    assert repository.write_concern('1') == WriteConcern(w=1, j=True)
+
+def test_collection_accessors_apply_write_concern(db, monkeypatch):
+    monkeypatch.setattr(repository, 'WRITE_CONCERN', 'majority')
+    monkeypatch.setattr(repository, 'BULK_WRITE_CONCERN', '1')
+    assert repository.fund_holdings(db).name == repository.FUND_HOLDINGS
+    assert repository.funds().write_concern == WriteConcern(w='majority')
+    assert repository.security_holders(db, bulk=True).write_concern == WriteConcern(w=1)
+
+def test_insert_batched_splits_unordered(db):
+    target = CountingCollection(repository.fund_holdings(db))
+    inserted = repository.insert_batched(target, [{'n': i} for i in range(25)], batch_size=10)
+    assert inserted == 25
+    assert target.calls == [('insert_many', 10, False), ('insert_many', 10, False), ('insert_many', 5, False)]
+    assert repository.fund_holdings(db).count_documents({}) == 25
+
+def test_bulk_write_batched_totals(db):
+    target = CountingCollection(repository.fund_holdings(db))
+    operations = [InsertOne({'_id': i, 'sector': None}) for i in range(7)]
+    operations += [UpdateOne({'_id': i}, {'$set': {'sector': 'Banking'}}) for i in range(7)]
+    totals = repository.bulk_write_batched(target, operations, batch_size=5, ordered=True)
+    assert totals['inserted'] == 7
+    assert totals['modified'] == 7
+    assert [size for _, size, _ in target.calls] == [5, 5, 4]
+    assert all(ordered for _, _, ordered in target.calls)
+
+def test_session_falls_back_without_support(db):
+    with repository.session() as client_session:
+        assert client_session is None
+    assert repository.supports_transactions() is False
+    assert repository.run_in_transaction(lambda session: session) is None
+
+def test_import_file_round_trip(db, tmp_path, monkeypatch):
+    import import_to_mongodb
+
+    monkeypatch.setattr(import_to_mongodb, 'PARSED_DIR', str(tmp_path))
+    repository.funds(db).insert_one({'schemeCode': 101, 'schemeName': 'Acme Bluechip Fund - Direct Plan'})
+
+    def write(name, report_date, securities):
+        with open(tmp_path / name, 'w') as f:
+            json.dump({
+                'fund_name': 'Acme Bluechip Fund',
+                'report_date': report_date,
+                'holdings': [{'security': s, 'weight': w} for s, w in securities]
+            }, f)
+
+    write('acme_2024_05.json', '2024-05-01', [('HDFC Bank Ltd', 8.5), ('Infosys Ltd', 6.0)])
+    write('acme_2024_04.json', '2024-04-01', [('Reliance Industries Ltd', 9.0)])
+
+    result = import_to_mongodb.import_file(db, 'acme_2024_05.json')
+    assert result['status'] == 'imported'
+    assert result['scheme_code'] == 101
+    assert repository.fund_holdings(db).count_documents({'schemeCode': 101}) == 2
+    assert repository.security_holders(db).count_documents({}) == 2
+
+    # An older month is archived, not swapped in
+    assert import_to_mongodb.import_file(db, 'acme_2024_04.json')['status'] == 'archived'
+    assert repository.fund_holdings(db).count_documents({'schemeCode': 101}) == 2
+
+    # Re-importing the latest month replaces rather than duplicates
+    import_to_mongodb.import_file(db, 'acme_2024_05.json')
+    assert repository.fund_holdings(db).count_documents({'schemeCode': 101}) == 2
+
+def test_classify_all_holdings(db, monkeypatch):
+    import classify_sectors
+
+    monkeypatch.setattr(classify_sectors, 'SECTOR_MAPPING_FILE', os.path.join(PACKAGE_DIR, 'sector_mapping.json'))
+    monkeypatch.setattr(repository, 'BULK_BATCH_SIZE', 2)
+    holdings = repository.fund_holdings(db)
+    holdings.insert_many([
+        {'schemeCode': 1, 'security': 'HDFC Bank Ltd', 'reportDate': datetime(2024, 5, 1)},
+        {'schemeCode': 1, 'security': 'Infosys Ltd', 'reportDate': datetime(2024, 5, 1)},
+        {'schemeCode': 1, 'security': 'Zzyzx Holdings', 'reportDate': datetime(2024, 5, 1)},
+        {'schemeCode': 1, 'security': 'Already Classified', 'sector': 'Energy', 'reportDate': datetime(2024, 5, 1)}
+    ])
+
+    classify_sectors.classify_all_holdings()
+
+    assert holdings.count_documents({'sector': None}) == 0
+    assert holdings.find_one({'security': 'Zzyzx Holdings'})['sector'] == 'Others'
+    assert holdings.find_one({'security': 'Already Classified'})['sector'] == 'Energy'
@@ -0,0 +1,102 @@
+"""
+Sector exposure roll-up and snapshot tests (mongomock)
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import holdings_history
+import instrumentation
+import sector_exposure
+import repository
+from conftest import PACKAGE_DIR
+
+JAN = datetime(2026, 1, 1)
+FEB = datetime(2026, 2, 1)
+
+@pytest.fixture
+def exposure_db(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(sector_exposure, 'SECTOR_MAPPING_FILE', os.path.join(PACKAGE_DIR, 'sector_mapping.json'))
+    monkeypatch.setattr(holdings_history, 'HISTORY_DIR', str(tmp_path / 'history'))
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    yield db
+    holdings_history._dictionaries.clear()
+    holdings_history._month_cache.clear()
+
+def test_fund_matrices_sum_weights_and_measure_drift(exposure_db, add_holdings):
+    db = exposure_db
+    repository.funds(db).insert_many([
+        {'schemeCode': 1, 'category': 'Large Cap', 'amc': {'name': 'Acme MF'}, 'aum': 300.0},
+        {'schemeCode': 2, 'category': 'Large Cap', 'fundHouse': 'Zeta MF', 'aum': 100.0}
+    ])
+    # fund_holdings keeps only the latest month; January lives in the history store
+    holdings_history.append_snapshot(1, JAN, [{'security': 'HDFC Bank Ltd', 'weight': 60.0},
+                                              {'security': 'Infosys Ltd', 'weight': 40.0}], holdings_history.HISTORY_DIR)
+    add_holdings(1, [('HDFC Bank Ltd', 30.0, 'Banking'), ('ICICI Bank Ltd', 30.0, 'Banking'), ('Infosys Ltd', 40.0, 'IT & Software')],
+                 report_date=FEB)
+    add_holdings(2, [('TCS Ltd', 80.0, 'IT & Software'), ('Zzyzx Holdings', 20.0)], report_date=FEB)
+
+    exposure = sector_exposure.build_exposure(db)
+    sectors = exposure['sectors']
+    weights = exposure['arrays']['fundWeights']
+    banking, it = sectors.index('Banking'), sectors.index('IT & Software')
+
+    assert exposure['funds'] == ['1', '2']
+    assert exposure['reportMonths'] == [202602, 202602]
+    assert weights[0, banking] == 60.0 and weights[0, it] == 40.0
+    assert weights[1, sectors.index(sector_exposure.UNCLASSIFIED)] == 20.0
+    # Same sector allocation as January (history securities take this month's sectors): no drift;
+    # fund 2 has no previous month
+    assert exposure['arrays']['fundDrift'][0] == 0.0
+    assert np.isnan(exposure['arrays']['fundDrift'][1])
+    assert exposure['amcs'] == ['Acme MF', 'Zeta MF']
+    # AUM-weighted category mean leans towards the larger fund
+    assert exposure['arrays']['categoryMean'][0, it] == 60.0
+    assert exposure['arrays']['categoryAumWeighted'][0, it] == 50.0
+
+def test_drift_classifies_securities_sold_since_last_month(exposure_db, add_holdings):
+    holdings_history.append_snapshot(1, JAN, [{'security': 'HDFC Bank Ltd', 'weight': 50.0},
+                                              {'security': 'Infosys Ltd', 'weight': 50.0}], holdings_history.HISTORY_DIR)
+    add_holdings(1, [('Infosys Ltd', 100.0, 'IT & Software')], report_date=FEB)
+
+    exposure = sector_exposure.build_exposure(exposure_db)
+
+    # The sold bank is classified by the sector_mapping rules, not left unclassified
+    assert exposure['arrays']['fundDrift'][0] == 50.0
+
+def test_refresh_writes_the_snapshot_and_reports_weights(exposure_db, tmp_path, capsys, add_holdings):
+    add_holdings(1, [('HDFC Bank Ltd', 70.0, 'Banking'), ('Bharti Airtel Ltd', 30.0, 'Telecom')], report_date=FEB)
+    path = str(tmp_path / 'sector_exposure.bin')
+
+    exposure = sector_exposure.refresh_snapshot(exposure_db, path)
+
+    assert sector_exposure.load_snapshot(path)['funds'] == ['1']
+    assert sector_exposure.mean_distribution(exposure, limit=2) == [('Banking', 70.0), ('Telecom', 30.0)]
+    assert 'Banking' in capsys.readouterr().out
+
+def test_snapshot_round_trip(exposure_db, tmp_path, add_holdings):
+    db = exposure_db
+    add_holdings(1, [('HDFC Bank Ltd', 70.0, 'Banking'), ('Bharti Airtel Ltd', 30.0, 'Telecom')], report_date=FEB)
+    add_holdings(2, [('HDFC Bank Ltd', 10.0, 'Banking'), ('Bharti Airtel Ltd', 90.0, 'Telecom')], report_date=FEB)
+    exposure = sector_exposure.build_exposure(db)
+
+    path = str(tmp_path / 'sector_exposure.bin')
+    assert sector_exposure.save_snapshot(exposure, path) == os.path.getsize(path)
+    loaded = sector_exposure.load_snapshot(path)
+
+    assert {k: v for k, v in loaded.items() if k != 'arrays'} == {k: v for k, v in exposure.items() if k != 'arrays'}
+    for name, array in exposure['arrays'].items():
+        np.testing.assert_array_equal(loaded['arrays'][name], array)
+    assert loaded['arrays']['categoryPercentiles'].shape == (1, len(sector_exposure.PERCENTILES), len(exposure['sectors']))
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'NOPE' + b'\0' * 16)
+    with pytest.raises(ValueError):
+        sector_exposure.load_snapshot(str(path))
+
+def test_empty_collection_builds_nothing(exposure_db):
+    assert sector_exposure.build_exposure(exposure_db) is None
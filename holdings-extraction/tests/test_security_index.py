@@ -0,0 +1,54 @@
+"""
+Security -> funds reverse index tests (mongomock)
+"""
+
+from datetime import datetime
+
+import repository
+import security_index
+
+JAN = datetime(2026, 1, 1)
+FEB = datetime(2026, 2, 1)
+
+def holdings(*rows):
+    return [{'security': security, 'weight': weight} for security, weight in rows]
+
+def postings(db):
+    return {
+        doc['_id']: [(h['schemeCode'], h['weight']) for h in doc['holders']]
+        for doc in repository.security_holders(db).find()
+    }
+
+def test_postings_are_summed_sorted_and_replaced(db):
+    security_index.update_fund_postings(db, 100, holdings(('Infosys Ltd', 2.0), ('INFOSYS LIMITED', 1.5), ('HDFC Bank Ltd', 3.0)), JAN)
+    security_index.update_fund_postings(db, 200, holdings(('Infosys Ltd', 6.0)), JAN)
+
+    assert postings(db) == {'infosys': [(200, 6.0), (100, 3.5)], 'hdfc bank': [(100, 3.0)]}
+    assert [h['schemeCode'] for h in security_index.top_holders(db, 'Infosys Limited', limit=1)] == [200]
+    assert sorted(repository.security_holders(db).find_one({'_id': 'infosys'})['names']) == ['INFOSYS LIMITED', 'Infosys Ltd']
+
+    # A new month replaces the fund's postings; securities nobody holds are dropped
+    touched = security_index.update_fund_postings(db, 100, holdings(('Infosys Ltd', 9.0)), FEB)
+    assert touched == 2
+    assert postings(db) == {'infosys': [(100, 9.0), (200, 6.0)]}
+
+def test_rebuild_matches_incremental_updates(db):
+    repository.fund_holdings(db).insert_many([
+        {'schemeCode': code, 'security': security, 'weight': weight, 'reportDate': JAN}
+        for code, security, weight in [(100, 'Infosys Ltd', 2.0), (100, 'Infosys Limited', 1.5), (100, 'HDFC Bank Ltd', 3.0),
+                                       (200, 'Infosys Ltd', 6.0)]
+    ])
+    repository.security_holders(db).insert_one({'_id': 'stale', 'names': ['Stale Ltd'], 'holders': []})
+
+    assert security_index.rebuild_index(db) == 2
+    assert postings(db) == {'infosys': [(200, 6.0), (100, 3.5)], 'hdfc bank': [(100, 3.0)]}
+
+def test_benchmark_leaves_the_live_index_alone(db):
+    repository.fund_holdings(db).insert_one({'schemeCode': 100, 'security': 'Infosys Ltd', 'weight': 2.0, 'reportDate': JAN})
+    security_index.update_fund_postings(db, 200, holdings(('HDFC Bank Ltd', 3.0)), JAN)
+
+    result = security_index.benchmark(db)
+
+    assert result['securities'] == 1 and result['queries'] == 1
+    assert postings(db) == {'hdfc bank': [(200, 3.0)]}
+    assert security_index.BENCHMARK_COLLECTION not in db.list_collection_names()
@@ -0,0 +1,73 @@
+"""
+Similar-fund MinHash/LSH index tests (mongomock)
+"""
+
+import pickle
+
+import pytest
+
+import auto_fetch_holdings
+import holdings_stats
+import similarity_index
+import repository
+from holdings_records import HoldingsBatch
+
+STOCKS = [f"Security {i} Ltd" for i in range(60)]
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'similarity_index.pkl')
+    monkeypatch.setattr(similarity_index, 'INDEX_FILE', path)
+    return path
+
+def test_lsh_candidates_find_overlapping_funds_only():
+    index = similarity_index.new_index()
+    similarity_index.add_fund(index, 1, 'Acme Bluechip Fund - Direct Plan', STOCKS[:40])
+    similarity_index.add_fund(index, 2, 'Acme Bluechip Fund - Regular Plan', STOCKS[:40] + ['Extra Ltd'])
+    similarity_index.add_fund(index, 3, 'Zeta Midcap Fund', STOCKS[30:60])
+
+    assert 2 in similarity_index.query_candidates(index, 1)
+    assert 3 not in similarity_index.query_candidates(index, 1)
+    assert [r['schemeCode'] for r in similarity_index.find_similar(index, 1)] == [2]
+    assert similarity_index.find_near_duplicates(index) == [
+        {'baseName': 'acme bluechip fund', 'sameBaseName': True, 'schemeCodes': [1, 2]}
+    ]
+
+def test_names_are_normalized_and_unchanged_funds_are_not_rehashed():
+    index = similarity_index.new_index()
+    assert similarity_index.add_fund(index, 1, 'A', ['Reliance Industries Ltd.', 'Infosys Limited'])
+    assert not similarity_index.add_fund(index, 1, 'A', ['RELIANCE INDUSTRIES LTD', 'Infosys Ltd'])
+
+    assert similarity_index.remove_fund(index, 1)
+    assert not any(index['buckets'])
+
+def test_update_index_persists_and_drops_funds_without_holdings(db, index_path, add_holdings):
+    add_holdings(1, STOCKS[:20], fund_name='Acme Fund')
+    add_holdings(2, STOCKS[10:30], fund_name='Zeta Fund')
+    index, changed = similarity_index.update_index(db, path=index_path)
+    assert changed == 2
+
+    repository.fund_holdings(db).delete_many({'schemeCode': 2})
+    index, changed = similarity_index.update_index(db, [2], path=index_path)
+    assert changed == 1
+    with open(index_path, 'rb') as f:
+        assert set(pickle.load(f)['signatures']) == {1}
+
+def test_auto_fetch_updates_the_index_once_per_flush(db, index_path, monkeypatch):
+    calls = []
+    original = similarity_index.update_index
+    monkeypatch.setattr(auto_fetch_holdings, 'update_index', lambda db, codes: calls.append(set(codes)) or original(db, codes, index_path))
+    snapshots = []
+    monkeypatch.setattr(auto_fetch_holdings, '_pending', {'codes': set(), 'snapshots': []})
+    monkeypatch.setattr(auto_fetch_holdings, 'append_snapshots', lambda batch: snapshots.append(len(batch)) or 0)
+
+    for code in (1, 2, 3):
+        batch = HoldingsBatch(STOCKS[code:code + 10], [10.0] * 10, sector=['Others'] * 10)
+        auto_fetch_holdings.import_holdings_to_db({'scheme_code': code, 'fund_name': f"Fund {code}", 'holdings': batch})
+    assert calls == []
+
+    assert auto_fetch_holdings.flush_pending(db) == 3
+    assert calls == [{1, 2, 3}]
+    assert snapshots == [3]
+    assert holdings_stats.load_report(db, compute_missing=False)['fundsWithHoldings'] == 3
+    assert auto_fetch_holdings.flush_pending(db) == 0
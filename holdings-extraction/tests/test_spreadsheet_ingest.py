@@ -0,0 +1,74 @@
+"""
+XLSX/CSV disclosure ingestion tests
+"""
+
+import os
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+import generate_fixtures
+import instrumentation
+import parser_profiles
+import spreadsheet_ingest
+from conftest import PACKAGE_DIR
+
+@pytest.fixture(autouse=True)
+def profiles(tmp_path, monkeypatch):
+    monkeypatch.chdir(PACKAGE_DIR)
+    monkeypatch.setattr(parser_profiles, '_registry', None)
+    monkeypatch.setattr(instrumentation, 'METRICS_DIR', str(tmp_path / 'metrics'))
+
+def test_workbook_sheets_become_schemes(tmp_path):
+    path = str(tmp_path / 'hdfc_portfolio_jan_2026.xlsx')
+    workbook = openpyxl.Workbook()
+    first = workbook.active
+    first.title = 'HDFCTOP100'
+    first.append(['HDFC Mutual Fund'])
+    first.append(['Scheme Name : HDFC Top 100 Fund'])
+    first.append([])
+    first.append(['Name of Instrument', 'ISIN', 'Market/Fair Value (Rs. in Lacs)', '% to NAV'])
+    first.append(['Infosys Ltd', 'INE009A01021', 1200.5, 0.0425])
+    first.append(['HDFC Bank Ltd', 'INE040A01034', 2400.0, 0.085])
+    first.append(['Grand Total', None, 3600.5, 0.1275])
+
+    second = workbook.create_sheet('HDFCMID')
+    second.append(['Name of Instrument', '% to NAV'])
+    second.append(['Trent Ltd', 3.5])
+    second.append(['Max Healthcare Institute Ltd', 2.75])
+
+    notes = workbook.create_sheet('Notes')
+    notes.append(['Industry classification as recommended by AMFI'])
+    workbook.save(path)
+
+    results = spreadsheet_ingest.parse_spreadsheet(path)
+
+    assert [name for name, _ in results] == ['HDFC Top 100 Fund', 'HDFCMID']
+    top = results[0][1]
+    # Fractional Excel percentages are scaled; the total row is dropped; values are in rupees
+    assert list(top['security']) == ['Infosys Ltd', 'HDFC Bank Ltd']
+    assert list(top['weight']) == pytest.approx([4.25, 8.5])
+    assert list(top['market_value']) == pytest.approx([1200.5e5, 2400.0e5])
+    assert list(results[1][1]['weight']) == pytest.approx([3.5, 2.75])
+
+def test_csv_without_a_holdings_header_yields_nothing(tmp_path):
+    path = tmp_path / 'notice.csv'
+    path.write_text('Dividend declared\nRecord date,2026-01-15\n')
+    assert spreadsheet_ingest.parse_spreadsheet(str(path)) == []
+    assert not spreadsheet_ingest.is_spreadsheet('portfolio.pdf')
+
+def test_generated_workbook_matches_its_csv_twin(tmp_path):
+    paths = {}
+    for file_format in ('xlsx', 'csv'):
+        generate_fixtures.generate_corpus(str(tmp_path / file_format), funds=2, holdings=40, months=1, formats=(file_format,))
+        directory = tmp_path / file_format / 'disclosures'
+        paths[file_format] = [str(directory / name) for name in sorted(os.listdir(directory))]
+
+    for xlsx_path, csv_path in zip(paths['xlsx'], paths['csv']):
+        [(_, workbook)] = spreadsheet_ingest.parse_spreadsheet(xlsx_path)
+        [(_, text)] = spreadsheet_ingest.parse_spreadsheet(csv_path)
+        assert len(workbook) == 40
+        assert list(workbook['security']) == list(text['security'])
+        # Workbooks keep full-precision fractions; the CSV prints percentages to two places
+        assert list(workbook['weight']) == pytest.approx(list(text['weight']), abs=0.01)
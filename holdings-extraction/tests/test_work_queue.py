@@ -0,0 +1,158 @@
+"""
+Work queue tests (mongomock; the multi-process test needs a local mongod)
+"""
+
+import multiprocessing
+import os
+from datetime import timedelta
+
+import pytest
+
+import repository
+import work_queue
+
+def test_enqueue_is_idempotent(db):
+    assert work_queue.enqueue('parse', 'abc', {'filename': 'a.pdf'})
+    assert not work_queue.enqueue('parse', 'abc', {'filename': 'renamed.pdf'})
+    assert work_queue.enqueue_many('parse', [('abc', {}), ('def', {}), ('ghi', {})]) == 2
+    assert repository.jobs(db).find_one({'_id': 'parse:abc'})['payload'] == {'filename': 'a.pdf'}
+    assert work_queue.queue_stats()['parse']['queued'] == 3
+
+def test_claim_is_exclusive(db):
+    work_queue.enqueue('parse', 'abc', {})
+    job = work_queue.claim('parse', worker='w1')
+    assert job['status'] == 'running' and job['attempts'] == 1
+    assert work_queue.claim('parse', worker='w2') is None
+    assert work_queue.complete(job, {'rows': 3})
+    assert repository.jobs(db).find_one()['status'] == 'succeeded'
+
+def test_expired_lease_is_reclaimed(db):
+    work_queue.enqueue('parse', 'abc', {})
+    first = work_queue.claim('parse', worker='w1', lease_seconds=60)
+    repository.jobs(db).update_one({'_id': first['_id']}, {'$set': {'leaseExpiresAt': work_queue.utcnow() - timedelta(seconds=1)}})
+
+    second = work_queue.claim('parse', worker='w2')
+    assert second['worker'] == 'w2' and second['attempts'] == 2
+    # The original worker lost the job and can neither heartbeat nor complete it
+    assert not work_queue.heartbeat(first)
+    assert not work_queue.complete(first)
+    assert work_queue.complete(second)
+
+def test_failures_back_off_then_dead_letter(db, monkeypatch):
+    monkeypatch.setattr(work_queue, 'RETRY_SECONDS', 0)
+    work_queue.enqueue('parse', 'abc', {}, max_attempts=2)
+
+    job = work_queue.claim('parse', worker='w1')
+    assert work_queue.fail(job, 'boom') == 'queued'
+    job = work_queue.claim('parse', worker='w1')
+    assert work_queue.fail(job, 'boom again') == 'dead'
+    assert work_queue.claim('parse', worker='w1') is None
+
+    dead = repository.jobs(db).find_one()
+    assert dead['status'] == 'dead' and dead['lastError'] == 'boom again'
+    assert work_queue.requeue_dead('parse') == 1
+    assert work_queue.claim('parse', worker='w1')['attempts'] == 1
+
+def test_claim_dead_letters_every_exhausted_job_before_returning(db):
+    work_queue.enqueue_many('parse', [(str(i), {}) for i in range(50)], max_attempts=1)
+    expired = work_queue.utcnow() - timedelta(seconds=1)
+    repository.jobs(db).update_many({'_id': {'$ne': 'parse:49'}}, {'$set': {'status': 'running', 'attempts': 1, 'leaseExpiresAt': expired}})
+    repository.jobs(db).update_one({'_id': 'parse:49'}, {'$set': {'availableAt': work_queue.utcnow()}})
+
+    assert work_queue.claim('parse', worker='w1')['_id'] == 'parse:49'
+    assert work_queue.queue_stats()['parse']['dead'] == 49
+
+def test_retry_waits_for_backoff(db, monkeypatch):
+    monkeypatch.setattr(work_queue, 'RETRY_SECONDS', 60)
+    work_queue.enqueue('parse', 'abc', {})
+    work_queue.fail(work_queue.claim('parse', worker='w1'), 'boom')
+    assert work_queue.claim('parse', worker='w1') is None
+
+def test_run_worker_drains_queue(db, monkeypatch):
+    monkeypatch.setattr(work_queue, 'RETRY_SECONDS', 0)
+    work_queue.enqueue_many('parse', [(str(i), {'n': i}) for i in range(5)], max_attempts=1)
+
+    def handler(payload):
+        if payload['n'] == 3:
+            raise ValueError('unparseable')
+        return {'double': payload['n'] * 2}
+
+    counts = work_queue.run_worker('parse', handler, worker='w1', idle_exit=True)
+    assert counts['succeeded'] == 4 and counts['dead'] == 1
+    assert repository.jobs(db).find_one({'_id': 'parse:4'})['result'] == {'double': 8}
+
+def test_failure_after_losing_the_lease_leaves_the_new_owner_alone(db, monkeypatch):
+    monkeypatch.setattr(work_queue, 'RETRY_SECONDS', 0)
+    work_queue.enqueue('parse', 'abc', {}, max_attempts=2)
+    first = work_queue.claim('parse', worker='w1', lease_seconds=60)
+    repository.jobs(db).update_one({'_id': first['_id']}, {'$set': {'leaseExpiresAt': work_queue.utcnow() - timedelta(seconds=1)}})
+    second = work_queue.claim('parse', worker='w2')
+
+    assert work_queue.fail(first, 'stale worker') == 'lost'
+    # Out of attempts: the stale worker must not dead-letter the job either
+    assert work_queue.fail(dict(first, attempts=2), 'stale worker') == 'lost'
+    job = repository.jobs(db).find_one()
+    assert (job['status'], job['worker'], job.get('lastError')) == ('running', 'w2', None)
+    assert work_queue.complete(second)
+
+def test_drain_parse_queue_parses_then_collects(db, tmp_path, monkeypatch):
+    import parse_holdings
+    monkeypatch.setattr(parse_holdings, 'OUTPUT_DIR', str(tmp_path / 'parsed'))
+    monkeypatch.setattr(parse_holdings, 'parse_job', lambda payload: {'outputs': [
+        {'filename': f"{payload['n']}.json", 'holdings_count': 1, 'data': {'fund_name': f"Fund {payload['n']}"}}
+    ]})
+    work_queue.enqueue_many('parse', [(str(i), {'n': i}) for i in range(3)])
+
+    assert parse_holdings.drain_parse_queue(db=db) == 3
+    assert sorted(os.listdir(tmp_path / 'parsed')) == ['0.json', '1.json', '2.json']
+    assert work_queue.queue_stats()['parse']['succeeded'] == 3
+    assert parse_holdings.collect_parsed_jobs(db) == 0
+
+def test_drain_parse_queue_waits_for_remote_jobs_without_respawning_workers(db, tmp_path, monkeypatch):
+    import parse_holdings
+    monkeypatch.setattr(parse_holdings, 'OUTPUT_DIR', str(tmp_path / 'parsed'))
+    work_queue.enqueue_many('parse', [('local', {'n': 0}), ('remote', {'n': 1})])
+    remote = work_queue.claim('parse', worker='remote-box')
+    pools = []
+    monkeypatch.setattr(parse_holdings, 'run_parse_workers', lambda processes, idle_exit: pools.append(
+        work_queue.run_worker('parse', lambda payload: {'outputs': []}, idle_exit=idle_exit)))
+    polls = []
+
+    def sleep(seconds):
+        polls.append(seconds)
+        if len(polls) == 3:
+            work_queue.complete(remote, {'outputs': []})
+    monkeypatch.setattr(parse_holdings.time, 'sleep', sleep)
+
+    parse_holdings.drain_parse_queue(processes=4, db=db)
+    assert len(pools) == 1 and len(polls) == 3
+    assert work_queue.queue_stats()['parse']['succeeded'] == 2
+
+def _drain(uri, database, seen):
+    from pymongo import MongoClient
+    repository.set_client(MongoClient(uri), database=database)
+    work_queue.run_worker('parse', lambda payload: seen.put(payload['n']) or os.getpid(), idle_exit=True)
+
+@pytest.mark.skipif(not os.getenv('HOLDINGS_TEST_MONGODB_URI'), reason='set HOLDINGS_TEST_MONGODB_URI to a local mongod')
+def test_worker_processes_share_queue():
+    from pymongo import MongoClient
+    uri = os.environ['HOLDINGS_TEST_MONGODB_URI']
+    database = 'holdings_queue_test'
+    repository.set_client(MongoClient(uri), database=database)
+    repository.jobs().drop()
+    work_queue.create_indexes()
+    work_queue.enqueue_many('parse', [(str(i), {'n': i}) for i in range(200)])
+
+    context = multiprocessing.get_context('spawn')
+    seen = context.Queue()
+    workers = [context.Process(target=_drain, args=(uri, database, seen)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    processed = sorted(seen.get() for _ in range(200))
+    assert processed == list(range(200))
+    assert work_queue.queue_stats()['parse']['succeeded'] == 200
+    repository.get_db().client.drop_database(database)
+    repository.set_client(None)
@@ -0,0 +1,230 @@
+"""
+Distributed Work Queue
+Job queue stored in the `pipeline_jobs` collection so parse workers can run on several machines.
+Workers claim jobs atomically with findOneAndUpdate and hold a lease that a heartbeat thread
+extends; a job whose worker dies is reclaimed once its lease expires. Failures are retried with
+exponential backoff and dead-lettered after JOB_MAX_ATTEMPTS. Job ids are idempotent keys
+(e.g. 'parse:<sha256 of the PDF>'), so enqueueing the same disclosure twice is a no-op.
+
+Job document:
+  {
+    _id: 'parse:<sha256>', kind: 'parse', payload: {...},
+    status: 'queued' | 'running' | 'succeeded' | 'dead',
+    attempts, maxAttempts, availableAt, leaseExpiresAt, worker, heartbeatAt,
+    lastError, result, createdAt, updatedAt, finishedAt
+  }
+
+Environment:
+  JOB_LEASE_SECONDS    lease a claim holds before another worker may take the job (default 300)
+  JOB_MAX_ATTEMPTS     attempts before a job is dead-lettered (default 3)
+  JOB_RETRY_SECONDS    first retry delay, doubled on every further attempt (default 30)
+  JOB_POLL_INTERVAL    seconds an idle worker waits between claims (default 2)
+"""
+
+import os
+import socket
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+import instrumentation
+import repository
+
+LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '300'))
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+RETRY_SECONDS = float(os.getenv('JOB_RETRY_SECONDS', '30'))
+POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '2'))
+
+STATUSES = ['queued', 'running', 'succeeded', 'dead']
+
+def utcnow():
+    """Queue timestamps are UTC so workers in different timezones agree on leases"""
+    return datetime.now(timezone.utc)
+
+def worker_name():
+    """host:pid, recorded on claimed jobs"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def create_indexes(db=None):
+    """Indexes for claiming (kind/status/availableAt) and lease recovery"""
+    jobs = repository.jobs(db)
+    jobs.create_index([('kind', ASCENDING), ('status', ASCENDING), ('availableAt', ASCENDING)])
+    jobs.create_index([('kind', ASCENDING), ('status', ASCENDING), ('leaseExpiresAt', ASCENDING)])
+
+def new_job(kind, payload, max_attempts=None):
+    """Fields set only when a job is first enqueued"""
+    now = utcnow()
+    return {
+        'kind': kind,
+        'payload': payload,
+        'status': 'queued',
+        'attempts': 0,
+        'maxAttempts': max_attempts or MAX_ATTEMPTS,
+        'availableAt': now,
+        'createdAt': now,
+        'updatedAt': now
+    }
+
+def enqueue(kind, key, payload, max_attempts=None, db=None):
+    """Add a job unless one with the same key exists; returns True if it was new"""
+    result = repository.jobs(db).update_one(
+        {'_id': f"{kind}:{key}"},
+        {'$setOnInsert': new_job(kind, payload, max_attempts)},
+        upsert=True
+    )
+    return result.upserted_id is not None
+
+def enqueue_many(kind, jobs, max_attempts=None, db=None):
+    """Enqueue [(key, payload)] in one unordered bulk upsert; returns how many were new"""
+    operations = [
+        UpdateOne({'_id': f"{kind}:{key}"}, {'$setOnInsert': new_job(kind, payload, max_attempts)}, upsert=True)
+        for key, payload in jobs
+    ]
+    if not operations:
+        return 0
+    added = repository.bulk_write_batched(repository.jobs(db), operations)['upserted']
+    instrumentation.count('queue', f"enqueued.{kind}", added)
+    return added
+
+def _claimable(kind, now):
+    """Filter for jobs a worker may take now: queued and past their backoff, or running on an expired lease"""
+    return {'kind': kind, '$or': [
+        {'status': 'queued', 'availableAt': {'$lte': now}},
+        {'status': 'running', 'leaseExpiresAt': {'$lt': now}}
+    ]}
+
+def claim(kind, worker=None, lease_seconds=None, db=None):
+    """Atomically take the oldest available job (or one whose lease expired); None if there is none"""
+    lease = lease_seconds or LEASE_SECONDS
+    while True:
+        now = utcnow()
+        job = repository.jobs(db).find_one_and_update(
+            _claimable(kind, now),
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker': worker or worker_name(),
+                    'leaseExpiresAt': now + timedelta(seconds=lease),
+                    'heartbeatAt': now,
+                    'updatedAt': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('availableAt', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None or job['attempts'] <= job['maxAttempts']:
+            return job
+        # Its workers kept dying mid-job (lease expired every time)
+        dead_letter(job, 'lease expired on every attempt', db)
+
+def claimable_count(kind, db=None):
+    """How many jobs a worker could claim right now"""
+    return repository.jobs(db).count_documents(_claimable(kind, utcnow()))
+
+def heartbeat(job, lease_seconds=None, db=None):
+    """Extend the lease; False if another worker has taken the job over"""
+    now = utcnow()
+    result = repository.jobs(db).update_one(
+        {'_id': job['_id'], 'status': 'running', 'worker': job['worker']},
+        {'$set': {'leaseExpiresAt': now + timedelta(seconds=lease_seconds or LEASE_SECONDS), 'heartbeatAt': now}}
+    )
+    return result.matched_count == 1
+
+def complete(job, result=None, db=None):
+    """Mark a claimed job succeeded; False if the lease was lost meanwhile"""
+    now = utcnow()
+    update = repository.jobs(db).update_one(
+        {'_id': job['_id'], 'status': 'running', 'worker': job['worker']},
+        {'$set': {'status': 'succeeded', 'result': result, 'finishedAt': now, 'updatedAt': now},
+         '$unset': {'leaseExpiresAt': ''}}
+    )
+    return update.matched_count == 1
+
+def dead_letter(job, error, db=None):
+    """Park a claimed job that won't succeed by retrying; False if the lease was lost meanwhile"""
+    now = utcnow()
+    update = repository.jobs(db).update_one(
+        {'_id': job['_id'], 'status': 'running', 'worker': job['worker']},
+        {'$set': {'status': 'dead', 'lastError': error, 'finishedAt': now, 'updatedAt': now},
+         '$unset': {'leaseExpiresAt': ''}}
+    )
+    if update.matched_count != 1:
+        return False
+    instrumentation.count('queue', f"dead_lettered.{job['kind']}")
+    return True
+
+def fail(job, error, db=None):
+    """Requeue with exponential backoff, or dead-letter once attempts are used up; returns the new status
+    ('lost' if another worker has taken the job over, which is then left alone)"""
+    if job['attempts'] >= job['maxAttempts']:
+        return 'dead' if dead_letter(job, error, db) else 'lost'
+
+    now = utcnow()
+    delay = RETRY_SECONDS * 2 ** (job['attempts'] - 1)
+    update = repository.jobs(db).update_one(
+        {'_id': job['_id'], 'status': 'running', 'worker': job['worker']},
+        {'$set': {'status': 'queued', 'availableAt': now + timedelta(seconds=delay), 'lastError': error, 'updatedAt': now},
+         '$unset': {'leaseExpiresAt': ''}}
+    )
+    if update.matched_count != 1:
+        return 'lost'
+    instrumentation.count('queue', f"retried.{job['kind']}")
+    return 'queued'
+
+def requeue_dead(kind, db=None):
+    """Give dead-lettered jobs a fresh set of attempts; returns how many"""
+    now = utcnow()
+    result = repository.jobs(db).update_many(
+        {'kind': kind, 'status': 'dead'},
+        {'$set': {'status': 'queued', 'attempts': 0, 'availableAt': now, 'updatedAt': now}}
+    )
+    return result.modified_count
+
+def queue_stats(db=None):
+    """{kind: {status: count}}"""
+    stats = {}
+    for row in repository.jobs(db).aggregate([{'$group': {'_id': {'kind': '$kind', 'status': '$status'}, 'count': {'$sum': 1}}}]):
+        stats.setdefault(row['_id']['kind'], dict.fromkeys(STATUSES, 0))[row['_id']['status']] = row['count']
+    return stats
+
+def _keep_alive(job, lease_seconds, stop, db):
+    """Heartbeat thread: extend the lease every third of its length until the handler returns"""
+    while not stop.wait(lease_seconds / 3):
+        if not heartbeat(job, lease_seconds, db):
+            print(f"⚠️  Lease on {job['_id'][:60]} taken over by another worker")
+            return
+
+def run_worker(kind, handler, worker=None, lease_seconds=None, max_jobs=None, idle_exit=False, db=None):
+    """Claim and run jobs until stopped; handler(payload) returns the job result. Returns {status: count}"""
+    worker = worker or worker_name()
+    lease = lease_seconds or LEASE_SECONDS
+    counts = {'succeeded': 0, 'queued': 0, 'dead': 0, 'lost': 0}
+
+    while max_jobs is None or sum(counts.values()) < max_jobs:
+        job = claim(kind, worker, lease, db)
+        if job is None:
+            if idle_exit:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_keep_alive, args=(job, lease, stop, db), daemon=True)
+        beat.start()
+        with instrumentation.item('queue', job['_id']) as fields:
+            try:
+                result = handler(job['payload'])
+                status = 'succeeded' if complete(job, result, db) else 'lost'
+            except Exception as e:
+                status = fail(job, f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}", db)
+            finally:
+                stop.set()
+                beat.join()
+            fields['status'] = 'succeeded' if status == 'succeeded' else 'failed'
+        counts[status] += 1
+        print(f"  [{worker}] {job['_id'][:60]} -> {status} (attempt {job['attempts']})")
+
+    return counts
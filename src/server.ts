@@ -6,6 +6,7 @@ import rateLimit from 'express-rate-limit';
 import { mongodb } from './db/mongodb';
 import { redis } from './cache/redis';
 import { config } from './config/environment';
+import { loadSectorExposureSnapshot } from './services/sectorExposureSnapshot';
 
 // Import cron jobs
 const newsCron = require('../cron/newsCron');
@@ -179,6 +180,13 @@ async function startServer() {
     await redis.connect();
     console.log('✅ Redis connected successfully\n');
 
+    // Load precomputed sector exposure (optional, produced by holdings-extraction)
+    try {
+      loadSectorExposureSnapshot();
+    } catch (error: any) {
+      console.log(`⚠️  Sector exposure snapshot unavailable: ${error.message}`);
+    }
+
     // Start Express server
     app.listen(PORT, () => {
       console.log('═'.repeat(60));
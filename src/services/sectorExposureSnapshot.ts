@@ -0,0 +1,123 @@
+import fs from 'fs';
+import path from 'path';
+
+/**
+ * Sector Exposure Snapshot
+ *
+ * Loads the binary snapshot written by holdings-extraction/sector_exposure.py:
+ *   'SEXP' | uint16 version | uint16 reserved | uint32 headerLength | JSON header | float32 arrays
+ *
+ * Arrays are Float32Array views over the file buffer, so lookups need no Mongo queries.
+ */
+
+const SNAPSHOT_MAGIC = 'SEXP';
+const SNAPSHOT_VERSION = 1;
+
+const DEFAULT_SNAPSHOT_PATH = path.join(
+  process.cwd(),
+  'holdings-extraction',
+  'analytics',
+  'sector_exposure.bin'
+);
+
+interface ArraySpec {
+  name: string;
+  shape: number[];
+  offset: number;
+}
+
+interface SnapshotArray {
+  shape: number[];
+  data: Float32Array;
+}
+
+export interface SectorExposureSnapshot {
+  generatedAt: string;
+  funds: string[];
+  sectors: string[];
+  categories: string[];
+  amcs: string[];
+  percentiles: number[];
+  reportMonths: number[];
+  arrays: Record<string, SnapshotArray>;
+  fundIndex: Map<string, number>;
+}
+
+let snapshot: SectorExposureSnapshot | null = null;
+
+export function loadSectorExposureSnapshot(
+  filePath: string = process.env.SECTOR_EXPOSURE_SNAPSHOT || DEFAULT_SNAPSHOT_PATH
+): SectorExposureSnapshot | null {
+  if (!fs.existsSync(filePath)) {
+    console.log(`⚠️  Sector exposure snapshot not found: ${filePath}`);
+    return null;
+  }
+
+  const buffer = fs.readFileSync(filePath);
+  if (buffer.toString('ascii', 0, 4) !== SNAPSHOT_MAGIC) {
+    throw new Error(`Not a sector exposure snapshot: ${filePath}`);
+  }
+
+  const version = buffer.readUInt16LE(4);
+  if (version !== SNAPSHOT_VERSION) {
+    throw new Error(`Unsupported sector exposure snapshot version: ${version}`);
+  }
+
+  const headerLength = buffer.readUInt32LE(8);
+  const header = JSON.parse(buffer.toString('utf8', 12, 12 + headerLength));
+  const base = buffer.byteOffset + 12 + headerLength;
+
+  // Copy into an aligned ArrayBuffer so Float32Array views are valid
+  const body = new ArrayBuffer(buffer.length - 12 - headerLength);
+  new Uint8Array(body).set(
+    new Uint8Array(buffer.buffer, base, body.byteLength)
+  );
+
+  const arrays: Record<string, SnapshotArray> = {};
+  for (const spec of header.arrays as ArraySpec[]) {
+    const count = spec.shape.reduce((a, b) => a * b, 1);
+    arrays[spec.name] = {
+      shape: spec.shape,
+      data: new Float32Array(body, spec.offset, count),
+    };
+  }
+
+  snapshot = {
+    ...header,
+    arrays,
+    fundIndex: new Map(header.funds.map((code: string, i: number) => [code, i])),
+  };
+
+  console.log(
+    `✅ Sector exposure snapshot loaded: ${header.funds.length} funds x ${header.sectors.length} sectors`
+  );
+  return snapshot;
+}
+
+export function getSectorExposureSnapshot(): SectorExposureSnapshot | null {
+  return snapshot;
+}
+
+/**
+ * Sector weights for a fund from the snapshot, largest first
+ */
+export function getFundSectorExposure(
+  schemeCode: string
+): { sector: string; weight: number }[] | null {
+  if (!snapshot) return null;
+
+  const row = snapshot.fundIndex.get(String(schemeCode));
+  if (row === undefined) return null;
+
+  const { data, shape } = snapshot.arrays.fundWeights;
+  const numSectors = shape[1];
+  const weights = data.subarray(row * numSectors, (row + 1) * numSectors);
+
+  return snapshot.sectors
+    .map((sector, i) => ({
+      sector,
+      weight: parseFloat(weights[i].toFixed(2)),
+    }))
+    .filter((s) => s.weight > 0)
+    .sort((a, b) => b.weight - a.weight);
+}